@@ -0,0 +1,121 @@
+"""
+Response Builders - Dựng response schemas cho graph routes.
+
+Request body được validate đầy đủ ở boundary (FastAPI + SimpleGraphRequest).
+Dữ liệu do server tạo ra (result state của graph, gồm cả lịch sử messages)
+là trusted nên được dựng bằng model_construct: không validate lại từng
+message, chi phí không tăng theo độ dài lịch sử. FastAPI nhận lại đúng
+instance của response_model nên cũng không validate lại trước khi
+serialize (revalidate_instances="never").
+"""
+from typing import Any, Mapping, Optional
+
+from app.schemas.api import SimpleGraphJobResponse, SimpleGraphResponse, SimpleGraphResult
+
+MESSAGE_WAITING_FOR_INPUT = "Đang chờ thông tin từ người dùng..."
+
+
+def graph_result(result_state: Mapping[str, Any]) -> SimpleGraphResult:
+    """
+    Dựng SimpleGraphResult từ result state (trusted, không validate).
+
+    Khi graph đang chờ human approve ghi file, final_response là nội dung
+    review (file_path + file_content); các trường hợp khác không trả về
+    file_content (file đã ghi hoặc không có).
+
+    Args:
+        result_state: State trả về từ SimpleGraph.invoke
+
+    Returns:
+        SimpleGraphResult
+    """
+    waiting = "__interrupt__" in result_state
+    file_path = result_state.get("file_path")
+    file_content = result_state.get("file_content")
+    if waiting and file_path and file_content:
+        final_response = f"Yêu cầu ghi file:\n\nFile: {file_path}\n\nNội dung:\n{file_content}"
+    else:
+        final_response = result_state.get("final_response") or (MESSAGE_WAITING_FOR_INPUT if waiting else "")
+        file_content = None
+        if waiting:
+            # Chờ thông tin từ người dùng (ask_user_for_file_info), chưa có file
+            file_path = None
+    return SimpleGraphResult.model_construct(
+        final_response=final_response,
+        messages=result_state.get("messages") or [],
+        token_usage=result_state.get("token_usage") or {},
+        intent=result_state.get("intent"),
+        file_path=file_path,
+        file_content=file_content,
+    )
+
+
+def graph_response(
+    result_state: Mapping[str, Any],
+    thread_id: Optional[str],
+    message: str,
+    paused_message: str,
+) -> SimpleGraphResponse:
+    """
+    Dựng SimpleGraphResponse thành công từ result state (trusted).
+
+    Args:
+        result_state: State trả về từ SimpleGraph.invoke
+        thread_id: Thread ID của conversation
+        message: Message khi graph chạy xong
+        paused_message: Message khi graph bị interrupt (chờ human)
+
+    Returns:
+        SimpleGraphResponse
+    """
+    waiting = "__interrupt__" in result_state
+    return SimpleGraphResponse.model_construct(
+        success=True,
+        message=paused_message if waiting else message,
+        data=graph_result(result_state),
+        thread_id=thread_id,
+        waiting_for_human=waiting,
+    )
+
+
+def graph_error_response(message: str, thread_id: Optional[str] = None) -> SimpleGraphResponse:
+    """SimpleGraphResponse lỗi (success = False, không có data)."""
+    return SimpleGraphResponse.model_construct(
+        success=False,
+        message=message,
+        data=None,
+        thread_id=thread_id,
+        waiting_for_human=False,
+    )
+
+
+def graph_job_response(job: Mapping[str, Any]) -> SimpleGraphJobResponse:
+    """
+    Dựng SimpleGraphJobResponse từ job document (trusted, đọc từ MongoDB).
+
+    Args:
+        job: Job document (xem app/services/graph_job_service.py)
+
+    Returns:
+        SimpleGraphJobResponse; result có cùng dạng với response của /simple/start
+    """
+    result_state = job.get("result")
+    result = None
+    if result_state is not None:
+        result = graph_response(
+            result_state,
+            job.get("thread_id"),
+            message="SimpleGraph executed successfully",
+            paused_message="Graph paused, waiting for human input",
+        )
+    return SimpleGraphJobResponse.model_construct(
+        job_id=job["_id"],
+        status=job["status"],
+        thread_id=job.get("thread_id"),
+        attempts=job.get("attempts", 0),
+        created_at=job.get("created_at"),
+        started_at=job.get("started_at"),
+        finished_at=job.get("finished_at"),
+        result=result,
+        error=job.get("error"),
+    )
@@ -16,5 +16,10 @@ from .graph import router as graph_router
 
 api_router.include_router(graph_router, prefix="/graph", tags=["graph"])
 
+# Include ingestion router
+from .ingest import router as ingest_router
+
+api_router.include_router(ingest_router, prefix="/ingest", tags=["ingest"])
+
 __all__ = ["api_router"]
 
@@ -1,26 +1,42 @@
 """
 Graph API Routes - Endpoints để gọi SimpleGraph qua FastAPI.
 """
-from fastapi import APIRouter, Depends
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query, Request, Response
 from fastapi.responses import HTMLResponse
 
+from app.api.responses import graph_error_response, graph_job_response, graph_response
+from app.core.cancellation import run_until_disconnected
 from app.core.dependencies import get_settings
+from app.core.exceptions import ClientDisconnectedError, NotFoundError
 from app.graph.simple_graph import SimpleGraph
+from app.graph.thread_status import thread_status_registry, STATUS_UNKNOWN
+from app.services.graph_job_service import get_graph_job_service
 from app.schemas.graph import BaseGraphState
 from app.schemas.api import (
     SimpleGraphRequest,
     SimpleGraphResponse,
-    SimpleGraphResult,
     SimpleGraphContinueRequest,
     SimpleGraphStatusResponse,
+    SimpleGraphJobRequest,
+    SimpleGraphJobResponse,
 )
 
 router = APIRouter()
 
 
+async def _run_graph(http_request: Request, awaitable, settings, name: str):
+    """Chạy graph; hủy khi client ngắt kết nối (settings.graph_cancel_on_disconnect)."""
+    if not settings.graph_cancel_on_disconnect:
+        return await awaitable
+    return await run_until_disconnected(http_request, awaitable, name=name)
+
+
 @router.post("/simple/start", response_model=SimpleGraphResponse)
 async def start_simple_graph(
     request: SimpleGraphRequest,
+    http_request: Request,
     settings=Depends(get_settings),
 ):
     """
@@ -31,11 +47,13 @@ async def start_simple_graph(
 
     Args:
         request: SimpleGraphRequest body.
+        http_request: Request hiện tại (theo dõi client disconnect để hủy graph).
         settings: App settings.
 
     Returns:
         SimpleGraphResponse với thread_id và waiting_for_human=True nếu bị interrupt.
     """
+    thread_id = None
     try:
         import uuid
         
@@ -53,77 +71,33 @@ async def start_simple_graph(
             "token_usage": {},
         }
 
-        # Thực thi graph với thread_id
-        result_state = await graph.invoke(initial_state, thread_id=thread_id)
-
-        # Kiểm tra nếu graph bị interrupt (chờ human input)
-        if "__interrupt__" in result_state:
-            # Graph đã pause tại human_approval node (cho request) hoặc các node khác
-            # Lấy thông tin file để user review (nếu có)
-            file_path = result_state.get("file_path")
-            file_content = result_state.get("file_content")
-            
-            # Tạo result với thông tin file để review
-            review_data = None
-            if file_path and file_content:
-                review_data = SimpleGraphResult(
-                    final_response=f"Yêu cầu ghi file:\n\nFile: {file_path}\n\nNội dung:\n{file_content}",
-                    messages=result_state.get("messages", []),
-                    token_usage=result_state.get("token_usage", {}) or {},
-                    intent=result_state.get("intent"),
-                    file_path=file_path,
-                    file_content=file_content,
-                )
-            else:
-                # Nếu không có file (có thể đang chờ ở ask_user_for_file_info)
-                review_data = SimpleGraphResult(
-                    final_response=result_state.get("final_response", "Đang chờ thông tin từ người dùng..."),
-                    messages=result_state.get("messages", []),
-                    token_usage=result_state.get("token_usage", {}) or {},
-                    intent=result_state.get("intent"),
-                    file_path=None,
-                    file_content=None,
-                )
-            
-            return SimpleGraphResponse(
-                success=True,
-                message="Graph paused, waiting for human approval to write file" if file_path else "Graph paused, waiting for human input",
-                data=review_data,
-                thread_id=thread_id,
-                waiting_for_human=True,
-            )
-
-        # Graph đã chạy xong (không bị interrupt)
-        result = SimpleGraphResult(
-            final_response=result_state.get("final_response", ""),
-            messages=result_state.get("messages", []),
-            token_usage=result_state.get("token_usage", {}) or {},
-            intent=result_state.get("intent"),
-            file_path=result_state.get("file_path"),
-            file_content=None,  # Không trả về content sau khi đã ghi file
+        # Thực thi graph với thread_id (hủy nếu client đóng kết nối)
+        result_state = await _run_graph(
+            http_request, graph.invoke(initial_state, thread_id=thread_id), settings, "SimpleGraph start"
         )
 
-        return SimpleGraphResponse(
-            success=True,
+        # Luôn trả về thread_id để track conversation; nếu bị interrupt thì
+        # data chứa thông tin file để user review (nếu có)
+        return graph_response(
+            result_state,
+            thread_id,
             message="SimpleGraph executed successfully",
-            data=result,
-            thread_id=thread_id,  # Luôn trả về thread_id để track conversation
-            waiting_for_human=False,
+            paused_message=(
+                "Graph paused, waiting for human approval to write file"
+                if result_state.get("file_path") else "Graph paused, waiting for human input"
+            ),
         )
+    except ClientDisconnectedError:
+        return graph_error_response("Client disconnected, SimpleGraph cancelled", thread_id)
     except Exception as e:
-        return SimpleGraphResponse(
-            success=False,
-            message=f"Error executing SimpleGraph: {str(e)}",
-            data=None,
-            thread_id=None,
-            waiting_for_human=False,
-        )
+        return graph_error_response(f"Error executing SimpleGraph: {str(e)}")
 
 
 @router.post("/simple/{thread_id}/continue", response_model=SimpleGraphResponse)
 async def continue_simple_graph(
     thread_id: str,
     request: SimpleGraphContinueRequest,
+    http_request: Request,
     settings=Depends(get_settings),
 ):
     """
@@ -134,6 +108,7 @@ async def continue_simple_graph(
     Args:
         thread_id: Thread ID từ lần invoke trước.
         request: SimpleGraphContinueRequest với human_input.
+        http_request: Request hiện tại (theo dõi client disconnect để hủy graph).
         settings: App settings.
 
     Returns:
@@ -144,99 +119,137 @@ async def continue_simple_graph(
         graph = SimpleGraph()
 
         # Resume graph với human_input
-        result_state = await graph.invoke(
-            state={},  # State sẽ được load từ checkpoint
-            thread_id=thread_id,
-            resume_value=request.human_input,
-        )
-
-        # Kiểm tra nếu graph vẫn bị interrupt (nếu có nhiều interrupt points)
-        if "__interrupt__" in result_state:
-            # Lấy thông tin file để user review (nếu có)
-            file_path = result_state.get("file_path")
-            file_content = result_state.get("file_content")
-            final_response = result_state.get("final_response", "")
-            
-            # Tạo result với thông tin để review
-            review_data = None
-            if file_path and file_content:
-                # human_approval stage
-                review_data = SimpleGraphResult(
-                    final_response=f"Yêu cầu ghi file:\n\nFile: {file_path}\n\nNội dung:\n{file_content}",
-                    messages=result_state.get("messages", []),
-                    token_usage=result_state.get("token_usage", {}) or {},
-                    intent=result_state.get("intent"),
-                    file_path=file_path,
-                    file_content=file_content,
-                )
-            else:
-                # ask_user_for_file_info stage
-                review_data = SimpleGraphResult(
-                    final_response=final_response or "Đang chờ thông tin từ người dùng...",
-                    messages=result_state.get("messages", []),
-                    token_usage=result_state.get("token_usage", {}) or {},
-                    intent=result_state.get("intent"),
-                    file_path=None,
-                    file_content=None,
-                )
-            
-            return SimpleGraphResponse(
-                success=True,
-                message="Graph paused again, waiting for more human input",
-                data=review_data,
+        result_state = await _run_graph(
+            http_request,
+            graph.invoke(
+                state={},  # State sẽ được load từ checkpoint
                 thread_id=thread_id,
-                waiting_for_human=True,
-            )
-
-        # Graph đã chạy xong
-        result = SimpleGraphResult(
-            final_response=result_state.get("final_response", ""),
-            messages=result_state.get("messages", []),
-            token_usage=result_state.get("token_usage", {}) or {},
-            intent=result_state.get("intent"),
-            file_path=result_state.get("file_path"),
-            file_content=None,  # Không trả về content sau khi đã ghi file
+                resume_value=request.human_input,
+            ),
+            settings,
+            "SimpleGraph continue",
         )
 
-        return SimpleGraphResponse(
-            success=True,
+        # Graph có thể vẫn bị interrupt (nếu có nhiều interrupt points)
+        return graph_response(
+            result_state,
+            thread_id,
             message="Graph resumed and completed successfully",
-            data=result,
-            thread_id=thread_id,
-            waiting_for_human=False,
+            paused_message="Graph paused again, waiting for more human input",
         )
+    except ClientDisconnectedError:
+        return graph_error_response("Client disconnected, graph resume cancelled", thread_id)
     except Exception as e:
-        return SimpleGraphResponse(
-            success=False,
-            message=f"Error resuming graph: {str(e)}",
-            data=None,
-            thread_id=thread_id,
-            waiting_for_human=False,
-        )
+        return graph_error_response(f"Error resuming graph: {str(e)}", thread_id)
+
+
+@router.post("/simple/jobs", response_model=SimpleGraphJobResponse, status_code=202)
+async def create_simple_graph_job(
+    request: SimpleGraphJobRequest,
+    http_request: Request,
+    response: Response,
+):
+    """
+    Chạy SimpleGraph dưới dạng job nền, trả về job_id ngay.
+
+    Job bắt đầu thread mới (query) hoặc resume thread đang chờ human
+    (thread_id + human_input). Kết quả xem qua GET /simple/jobs/{job_id}
+    hoặc nhận qua callback (settings.graph_job_callback_url).
+
+    Args:
+        request: SimpleGraphJobRequest body.
+        http_request: Request hiện tại (để dựng URL của job).
+        response: Response (header Location).
+
+    Returns:
+        SimpleGraphJobResponse với status pending.
+    """
+    if request.human_input is not None:
+        state: BaseGraphState = {}
+    else:
+        state = {
+            "messages": request.messages or [],
+            "query": request.query,
+            "final_response": "",
+            "token_usage": {},
+        }
+    job = await get_graph_job_service().submit(
+        "simple", state, thread_id=request.thread_id, resume_value=request.human_input
+    )
+    response.headers["Location"] = str(http_request.url_for("get_simple_graph_job", job_id=job["_id"]))
+    return graph_job_response(job)
+
+
+@router.get("/simple/jobs/{job_id}", response_model=SimpleGraphJobResponse)
+async def get_simple_graph_job(job_id: str):
+    """
+    Xem trạng thái / kết quả của graph job (lookup theo _id trong MongoDB).
+
+    Args:
+        job_id: Job ID.
+
+    Returns:
+        SimpleGraphJobResponse.
+    """
+    job = await get_graph_job_service().get(job_id)
+    if job is None:
+        raise NotFoundError(f"Graph job {job_id} không tồn tại")
+    return graph_job_response(job)
 
 
 @router.get("/simple/{thread_id}/status", response_model=SimpleGraphStatusResponse)
 async def get_simple_graph_status(
     thread_id: str,
+    wait: Optional[float] = Query(
+        None,
+        ge=0,
+        description="Long-poll: chờ tối đa N giây đến khi trạng thái thay đổi",
+    ),
+    since: Optional[int] = Query(
+        None,
+        ge=0,
+        description="Version client đã biết; trả về ngay nếu version hiện tại khác",
+    ),
     settings=Depends(get_settings),
 ):
     """
     Xem trạng thái hiện tại của graph với thread_id.
-    
+
+    Trạng thái được đọc O(1) từ thread_status_registry. Với ?wait=N, request
+    block (không busy polling) đến khi version khác `since` (mặc định: version
+    hiện tại) hoặc hết N giây (giới hạn bởi settings.graph_status_max_wait).
+
     Args:
         thread_id: Thread ID để check status.
+        wait: Số giây long-poll tối đa (optional).
+        since: Version đã biết để so sánh (optional).
         settings: App settings.
 
     Returns:
         SimpleGraphStatusResponse với trạng thái hiện tại.
     """
     try:
-        # TODO: Implement logic để lấy state từ checkpointer
-        # Hiện tại chỉ return basic status
+        if wait:
+            timeout = min(wait, settings.graph_status_max_wait)
+            entry = await thread_status_registry.wait_for_change(thread_id, since, timeout)
+        else:
+            entry = thread_status_registry.get(thread_id)
+
+        if entry is None:
+            return SimpleGraphStatusResponse(
+                thread_id=thread_id,
+                waiting_for_human=False,
+                current_state=None,
+                status=STATUS_UNKNOWN,
+                version=0,
+            )
+
         return SimpleGraphStatusResponse(
             thread_id=thread_id,
-            waiting_for_human=True,  # Assume đang chờ nếu có status endpoint
-            current_state=None,
+            waiting_for_human=entry["waiting_for_human"],
+            current_state=entry["state"],
+            status=entry["status"],
+            version=entry["version"],
         )
     except Exception as e:
         # Return error status
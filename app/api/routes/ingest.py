@@ -0,0 +1,86 @@
+"""
+Ingestion API Routes - Nạp corpus (chunk + embed + lưu) chạy nền, resume được.
+"""
+import os
+
+from fastapi import APIRouter, Depends
+
+from app.core.dependencies import get_settings, require_api_key
+from app.core.exceptions import NotFoundError, ValidationError
+from app.schemas.api.ingest import IngestJobRequest, IngestJobResponse
+from app.services.ingestion_service import (
+    JOB_PENDING,
+    JOB_RUNNING,
+    MongoIngestJobStore,
+    is_job_running,
+    start_ingestion_job,
+)
+
+router = APIRouter(dependencies=[Depends(require_api_key)])
+
+
+def _check_source(source: str, settings) -> str:
+    """Chuẩn hóa source path và kiểm tra nằm trong settings.ingest_allowed_dir (bắt buộc)."""
+    if not settings.ingest_allowed_dir:
+        raise ValidationError("Ingestion API bị tắt (INGEST_ALLOWED_DIR chưa được cấu hình)")
+    path = os.path.realpath(source)
+    allowed = os.path.realpath(settings.ingest_allowed_dir)
+    if os.path.commonpath([path, allowed]) != allowed:
+        raise ValidationError("Source nằm ngoài thư mục được phép", details={"source": source})
+    if not os.path.exists(path):
+        raise ValidationError("Source không tồn tại", details={"source": source})
+    return path
+
+
+@router.post("/jobs", response_model=IngestJobResponse)
+async def create_ingest_job(
+    request: IngestJobRequest,
+    settings=Depends(get_settings),
+):
+    """
+    Tạo ingestion job chạy nền (hoặc resume job cũ theo job_id).
+
+    Args:
+        request: IngestJobRequest body.
+        settings: App settings.
+
+    Returns:
+        IngestJobResponse với job_id để theo dõi tiến độ.
+    """
+    source = _check_source(request.source, settings)
+    try:
+        job_id = start_ingestion_job(
+            source,
+            job_id=request.job_id,
+            chunk_size=request.chunk_size,
+            chunk_overlap=request.chunk_overlap,
+        )
+    except ValueError as e:
+        raise ValidationError(str(e))
+    return IngestJobResponse(job_id=job_id, status=JOB_RUNNING, running=True)
+
+
+@router.get("/jobs/{job_id}", response_model=IngestJobResponse)
+async def get_ingest_job(job_id: str):
+    """
+    Xem trạng thái / checkpoint / tốc độ của ingestion job.
+
+    Args:
+        job_id: Job ID.
+
+    Returns:
+        IngestJobResponse.
+    """
+    job = await MongoIngestJobStore().load(job_id)
+    running = is_job_running(job_id)
+    if job is None and not running:
+        raise NotFoundError(f"Ingestion job {job_id} không tồn tại")
+    job = job or {}
+    return IngestJobResponse(
+        job_id=job_id,
+        status=job.get("status", JOB_RUNNING if running else JOB_PENDING),
+        running=running,
+        last_seq=job.get("last_seq", -1),
+        stats=job.get("stats"),
+        error=job.get("error"),
+    )
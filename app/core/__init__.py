@@ -5,6 +5,7 @@ Core module - Configuration, database connections, và core utilities.
 from .config import settings, Settings
 from .database import get_database, connect_to_mongo, close_mongo_connection
 from .sql_database import SQLConnector, get_sql_connector, init_sql_connector
+from .checkpointer import MongoCheckpointSaver, get_mongo_checkpointer, create_checkpointer
 
 __all__ = [
     "settings",
@@ -15,5 +16,8 @@ __all__ = [
     "SQLConnector",
     "get_sql_connector",
     "init_sql_connector",
+    "MongoCheckpointSaver",
+    "get_mongo_checkpointer",
+    "create_checkpointer",
 ]
 
@@ -0,0 +1,106 @@
+"""
+Cancellation - Hủy work đang chạy khi client ngắt kết nối.
+
+- run_until_disconnected: chạy coroutine thành task, đồng thời chờ message
+  "http.disconnect" từ ASGI receive (blocking, không polling). Client đóng
+  kết nối => task bị cancel (LLM calls qua httpx bị hủy, connection bị đóng)
+  và ClientDisconnectedError được raise.
+- complete_despite_cancel: đoạn "commit" (ghi file + xóa pending HITL) luôn
+  chạy trọn vẹn; cancel đến giữa chừng bị hoãn tới khi commit xong, nên
+  state không bao giờ ghi dở.
+"""
+import asyncio
+import logging
+from typing import Awaitable, Optional, TypeVar
+
+from starlette.requests import Request
+
+from app.core.exceptions import ClientDisconnectedError
+from app.core.tracing import current_span
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+async def wait_for_disconnect(request: Request) -> None:
+    """
+    Chờ đến khi client ngắt kết nối.
+
+    Body của request phải đã được đọc (FastAPI đọc trước khi gọi endpoint);
+    sau đó receive chỉ trả về khi client disconnect.
+    """
+    while True:
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            return
+
+
+async def run_until_disconnected(
+    request: Request,
+    awaitable: Awaitable[T],
+    name: Optional[str] = None,
+) -> T:
+    """
+    Chạy awaitable, hủy nó nếu client ngắt kết nối trước khi xong.
+
+    Args:
+        request: Request hiện tại
+        awaitable: Work cần chạy (vd. graph.invoke(...))
+        name: Tên work để log (optional)
+
+    Returns:
+        Kết quả của awaitable
+
+    Raises:
+        ClientDisconnectedError: Client ngắt kết nối và work đã bị hủy
+    """
+    task = asyncio.ensure_future(awaitable)
+    watcher = asyncio.ensure_future(wait_for_disconnect(request))
+    try:
+        await asyncio.wait({task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+    except asyncio.CancelledError:
+        # Chính handler bị hủy (vd. server shutdown): hủy luôn work
+        task.cancel()
+        raise
+    finally:
+        watcher.cancel()
+
+    if not task.done():
+        task.cancel()
+        await asyncio.wait({task})
+        if task.cancelled():
+            logger.info(f"Client disconnected, cancelled {name or 'request work'}")
+            span = current_span()
+            if span is not None:
+                span.set_attribute("cancelled", True)
+                span.set_attribute("cancel_reason", "client_disconnected")
+            raise ClientDisconnectedError(details={"work": name})
+        # Work đang ở đoạn commit và đã chạy xong bất chấp cancel
+        logger.info(f"Client disconnected after {name or 'request work'} committed")
+    return task.result()
+
+
+async def complete_despite_cancel(awaitable: Awaitable[T]) -> T:
+    """
+    Chạy awaitable đến hết kể cả khi task hiện tại bị cancel giữa chừng.
+
+    Cancel nhận được trong lúc chờ bị nuốt (task.uncancel) để code phía sau
+    (cập nhật state) chạy như bình thường; dùng cho đoạn commit ngắn.
+
+    Args:
+        awaitable: Đoạn commit (vd. ghi file + cập nhật pending state)
+
+    Returns:
+        Kết quả của awaitable
+    """
+    inner = asyncio.ensure_future(awaitable)
+    current = asyncio.current_task()
+    while True:
+        try:
+            return await asyncio.shield(inner)
+        except asyncio.CancelledError:
+            if inner.cancelled():
+                raise
+            if current is not None:
+                current.uncancel()
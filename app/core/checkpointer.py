@@ -0,0 +1,609 @@
+"""
+Checkpointer module - MongoDB checkpointer cho LangGraph, dùng chung Motor client.
+
+Thiết kế:
+- Checkpoint chỉ lưu metadata + channel_versions. Giá trị channel được lưu riêng
+  trong collection blobs theo (thread_id, checkpoint_ns, channel, version), nên mỗi
+  step chỉ ghi các channel thay đổi (new_versions) thay vì copy toàn bộ state.
+- Writes của các task được buffer và gộp theo key, sau đó flush bằng bulk_write
+  cùng lúc với checkpoint của step. Writes đặc biệt (interrupt/error/resume) được
+  flush ngay để không mất khi graph dừng giữa chừng.
+- Checkpoint mới nhất của một thread được đọc bằng một aggregate duy nhất
+  ($match/$sort/$limit/$lookup) trên index (thread_id, checkpoint_ns, checkpoint_id).
+- TTL index trên created_at / last_used_at để MongoDB tự dọn checkpoint cũ.
+- Sync API (graph.invoke/stream) được chuyển sang event loop của Motor client
+  (loop đã gọi setup()), nên chỉ dùng được từ thread khác loop đó, ví dụ
+  asyncio.to_thread(graph.invoke, ...); gọi trên chính loop sẽ raise.
+
+GRAPH_CHECKPOINTER chỉ áp dụng cho graphs compile với self.checkpointer.
+SimpleGraph (graph của API hiện tại) giữ human-in-the-loop ở tầng ứng dụng
+(app/graph/pending_requests.py) nên không đọc/ghi checkpoint.
+"""
+import asyncio
+import logging
+import random
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, TypeVar
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.memory import MemorySaver
+from pymongo import UpdateMany, UpdateOne
+
+from .config import settings
+from .database import get_database
+
+logger = logging.getLogger(__name__)
+
+# Separator cho các key ghép (thread_id, checkpoint_ns, ...) - không xuất hiện trong ID thông thường
+_KEY_SEP = "\x1f"
+
+T = TypeVar("T")
+
+
+def _key(*parts: Any) -> str:
+    """Ghép các thành phần thành một key string dùng làm _id."""
+    return _KEY_SEP.join(str(part) for part in parts)
+
+
+class MongoCheckpointSaver(BaseCheckpointSaver[str]):
+    """
+    Async LangGraph checkpointer lưu trên MongoDB.
+
+    Collections (với prefix mặc định "checkpoint"):
+    - checkpoints: một document cho mỗi checkpoint (không chứa channel_values)
+    - checkpoint_blobs: giá trị channel theo version (chỉ ghi khi channel thay đổi)
+    - checkpoint_writes: pending writes của các task
+
+    Motor là async driver: sync API chạy coroutine tương ứng trên event loop
+    của Motor client và chỉ gọi được từ thread khác loop đó.
+    """
+
+    def __init__(
+        self,
+        database=None,
+        collection_prefix: Optional[str] = None,
+        ttl_seconds: Optional[int] = None,
+        flush_max_writes: Optional[int] = None,
+        serde=None,
+    ):
+        """
+        Initialize Mongo checkpointer.
+
+        Args:
+            database: Motor database (defaults to get_database())
+            collection_prefix: Prefix tên collections (defaults to settings.checkpoint_collection_prefix)
+            ttl_seconds: TTL cho checkpoint cũ (defaults to settings.checkpoint_ttl_seconds)
+            flush_max_writes: Số writes tối đa được buffer trước khi flush
+            serde: Serializer (defaults to JsonPlusSerializer của LangGraph)
+        """
+        super().__init__(serde=serde)
+        self._database = database
+        prefix = collection_prefix or settings.checkpoint_collection_prefix
+        self.checkpoints_collection = f"{prefix}s"
+        self.blobs_collection = f"{prefix}_blobs"
+        self.writes_collection = f"{prefix}_writes"
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else settings.checkpoint_ttl_seconds
+        self.flush_max_writes = flush_max_writes or settings.checkpoint_flush_max_writes
+
+        # Buffer writes theo _id để gộp các lần ghi trùng trong cùng một step
+        self._pending_writes: Dict[str, UpdateOne] = {}
+        self._flush_lock = asyncio.Lock()
+        self._is_setup = False
+        # Event loop của Motor client (cập nhật ở mỗi lần dùng async API)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def db(self):
+        """Motor database đang dùng."""
+        return self._database if self._database is not None else get_database()
+
+    async def setup(self) -> None:
+        """Tạo indexes (idempotent). Gọi một lần lúc startup hoặc tự động ở lần dùng đầu tiên."""
+        self._loop = asyncio.get_running_loop()
+        if self._is_setup:
+            return
+        db = self.db
+        await db[self.checkpoints_collection].create_index(
+            [("thread_id", 1), ("checkpoint_ns", 1), ("checkpoint_id", -1)]
+        )
+        await db[self.writes_collection].create_index([("checkpoint_key", 1)])
+        await db[self.writes_collection].create_index([("thread_id", 1)])
+        await db[self.blobs_collection].create_index([("thread_id", 1)])
+        if self.ttl_seconds:
+            await db[self.checkpoints_collection].create_index(
+                "created_at", expireAfterSeconds=self.ttl_seconds
+            )
+            await db[self.writes_collection].create_index(
+                "created_at", expireAfterSeconds=self.ttl_seconds
+            )
+            # Blob có thể được checkpoint mới hơn tham chiếu lại => TTL theo lần dùng cuối
+            await db[self.blobs_collection].create_index(
+                "last_used_at", expireAfterSeconds=self.ttl_seconds
+            )
+        self._is_setup = True
+
+    # ==================== Serialization ====================
+
+    def _dump(self, value: Any) -> Dict[str, Any]:
+        type_, data = self.serde.dumps_typed(value)
+        return {"type": type_, "data": data}
+
+    def _load(self, doc: Dict[str, Any]) -> Any:
+        return self.serde.loads_typed((doc["type"], doc["data"]))
+
+    def _lookup_stages(self) -> List[Dict[str, Any]]:
+        """$lookup blobs và writes để đọc checkpoint trong một round trip."""
+        return [
+            {
+                "$lookup": {
+                    "from": self.blobs_collection,
+                    "localField": "blob_ids",
+                    "foreignField": "_id",
+                    "as": "blobs",
+                }
+            },
+            {
+                "$lookup": {
+                    "from": self.writes_collection,
+                    "localField": "_id",
+                    "foreignField": "checkpoint_key",
+                    "as": "writes",
+                }
+            },
+        ]
+
+    def _doc_to_tuple(self, doc: Dict[str, Any]) -> CheckpointTuple:
+        """Convert document (đã $lookup) thành CheckpointTuple."""
+        thread_id = doc["thread_id"]
+        checkpoint_ns = doc["checkpoint_ns"]
+        checkpoint: Checkpoint = self._load(doc["checkpoint"])
+
+        blobs = {blob["_id"]: blob for blob in doc.get("blobs", [])}
+        channel_values: Dict[str, Any] = {}
+        for channel, version in checkpoint["channel_versions"].items():
+            blob = blobs.get(_key(thread_id, checkpoint_ns, channel, version))
+            if blob is None or blob["type"] == "empty":
+                continue
+            channel_values[channel] = self._load(blob)
+
+        # Thứ tự writes giống lúc thực thi: (task_path, task_id, idx)
+        writes = sorted(
+            doc.get("writes", []),
+            key=lambda w: (w.get("task_path", ""), w["task_id"], w["idx"]),
+        )
+
+        parent_id = doc.get("parent_checkpoint_id")
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": doc["checkpoint_id"],
+                }
+            },
+            checkpoint={**checkpoint, "channel_values": channel_values},
+            metadata=self._load(doc["metadata"]),
+            parent_config=(
+                {
+                    "configurable": {
+                        "thread_id": thread_id,
+                        "checkpoint_ns": checkpoint_ns,
+                        "checkpoint_id": parent_id,
+                    }
+                }
+                if parent_id
+                else None
+            ),
+            pending_writes=[
+                (w["task_id"], w["channel"], self._load(w["value"])) for w in writes
+            ],
+        )
+
+    # ==================== Batched writes ====================
+
+    async def _flush(
+        self,
+        blob_ops: Optional[List[Any]] = None,
+        checkpoint_doc: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        """
+        Flush buffer writes (+ blobs/checkpoint của step hiện tại nếu có).
+
+        Blobs và writes được ghi trước checkpoint để reader không bao giờ thấy
+        checkpoint thiếu dữ liệu.
+        """
+        async with self._flush_lock:
+            pending_writes = self._pending_writes
+            self._pending_writes = {}
+            db = self.db
+            try:
+                bulk = []
+                if blob_ops:
+                    bulk.append(db[self.blobs_collection].bulk_write(blob_ops, ordered=False))
+                if pending_writes:
+                    bulk.append(
+                        db[self.writes_collection].bulk_write(
+                            list(pending_writes.values()), ordered=False
+                        )
+                    )
+                if bulk:
+                    await asyncio.gather(*bulk)
+            except Exception:
+                # Trả writes về buffer để lần flush sau thử lại
+                pending_writes.update(self._pending_writes)
+                self._pending_writes = pending_writes
+                raise
+            if checkpoint_doc is not None:
+                await db[self.checkpoints_collection].replace_one(
+                    {"_id": checkpoint_doc["_id"]}, checkpoint_doc, upsert=True
+                )
+
+    async def aflush(self) -> None:
+        """Flush toàn bộ writes đang buffer (gọi khi shutdown)."""
+        if self._pending_writes:
+            await self._flush()
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        """Lưu checkpoint; chỉ các channel trong new_versions được ghi blob mới."""
+        await self.setup()
+        configurable = config["configurable"]
+        thread_id = configurable["thread_id"]
+        checkpoint_ns = configurable.get("checkpoint_ns", "")
+        now = datetime.now(timezone.utc)
+
+        c = checkpoint.copy()
+        values: Dict[str, Any] = c.pop("channel_values")  # type: ignore[misc]
+
+        blob_ops: List[Any] = []
+        for channel, version in new_versions.items():
+            blob = (
+                self._dump(values[channel])
+                if channel in values
+                else {"type": "empty", "data": b""}
+            )
+            blob_ops.append(
+                UpdateOne(
+                    {"_id": _key(thread_id, checkpoint_ns, channel, version)},
+                    {
+                        "$setOnInsert": {
+                            "thread_id": thread_id,
+                            "checkpoint_ns": checkpoint_ns,
+                            **blob,
+                        },
+                        "$set": {"last_used_at": now},
+                    },
+                    upsert=True,
+                )
+            )
+
+        blob_ids = [
+            _key(thread_id, checkpoint_ns, channel, version)
+            for channel, version in c["channel_versions"].items()
+        ]
+        if self.ttl_seconds:
+            # Gia hạn TTL cho blobs không đổi nhưng vẫn được checkpoint này tham chiếu
+            reused = [
+                _key(thread_id, checkpoint_ns, channel, version)
+                for channel, version in c["channel_versions"].items()
+                if channel not in new_versions
+            ]
+            if reused:
+                blob_ops.append(
+                    UpdateMany({"_id": {"$in": reused}}, {"$set": {"last_used_at": now}})
+                )
+
+        checkpoint_doc = {
+            "_id": _key(thread_id, checkpoint_ns, checkpoint["id"]),
+            "thread_id": thread_id,
+            "checkpoint_ns": checkpoint_ns,
+            "checkpoint_id": checkpoint["id"],
+            "parent_checkpoint_id": configurable.get("checkpoint_id"),
+            "checkpoint": self._dump(c),
+            "metadata": self._dump(get_checkpoint_metadata(config, metadata)),
+            "blob_ids": blob_ids,
+            "created_at": now,
+        }
+        await self._flush(blob_ops=blob_ops, checkpoint_doc=checkpoint_doc)
+
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        """Buffer writes của task; flush cùng checkpoint của step tiếp theo."""
+        await self.setup()
+        configurable = config["configurable"]
+        thread_id = configurable["thread_id"]
+        checkpoint_ns = configurable.get("checkpoint_ns", "")
+        checkpoint_key = _key(thread_id, checkpoint_ns, configurable["checkpoint_id"])
+        now = datetime.now(timezone.utc)
+
+        flush_now = False
+        for idx, (channel, value) in enumerate(writes):
+            write_idx = WRITES_IDX_MAP.get(channel, idx)
+            write_id = _key(checkpoint_key, task_id, write_idx)
+            doc = {
+                "checkpoint_key": checkpoint_key,
+                "thread_id": thread_id,
+                "task_id": task_id,
+                "task_path": task_path,
+                "idx": write_idx,
+                "channel": channel,
+                "value": self._dump(value),
+                "created_at": now,
+            }
+            if write_idx >= 0:
+                # Write thường: giữ bản đầu tiên (giống InMemorySaver)
+                self._pending_writes.setdefault(
+                    write_id,
+                    UpdateOne({"_id": write_id}, {"$setOnInsert": doc}, upsert=True),
+                )
+            else:
+                # Interrupt/error/resume: ghi đè và flush ngay
+                self._pending_writes[write_id] = UpdateOne(
+                    {"_id": write_id}, {"$set": doc}, upsert=True
+                )
+                flush_now = True
+
+        if flush_now or len(self._pending_writes) >= self.flush_max_writes:
+            await self._flush()
+
+    # ==================== Reads ====================
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        """Đọc checkpoint (mới nhất nếu không có checkpoint_id) bằng một aggregate."""
+        await self.setup()
+        await self.aflush()
+        configurable = config["configurable"]
+        match: Dict[str, Any] = {
+            "thread_id": configurable["thread_id"],
+            "checkpoint_ns": configurable.get("checkpoint_ns", ""),
+        }
+        if checkpoint_id := get_checkpoint_id(config):
+            match["checkpoint_id"] = checkpoint_id
+
+        pipeline = [
+            {"$match": match},
+            {"$sort": {"checkpoint_id": -1}},
+            {"$limit": 1},
+            *self._lookup_stages(),
+        ]
+        async for doc in self.db[self.checkpoints_collection].aggregate(pipeline):
+            return self._doc_to_tuple(doc)
+        return None
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        """Liệt kê checkpoints (mới nhất trước)."""
+        if limit is not None and limit <= 0:
+            return
+        await self.setup()
+        await self.aflush()
+
+        match: Dict[str, Any] = {}
+        checkpoint_id_filter: Dict[str, Any] = {}
+        if config:
+            configurable = config["configurable"]
+            match["thread_id"] = configurable["thread_id"]
+            if configurable.get("checkpoint_ns") is not None:
+                match["checkpoint_ns"] = configurable["checkpoint_ns"]
+            if checkpoint_id := get_checkpoint_id(config):
+                checkpoint_id_filter["$eq"] = checkpoint_id
+        if before and (before_id := get_checkpoint_id(before)):
+            checkpoint_id_filter["$lt"] = before_id
+        if checkpoint_id_filter:
+            match["checkpoint_id"] = checkpoint_id_filter
+
+        pipeline: List[Dict[str, Any]] = [{"$match": match}, {"$sort": {"checkpoint_id": -1}}]
+        # Metadata được serialize => filter ở Python, chỉ push $limit khi không có filter
+        if limit is not None and not filter:
+            pipeline.append({"$limit": limit})
+        pipeline.extend(self._lookup_stages())
+
+        remaining = limit
+        async for doc in self.db[self.checkpoints_collection].aggregate(pipeline):
+            checkpoint_tuple = self._doc_to_tuple(doc)
+            if filter and not all(
+                checkpoint_tuple.metadata.get(key) == value for key, value in filter.items()
+            ):
+                continue
+            yield checkpoint_tuple
+            if remaining is not None:
+                remaining -= 1
+                if remaining <= 0:
+                    break
+
+    # ==================== Deletion / pruning ====================
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        """Xóa toàn bộ checkpoints, blobs và writes của thread."""
+        await self.aflush()
+        db = self.db
+        await asyncio.gather(
+            db[self.checkpoints_collection].delete_many({"thread_id": thread_id}),
+            db[self.blobs_collection].delete_many({"thread_id": thread_id}),
+            db[self.writes_collection].delete_many({"thread_id": thread_id}),
+        )
+
+    async def aprune(
+        self,
+        thread_ids: Sequence[str],
+        *,
+        strategy: str = "keep_latest",
+    ) -> None:
+        """
+        Dọn checkpoints của các threads.
+
+        Args:
+            thread_ids: Threads cần dọn
+            strategy: "keep_latest" giữ checkpoint mới nhất mỗi namespace, "delete" xóa hết
+        """
+        if strategy == "delete":
+            for thread_id in thread_ids:
+                await self.adelete_thread(thread_id)
+            return
+        if strategy != "keep_latest":
+            raise ValueError(f"Unsupported prune strategy: {strategy}")
+
+        await self.aflush()
+        db = self.db
+        for thread_id in thread_ids:
+            latest = db[self.checkpoints_collection].aggregate(
+                [
+                    {"$match": {"thread_id": thread_id}},
+                    {"$sort": {"checkpoint_id": -1}},
+                    {
+                        "$group": {
+                            "_id": "$checkpoint_ns",
+                            "checkpoint_key": {"$first": "$_id"},
+                            "blob_ids": {"$first": "$blob_ids"},
+                        }
+                    },
+                ]
+            )
+            keep_checkpoints: List[str] = []
+            keep_blobs: List[str] = []
+            async for doc in latest:
+                keep_checkpoints.append(doc["checkpoint_key"])
+                keep_blobs.extend(doc["blob_ids"])
+
+            await asyncio.gather(
+                db[self.checkpoints_collection].delete_many(
+                    {"thread_id": thread_id, "_id": {"$nin": keep_checkpoints}}
+                ),
+                db[self.writes_collection].delete_many(
+                    {"thread_id": thread_id, "checkpoint_key": {"$nin": keep_checkpoints}}
+                ),
+                db[self.blobs_collection].delete_many(
+                    {"thread_id": thread_id, "_id": {"$nin": keep_blobs}}
+                ),
+            )
+
+    # ==================== Sync API (bridge sang event loop của Motor) ====================
+
+    def _run_sync(self, factory: Callable[[], Awaitable[T]]) -> T:
+        """
+        Chạy coroutine trên event loop của Motor client và chờ kết quả.
+
+        Raises:
+            RuntimeError: Nếu chưa có loop (chưa gọi setup()) hoặc đang ở trên chính
+                loop đó (chờ đồng bộ sẽ deadlock)
+        """
+        loop = self._loop
+        if loop is None or loop.is_closed() or not loop.is_running():
+            raise RuntimeError(
+                "MongoCheckpointSaver sync API cần event loop của Motor đang chạy: gọi await setup() trước"
+            )
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            raise RuntimeError(
+                "Không gọi sync API của MongoCheckpointSaver trên event loop của nó: "
+                "dùng graph.ainvoke/astream hoặc asyncio.to_thread(graph.invoke, ...)"
+            )
+        return asyncio.run_coroutine_threadsafe(factory(), loop).result()
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return self._run_sync(lambda: self.aget_tuple(config))
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        async def collect() -> List[CheckpointTuple]:
+            return [item async for item in self.alist(config, filter=filter, before=before, limit=limit)]
+
+        return iter(self._run_sync(collect))
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return self._run_sync(lambda: self.aput(config, checkpoint, metadata, new_versions))
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        return self._run_sync(lambda: self.aput_writes(config, writes, task_id, task_path))
+
+    def delete_thread(self, thread_id: str) -> None:
+        return self._run_sync(lambda: self.adelete_thread(thread_id))
+
+    def get_next_version(self, current: Optional[str], channel: None) -> str:
+        """String versions tăng dần (giống InMemorySaver) để dùng làm key blob."""
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+
+# Shared instance - buffer writes phải dùng chung trong process
+_mongo_checkpointer: Optional[MongoCheckpointSaver] = None
+
+
+def get_mongo_checkpointer() -> MongoCheckpointSaver:
+    """Get shared MongoCheckpointSaver instance (tạo lazily)."""
+    global _mongo_checkpointer
+    if _mongo_checkpointer is None:
+        _mongo_checkpointer = MongoCheckpointSaver()
+    return _mongo_checkpointer
+
+
+def create_checkpointer() -> BaseCheckpointSaver:
+    """
+    Tạo checkpointer mặc định theo settings.graph_checkpointer.
+
+    Returns:
+        Shared MongoCheckpointSaver nếu "mongo", ngược lại một MemorySaver mới
+    """
+    if settings.graph_checkpointer.lower() == "mongo":
+        return get_mongo_checkpointer()
+    return MemorySaver()
@@ -29,6 +29,24 @@ class Settings(BaseSettings):
     
     # OpenAI Organization (optional)
     openai_organization: Optional[str] = None
+
+    # Base URL của API tương thích OpenAI (None = api.openai.com), ví dụ stub local
+    # cho load test offline: python -m benchmarks.openai_stub
+    openai_base_url: Optional[str] = None
+
+    # HTTP client dùng chung cho mọi ChatOpenAI/OpenAIEmbeddings (xem app/core/http_client.py);
+    # read/write timeout = openai_timeout
+    llm_http_max_connections: int = 100  # Tổng số connections tối đa tới LLM endpoint
+    llm_http_max_keepalive: int = 20  # Số connections idle được giữ lại để reuse
+    llm_http_keepalive_expiry: float = 30.0  # Đóng connection idle sau N giây
+    llm_http2: bool = False  # HTTP/2 (cần package h2: pip install "httpx[http2]")
+    llm_http_connect_timeout: float = 5.0
+    llm_http_pool_timeout: float = 10.0  # Thời gian tối đa chờ connection rảnh trong pool
+
+    # Prompt prefix caching (xem app/prompts/builder.py): OpenAI chỉ cache prompt từ 1024 tokens,
+    # file này (instructions/examples dùng chung) được đặt trước system prompt của mọi node
+    prompt_shared_prefix_path: Optional[str] = None
+    prompt_cache_discount: float = 0.5  # Giá cached input token giảm bao nhiêu (0.5 = rẻ hơn 50%)
     
     # ==================== MongoDB Configuration ====================
     # MongoDB Connection
@@ -72,8 +90,8 @@ class Settings(BaseSettings):
     # anthropic_api_key: Optional[str] = None
     # cohere_api_key: Optional[str] = None
     
-    # Example: Embedding Services
-    # openai_embedding_model: str = "text-embedding-3-small"
+    # Embedding Services
+    openai_embedding_model: str = "text-embedding-3-small"
     
     # ==================== Application Configuration ====================
     app_name: str = "FastBase AI"
@@ -97,15 +115,99 @@ class Settings(BaseSettings):
     log_level: str = "INFO"
     log_format: str = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
     log_file: Optional[str] = None  # Optional log file path
+    log_json: bool = False  # Ghi log_file dạng JSON lines
+    log_error_sample_window: float = 60.0  # Traceback giống nhau chỉ log đầy đủ 1 lần mỗi N giây (0 = tắt)
     
     # ==================== Graph Configuration ====================
     graph_max_iterations: int = 50
     graph_timeout: Optional[int] = None
-    
+
+    # Checkpointer Configuration
+    graph_checkpointer: str = "memory"  # "memory" hoặc "mongo" (graphs compile với checkpointer; SimpleGraph không dùng)
+    checkpoint_collection_prefix: str = "checkpoint"
+    checkpoint_ttl_seconds: Optional[int] = None  # None = không tự động xóa checkpoint cũ
+    checkpoint_flush_max_writes: int = 256  # Flush buffer khi số writes đang chờ vượt ngưỡng
+
+    # Graph status (in-process registry + long-poll)
+    graph_status_max_threads: int = 10000  # Số threads tối đa giữ trạng thái (LRU)
+    graph_status_max_wait: float = 30.0  # Thời gian long-poll tối đa (giây)
+    graph_cancel_on_disconnect: bool = True  # Hủy graph đang chạy khi client ngắt kết nối
+
+    # Đề xuất ghi file chờ human duyệt (xem app/graph/pending_requests.py)
+    graph_pending_store: str = "mongo"  # "mongo" (chia sẻ giữa processes) hoặc "memory" (test/dev một process)
+    graph_pending_collection: str = "graph_pending_requests"
+    graph_pending_ttl_seconds: Optional[int] = None  # Tự xóa đề xuất chưa được duyệt sau N giây (None = giữ)
+
+    # Graph jobs (POST /graph/simple/jobs, xem app/services/graph_job_service.py)
+    graph_jobs_collection: str = "graph_jobs"
+    graph_job_max_concurrency: int = 4  # Số jobs chạy đồng thời mỗi process
+    graph_job_ttl_seconds: Optional[int] = None  # Tự xóa job sau N giây kể từ khi kết thúc (None = giữ)
+    graph_job_callback_url: Optional[str] = None  # POST kết quả tới URL này khi job kết thúc
+    graph_job_callback_timeout: float = 10.0
+    graph_job_executor: str = "local"  # "local" (chạy trong API process) hoặc "worker" (python -m app.worker)
+
+    # Worker process cho graph jobs (python -m app.worker, xem app/worker.py)
+    worker_concurrency: int = 4  # Số jobs chạy đồng thời mỗi worker
+    worker_lease_seconds: float = 60.0  # Lease của job đã claim; hết hạn => job được chạy lại (job local: failed)
+    worker_heartbeat_interval: float = 15.0  # Chu kỳ gia hạn lease (nên < lease / 3), cả job local
+    worker_poll_interval: float = 1.0  # Thời gian chờ tối đa giữa các lần claim khi hàng đợi rỗng
+    worker_max_attempts: int = 3  # Số lần chạy tối đa (tính cả lần worker chết giữa chừng)
+    worker_retry_backoff: float = 5.0  # Backoff trước lần chạy lại: base * 2^(attempts-1)
+    worker_retry_backoff_max: float = 300.0
+    worker_graceful_timeout: float = 30.0  # Chờ jobs đang chạy khi dừng, sau đó trả job về hàng đợi
+
     # Retriever Configuration
     retriever_top_k: int = 5  # Number of documents to retrieve
     retriever_score_threshold: Optional[float] = None
+    retriever_duplicate_threshold: float = 0.9  # Similarity >= ngưỡng => near-duplicate khi pack context
+    retriever_mmr_lambda: float = 0.7  # Trọng số relevance vs diversity khi pack context
+
+    # Hybrid retrieval (BM25 + vector, hợp nhất bằng reciprocal rank fusion)
+    bm25_k1: float = 1.5
+    bm25_b: float = 0.75
+    hybrid_rrf_k: int = 60
+    hybrid_candidate_k: int = 50  # Số ứng viên lấy từ mỗi nhánh trước khi fuse
+
+    # Vector Index (in-process NumPy, xem app/utils/vector_index.py)
+    vector_index_type: str = "auto"  # "flat" (exact), "ivf" hoặc "auto"
+    vector_index_ivf_threshold: int = 50000  # auto: dùng IVF khi số vectors >= ngưỡng
+    vector_index_n_lists: Optional[int] = None  # Số IVF clusters (None = sqrt(n))
+    vector_index_n_probe: int = 16  # Số clusters scan mỗi query
+    vector_index_search_block_rows: int = 65536  # Số hàng mỗi block khi flat search
+    vector_index_segment_rows: int = 65536  # Số vectors tối đa mỗi segment growable
+    vector_index_compaction_ratio: float = 0.2  # Compact khi rác/tail >= tỉ lệ này
+    vector_index_dtype: str = "float32"  # Storage: "float32", "float16" hoặc "int8"
+    vector_index_rerank_factor: int = 4  # Quantized + có rerank_source: rerank k * factor candidates
+
+    # Index snapshots (memory-mapped, dùng chung giữa workers, xem app/utils/index_snapshot.py)
+    index_snapshot_dir: Optional[str] = None  # None = không load snapshot khi startup
+    index_snapshot_refresh_interval: float = 30.0  # Chu kỳ kiểm tra version mới (giây)
+    index_snapshot_keep: int = 2  # Số versions giữ lại trên disk
+
+    # Embedding Cache (content hash + model, xem app/utils/embedding_cache.py)
+    embedding_cache_enabled: bool = True
+    embedding_cache_backend: str = "memory"  # "memory" (chỉ LRU) hoặc "mongo" (dùng chung giữa workers)
+    embedding_cache_max_entries: int = 100000  # Số vectors tối đa trong LRU in-process
+    embedding_cache_collection: str = "embedding_cache"
     
+    # ==================== File Tools Configuration ====================
+    file_write_max_workers: int = 4  # Số threads cho file I/O (không block event loop)
+    file_write_chunk_size: int = 1024 * 1024  # Số ký tự mỗi lần write
+    read_data_max_bytes: int = 256 * 1024  # Giới hạn bytes read_data_tool trả về mỗi lần
+    read_data_chunk_bytes: int = 64 * 1024  # Kích thước chunk khi stream file
+    read_data_index_cache_size: int = 64  # Số file giữ line index trong cache
+
+    # ==================== Ingestion Configuration ====================
+    ingest_chunk_size: int = 1000  # Số ký tự mỗi chunk
+    ingest_chunk_overlap: int = 200  # Số ký tự overlap giữa các chunks
+    ingest_batch_size: int = 64  # Số chunks mỗi lời gọi embed
+    ingest_max_concurrency: int = 4  # Số lời gọi embed đồng thời
+    ingest_queue_size: int = 8  # Số batches tối đa chờ giữa các stage
+    ingest_progress_interval: float = 5.0  # Chu kỳ log tiến độ (giây)
+    ingest_chunks_collection: str = "ingest_chunks"
+    ingest_jobs_collection: str = "ingest_jobs"
+    ingest_allowed_dir: Optional[str] = "data"  # API chỉ nhận source nằm trong thư mục này (rỗng = tắt ingestion API)
+
     # ==================== Security Configuration ====================
     # API Key for protecting endpoints (optional)
     api_secret_key: Optional[str] = None
@@ -113,6 +215,34 @@ class Settings(BaseSettings):
     # Rate Limiting (optional)
     rate_limit_enabled: bool = False
     rate_limit_per_minute: int = 60
+
+    # ==================== Server Configuration ====================
+    # Pre-fork launcher: python -m app.server (xem app/server.py)
+    server_host: str = "0.0.0.0"
+    server_port: int = 8000
+    server_workers: int = 1  # 0 = số CPU cores; >1 xem giới hạn trạng thái per-process trong app/server.py
+    server_profile: str = "balanced"  # Tuning keep-alive/concurrency: "balanced", "proxy" hoặc "direct"
+    server_keepalive_timeout: Optional[int] = None  # None = theo profile
+    server_limit_concurrency: Optional[int] = None  # None = theo profile (vượt => 503)
+    server_backlog: Optional[int] = None  # None = theo profile
+    server_max_requests: int = 0  # Recycle worker sau N requests (0 = tắt)
+    server_max_requests_jitter: int = 0  # Cộng thêm ngẫu nhiên [0, jitter] để workers không recycle cùng lúc
+    server_max_rss_mb: float = 0  # Recycle worker khi RSS vượt ngưỡng (0 = tắt)
+    server_rss_check_interval: float = 10.0  # Chu kỳ kiểm tra RSS (giây)
+    server_graceful_timeout: float = 30.0  # Thời gian tối đa drain requests khi worker dừng (giây)
+
+    # ==================== Tracing Configuration ====================
+    # Spans route -> graph -> LLM / tool -> Mongo (xem app/core/tracing.py)
+    tracing_enabled: bool = False
+    tracing_export_path: str = "traces/spans.jsonl"  # File JSON lines (mỗi span một dòng)
+
+    # ==================== Profiling Configuration ====================
+    # Profile từng request (xem app/core/profiling.py); tắt => không đăng ký middleware
+    profiling_enabled: bool = False
+    profiling_mode: str = "sampling"  # "sampling" (speedscope JSON) hoặc "cprofile" (pstats)
+    profiling_sample_every: int = 0  # Profile 1 trong N requests, 0 = chỉ theo header X-Profile
+    profiling_interval_ms: float = 1.0  # Chu kỳ sample stack (mode sampling)
+    profiling_dir: str = "profiles"  # Thư mục ghi profiles
     
     class Config:
         env_file = ".env"
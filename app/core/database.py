@@ -7,6 +7,7 @@ from typing import Optional
 import logging
 
 from .config import settings
+from .tracing import MongoCommandTracer
 
 logger = logging.getLogger(__name__)
 
@@ -23,7 +24,9 @@ mongodb = MongoDB()
 async def connect_to_mongo() -> None:
     """Create database connection."""
     try:
-        mongodb.client = AsyncIOMotorClient(settings.mongodb_url)
+        # Span cho mỗi Mongo command khi tracing bật (listener no-op khi tắt)
+        event_listeners = [MongoCommandTracer()] if settings.tracing_enabled else []
+        mongodb.client = AsyncIOMotorClient(settings.mongodb_url, event_listeners=event_listeners)
         mongodb.database = mongodb.client[settings.mongodb_db_name]
         # Test connection
         await mongodb.client.admin.command('ping')
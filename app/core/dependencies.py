@@ -1,10 +1,14 @@
 """
 Dependencies module - Dependency injection setup cho base structure.
 """
+import hmac
 from typing import Optional
 from functools import lru_cache
 
+from fastapi import Header
+
 from .config import settings
+from .exceptions import AuthenticationError
 from .database import get_database
 from .sql_database import get_sql_connector
 
@@ -42,3 +46,22 @@ def get_sql_db():
     """
     return get_sql_connector()
 
+
+
+def require_api_key(x_api_key: Optional[str] = Header(None)):
+    """
+    Yêu cầu header X-API-Key bằng settings.api_secret_key (dependency injection).
+    
+    Endpoint bị khóa hoàn toàn khi API_SECRET_KEY chưa được cấu hình.
+    
+    Args:
+        x_api_key: Giá trị header X-API-Key
+        
+    Raises:
+        AuthenticationError: Nếu API key chưa cấu hình, thiếu hoặc sai
+    """
+    secret = get_settings().api_secret_key
+    if not secret:
+        raise AuthenticationError("API_SECRET_KEY chưa được cấu hình, endpoint bị khóa")
+    if not x_api_key or not hmac.compare_digest(x_api_key.encode("utf-8"), secret.encode("utf-8")):
+        raise AuthenticationError("API key không hợp lệ")
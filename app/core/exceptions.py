@@ -61,9 +61,23 @@ class LLMError(BaseAppException):
         super().__init__(message, status_code=502, details=details)
 
 
+class AuthenticationError(BaseAppException):
+    """Exception khi request thiếu hoặc sai API key."""
+    
+    def __init__(self, message: str = "Unauthorized", details: Optional[Dict[str, Any]] = None):
+        super().__init__(message, status_code=401, details=details)
+
+
 class ConfigurationError(BaseAppException):
     """Exception cho configuration errors."""
     
     def __init__(self, message: str, details: Optional[Dict[str, Any]] = None):
         super().__init__(message, status_code=500, details=details)
 
+
+
+class ClientDisconnectedError(BaseAppException):
+    """Exception khi client ngắt kết nối trước khi xử lý xong (work đã bị hủy)."""
+    
+    def __init__(self, message: str = "Client disconnected", details: Optional[Dict[str, Any]] = None):
+        super().__init__(message, status_code=499, details=details)
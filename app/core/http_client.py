@@ -0,0 +1,204 @@
+"""
+HTTP Client - Một httpx.AsyncClient dùng chung cho mọi LLM/embeddings client.
+
+Mỗi ChatOpenAI/OpenAIEmbeddings mặc định tự tạo HTTP client riêng (pool
+riêng, TLS handshake riêng cho mỗi graph/request). Module này giữ một client
+cho cả process:
+- Keep-alive và pool limits/timeouts từ settings (llm_http_*), HTTP/2 tuỳ chọn
+- Tạo ở startup, đóng ở shutdown (app/main.py); reset trong process con sau fork
+- Stats: số requests, connections mở mới / reuse, thời gian chờ connection
+  trong pool (đo qua trace events của httpcore)
+"""
+import importlib.util
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+_client: Optional[httpx.AsyncClient] = None
+_stats: Optional["PoolStats"] = None
+_lock = threading.Lock()
+
+
+def _get_settings():
+    from app.core.config import settings
+    return settings
+
+
+class PoolStats:
+    """Counters về connection reuse và thời gian chờ pool."""
+
+    def __init__(self):
+        self.requests = 0
+        self.in_flight = 0
+        self.connections_opened = 0
+        self.pool_timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.http_versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def record(self, wait: float, new_connection: bool, http_version: Optional[str]) -> None:
+        with self._lock:
+            self.requests += 1
+            self.connections_opened += new_connection
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+            if http_version:
+                self.http_versions[http_version] = self.http_versions.get(http_version, 0) + 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Stats hiện tại (thời gian theo ms)."""
+        with self._lock:
+            reused = max(self.requests - self.connections_opened, 0)
+            return {
+                "requests": self.requests,
+                "in_flight": self.in_flight,
+                "connections_opened": self.connections_opened,
+                "connections_reused": reused,
+                "reuse_ratio": round(reused / self.requests, 4) if self.requests else 0.0,
+                "pool_wait_avg_ms": round(self.wait_total / self.requests * 1000, 3) if self.requests else 0.0,
+                "pool_wait_max_ms": round(self.wait_max * 1000, 3),
+                "pool_timeouts": self.pool_timeouts,
+                "http_versions": dict(self.http_versions),
+            }
+
+
+class _InstrumentedTransport(httpx.AsyncBaseTransport):
+    """
+    Bọc AsyncHTTPTransport, đo mỗi request qua extension "trace" của httpcore.
+
+    Connection coi là mở mới nếu có event "connection.connect_*"; thời gian
+    chờ pool = từ lúc gửi vào pool tới khi bắt đầu connect (connection mới)
+    hoặc gửi headers (connection reuse).
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, stats: PoolStats):
+        self._transport = transport
+        self._stats = stats
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        started = time.perf_counter()
+        state = {"acquired": None, "new": False}
+        previous = request.extensions.get("trace")
+
+        async def trace(name: str, info: Dict[str, Any]) -> None:
+            if state["acquired"] is None:
+                if name.startswith("connection.connect_") and name.endswith(".started"):
+                    state["new"] = True
+                    state["acquired"] = time.perf_counter()
+                elif name.endswith("send_request_headers.started"):
+                    state["acquired"] = time.perf_counter()
+            if previous is not None:
+                await previous(name, info)
+
+        request.extensions["trace"] = trace
+        stats = self._stats
+        stats.in_flight += 1
+        response = None
+        try:
+            response = await self._transport.handle_async_request(request)
+            return response
+        except httpx.PoolTimeout:
+            stats.pool_timeouts += 1
+            raise
+        finally:
+            stats.in_flight -= 1
+            acquired = state["acquired"] or time.perf_counter()
+            http_version = response.extensions.get("http_version", b"").decode() if response is not None else None
+            stats.record(acquired - started, state["new"], http_version)
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+def create_http_client(
+    max_connections: Optional[int] = None,
+    max_keepalive: Optional[int] = None,
+    keepalive_expiry: Optional[float] = None,
+    http2: Optional[bool] = None,
+    timeout: Optional[float] = None,
+    connect_timeout: Optional[float] = None,
+    pool_timeout: Optional[float] = None,
+    stats: Optional[PoolStats] = None,
+) -> httpx.AsyncClient:
+    """
+    Tạo AsyncClient có pool limits/timeouts và đo stats.
+
+    Args:
+        max_connections: Số connections tối đa (defaults to settings.llm_http_max_connections)
+        max_keepalive: Số connections idle giữ lại (defaults to settings.llm_http_max_keepalive)
+        keepalive_expiry: Giây trước khi đóng connection idle (defaults to settings.llm_http_keepalive_expiry)
+        http2: Bật HTTP/2 (defaults to settings.llm_http2; bỏ qua nếu thiếu package h2)
+        timeout: Read/write timeout (defaults to settings.openai_timeout)
+        connect_timeout: Connect timeout (defaults to settings.llm_http_connect_timeout)
+        pool_timeout: Thời gian chờ connection rảnh (defaults to settings.llm_http_pool_timeout)
+        stats: PoolStats nhận số liệu (None = tạo mới, xem client.pool_stats)
+
+    Returns:
+        httpx.AsyncClient
+    """
+    settings = _get_settings()
+    http2 = settings.llm_http2 if http2 is None else http2
+    if http2 and importlib.util.find_spec("h2") is None:
+        logger.warning('LLM_HTTP2 bật nhưng thiếu package h2 (pip install "httpx[http2]"), dùng HTTP/1.1')
+        http2 = False
+    limits = httpx.Limits(
+        max_connections=max_connections or settings.llm_http_max_connections,
+        max_keepalive_connections=max_keepalive if max_keepalive is not None else settings.llm_http_max_keepalive,
+        keepalive_expiry=keepalive_expiry if keepalive_expiry is not None else settings.llm_http_keepalive_expiry,
+    )
+    timeouts = httpx.Timeout(
+        timeout if timeout is not None else settings.openai_timeout,
+        connect=connect_timeout if connect_timeout is not None else settings.llm_http_connect_timeout,
+        pool=pool_timeout if pool_timeout is not None else settings.llm_http_pool_timeout,
+    )
+    stats = stats or PoolStats()
+    transport = _InstrumentedTransport(httpx.AsyncHTTPTransport(limits=limits, http2=http2), stats)
+    client = httpx.AsyncClient(transport=transport, timeout=timeouts)
+    client.pool_stats = stats
+    return client
+
+
+def get_llm_http_client() -> httpx.AsyncClient:
+    """
+    AsyncClient dùng chung cho LLM/embeddings clients (tạo lần đầu khi gọi).
+
+    Returns:
+        httpx.AsyncClient của process
+    """
+    global _client, _stats
+    if _client is None or _client.is_closed:
+        with _lock:
+            if _client is None or _client.is_closed:
+                _stats = _stats or PoolStats()
+                _client = create_http_client(stats=_stats)
+    return _client
+
+
+async def close_llm_http_client() -> None:
+    """Đóng client dùng chung (gọi ở shutdown); stats được giữ lại."""
+    global _client
+    client, _client = _client, None
+    if client is not None:
+        await client.aclose()
+
+
+def get_llm_http_stats() -> Optional[Dict[str, Any]]:
+    """Stats của client dùng chung (None nếu chưa tạo)."""
+    return _stats.snapshot() if _stats is not None else None
+
+
+def _reset_after_fork() -> None:
+    # Sockets trong pool thuộc process cha: process con tạo client mới khi cần
+    global _client, _stats
+    _client = None
+    _stats = None
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,267 @@
+"""
+Logging Config - Logging qua queue, I/O chạy trên thread nền.
+
+- Root logger chỉ có một QueueHandler: thread gọi log (event loop) chỉ tạo
+  record và đưa vào queue; format message/traceback và ghi console/file do
+  QueueListener làm trên thread riêng.
+- Console dùng settings.log_format; settings.log_file (nếu có) ghi text hoặc
+  JSON lines (settings.log_json).
+- ErrorSamplingFilter: traceback giống nhau (cùng loại exception và cùng
+  chuỗi frames) chỉ được log đầy đủ một lần mỗi cửa sổ
+  settings.log_error_sample_window giây. Thread nền định kỳ ghi
+  "suppressed N similar ... tracebacks" cho các cửa sổ đã hết hạn (burst dừng
+  hẳn vẫn để lại dấu vết); số còn lại được báo khi shutdown.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+import traceback
+from datetime import datetime, timezone
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+_DEFAULTS = {"request_id": "-", "trace_id": "-"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_sampling_filter: Optional["ErrorSamplingFilter"] = None
+# Thread ghi summary cho các cửa sổ sampling đã hết hạn
+_flusher: Optional[threading.Thread] = None
+_flusher_stop = threading.Event()
+
+
+def _get_settings():
+    from app.core.config import settings
+    return settings
+
+
+class ErrorSamplingFilter(logging.Filter):
+    """
+    Dedup + sampling cho records có traceback giống nhau trong một cửa sổ thời gian.
+    """
+
+    def __init__(self, window: float = 60.0, max_keys: int = 1024):
+        """
+        Initialize filter.
+
+        Args:
+            window: Độ dài cửa sổ (giây); 0 = không sampling
+            max_keys: Số loại traceback tối đa được theo dõi
+        """
+        super().__init__()
+        self.window = window
+        self.max_keys = max_keys
+        # key -> [thời điểm bắt đầu cửa sổ, số records bị chặn trong cửa sổ]
+        self._windows: Dict[Hashable, list] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(record: logging.LogRecord) -> Optional[Tuple]:
+        exc_type, exc, tb = record.exc_info or (None, None, None)
+        if exc_type is None:
+            return None
+        # Chỉ dùng (file, dòng) của frames: rẻ, không format traceback trên thread gọi log
+        frames = tuple((frame.f_code.co_filename, lineno) for frame, lineno in traceback.walk_tb(tb))
+        return (record.name, record.levelno, exc_type, frames)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.window <= 0:
+            return True
+        key = self._key(record)
+        if key is None:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            state = self._windows.get(key)
+            if state is not None and now - state[0] < self.window:
+                state[1] += 1
+                return False
+            suppressed = state[1] if state is not None else 0
+            if state is None and len(self._windows) >= self.max_keys:
+                self._windows.pop(next(iter(self._windows)))
+            self._windows[key] = [now, 0]
+        if suppressed:
+            record.suppressed = suppressed
+            record.msg = f"{record.msg} (suppressed {suppressed} similar in last {self.window:g}s)"
+        return True
+
+    def pending(self) -> Dict[Hashable, int]:
+        """Số records đang bị chặn theo key (chưa được báo)."""
+        with self._lock:
+            return {key: state[1] for key, state in self._windows.items() if state[1]}
+
+    def pop_expired(self, now: Optional[float] = None) -> Dict[Hashable, int]:
+        """
+        Bỏ các cửa sổ đã hết hạn (lần sau lại log đầy đủ).
+
+        Returns:
+            Số records bị chặn chưa được báo theo key của các cửa sổ đó
+        """
+        now = time.monotonic() if now is None else now
+        expired = {}
+        with self._lock:
+            for key, state in list(self._windows.items()):
+                if now - state[0] >= self.window:
+                    del self._windows[key]
+                    if state[1]:
+                        expired[key] = state[1]
+        return expired
+
+
+def _log_suppressed(counts: Dict[Hashable, int]) -> None:
+    for (name, levelno, exc_type, _frames), count in counts.items():
+        logging.getLogger(name).log(levelno, f"suppressed {count} similar {exc_type.__name__} tracebacks")
+
+
+def _flush_expired(sampling_filter: ErrorSamplingFilter, stop: threading.Event) -> None:
+    interval = max(sampling_filter.window / 2, 0.05)
+    while not stop.wait(interval):
+        _log_suppressed(sampling_filter.pop_expired())
+
+
+def _start_flusher() -> None:
+    global _flusher
+    if _sampling_filter is None or _sampling_filter.window <= 0:
+        return
+    _flusher_stop.clear()
+    _flusher = threading.Thread(
+        target=_flush_expired, args=(_sampling_filter, _flusher_stop), name="log-sampling-flush", daemon=True
+    )
+    _flusher.start()
+
+
+def _stop_flusher() -> None:
+    global _flusher
+    flusher, _flusher = _flusher, None
+    if flusher is not None:
+        _flusher_stop.set()
+        flusher.join()
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler không format trên thread gọi log.
+
+    QueueHandler.prepare mặc định format cả traceback (tốn thời gian event
+    loop); ở đây chỉ ghép message và giữ nguyên exc_info để listener format.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """Mỗi record một dòng JSON."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload: Dict[str, Any] = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+            "trace_id": getattr(record, "trace_id", None),
+        }
+        if getattr(record, "suppressed", None):
+            payload["suppressed"] = record.suppressed
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            payload["exc_info"] = record.exc_text
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+def setup_logging(
+    level: Optional[str] = None,
+    fmt: Optional[str] = None,
+    log_file: Optional[str] = None,
+    json_file: Optional[bool] = None,
+    sample_window: Optional[float] = None,
+) -> logging.handlers.QueueListener:
+    """
+    Cấu hình root logger: QueueHandler -> QueueListener (console + file).
+
+    Gọi lại sẽ dừng listener cũ và cấu hình lại.
+
+    Args:
+        level: Log level (defaults to settings.log_level)
+        fmt: Format text (defaults to settings.log_format, thêm request_id khi tracing bật)
+        log_file: File log (defaults to settings.log_file, None = chỉ console)
+        json_file: Ghi file dạng JSON lines (defaults to settings.log_json)
+        sample_window: Cửa sổ dedup traceback, giây (defaults to settings.log_error_sample_window)
+
+    Returns:
+        QueueListener đang chạy
+    """
+    global _listener, _sampling_filter
+    settings = _get_settings()
+    level = level or settings.log_level
+    fmt = fmt or settings.log_format
+    if settings.tracing_enabled and "request_id" not in fmt:
+        fmt = fmt.replace("%(message)s", "[%(request_id)s] %(message)s")
+    log_file = log_file if log_file is not None else settings.log_file
+    json_file = json_file if json_file is not None else settings.log_json
+    sample_window = sample_window if sample_window is not None else settings.log_error_sample_window
+
+    shutdown_logging()
+
+    text_formatter = logging.Formatter(fmt, defaults=_DEFAULTS)
+    handlers = [logging.StreamHandler()]
+    handlers[0].setFormatter(text_formatter)
+    if log_file:
+        file_handler = logging.FileHandler(log_file, encoding="utf-8")
+        file_handler.setFormatter(JsonFormatter() if json_file else text_formatter)
+        handlers.append(file_handler)
+
+    queue_handler = _DeferredQueueHandler(queue.SimpleQueue())
+    _sampling_filter = ErrorSamplingFilter(sample_window)
+    queue_handler.addFilter(_sampling_filter)
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(getattr(logging, level.upper(), logging.INFO))
+
+    _listener = logging.handlers.QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    _start_flusher()
+    return _listener
+
+
+def shutdown_logging() -> None:
+    """Báo các tracebacks còn bị chặn, ghi nốt queue và dừng listener."""
+    global _listener, _sampling_filter
+    listener, _listener = _listener, None
+    if listener is None:
+        return
+    _stop_flusher()
+    if _sampling_filter is not None:
+        _log_suppressed(_sampling_filter.pending())
+        _sampling_filter = None
+    listener.stop()
+    for handler in listener.handlers:
+        handler.close()
+
+
+def _restart_listener_after_fork() -> None:
+    # Threads của listener/flusher không tồn tại trong process con (vd. workers
+    # của app/server.py): tạo lại trên cùng queue, handlers và filter
+    global _listener, _flusher
+    if _listener is not None:
+        _listener = logging.handlers.QueueListener(
+            _listener.queue, *_listener.handlers, respect_handler_level=True
+        )
+        _listener.start()
+        _flusher = None
+        _start_flusher()
+
+
+atexit.register(shutdown_logging)
+os.register_at_fork(after_in_child=_restart_listener_after_fork)
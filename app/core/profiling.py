@@ -0,0 +1,237 @@
+"""
+Profiling Middleware - Profile từng request (opt-in), ghi profile xuống disk.
+
+Chỉ được đăng ký khi settings.profiling_enabled = True (tắt => không có
+middleware, overhead bằng 0). Khi bật, một request được profile nếu:
+- Có header X-Profile bằng settings.api_secret_key (header bị bỏ qua nếu
+  chưa cấu hình secret), hoặc
+- Là request thứ N (settings.profiling_sample_every, 0 = không sampling).
+
+Hai chế độ (settings.profiling_mode):
+- "cprofile": cProfile, ghi file .prof (pstats, mở bằng snakeviz/pstats).
+- "sampling": sampling stack của thread chạy request mỗi
+  profiling_interval_ms, ghi file .speedscope.json (https://speedscope.app).
+  Overhead thấp hơn cProfile; độ phân giải bị giới hạn bởi GIL
+  (sys.getswitchinterval) khi event loop bận CPU.
+
+Profile đo thread chạy event loop nên gồm cả các coroutines khác chạy xen kẽ
+trong lúc request await. Mỗi thời điểm chỉ profile một request (request khác
+đến trong lúc đó chạy bình thường). Tên file được trả về qua header
+X-Profile-Id.
+"""
+import asyncio
+import cProfile
+import hmac
+import itertools
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "x-profile"
+PROFILE_ID_HEADER = "x-profile-id"
+MODE_CPROFILE = "cprofile"
+MODE_SAMPLING = "sampling"
+
+_Frame = Tuple[str, str, int]
+
+
+def _get_settings():
+    from app.core.config import settings
+    return settings
+
+
+class StackSampler:
+    """
+    Statistical profiler: một thread nền chụp stack của thread mục tiêu theo chu kỳ.
+    """
+
+    def __init__(self, thread_id: int, interval: float = 0.001):
+        """
+        Initialize sampler.
+
+        Args:
+            thread_id: Thread cần sample (threading.get_ident())
+            interval: Chu kỳ sample (giây)
+        """
+        self.thread_id = thread_id
+        self.interval = interval
+        self.frames: List[_Frame] = []
+        self.samples: List[List[int]] = []
+        self.weights: List[float] = []
+        self._frame_ids: Dict[_Frame, int] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._started = 0.0
+        self._elapsed = 0.0
+
+    def start(self) -> None:
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._elapsed = time.perf_counter() - self._started
+
+    def _frame_id(self, frame) -> int:
+        code = frame.f_code
+        key = (getattr(code, "co_qualname", code.co_name), code.co_filename, code.co_firstlineno)
+        frame_id = self._frame_ids.get(key)
+        if frame_id is None:
+            frame_id = self._frame_ids[key] = len(self.frames)
+            self.frames.append(key)
+        return frame_id
+
+    def _run(self) -> None:
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            now = time.perf_counter()
+            stack = []
+            while frame is not None:
+                stack.append(self._frame_id(frame))
+                frame = frame.f_back
+            if stack:
+                # speedscope: stack từ root đến leaf, weight = thời gian từ sample trước
+                stack.reverse()
+                self.samples.append(stack)
+                self.weights.append((now - last) * 1000)
+            last = now
+
+    def to_speedscope(self, name: str) -> Dict[str, Any]:
+        """Profile theo speedscope file format (sampled, đơn vị ms)."""
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "app.core.profiling",
+            "activeProfileIndex": 0,
+            "shared": {
+                "frames": [{"name": func, "file": file, "line": line} for func, file, line in self.frames],
+            },
+            "profiles": [{
+                "type": "sampled",
+                "name": name,
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": self._elapsed * 1000,
+                "samples": self.samples,
+                "weights": self.weights,
+            }],
+        }
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware profile các requests được chọn (header hoặc 1/N).
+    """
+
+    def __init__(
+        self,
+        app,
+        directory: Optional[str] = None,
+        mode: Optional[str] = None,
+        sample_every: Optional[int] = None,
+        secret: Optional[str] = None,
+        interval_ms: Optional[float] = None,
+    ):
+        """
+        Initialize middleware.
+
+        Args:
+            app: ASGI app
+            directory: Thư mục ghi profiles (defaults to settings.profiling_dir)
+            mode: "cprofile" hoặc "sampling" (defaults to settings.profiling_mode)
+            sample_every: Profile 1 trong N requests, 0 = tắt
+                (defaults to settings.profiling_sample_every)
+            secret: Giá trị header X-Profile (defaults to settings.api_secret_key)
+            interval_ms: Chu kỳ sample của mode "sampling"
+                (defaults to settings.profiling_interval_ms)
+        """
+        settings = _get_settings()
+        self.app = app
+        self.directory = directory or settings.profiling_dir
+        self.mode = (mode or settings.profiling_mode).lower()
+        if self.mode not in (MODE_CPROFILE, MODE_SAMPLING):
+            raise ValueError(f"profiling_mode không hợp lệ: {self.mode}")
+        self.sample_every = sample_every if sample_every is not None else settings.profiling_sample_every
+        self.secret = secret if secret is not None else settings.api_secret_key
+        self.interval = (interval_ms if interval_ms is not None else settings.profiling_interval_ms) / 1000
+        self._counter = itertools.count(1)
+        self._busy = threading.Lock()
+
+    def _selected(self, scope) -> bool:
+        if self.secret:
+            for name, value in scope.get("headers", ()):
+                if name == PROFILE_HEADER.encode():
+                    return hmac.compare_digest(value, self.secret.encode())
+        return self.sample_every > 0 and next(self._counter) % self.sample_every == 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._selected(scope):
+            await self.app(scope, receive, send)
+            return
+        if not self._busy.acquire(blocking=False):
+            # Đang profile request khác (cProfile không lồng nhau được)
+            await self.app(scope, receive, send)
+            return
+
+        path = scope.get("path", "")
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", path).strip("_")[:60] or "root"
+        profile_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{scope.get('method', 'GET')}-{slug}-{uuid.uuid4().hex[:8]}"
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((PROFILE_ID_HEADER.encode(), profile_id.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        if self.mode == MODE_CPROFILE:
+            profiler = cProfile.Profile()
+            start, stop = profiler.enable, profiler.disable
+        else:
+            profiler = StackSampler(threading.get_ident(), self.interval)
+            start, stop = profiler.start, profiler.stop
+
+        try:
+            start()
+        except ValueError as e:
+            # Vd. một profiler khác (coverage, debugger) đang active
+            self._busy.release()
+            logger.warning(f"Không bật được profiler cho {path}: {e}")
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            stop()
+            self._busy.release()
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        try:
+            filename = await asyncio.to_thread(self._write, profiler, profile_id, f"{scope.get('method')} {path}")
+            logger.info(f"Profiled {scope.get('method')} {path} ({elapsed_ms:.1f} ms) -> {filename}")
+        except Exception as e:
+            logger.error(f"Không ghi được profile {profile_id}: {e}")
+
+    def _write(self, profiler, profile_id: str, name: str) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        if isinstance(profiler, StackSampler):
+            filename = os.path.join(self.directory, f"{profile_id}.speedscope.json")
+            with open(filename, "w", encoding="utf-8") as f:
+                json.dump(profiler.to_speedscope(name), f)
+        else:
+            filename = os.path.join(self.directory, f"{profile_id}.prof")
+            profiler.dump_stats(filename)
+        return filename
@@ -0,0 +1,486 @@
+"""
+Tracing - Spans nhẹ cho một request: route -> graph -> LLM / tool -> MongoDB.
+
+- Request ID và span hiện tại nằm trong contextvars nên đi theo request qua
+  các coroutines, asyncio tasks và executor của Motor (copy context).
+- Spans được tạo tự động cho:
+  - Routes: TracingMiddleware (span "server", echo X-Request-ID và X-Trace-ID).
+  - Graph: BaseGraph.invoke của mọi subclass, các bước được đánh dấu @traced
+    và node của LangGraph (qua LangChain callbacks).
+  - LLM calls và tool runs: TracingCallbackHandler, gắn vào mọi runnable
+    trong request qua register_configure_hook (không cần truyền callbacks).
+  - MongoDB: MongoCommandTracer (pymongo CommandListener) cho client Motor.
+- Exporter local ghi mỗi span một dòng JSON (JsonLinesExporter) trên thread
+  nền, không cần collector qua network.
+- RequestContextFilter thêm request_id / trace_id vào log records để log của
+  routes, services và error handlers link được với nhau.
+
+Tắt (settings.tracing_enabled = False) => không có middleware, @traced và
+start_span chỉ tốn một phép kiểm tra exporter is None.
+"""
+import functools
+import inspect
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.tracers.context import register_configure_hook
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+REQUEST_ID_HEADER = "x-request-id"
+TRACE_ID_HEADER = "x-trace-id"
+
+KIND_SERVER = "server"
+KIND_INTERNAL = "internal"
+KIND_GRAPH = "graph"
+KIND_NODE = "node"
+KIND_LLM = "llm"
+KIND_TOOL = "tool"
+KIND_DB = "db"
+
+
+def _get_settings():
+    from app.core.config import settings
+    return settings
+
+
+def _new_span_id() -> str:
+    return os.urandom(8).hex()
+
+
+class Span:
+    """Một đơn vị công việc có thời gian bắt đầu/kết thúc trong một trace."""
+
+    __slots__ = (
+        "trace_id", "span_id", "parent_id", "request_id", "name", "kind",
+        "attributes", "start_time", "_started", "duration_ms", "status", "error",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        kind: str = KIND_INTERNAL,
+        parent: Optional["Span"] = None,
+        trace_id: Optional[str] = None,
+        request_id: Optional[str] = None,
+        attributes: Optional[Dict[str, Any]] = None,
+    ):
+        self.trace_id = parent.trace_id if parent else (trace_id or uuid.uuid4().hex)
+        self.span_id = _new_span_id()
+        self.parent_id = parent.span_id if parent else None
+        self.request_id = parent.request_id if parent else request_id
+        self.name = name
+        self.kind = kind
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.start_time = time.time()
+        self._started = time.perf_counter()
+        self.duration_ms: Optional[float] = None
+        self.status = "ok"
+        self.error: Optional[str] = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def record_error(self, error: BaseException) -> None:
+        self.status = "error"
+        self.error = f"{type(error).__name__}: {error}"
+
+    def end(self) -> None:
+        """Kết thúc span và gửi tới exporter (gọi nhiều lần chỉ export một lần)."""
+        if self.duration_ms is not None:
+            return
+        self.duration_ms = (time.perf_counter() - self._started) * 1000
+        exporter = _exporter
+        if exporter is not None:
+            exporter.export(self.to_dict())
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "request_id": self.request_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start_time": datetime.fromtimestamp(self.start_time, timezone.utc).isoformat(),
+            "duration_ms": self.duration_ms,
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+class JsonLinesExporter:
+    """
+    Ghi spans ra file JSON lines trên một thread nền (không block event loop).
+    """
+
+    _STOP = object()
+
+    def __init__(self, path: str):
+        """
+        Initialize exporter.
+
+        Args:
+            path: File JSON lines (append)
+        """
+        self.path = path
+        self._queue: "queue.SimpleQueue[Any]" = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def export(self, span: Dict[str, Any]) -> None:
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+                    self._thread.start()
+        self._queue.put(span)
+
+    def _run(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            while True:
+                item = self._queue.get()
+                # Gom các spans đang chờ rồi flush một lần
+                while item is not self._STOP:
+                    f.write(json.dumps(item, ensure_ascii=False, default=str) + "\n")
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                f.flush()
+                if item is self._STOP:
+                    return
+
+    def _after_fork(self) -> None:
+        # Process con không có thread của process cha: queue mới, thread tạo lại khi export
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def close(self) -> None:
+        """Ghi nốt các spans đang chờ và dừng thread."""
+        if self._thread is not None:
+            self._queue.put(self._STOP)
+            self._thread.join()
+            self._thread = None
+
+
+_exporter: Optional[JsonLinesExporter] = None
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+_request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+
+def _reset_exporter_after_fork() -> None:
+    if _exporter is not None:
+        _exporter._after_fork()
+
+
+os.register_at_fork(after_in_child=_reset_exporter_after_fork)
+
+
+def configure_tracing(exporter: Optional[JsonLinesExporter]) -> None:
+    """Bật tracing với exporter (None = tắt)."""
+    global _exporter
+    _exporter = exporter
+
+
+def shutdown_tracing() -> None:
+    """Flush exporter và tắt tracing."""
+    global _exporter
+    exporter, _exporter = _exporter, None
+    if exporter is not None:
+        exporter.close()
+
+
+def tracing_enabled() -> bool:
+    return _exporter is not None
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def current_request_id() -> Optional[str]:
+    return _request_id.get()
+
+
+def current_trace_id() -> Optional[str]:
+    span = _current_span.get()
+    return span.trace_id if span else None
+
+
+@contextmanager
+def start_span(name: str, kind: str = KIND_INTERNAL, **attributes: Any) -> Iterator[Optional[Span]]:
+    """
+    Context manager tạo span con của span hiện tại (None nếu tracing tắt).
+
+    Args:
+        name: Tên span
+        kind: Loại span (server, graph, node, llm, tool, db, internal)
+        **attributes: Attributes ban đầu
+    """
+    if _exporter is None:
+        yield None
+        return
+    parent = _current_span.get()
+    span = Span(name, kind, parent=parent, request_id=_request_id.get(), attributes=attributes)
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.record_error(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        span.end()
+
+
+def traced(name: Optional[str] = None, kind: str = KIND_INTERNAL) -> Callable:
+    """
+    Decorator bọc function (sync hoặc async) trong một span.
+
+    Args:
+        name: Tên span (defaults to function __qualname__)
+        kind: Loại span
+    """
+    def decorator(func: Callable) -> Callable:
+        span_name = name or func.__qualname__
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if _exporter is None:
+                    return await func(*args, **kwargs)
+                with start_span(span_name, kind):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _exporter is None:
+                return func(*args, **kwargs)
+            with start_span(span_name, kind):
+                return func(*args, **kwargs)
+        return wrapper
+
+    return decorator
+
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """
+    LangChain callbacks -> spans cho LLM calls, tool runs và LangGraph nodes.
+
+    Parent của span là span của run cha (theo parent_run_id) hoặc span hiện
+    tại trong contextvar. Các chains trung gian (prompt | llm, ...) không tạo
+    span riêng, chỉ chuyển tiếp parent.
+    """
+
+    run_inline = True
+
+    def __init__(self):
+        self._runs: Dict[UUID, Tuple[Optional[Span], bool]] = {}
+
+    def _parent(self, parent_run_id: Optional[UUID]) -> Optional[Span]:
+        if parent_run_id is not None and parent_run_id in self._runs:
+            return self._runs[parent_run_id][0]
+        return _current_span.get()
+
+    def _start(self, run_id: UUID, parent_run_id: Optional[UUID], name: str, kind: str, **attributes) -> None:
+        if _exporter is None:
+            return
+        span = Span(name, kind, parent=self._parent(parent_run_id), request_id=_request_id.get(), attributes=attributes)
+        self._runs[run_id] = (span, True)
+
+    def _end(self, run_id: UUID, error: Optional[BaseException] = None, **attributes) -> None:
+        span, owned = self._runs.pop(run_id, (None, False))
+        if span is None or not owned:
+            return
+        span.attributes.update(attributes)
+        if error is not None:
+            span.record_error(error)
+        span.end()
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, **kwargs):
+        params = kwargs.get("invocation_params") or {}
+        model = params.get("model") or params.get("model_name") or (serialized or {}).get("name", "llm")
+        self._start(run_id, parent_run_id, f"llm {model}", KIND_LLM, model=model)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, **kwargs):
+        params = kwargs.get("invocation_params") or {}
+        model = params.get("model") or params.get("model_name") or (serialized or {}).get("name", "llm")
+        self._start(run_id, parent_run_id, f"llm {model}", KIND_LLM, model=model)
+
+    def on_llm_end(self, response, *, run_id, parent_run_id=None, **kwargs):
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        self._end(run_id, **{f"usage.{key}": value for key, value in usage.items() if isinstance(value, int)})
+
+    def on_llm_error(self, error, *, run_id, parent_run_id=None, **kwargs):
+        self._end(run_id, error)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, parent_run_id=None, **kwargs):
+        name = (serialized or {}).get("name") or kwargs.get("name") or "tool"
+        self._start(run_id, parent_run_id, f"tool {name}", KIND_TOOL, tool=name)
+
+    def on_tool_end(self, output, *, run_id, parent_run_id=None, **kwargs):
+        self._end(run_id)
+
+    def on_tool_error(self, error, *, run_id, parent_run_id=None, **kwargs):
+        self._end(run_id, error)
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, **kwargs):
+        node = (kwargs.get("metadata") or {}).get("langgraph_node")
+        if node is not None and kwargs.get("name") == node:
+            self._start(run_id, parent_run_id, f"node {node}", KIND_NODE, node=node)
+        elif _exporter is not None:
+            self._runs[run_id] = (self._parent(parent_run_id), False)
+
+    def on_chain_end(self, outputs, *, run_id, parent_run_id=None, **kwargs):
+        self._end(run_id)
+
+    def on_chain_error(self, error, *, run_id, parent_run_id=None, **kwargs):
+        self._end(run_id, error)
+
+
+_callback_handler: ContextVar[Optional[TracingCallbackHandler]] = ContextVar(
+    "tracing_callback_handler", default=None
+)
+# Mọi CallbackManager được configure trong context có handler sẽ tự thêm handler
+register_configure_hook(_callback_handler, inheritable=True)
+
+
+class MongoCommandTracer(monitoring.CommandListener):
+    """
+    pymongo CommandListener -> span cho mỗi command (Motor copy context
+    sang executor thread nên span hiện tại của request vẫn đọc được).
+    """
+
+    def __init__(self):
+        self._spans: Dict[Tuple[Any, int], Span] = {}
+
+    def started(self, event) -> None:
+        if _exporter is None:
+            return
+        parent = _current_span.get()
+        if parent is None:
+            # Command nền (heartbeat, flush checkpoint...) không thuộc request nào
+            return
+        self._spans[(event.connection_id, event.request_id)] = Span(
+            f"mongo {event.command_name}",
+            KIND_DB,
+            parent=parent,
+            attributes={"db.name": event.database_name, "db.command": event.command_name},
+        )
+
+    def succeeded(self, event) -> None:
+        span = self._spans.pop((event.connection_id, event.request_id), None)
+        if span is not None:
+            span.end()
+
+    def failed(self, event) -> None:
+        span = self._spans.pop((event.connection_id, event.request_id), None)
+        if span is not None:
+            span.status = "error"
+            span.error = str(event.failure.get("errmsg") or event.failure)
+            span.end()
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware: gán request ID / trace, tạo span server cho mỗi request
+    và echo X-Request-ID, X-Trace-ID trong response headers.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._handler = TracingCallbackHandler()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or _exporter is None:
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope.get("headers", ()):
+            if name == REQUEST_ID_HEADER.encode():
+                request_id = value.decode("latin-1")[:128] or None
+                break
+        trace_id = uuid.uuid4().hex
+        request_id = request_id or trace_id
+        method, path = scope.get("method", "GET"), scope.get("path", "")
+        span = Span(
+            f"{method} {path}",
+            KIND_SERVER,
+            trace_id=trace_id,
+            request_id=request_id,
+            attributes={"http.method": method, "http.path": path},
+        )
+        tokens = (_request_id.set(request_id), _current_span.set(span), _callback_handler.set(self._handler))
+
+        async def send_with_ids(message):
+            if message["type"] == "http.response.start":
+                span.set_attribute("http.status_code", message["status"])
+                if message["status"] >= 500:
+                    span.status = "error"
+                headers = list(message.get("headers", []))
+                headers.append((REQUEST_ID_HEADER.encode(), request_id.encode("latin-1", "replace")))
+                headers.append((TRACE_ID_HEADER.encode(), trace_id.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_ids)
+        except BaseException as e:
+            span.record_error(e)
+            raise
+        finally:
+            route = scope.get("route")
+            if route is not None and getattr(route, "path", None):
+                span.name = f"{method} {route.path}"
+                span.set_attribute("http.route", route.path)
+            _callback_handler.reset(tokens[2])
+            _current_span.reset(tokens[1])
+            _request_id.reset(tokens[0])
+            span.end()
+
+
+class RequestContextFilter(logging.Filter):
+    """Thêm request_id và trace_id ("-" nếu không có) vào mọi log record."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = _request_id.get() or "-"
+        record.trace_id = current_trace_id() or "-"
+        return True
+
+
+def setup_tracing() -> bool:
+    """
+    Bật tracing theo settings (exporter JSON lines + log filter).
+
+    Returns:
+        True nếu tracing được bật
+    """
+    settings = _get_settings()
+    if not settings.tracing_enabled:
+        return False
+    configure_tracing(JsonLinesExporter(settings.tracing_export_path))
+    log_filter = RequestContextFilter()
+    for handler in logging.getLogger().handlers:
+        handler.addFilter(log_filter)
+    logger.info(f"Tracing enabled, spans -> {settings.tracing_export_path}")
+    return True
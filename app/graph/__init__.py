@@ -3,6 +3,9 @@ Graph module - LangGraph definitions và base classes cho AI text generation.
 """
 from .base_graph import BaseGraph
 from .simple_graph import SimpleGraph
+from .thread_status import ThreadStatusRegistry, thread_status_registry
+from .data_retriever import DataRetriever
+from .hybrid_retriever import HybridRetriever
 from app.schemas.graph.base import BaseGraphState
 
 # Try to import Graph if exists (optional)
@@ -12,6 +15,10 @@ try:
         "BaseGraph",
         "BaseGraphState",
         "SimpleGraph",
+        "ThreadStatusRegistry",
+        "thread_status_registry",
+        "DataRetriever",
+        "HybridRetriever",
         "Graph",
         "GraphState",
     ]
@@ -20,5 +27,9 @@ except ImportError:
         "BaseGraph",
         "BaseGraphState",
         "SimpleGraph",
+        "ThreadStatusRegistry",
+        "thread_status_registry",
+        "DataRetriever",
+        "HybridRetriever",
     ]
 
@@ -4,6 +4,7 @@ Base Graph classes - Abstract base classes cho graph implementations.
 from abc import ABC, abstractmethod
 from typing import Any, Dict, Optional, Union
 from langgraph.graph import StateGraph
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from langgraph.checkpoint.memory import MemorySaver, InMemorySaver  # In-memory checkpointer cho test
 from langchain_openai import ChatOpenAI
 
@@ -19,6 +20,8 @@ def _get_settings():
 
 # Import BaseGraphState từ schemas
 from app.schemas.graph.base import BaseGraphState
+from app.core.tracing import KIND_GRAPH, traced
+from app.core.http_client import get_llm_http_client
 
 
 class BaseGraph(ABC):
@@ -30,14 +33,20 @@ class BaseGraph(ABC):
     - Graph building pattern
     - Checkpointer cho human-in-the-loop
     - Common utilities
+    - Tracing: invoke của mọi subclass tự động chạy trong span "graph <Class>"
     """
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if "invoke" in cls.__dict__:
+            cls.invoke = traced(f"graph {cls.__name__}", KIND_GRAPH)(cls.__dict__["invoke"])
     
     def __init__(
         self,
         llm: Optional[ChatOpenAI] = None,
         model_name: Optional[str] = None,
         temperature: Optional[float] = None,
-        checkpointer: Optional[Union[MemorySaver, InMemorySaver]] = None,
+        checkpointer: Optional[Union[MemorySaver, InMemorySaver, BaseCheckpointSaver]] = None,
     ):
         """
         Initialize base graph.
@@ -46,17 +55,29 @@ class BaseGraph(ABC):
             llm: Pre-initialized LLM instance (optional)
             model_name: Model name (defaults to settings.openai_model)
             temperature: Temperature (defaults to settings.openai_temperature)
-            checkpointer: Checkpointer instance (defaults to MemorySaver for testing)
+            checkpointer: Checkpointer instance (defaults theo settings.graph_checkpointer:
+                MemorySaver hoặc MongoCheckpointSaver dùng chung)
         """
         settings = _get_settings()
-        self.llm = llm or ChatOpenAI(
-            model_name=model_name or settings.openai_model,
-            temperature=temperature or settings.openai_temperature,
-            openai_api_key=settings.get_openai_api_key(),
-        )
-        # Sử dụng MemorySaver cho test, có thể thay bằng AsyncPostgresSaver cho production
-        # Hoặc InMemorySaver cho agent với HumanInTheLoopMiddleware
-        self.checkpointer = checkpointer or MemorySaver()
+        if llm is None:
+            # Pool connections dùng chung cả process (keep-alive giữa các graphs);
+            # truyền cả timeout vì openai SDK override timeout của client theo request
+            http_client = get_llm_http_client()
+            llm = ChatOpenAI(
+                model_name=model_name or settings.openai_model,
+                temperature=temperature or settings.openai_temperature,
+                openai_api_key=settings.get_openai_api_key(),
+                base_url=settings.openai_base_url,
+                http_async_client=http_client,
+                request_timeout=http_client.timeout,
+            )
+        self.llm = llm
+        # MemorySaver cho test/dev; GRAPH_CHECKPOINTER=mongo để checkpoint bền vững,
+        # dùng chung giữa các workers (xem app/core/checkpointer.py)
+        if checkpointer is None:
+            from app.core.checkpointer import create_checkpointer
+            checkpointer = create_checkpointer()
+        self.checkpointer = checkpointer
         self.graph = self._build_graph()
     
     @abstractmethod
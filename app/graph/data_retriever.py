@@ -0,0 +1,269 @@
+"""
+Data Retriever - Retrieval trên VectorIndex in-process cho các retrieval graphs.
+
+Documents được embed một lần khi add; query chỉ cần embed câu hỏi rồi search
+trên ma trận NumPy (chạy trong thread để không block event loop).
+Kết quả là langchain Documents với metadata["score"], dùng trực tiếp với
+format_retrieved_docs. Metadata filter được giải trên MetadataIndex trước,
+vector scoring chỉ chạy trên các documents thỏa filter.
+
+Add/delete là incremental (segments + tombstones); compaction của VectorIndex
+chạy ở background khi index.needs_compaction(), queries vẫn được phục vụ.
+"""
+import asyncio
+import logging
+from typing import Any, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from app.utils.metadata_index import MetadataIndex
+from app.utils.vector_index import VectorIndex
+
+logger = logging.getLogger(__name__)
+
+
+def _get_settings():
+    from app.core.config import settings
+    return settings
+
+
+def default_embeddings() -> Embeddings:
+    """Shared CachedEmbeddings, hoặc create_embeddings() nếu tắt embedding cache."""
+    if _get_settings().embedding_cache_enabled:
+        from app.utils.embedding_cache import get_cached_embeddings
+        return get_cached_embeddings()
+    from app.utils.llm_utils import create_embeddings
+    return create_embeddings()
+
+
+class DataRetriever:
+    """
+    Vector retriever dựa trên VectorIndex.
+
+    Position trong index chính là index trong self.documents.
+    """
+
+    def __init__(
+        self,
+        embeddings: Optional[Embeddings] = None,
+        index: Optional[VectorIndex] = None,
+        top_k: Optional[int] = None,
+        score_threshold: Optional[float] = None,
+    ):
+        """
+        Initialize data retriever.
+
+        Args:
+            embeddings: Embeddings model (cần cho aadd_documents/aretrieve theo text)
+            index: VectorIndex có sẵn (None = tạo khi add documents đầu tiên)
+            top_k: Số documents trả về (defaults to settings.retriever_top_k)
+            score_threshold: Score tối thiểu (defaults to settings.retriever_score_threshold)
+        """
+        settings = _get_settings()
+        self.embeddings = embeddings
+        self.index = index
+        self.top_k = top_k or settings.retriever_top_k
+        self.score_threshold = (
+            score_threshold if score_threshold is not None else settings.retriever_score_threshold
+        )
+        self.documents: List[Document] = []
+        self.metadata_index = MetadataIndex()
+        self._compaction: Optional[asyncio.Task] = None
+
+    @classmethod
+    async def create_with_embeddings(
+        cls,
+        documents: Optional[Sequence[Document]] = None,
+        embeddings: Optional[Embeddings] = None,
+        **kwargs: Any,
+    ) -> "DataRetriever":
+        """
+        Tạo retriever với OpenAI embeddings (có cache) mặc định và (optional) index documents.
+
+        Args:
+            documents: Documents cần index
+            embeddings: Embeddings model (defaults to shared CachedEmbeddings,
+                hoặc create_embeddings() nếu tắt embedding cache)
+            **kwargs: Truyền vào __init__ (top_k, score_threshold, index)
+
+        Returns:
+            DataRetriever instance
+        """
+        retriever = cls(embeddings=embeddings or default_embeddings(), **kwargs)
+        if documents:
+            await retriever.aadd_documents(documents)
+        return retriever
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def _require_embeddings(self) -> Embeddings:
+        if self.embeddings is None:
+            raise ValueError("DataRetriever cần embeddings để xử lý text")
+        return self.embeddings
+
+    def add_vectors(self, vectors, documents: Sequence[Document]) -> None:
+        """
+        Thêm documents kèm vectors đã embed sẵn.
+
+        Args:
+            vectors: Array-like shape (n, dim)
+            documents: n documents tương ứng
+        """
+        matrix = np.asarray(vectors, dtype=np.float32)
+        if matrix.ndim != 2 or matrix.shape[0] != len(documents):
+            raise ValueError("Số vectors phải bằng số documents")
+        if self.index is None:
+            self.index = VectorIndex(dim=matrix.shape[1])
+        self.index.add(matrix)
+        self.documents.extend(documents)
+        self.metadata_index.add(doc.metadata for doc in documents)
+        self._schedule_compaction()
+
+    def delete(self, positions: Iterable[int]) -> int:
+        """
+        Xóa documents khỏi kết quả retrieval (tombstone trong VectorIndex).
+
+        Positions không đổi nên self.documents và MetadataIndex giữ nguyên.
+
+        Args:
+            positions: Positions cần xóa
+
+        Returns:
+            Số documents bị xóa
+        """
+        if self.index is None:
+            return 0
+        removed = self.index.delete(list(positions))
+        self._schedule_compaction()
+        return removed
+
+    def _schedule_compaction(self) -> None:
+        """Chạy index.build trong thread nếu cần (chỉ khi có event loop đang chạy)."""
+        if self.index is None or not self.index.needs_compaction():
+            return
+        if self._compaction is not None and not self._compaction.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Caller sync: tự gọi index.build() khi muốn
+            return
+        self._compaction = loop.create_task(asyncio.to_thread(self.index.build))
+        self._compaction.add_done_callback(self._on_compaction_done)
+
+    @staticmethod
+    def _on_compaction_done(task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Vector index compaction failed: {task.exception()}")
+
+    async def acompact(self) -> None:
+        """Chờ compaction đang chạy (nếu có) rồi compact index ngay."""
+        if self._compaction is not None and not self._compaction.done():
+            await asyncio.gather(self._compaction, return_exceptions=True)
+        if self.index is not None:
+            await asyncio.to_thread(self.index.build)
+
+    async def aadd_documents(self, documents: Sequence[Document]) -> None:
+        """
+        Embed và thêm documents vào index (compaction chạy ở background nếu cần).
+
+        Args:
+            documents: Documents cần index
+        """
+        if not documents:
+            return
+        vectors = await self._require_embeddings().aembed_documents(
+            [doc.page_content for doc in documents]
+        )
+        self.add_vectors(vectors, documents)
+        logger.info(f"Indexed {len(documents)} documents (total {len(self.documents)})")
+
+    def search_positions(
+        self,
+        vector,
+        k: int,
+        metadata_filter: Optional[Mapping[str, Any]] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Search bằng query vector, trả về positions thay vì Documents.
+
+        Args:
+            vector: Query vector shape (dim,)
+            k: Số kết quả
+            metadata_filter: Chỉ xét documents có metadata khớp (key == value)
+
+        Returns:
+            Tuple (scores, positions) 1-D, sắp xếp giảm dần theo score
+        """
+        empty = np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64)
+        if self.index is None or len(self.index) == 0:
+            return empty
+        candidates = None
+        if metadata_filter:
+            candidates = self.metadata_index.filter(metadata_filter)
+            if candidates.size == 0:
+                return empty
+        scores, positions = self.index.search(vector, k, positions=candidates)
+        valid = positions[0] >= 0
+        return scores[0][valid], positions[0][valid]
+
+    def document_at(self, position: int, **metadata: Any) -> Document:
+        """Bản copy của document tại position, metadata được bổ sung thêm các giá trị truyền vào."""
+        doc = self.documents[position]
+        return Document(page_content=doc.page_content, metadata={**doc.metadata, **metadata})
+
+    def search_by_vector(
+        self,
+        vector,
+        top_k: Optional[int] = None,
+        score_threshold: Optional[float] = None,
+        metadata_filter: Optional[Mapping[str, Any]] = None,
+    ) -> List[Document]:
+        """
+        Search bằng query vector (sync, CPU-bound).
+
+        Args:
+            vector: Query vector shape (dim,)
+            top_k: Override self.top_k
+            score_threshold: Override self.score_threshold
+            metadata_filter: Chỉ xét documents có metadata khớp (key == value)
+
+        Returns:
+            Documents sắp xếp theo score giảm dần, metadata["score"] là cosine similarity
+        """
+        threshold = self.score_threshold if score_threshold is None else score_threshold
+        scores, positions = self.search_positions(vector, top_k or self.top_k, metadata_filter)
+        return [
+            self.document_at(position, score=float(score))
+            for score, position in zip(scores, positions)
+            if threshold is None or score >= threshold
+        ]
+
+    async def aretrieve(
+        self,
+        query: str,
+        top_k: Optional[int] = None,
+        score_threshold: Optional[float] = None,
+        metadata_filter: Optional[Mapping[str, Any]] = None,
+    ) -> List[Document]:
+        """
+        Retrieve documents liên quan đến query.
+
+        Args:
+            query: Câu hỏi/query text
+            top_k: Override self.top_k
+            score_threshold: Override self.score_threshold
+            metadata_filter: Chỉ xét documents có metadata khớp (key == value)
+
+        Returns:
+            Documents sắp xếp theo score giảm dần
+        """
+        if self.index is None or len(self.index) == 0:
+            return []
+        vector = await self._require_embeddings().aembed_query(query)
+        return await asyncio.to_thread(
+            self.search_by_vector, vector, top_k, score_threshold, metadata_filter
+        )
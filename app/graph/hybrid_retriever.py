@@ -0,0 +1,206 @@
+"""
+Hybrid Retriever - Kết hợp vector search (DataRetriever) và BM25 (BM25Index).
+
+Hai nhánh chạy đồng thời (asyncio.gather: embed query + vector search trong
+thread song song với BM25 trong thread khác), kết quả được hợp nhất bằng
+Reciprocal Rank Fusion: score = sum(weight / (rrf_k + rank)).
+Documents trả về có metadata["score"] (RRF), "vector_score" và "bm25_score".
+"""
+import asyncio
+import logging
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from app.graph.data_retriever import DataRetriever
+from app.utils.bm25_index import BM25Index
+
+logger = logging.getLogger(__name__)
+
+
+def _get_settings():
+    from app.core.config import settings
+    return settings
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[Sequence[int]],
+    rrf_k: int = 60,
+    weights: Optional[Sequence[float]] = None,
+) -> Dict[int, float]:
+    """
+    Reciprocal Rank Fusion cho nhiều danh sách positions đã xếp hạng.
+
+    Args:
+        rankings: Mỗi phần tử là list positions theo thứ tự giảm dần relevance
+        rrf_k: Hằng số làm mượt (60 theo paper gốc)
+        weights: Trọng số từng danh sách (defaults to 1.0)
+
+    Returns:
+        Dict position -> fused score, sắp xếp giảm dần
+    """
+    weights = weights or [1.0] * len(rankings)
+    fused: Dict[int, float] = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, position in enumerate(ranking, start=1):
+            fused[int(position)] = fused.get(int(position), 0.0) + weight / (rrf_k + rank)
+    return dict(sorted(fused.items(), key=lambda item: item[1], reverse=True))
+
+
+class HybridRetriever:
+    """
+    Retriever lai: vector + BM25, hợp nhất bằng RRF.
+
+    DataRetriever và BM25Index dùng chung positions (cùng thứ tự add).
+    """
+
+    def __init__(
+        self,
+        data_retriever: Optional[DataRetriever] = None,
+        bm25_index: Optional[BM25Index] = None,
+        top_k: Optional[int] = None,
+        candidate_k: Optional[int] = None,
+        rrf_k: Optional[int] = None,
+        vector_weight: float = 1.0,
+        bm25_weight: float = 1.0,
+    ):
+        """
+        Initialize hybrid retriever.
+
+        Args:
+            data_retriever: Vector retriever (None = DataRetriever mới không có embeddings)
+            bm25_index: BM25 index (None = tạo mới)
+            top_k: Số documents trả về (defaults to settings.retriever_top_k)
+            candidate_k: Số ứng viên lấy từ mỗi nhánh (defaults to settings.hybrid_candidate_k)
+            rrf_k: Hằng số RRF (defaults to settings.hybrid_rrf_k)
+            vector_weight: Trọng số nhánh vector
+            bm25_weight: Trọng số nhánh BM25
+        """
+        settings = _get_settings()
+        self.data_retriever = data_retriever if data_retriever is not None else DataRetriever()
+        self.bm25_index = bm25_index if bm25_index is not None else BM25Index()
+        if len(self.data_retriever) != self.bm25_index.size:
+            raise ValueError("DataRetriever và BM25Index phải có cùng số documents")
+        self.top_k = top_k or settings.retriever_top_k
+        self.candidate_k = candidate_k or settings.hybrid_candidate_k
+        self.rrf_k = rrf_k or settings.hybrid_rrf_k
+        self.vector_weight = vector_weight
+        self.bm25_weight = bm25_weight
+
+    @classmethod
+    async def create_with_embeddings(
+        cls,
+        documents: Optional[Sequence[Document]] = None,
+        embeddings: Optional[Embeddings] = None,
+        **kwargs: Any,
+    ) -> "HybridRetriever":
+        """
+        Tạo hybrid retriever với embeddings mặc định (xem DataRetriever.create_with_embeddings).
+
+        Args:
+            documents: Documents cần index
+            embeddings: Embeddings model
+            **kwargs: Truyền vào __init__ (top_k, candidate_k, rrf_k, weights)
+
+        Returns:
+            HybridRetriever instance
+        """
+        data_retriever = await DataRetriever.create_with_embeddings(embeddings=embeddings)
+        retriever = cls(data_retriever=data_retriever, **kwargs)
+        if documents:
+            await retriever.aadd_documents(documents)
+        return retriever
+
+    def __len__(self) -> int:
+        return len(self.bm25_index)
+
+    def add_vectors(self, vectors, documents: Sequence[Document]) -> None:
+        """Thêm documents kèm vectors đã embed sẵn vào cả hai index."""
+        self.data_retriever.add_vectors(vectors, documents)
+        self.bm25_index.add(doc.page_content for doc in documents)
+
+    async def aadd_documents(self, documents: Sequence[Document]) -> None:
+        """
+        Embed và index documents vào cả vector index lẫn BM25.
+
+        Chỉ await lúc embed; hai index được add liền nhau (không await ở giữa)
+        nên các lời gọi đồng thời không làm lệch positions giữa hai index.
+
+        Args:
+            documents: Documents cần index
+        """
+        if not documents:
+            return
+        vectors = await self.data_retriever._require_embeddings().aembed_documents(
+            [doc.page_content for doc in documents]
+        )
+        self.add_vectors(vectors, documents)
+
+    def delete(self, positions: Iterable[int]) -> int:
+        """
+        Xóa documents khỏi kết quả retrieval (tombstone trong cả hai index).
+
+        Args:
+            positions: Positions cần xóa
+
+        Returns:
+            Số documents bị xóa
+        """
+        positions = list(positions)
+        self.data_retriever.delete(positions)
+        return self.bm25_index.delete(positions)
+
+    def _bm25_leg(self, query: str, metadata_filter: Optional[Mapping[str, Any]]):
+        candidates = None
+        if metadata_filter:
+            candidates = self.data_retriever.metadata_index.filter(metadata_filter)
+        return self.bm25_index.search(query, self.candidate_k, positions=candidates)
+
+    async def _vector_leg(self, query: str, metadata_filter: Optional[Mapping[str, Any]]):
+        embeddings = self.data_retriever.embeddings
+        if embeddings is None or len(self.data_retriever) == 0:
+            return np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64)
+        vector = await embeddings.aembed_query(query)
+        return await asyncio.to_thread(
+            self.data_retriever.search_positions, vector, self.candidate_k, metadata_filter
+        )
+
+    async def aretrieve(
+        self,
+        query: str,
+        top_k: Optional[int] = None,
+        metadata_filter: Optional[Mapping[str, Any]] = None,
+    ) -> List[Document]:
+        """
+        Retrieve documents bằng vector + BM25 chạy đồng thời, hợp nhất bằng RRF.
+
+        Args:
+            query: Query text
+            top_k: Override self.top_k
+            metadata_filter: Chỉ xét documents có metadata khớp (key == value)
+
+        Returns:
+            Documents sắp xếp theo RRF score giảm dần
+        """
+        (vector_scores, vector_positions), (bm25_scores, bm25_positions) = await asyncio.gather(
+            self._vector_leg(query, metadata_filter),
+            asyncio.to_thread(self._bm25_leg, query, metadata_filter),
+        )
+        fused = reciprocal_rank_fusion(
+            [vector_positions, bm25_positions],
+            rrf_k=self.rrf_k,
+            weights=[self.vector_weight, self.bm25_weight],
+        )
+        vector_by_position = dict(zip(vector_positions.tolist(), vector_scores.tolist()))
+        bm25_by_position = dict(zip(bm25_positions.tolist(), bm25_scores.tolist()))
+        results = []
+        for position, score in list(fused.items())[:top_k or self.top_k]:
+            results.append(self.data_retriever.document_at(
+                position,
+                score=score,
+                vector_score=vector_by_position.get(position),
+                bm25_score=bm25_by_position.get(position),
+            ))
+        return results
@@ -0,0 +1,86 @@
+"""
+Pending File Requests - Đề xuất ghi file đang chờ human duyệt (human-in-the-loop).
+
+SimpleGraph lưu đề xuất (file_path, file_content, query) theo thread_id ở lượt
+đầu và đọc lại khi resume. Hai lượt có thể chạy trên các processes khác nhau
+(nhiều API workers, graph workers claim job resume, process bị recycle), nên
+mặc định đề xuất nằm trong MongoDB:
+
+- "mongo": collection settings.graph_pending_collection (_id = thread_id),
+  TTL theo settings.graph_pending_ttl_seconds (tính từ created_at).
+- "memory": dict trong process, chỉ dùng cho test/dev một process.
+"""
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+PENDING_MONGO = "mongo"
+PENDING_MEMORY = "memory"
+
+# Store "memory" dùng chung của process (mỗi request tạo SimpleGraph mới)
+_MEMORY_REQUESTS: Dict[str, Dict[str, Any]] = {}
+
+
+def _get_settings():
+    from app.core.config import settings
+    return settings
+
+
+class MemoryPendingStore:
+    """Pending requests trong memory của process (test/dev)."""
+
+    def __init__(self, requests: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.requests = requests if requests is not None else {}
+
+    async def get(self, thread_id: str) -> Optional[Dict[str, Any]]:
+        return self.requests.get(thread_id)
+
+    async def put(self, thread_id: str, request: Dict[str, Any]) -> None:
+        self.requests[thread_id] = dict(request)
+
+    async def delete(self, thread_id: str) -> None:
+        self.requests.pop(thread_id, None)
+
+
+class MongoPendingStore:
+    """Pending requests trong MongoDB, dùng chung giữa mọi processes."""
+
+    def __init__(self, database=None, collection_name: Optional[str] = None):
+        self._database = database
+        self.collection_name = collection_name or _get_settings().graph_pending_collection
+
+    @property
+    def collection(self):
+        if self._database is not None:
+            return self._database[self.collection_name]
+        from app.core.database import get_database
+        return get_database()[self.collection_name]
+
+    async def setup(self, ttl_seconds: Optional[int] = None) -> None:
+        """Tạo TTL index (idempotent) nếu cấu hình ttl_seconds."""
+        if ttl_seconds:
+            await self.collection.create_index("created_at", expireAfterSeconds=ttl_seconds)
+
+    async def get(self, thread_id: str) -> Optional[Dict[str, Any]]:
+        return await self.collection.find_one({"_id": thread_id}, {"_id": 0, "created_at": 0})
+
+    async def put(self, thread_id: str, request: Dict[str, Any]) -> None:
+        document = {**request, "created_at": datetime.now(timezone.utc)}
+        await self.collection.replace_one({"_id": thread_id}, document, upsert=True)
+
+    async def delete(self, thread_id: str) -> None:
+        await self.collection.delete_one({"_id": thread_id})
+
+
+def create_pending_store():
+    """
+    Tạo pending store theo settings.graph_pending_store.
+
+    Returns:
+        MongoPendingStore hoặc MemoryPendingStore dùng chung của process
+    """
+    kind = _get_settings().graph_pending_store.lower()
+    if kind == PENDING_MONGO:
+        return MongoPendingStore()
+    if kind == PENDING_MEMORY:
+        return MemoryPendingStore(_MEMORY_REQUESTS)
+    raise ValueError(f"graph_pending_store không hợp lệ: {kind}")
@@ -8,19 +8,49 @@ Thiết kế lại theo hướng:
   - Bước 2: Nếu request (ghi file), LLM tự đề xuất file_name + file_content.
   - Bước 3: Trả về cho UI để human review (pause) với cờ __interrupt__.
   - Bước 4: /continue nhận quyết định của human (approve / reject / edit) rồi mới ghi file.
+- Đề xuất đang chờ duyệt nằm trong pending store (mặc định MongoDB, xem
+  app/graph/pending_requests.py) nên resume chạy được trên process bất kỳ.
 """
-from typing import Dict, Any, Optional
+import asyncio
+import time
+from typing import Dict, Any, List, Optional, Type
 
+from langchain_openai import ChatOpenAI
 from langgraph.graph import StateGraph, END
 
+from app.core.cancellation import complete_despite_cancel
+from app.core.tracing import KIND_NODE, traced
 from app.graph.base_graph import BaseGraph
+from app.graph.pending_requests import create_pending_store
+from app.graph.thread_status import (
+    thread_status_registry,
+    STATUS_RUNNING,
+    STATUS_WAITING_FOR_HUMAN,
+    STATUS_COMPLETED,
+    STATUS_FAILED,
+    STATUS_CANCELLED,
+)
 from app.schemas.graph.base import BaseGraphState, IntentClassification, FileInfo
-from app.prompts.intent_classification import INTENT_CLASSIFICATION_PROMPT
-from app.prompts.extract_file_info import EXTRACT_FILE_INFO_PROMPT
+from app.prompts.builder import build_messages, record_prompt_usage
+from app.prompts.intent_classification import (
+    INTENT_CLASSIFICATION_SYSTEM_PROMPT,
+    INTENT_CLASSIFICATION_USER_TEMPLATE,
+)
+from app.prompts.extract_file_info import EXTRACT_FILE_INFO_SYSTEM_PROMPT, EXTRACT_FILE_INFO_USER_TEMPLATE
 
-# In-memory store để giữ thông tin request theo thread_id giữa /start và /continue.
-# Chỉ dùng cho demo/dev; production nên dùng storage bền vững (DB, Redis, ...).
-_PENDING_FILE_REQUESTS: Dict[str, Dict[str, Any]] = {}
+
+def _summarize_state(result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Tóm tắt result state cho status endpoint (bỏ lịch sử messages để giữ entry nhỏ).
+    """
+    return {
+        "query": result.get("query"),
+        "intent": result.get("intent"),
+        "final_response": result.get("final_response"),
+        "file_path": result.get("file_path"),
+        "file_content": result.get("file_content"),
+        "message_count": len(result.get("messages") or []),
+    }
 
 
 class SimpleGraph(BaseGraph):
@@ -39,6 +69,25 @@ class SimpleGraph(BaseGraph):
                - Text khác           -> coi như nội dung file đã được human edit, ghi file với nội dung đó.
     """
 
+    def __init__(
+        self,
+        llm: Optional[ChatOpenAI] = None,
+        model_name: Optional[str] = None,
+        temperature: Optional[float] = None,
+        checkpointer=None,
+        pending_store=None,
+    ):
+        """
+        Initialize SimpleGraph.
+
+        Args:
+            llm, model_name, temperature, checkpointer: Xem BaseGraph
+            pending_store: Nơi lưu đề xuất chờ duyệt theo thread_id
+                (defaults theo settings.graph_pending_store)
+        """
+        self.pending_store = pending_store if pending_store is not None else create_pending_store()
+        super().__init__(llm=llm, model_name=model_name, temperature=temperature, checkpointer=checkpointer)
+
     def _build_graph(self) -> StateGraph:
         """
         Ở bản thiết kế này, ta không dùng LangGraph cho logic chính,
@@ -54,44 +103,81 @@ class SimpleGraph(BaseGraph):
         workflow.add_edge("noop", END)
         return workflow.compile()
 
+    async def _invoke_structured(self, node: str, schema: Type, messages: List) -> Any:
+        """
+        Gọi LLM với structured output, ghi usage (cached prompt tokens) theo node.
+        """
+        structured_llm = self.llm.with_structured_output(schema, include_raw=True)
+        started = time.perf_counter()
+        output = await structured_llm.ainvoke(messages)
+        record_prompt_usage(node, output["raw"], time.perf_counter() - started)
+        if output["parsing_error"] is not None:
+            raise output["parsing_error"]
+        return output["parsed"]
+
+    @traced("node classify_intent", KIND_NODE)
     async def _classify_intent(self, query: str) -> str:
         """
         Dùng LLM để phân loại intent (question / request).
         """
-        structured_llm = self.llm.with_structured_output(IntentClassification)
-        prompt = INTENT_CLASSIFICATION_PROMPT.format(query=query)
-        result: IntentClassification = await structured_llm.ainvoke(prompt)
+        messages = build_messages(
+            INTENT_CLASSIFICATION_SYSTEM_PROMPT, INTENT_CLASSIFICATION_USER_TEMPLATE.format(query=query)
+        )
+        result: IntentClassification = await self._invoke_structured(
+            "classify_intent", IntentClassification, messages
+        )
         intent = result.intent.strip().lower()
         if intent not in ("question", "request"):
             # Fail-safe: nếu model trả linh tinh, coi như question
             intent = "question"
         return intent
 
+    @traced("node propose_file", KIND_NODE)
     async def _propose_file(self, query: str) -> FileInfo:
         """
         Dùng LLM để đề xuất file_name + file_content từ user query.
         """
-        structured_llm = self.llm.with_structured_output(FileInfo)
-        prompt = EXTRACT_FILE_INFO_PROMPT.format(query=query)
-        result: FileInfo = await structured_llm.ainvoke(prompt)
+        messages = build_messages(
+            EXTRACT_FILE_INFO_SYSTEM_PROMPT, EXTRACT_FILE_INFO_USER_TEMPLATE.format(query=query)
+        )
+        result: FileInfo = await self._invoke_structured("propose_file", FileInfo, messages)
         return result
 
+    @traced("node answer_question", KIND_NODE)
     async def _answer_question(self, query: str, messages: Optional[list] = None) -> str:
         """
         Trả lời câu hỏi bình thường (không có side-effect).
         """
-        from langchain_core.messages import HumanMessage
-
         history = []
         if messages:
             # Giữ mọi thứ đơn giản: chỉ dùng query hiện tại làm input chính
             # Có thể mở rộng để convert full history nếu cần.
             pass
 
-        response = await self.llm.ainvoke([HumanMessage(content=query)])
+        # Không có system prompt riêng: chỉ thêm shared prefix (nếu cấu hình)
+        started = time.perf_counter()
+        response = await self.llm.ainvoke(build_messages(None, query))
+        record_prompt_usage("answer_question", response, time.perf_counter() - started)
         # ChatOpenAI trả về message có content
         return getattr(response, "content", str(response))
 
+    async def _commit_file(self, thread_id: str, file_path: str, content: str) -> str:
+        """
+        Ghi file rồi xóa pending request của thread.
+
+        Chạy trọn vẹn kể cả khi request bị hủy giữa chừng (client disconnect),
+        để không có trạng thái file đã ghi nhưng pending vẫn còn.
+        """
+        # Ghi file trên thread pool riêng (không block event loop)
+        from app.tools import awrite_file
+
+        async def commit() -> str:
+            result_msg = await awrite_file(file_path, content)
+            await self.pending_store.delete(thread_id)
+            return result_msg
+
+        return await complete_despite_cancel(commit())
+
     async def invoke(
         self,
         state: BaseGraphState,
@@ -101,11 +187,46 @@ class SimpleGraph(BaseGraph):
         """
         Thực thi SimpleGraph với human-in-the-loop ở tầng ứng dụng.
 
+        Trạng thái thread được publish vào thread_status_registry để
+        GET /graph/simple/{thread_id}/status đọc (và long-poll) mà không cần chạy lại graph.
+
         Args:
             state: Initial state (ít nhất phải có "query" cho lần đầu).
             thread_id: Thread ID để gắn với pending request (bắt buộc khi có human-in-the-loop).
             resume_value: Human input khi resume sau interrupt (approve/reject/edit).
         """
+        if not thread_id:
+            return await self._run(state, thread_id, resume_value)
+
+        thread_status_registry.update(thread_id, STATUS_RUNNING)
+        try:
+            result = await self._run(state, thread_id, resume_value)
+        except asyncio.CancelledError:
+            # Client ngắt kết nối (hoặc shutdown): pending HITL chỉ thay đổi ở đoạn commit
+            # nên giữ nguyên trạng thái trước đó
+            try:
+                pending_review = await self.pending_store.get(thread_id) is not None
+            except Exception:
+                pending_review = None
+            thread_status_registry.update(thread_id, STATUS_CANCELLED, {"pending_review": pending_review})
+            raise
+        except BaseException as e:
+            thread_status_registry.update(
+                thread_id, STATUS_FAILED, {"error": str(e) or type(e).__name__}
+            )
+            raise
+
+        status = STATUS_WAITING_FOR_HUMAN if result.get("waiting_for_human") else STATUS_COMPLETED
+        thread_status_registry.update(thread_id, status, _summarize_state(result))
+        return result
+
+    async def _run(
+        self,
+        state: BaseGraphState,
+        thread_id: Optional[str] = None,
+        resume_value: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Logic chính của SimpleGraph (xem invoke)."""
         # Chuẩn hóa input
         query = state.get("query", "") or ""
         messages = state.get("messages", []) or []
@@ -125,7 +246,7 @@ class SimpleGraph(BaseGraph):
                     "waiting_for_human": False,
                 }
 
-            pending = _PENDING_FILE_REQUESTS.get(thread_id)
+            pending = await self.pending_store.get(thread_id)
             if not pending:
                 return {
                     "messages": messages,
@@ -140,19 +261,13 @@ class SimpleGraph(BaseGraph):
 
             decision = str(resume_value).strip().lower()
 
-            # Import tool ghi file
-            from app.tools import write_file_tool
-
             # 3 case:
             # - approve: đồng ý / approve
             # - reject : từ chối / reject
             # - edit   : mọi text khác => coi như nội dung file mới
             if "đồng ý" in decision or "approve" in decision:
                 # Ghi file với nội dung gốc do LLM đề xuất
-                result_msg = write_file_tool.invoke(
-                    {"file_path": file_path, "content": original_content}
-                )
-                _PENDING_FILE_REQUESTS.pop(thread_id, None)
+                result_msg = await self._commit_file(thread_id, file_path, original_content)
 
                 final_response = (
                     f"✅ Đã ghi file theo đề xuất ban đầu.\n\n"
@@ -171,7 +286,7 @@ class SimpleGraph(BaseGraph):
                 }
 
             if "từ chối" in decision or "reject" in decision:
-                _PENDING_FILE_REQUESTS.pop(thread_id, None)
+                await self.pending_store.delete(thread_id)
                 final_response = (
                     f"❌ Bạn đã từ chối yêu cầu ghi file.\n"
                     f"File đề xuất: {file_path} (KHÔNG được ghi)."
@@ -189,10 +304,7 @@ class SimpleGraph(BaseGraph):
 
             # Mọi trường hợp khác: coi như nội dung file đã được human edit
             edited_content = str(resume_value)
-            result_msg = write_file_tool.invoke(
-                {"file_path": file_path, "content": edited_content}
-            )
-            _PENDING_FILE_REQUESTS.pop(thread_id, None)
+            result_msg = await self._commit_file(thread_id, file_path, edited_content)
 
             final_response = (
                 f"✏️ Đã ghi file với nội dung bạn cung cấp.\n\n"
@@ -243,11 +355,11 @@ class SimpleGraph(BaseGraph):
 
         # Lưu pending theo thread_id để lần /continue có thông tin
         if thread_id:
-            _PENDING_FILE_REQUESTS[thread_id] = {
+            await self.pending_store.put(thread_id, {
                 "file_path": file_path,
                 "file_content": file_content,
                 "query": query,
-            }
+            })
 
         review_message = (
             f"📝 Tôi đề xuất ghi file sau (CHƯA ghi, cần bạn duyệt):\n\n"
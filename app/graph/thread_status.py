@@ -0,0 +1,150 @@
+"""
+Thread Status Registry - Trạng thái hiện tại của các graph threads trong process.
+
+- Lookup O(1) theo thread_id (OrderedDict, giới hạn số threads theo LRU;
+  cả get và update đều tính là "dùng").
+- Mỗi lần cập nhật tăng version và đánh thức các waiters qua asyncio.Event,
+  nên long-poll không cần busy polling. Event bị xóa khi waiter cuối cùng
+  rời đi (timeout/cancel), nên không tích lũy theo số threads từng được poll.
+- Registry chỉ sống trong một process; nhiều workers thì mỗi worker chỉ biết
+  các threads mà nó đã chạy.
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+# Trạng thái của thread
+STATUS_RUNNING = "running"
+STATUS_WAITING_FOR_HUMAN = "waiting_for_human"
+STATUS_COMPLETED = "completed"
+STATUS_FAILED = "failed"
+STATUS_CANCELLED = "cancelled"
+STATUS_UNKNOWN = "unknown"
+
+
+class _Waiters:
+    """Event chung của các waiters đang chờ một thread."""
+
+    __slots__ = ("event", "count")
+
+    def __init__(self):
+        self.event = asyncio.Event()
+        self.count = 0
+
+
+class ThreadStatusRegistry:
+    """
+    In-process registry cho trạng thái graph threads với event-based notification.
+
+    Mỗi entry gồm: thread_id, version, status, waiting_for_human, updated_at, state.
+    """
+
+    def __init__(self, max_threads: Optional[int] = None):
+        """
+        Initialize registry.
+
+        Args:
+            max_threads: Số threads tối đa giữ trong memory (defaults to settings.graph_status_max_threads)
+        """
+        if max_threads is None:
+            from app.core.config import settings
+            max_threads = settings.graph_status_max_threads
+        self.max_threads = max_threads
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        # Chỉ tạo event khi có waiter; event bị thay mới sau mỗi lần set
+        self._events: Dict[str, _Waiters] = {}
+
+    def get(self, thread_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Lấy trạng thái hiện tại của thread (O(1)), đánh dấu thread mới được dùng.
+
+        Returns:
+            Entry dict hoặc None nếu thread không tồn tại
+        """
+        entry = self._entries.get(thread_id)
+        if entry is not None:
+            self._entries.move_to_end(thread_id)
+        return entry
+
+    def update(
+        self,
+        thread_id: str,
+        status: str,
+        state: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Cập nhật trạng thái thread và đánh thức các waiters.
+
+        Args:
+            thread_id: Thread ID
+            status: Một trong STATUS_* constants
+            state: State tóm tắt của thread (optional)
+
+        Returns:
+            Entry sau khi cập nhật
+        """
+        previous = self._entries.pop(thread_id, None)
+        entry = {
+            "thread_id": thread_id,
+            "version": (previous["version"] if previous else 0) + 1,
+            "status": status,
+            "waiting_for_human": status == STATUS_WAITING_FOR_HUMAN,
+            "updated_at": time.time(),
+            "state": state,
+        }
+        self._entries[thread_id] = entry
+        while len(self._entries) > self.max_threads:
+            evicted_id, _ = self._entries.popitem(last=False)
+            self._notify(evicted_id)
+        self._notify(thread_id)
+        return entry
+
+    def _notify(self, thread_id: str) -> None:
+        waiters = self._events.pop(thread_id, None)
+        if waiters is not None:
+            waiters.event.set()
+
+    async def wait_for_change(
+        self,
+        thread_id: str,
+        since_version: Optional[int],
+        timeout: float,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Chờ đến khi version của thread khác since_version hoặc hết timeout.
+
+        Args:
+            thread_id: Thread ID
+            since_version: Version client đã biết (None = version hiện tại)
+            timeout: Thời gian chờ tối đa (giây)
+
+        Returns:
+            Entry mới nhất (hoặc None nếu thread không tồn tại)
+        """
+        entry = self.get(thread_id)
+        # Thread không tồn tại: trả về ngay (thread_id luôn được đăng ký trước khi client biết)
+        if entry is None:
+            return None
+        if since_version is None:
+            since_version = entry["version"]
+        if entry["version"] != since_version or timeout <= 0:
+            return entry
+
+        waiters = self._events.get(thread_id)
+        if waiters is None:
+            waiters = self._events[thread_id] = _Waiters()
+        waiters.count += 1
+        try:
+            await asyncio.wait_for(waiters.event.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            waiters.count -= 1
+            # Waiter cuối cùng timeout/bị cancel: bỏ event (nếu chưa bị _notify thay)
+            if waiters.count == 0 and self._events.get(thread_id) is waiters:
+                del self._events[thread_id]
+        return self.get(thread_id)
+
+
+thread_status_registry = ThreadStatusRegistry()
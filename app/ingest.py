@@ -0,0 +1,59 @@
+"""
+Ingestion CLI - Nạp corpus vào MongoDB (chunk + embed + bulk write).
+
+Chạy lại với cùng --job-id để resume từ checkpoint khi job bị dừng giữa chừng.
+
+Cách chạy:
+    python -m app.ingest data/corpus.jsonl --job-id corpus-v1
+    python -m app.ingest docs/ --chunk-size 800 --chunk-overlap 100 --concurrency 8
+"""
+import argparse
+import asyncio
+import json
+import logging
+
+from app.core.config import settings
+from app.core.database import close_mongo_connection, connect_to_mongo
+from app.services.ingestion_service import IngestionService
+
+logger = logging.getLogger(__name__)
+
+
+async def run(args: argparse.Namespace) -> None:
+    """Kết nối MongoDB, chạy ingestion job và in summary."""
+    await connect_to_mongo()
+    try:
+        service = IngestionService(
+            chunk_size=args.chunk_size,
+            chunk_overlap=args.chunk_overlap,
+            batch_size=args.batch_size,
+            max_concurrency=args.concurrency,
+            progress_interval=args.progress_interval,
+        )
+        summary = await service.run(args.source, job_id=args.job_id)
+        print(json.dumps(summary, indent=2, ensure_ascii=False))
+    finally:
+        await close_mongo_connection()
+
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(description="Nạp corpus: chunk, embed theo batch và lưu vào MongoDB")
+    parser.add_argument("source", help="File .jsonl, file text hoặc thư mục (.txt/.md)")
+    parser.add_argument("--job-id", default=None, help="ID job (dùng lại để resume)")
+    parser.add_argument("--chunk-size", type=int, default=None, help="Số ký tự mỗi chunk")
+    parser.add_argument("--chunk-overlap", type=int, default=None, help="Overlap giữa các chunks")
+    parser.add_argument("--batch-size", type=int, default=None, help="Số chunks mỗi lời gọi embed")
+    parser.add_argument("--concurrency", type=int, default=None, help="Số lời gọi embed đồng thời")
+    parser.add_argument("--progress-interval", type=float, default=None, help="Chu kỳ log tiến độ (giây)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=getattr(logging, settings.log_level), format=settings.log_format)
+    try:
+        asyncio.run(run(args))
+    except KeyboardInterrupt:
+        logger.warning("Đã dừng - chạy lại với cùng --job-id để resume")
+
+
+if __name__ == "__main__":
+    main()
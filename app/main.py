@@ -8,7 +8,16 @@ import logging
 
 from app.core.config import settings
 from app.core.database import connect_to_mongo, close_mongo_connection
+from app.core.checkpointer import get_mongo_checkpointer
+from app.tools.file_tools import shutdown_file_executor
+from app.services.ingestion_service import cancel_running_jobs
+from app.graph.pending_requests import MongoPendingStore
+from app.services.graph_job_service import MongoGraphJobStore, cancel_graph_jobs, get_graph_job_service
 from app.core.exceptions import BaseAppException
+from app.core.logging_config import setup_logging
+from app.core.profiling import ProfilingMiddleware
+from app.core.http_client import get_llm_http_client, close_llm_http_client, get_llm_http_stats
+from app.core.tracing import TracingMiddleware, setup_tracing, shutdown_tracing
 from app.core.error_handlers import (
     app_exception_handler,
     validation_exception_handler,
@@ -20,11 +29,10 @@ from starlette.exceptions import HTTPException
 # TẠM THỜI ẨN - Chỉ sử dụng MongoDB hiện tại
 # from app.core.sql_database import init_sql_connector, get_sql_connector
 
-# Configure logging
-logging.basicConfig(
-    level=getattr(logging, settings.log_level),
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-)
+# Configure logging: queue + thread nền (kèm request_id khi tracing bật),
+# sau đó tracing gắn filter request_id vào QueueHandler
+setup_logging()
+setup_tracing()
 
 logger = logging.getLogger(__name__)
 
@@ -49,6 +57,14 @@ app.add_middleware(
     allow_headers=[header.strip() for header in cors_headers],
 )
 
+# Profiling middleware - chỉ đăng ký khi bật (tắt => không có overhead)
+if settings.profiling_enabled:
+    app.add_middleware(ProfilingMiddleware)
+
+# Tracing middleware - thêm sau cùng để bọc ngoài (span gồm cả thời gian profiling)
+if settings.tracing_enabled:
+    app.add_middleware(TracingMiddleware)
+
 # Register error handlers
 app.add_exception_handler(BaseAppException, app_exception_handler)
 app.add_exception_handler(RequestValidationError, validation_exception_handler)
@@ -77,7 +93,21 @@ async def startup_event():
         logger.error(f"  - Error: {str(e)}")
         logger.error("=" * 60)
         raise
+
+    # Tạo indexes cho Mongo checkpointer (nếu dùng)
+    if settings.graph_checkpointer.lower() == "mongo":
+        await get_mongo_checkpointer().setup()
+        logger.info("✓ Mongo checkpointer ready")
     
+    # Indexes cho graph jobs (status lookup theo _id, TTL theo finished_at)
+    await MongoGraphJobStore().setup(settings.graph_job_ttl_seconds)
+    # Executor "local": đánh dấu failed các job của process đã chết (lease hết hạn)
+    get_graph_job_service().start_reaper()
+
+    # TTL index cho đề xuất ghi file chờ human duyệt (pending store dùng chung)
+    if settings.graph_pending_store.lower() == "mongo":
+        await MongoPendingStore().setup(settings.graph_pending_ttl_seconds)
+
     # TẠM THỜI ẨN - Chỉ sử dụng MongoDB hiện tại
     # Kết nối SQL Database (PostgreSQL/MySQL)
     # logger.info("=" * 60)
@@ -121,10 +151,22 @@ async def startup_event():
     #     logger.error("=" * 60)
     #     # Không raise để app vẫn có thể chạy nếu không cần SQL
     
+    # HTTP client dùng chung cho LLM/embeddings (tạo trong worker, sau fork)
+    get_llm_http_client()
+
+    # Mở index snapshot (memory-mapped, dùng chung page cache giữa workers)
+    if settings.index_snapshot_dir:
+        from app.utils.index_snapshot import get_snapshot_holder
+        holder = get_snapshot_holder()
+        if holder.refresh():
+            logger.info(f"✓ Index snapshot {holder.version} loaded")
+        else:
+            logger.warning(f"⚠ Chưa có index snapshot trong {settings.index_snapshot_dir}")
+
     # TODO: Initialize graph và retriever nếu cần
     # Ví dụ:
-    # from base.graph import Graph
-    # from base.graph.data_retriever import DataRetriever
+    # from app.graph import Graph
+    # from app.graph.data_retriever import DataRetriever
     # 
     # logger.info("=" * 60)
     # logger.info("Đang khởi tạo Graph...")
@@ -142,7 +184,15 @@ async def startup_event():
 @app.on_event("shutdown")
 async def shutdown_event():
     """Close connections on shutdown."""
+    # Dừng ingestion jobs đang chạy; checkpoint đã lưu để resume sau
+    await cancel_running_jobs()
+    await cancel_graph_jobs()
+    if settings.graph_checkpointer.lower() == "mongo":
+        await get_mongo_checkpointer().aflush()
     await close_mongo_connection()
+    await close_llm_http_client()
+    shutdown_file_executor()
+    shutdown_tracing()
     logger.info("Application shut down successfully")
 
 
@@ -195,6 +245,23 @@ async def health_check():
     # except Exception as e:
     #     health_status["sql_database"] = f"error: {str(e)}"
     health_status["sql_database"] = "disabled"
+
+    # Embedding cache hit rate (chỉ có khi retrieval đã dùng shared cache)
+    from app.utils.embedding_cache import get_embedding_cache_stats
+    cache_stats = get_embedding_cache_stats()
+    if cache_stats is not None:
+        health_status["embedding_cache"] = cache_stats
+
+    # Connection reuse và thời gian chờ pool của HTTP client LLM
+    llm_http_stats = get_llm_http_stats()
+    if llm_http_stats is not None:
+        health_status["llm_http"] = llm_http_stats
+
+    # Cached prompt tokens theo node (prefix caching phía provider)
+    from app.prompts.builder import get_prompt_cache_stats
+    prompt_cache = get_prompt_cache_stats()
+    if prompt_cache is not None:
+        health_status["prompt_cache"] = prompt_cache
     
     # Overall status
     if health_status["mongodb"] != "connected":
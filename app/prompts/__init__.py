@@ -2,11 +2,17 @@
 Prompts module - Chứa các prompt templates cho graph nodes.
 """
 
-from .intent_classification import INTENT_CLASSIFICATION_PROMPT
-from .extract_file_info import EXTRACT_FILE_INFO_PROMPT
+from .intent_classification import INTENT_CLASSIFICATION_SYSTEM_PROMPT, INTENT_CLASSIFICATION_USER_TEMPLATE
+from .extract_file_info import EXTRACT_FILE_INFO_SYSTEM_PROMPT, EXTRACT_FILE_INFO_USER_TEMPLATE
+from .builder import build_messages, get_shared_prefix, record_prompt_usage, get_prompt_cache_stats
 
 __all__ = [
-    "INTENT_CLASSIFICATION_PROMPT",
-    "EXTRACT_FILE_INFO_PROMPT",
+    "INTENT_CLASSIFICATION_SYSTEM_PROMPT",
+    "INTENT_CLASSIFICATION_USER_TEMPLATE",
+    "EXTRACT_FILE_INFO_SYSTEM_PROMPT",
+    "EXTRACT_FILE_INFO_USER_TEMPLATE",
+    "build_messages",
+    "get_shared_prefix",
+    "record_prompt_usage",
+    "get_prompt_cache_stats",
 ]
-
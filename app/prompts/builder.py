@@ -0,0 +1,162 @@
+"""
+Prompt Builder - Dựng messages có prefix cố định để provider cache được.
+
+Prefix caching của OpenAI khớp theo phần đầu prompt (từ 1024 tokens): mọi
+phần cố định phải đứng trước, nội dung thay đổi theo request đứng sau.
+Thứ tự messages:
+1. System: shared prefix (settings.prompt_shared_prefix_path, giống nhau ở mọi node)
+   + system prompt của node
+2. Human: nội dung của user (query)
+
+Usage của mỗi lần gọi LLM (input tokens, cached tokens, latency) được ghi
+theo node để so sánh hit ratio, latency và chi phí (xem get_prompt_cache_stats).
+"""
+import threading
+from typing import Any, Dict, List, Optional
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+
+from app.core.tracing import current_span
+
+_shared_prefix: Optional[str] = None
+_shared_prefix_path: Optional[str] = None
+
+
+def _get_settings():
+    from app.core.config import settings
+    return settings
+
+
+def get_shared_prefix() -> str:
+    """
+    Shared instruction prefix (đọc một lần từ settings.prompt_shared_prefix_path).
+
+    Returns:
+        Nội dung prefix ("" nếu không cấu hình)
+    """
+    global _shared_prefix, _shared_prefix_path
+    path = _get_settings().prompt_shared_prefix_path
+    if _shared_prefix is None or path != _shared_prefix_path:
+        if path:
+            with open(path, encoding="utf-8") as f:
+                _shared_prefix = f.read().strip()
+        else:
+            _shared_prefix = ""
+        _shared_prefix_path = path
+    return _shared_prefix
+
+
+def build_messages(
+    system_prompt: Optional[str],
+    user_content: str,
+    shared_prefix: Optional[str] = None,
+) -> List[BaseMessage]:
+    """
+    Dựng messages: system (prefix cố định) trước, nội dung user sau.
+
+    Args:
+        system_prompt: System prompt cố định của node (None = chỉ dùng shared prefix)
+        user_content: Nội dung thay đổi theo request
+        shared_prefix: Prefix dùng chung (defaults to get_shared_prefix())
+
+    Returns:
+        List messages cho llm.ainvoke
+    """
+    prefix = get_shared_prefix() if shared_prefix is None else shared_prefix
+    system = "\n\n".join(part for part in (prefix, system_prompt) if part)
+    messages: List[BaseMessage] = [SystemMessage(content=system)] if system else []
+    messages.append(HumanMessage(content=user_content))
+    return messages
+
+
+class PromptCacheStats:
+    """Cached prompt tokens và latency theo node."""
+
+    def __init__(self):
+        self._nodes: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, node: str, usage: Optional[Dict[str, Any]], elapsed: float) -> None:
+        """
+        Ghi một lần gọi LLM.
+
+        Args:
+            node: Tên node (vd. "classify_intent")
+            usage: usage_metadata của AIMessage (None nếu provider không trả)
+            elapsed: Latency (giây)
+        """
+        usage = usage or {}
+        input_tokens = usage.get("input_tokens") or 0
+        cached = (usage.get("input_token_details") or {}).get("cache_read") or 0
+        with self._lock:
+            entry = self._nodes.setdefault(node, {
+                "calls": 0, "input_tokens": 0, "cached_tokens": 0,
+                "hit_calls": 0, "hit_latency": 0.0, "miss_latency": 0.0,
+            })
+            entry["calls"] += 1
+            entry["input_tokens"] += input_tokens
+            entry["cached_tokens"] += cached
+            if cached:
+                entry["hit_calls"] += 1
+                entry["hit_latency"] += elapsed
+            else:
+                entry["miss_latency"] += elapsed
+
+    def snapshot(self, discount: float = 0.5) -> Dict[str, Dict[str, Any]]:
+        """
+        Stats theo node.
+
+        Args:
+            discount: Mức giảm giá của cached input tokens
+
+        Returns:
+            Dict node -> calls, tokens, cached_ratio, latency cache hit/miss (ms),
+            input_cost_saving (tỉ lệ chi phí input tiết kiệm được)
+        """
+        with self._lock:
+            result = {}
+            for node, entry in self._nodes.items():
+                misses = entry["calls"] - entry["hit_calls"]
+                ratio = entry["cached_tokens"] / entry["input_tokens"] if entry["input_tokens"] else 0.0
+                result[node] = {
+                    "calls": entry["calls"],
+                    "input_tokens": entry["input_tokens"],
+                    "cached_tokens": entry["cached_tokens"],
+                    "cached_ratio": round(ratio, 4),
+                    "hit_latency_avg_ms": round(entry["hit_latency"] / entry["hit_calls"] * 1000, 1) if entry["hit_calls"] else None,
+                    "miss_latency_avg_ms": round(entry["miss_latency"] / misses * 1000, 1) if misses else None,
+                    "input_cost_saving": round(ratio * discount, 4),
+                }
+            return result
+
+    def reset(self) -> None:
+        with self._lock:
+            self._nodes.clear()
+
+
+prompt_cache_stats = PromptCacheStats()
+
+
+def record_prompt_usage(node: str, message: Any, elapsed: float) -> None:
+    """
+    Ghi usage của một response LLM vào stats và span hiện tại.
+
+    Args:
+        node: Tên node
+        message: AIMessage trả về (đọc usage_metadata)
+        elapsed: Latency (giây)
+    """
+    usage = getattr(message, "usage_metadata", None)
+    prompt_cache_stats.record(node, usage, elapsed)
+    span = current_span()
+    if span is not None and usage:
+        span.set_attribute("usage.input_tokens", usage.get("input_tokens") or 0)
+        span.set_attribute(
+            "usage.cached_tokens", (usage.get("input_token_details") or {}).get("cache_read") or 0
+        )
+
+
+def get_prompt_cache_stats() -> Optional[Dict[str, Dict[str, Any]]]:
+    """Stats theo node (None nếu chưa có lần gọi nào)."""
+    stats = prompt_cache_stats.snapshot(_get_settings().prompt_cache_discount)
+    return stats or None
@@ -15,7 +15,10 @@ from .graph import (
     SimpleGraphResult,
     SimpleGraphContinueRequest,
     SimpleGraphStatusResponse,
+    SimpleGraphJobRequest,
+    SimpleGraphJobResponse,
 )
+from .ingest import IngestJobRequest, IngestJobResponse
 
 __all__ = [
     "ExampleRequest",
@@ -27,5 +30,9 @@ __all__ = [
     "SimpleGraphResult",
     "SimpleGraphContinueRequest",
     "SimpleGraphStatusResponse",
+    "SimpleGraphJobRequest",
+    "SimpleGraphJobResponse",
+    "IngestJobRequest",
+    "IngestJobResponse",
 ]
 
@@ -1,9 +1,10 @@
 """
 Graph API Schemas - Schemas cho việc gọi SimpleGraph qua FastAPI.
 """
+from datetime import datetime
 from typing import Optional, Dict, Any, List
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 
 
 class SimpleGraphRequest(BaseModel):
@@ -104,13 +105,82 @@ class SimpleGraphStatusResponse(BaseModel):
         thread_id: Thread ID.
         waiting_for_human: Flag cho biết đang chờ human input.
         current_state: State hiện tại của graph (nếu có).
+        status: Trạng thái thread - running / waiting_for_human / completed / failed / unknown.
+        version: Version trạng thái, tăng mỗi lần thay đổi (dùng cho long-poll ?since=).
     """
 
     thread_id: str = Field(..., description="Thread ID")
     waiting_for_human: bool = Field(..., description="Flag indicating waiting for human input")
+    status: str = Field(
+        default="unknown",
+        description="Thread status: running, waiting_for_human, completed, failed or unknown",
+    )
+    version: int = Field(
+        default=0,
+        description="Status version, increments on every change (use with ?since= for long-poll)",
+    )
     current_state: Optional[Dict[str, Any]] = Field(
         default=None,
         description="Current graph state (if available)",
     )
 
 
+
+
+class SimpleGraphJobRequest(BaseModel):
+    """
+    Request schema để chạy SimpleGraph dưới dạng job nền.
+
+    Bắt đầu thread mới với query, hoặc resume thread đang chờ human với
+    thread_id + human_input.
+
+    Attributes:
+        query: Câu hỏi / input của user (bắt buộc khi bắt đầu thread mới).
+        messages: (Optional) Lịch sử hội thoại trước đó.
+        thread_id: Thread cần resume (đi kèm human_input).
+        human_input: Input từ human để tiếp tục graph.
+    """
+
+    query: Optional[str] = Field(default=None, description="User query/input (new thread)", min_length=1)
+    messages: Optional[List[Dict[str, str]]] = Field(
+        default=None,
+        description="Optional conversation history for context",
+    )
+    thread_id: Optional[str] = Field(default=None, description="Thread ID to resume")
+    human_input: Optional[str] = Field(default=None, description="Human input to continue graph", min_length=1)
+
+    @model_validator(mode="after")
+    def _check_mode(self) -> "SimpleGraphJobRequest":
+        if self.human_input is not None:
+            if not self.thread_id:
+                raise ValueError("thread_id is required with human_input")
+        elif not self.query:
+            raise ValueError("query is required to start a new thread")
+        return self
+
+
+class SimpleGraphJobResponse(BaseModel):
+    """
+    Response schema cho graph job.
+
+    Attributes:
+        job_id: Job ID.
+        status: pending / running / completed / failed / cancelled.
+        thread_id: Thread ID của conversation.
+        attempts: Số lần job đã được chạy.
+        created_at: Thời điểm tạo job.
+        started_at: Thời điểm bắt đầu chạy lần gần nhất.
+        finished_at: Thời điểm kết thúc.
+        result: Kết quả như response của /simple/start (khi completed).
+        error: Lỗi (khi failed / cancelled).
+    """
+
+    job_id: str = Field(..., description="Job ID")
+    status: str = Field(..., description="Job status: pending, running, completed, failed or cancelled")
+    thread_id: Optional[str] = Field(default=None, description="Thread ID for conversation tracking")
+    attempts: int = Field(default=0, description="Number of execution attempts")
+    created_at: Optional[datetime] = Field(default=None, description="Job creation time")
+    started_at: Optional[datetime] = Field(default=None, description="Last execution start time")
+    finished_at: Optional[datetime] = Field(default=None, description="Job completion time")
+    result: Optional[SimpleGraphResponse] = Field(default=None, description="Graph result (when completed)")
+    error: Optional[str] = Field(default=None, description="Error message (when failed or cancelled)")
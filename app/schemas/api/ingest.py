@@ -0,0 +1,44 @@
+"""
+Ingestion API Schemas - Schemas cho việc nạp corpus qua FastAPI.
+"""
+from typing import Optional, Dict, Any
+
+from pydantic import BaseModel, Field
+
+
+class IngestJobRequest(BaseModel):
+    """
+    Request schema để tạo (hoặc resume) ingestion job.
+
+    Attributes:
+        source: Đường dẫn file (.jsonl / text) hoặc thư mục trên server.
+        job_id: ID job; truyền ID của job bị dừng để resume từ checkpoint.
+        chunk_size: Override số ký tự mỗi chunk.
+        chunk_overlap: Override overlap giữa các chunks.
+    """
+
+    source: str = Field(..., description="Path to a .jsonl/text file or directory on the server", min_length=1)
+    job_id: Optional[str] = Field(default=None, description="Existing job ID to resume")
+    chunk_size: Optional[int] = Field(default=None, description="Characters per chunk", gt=0)
+    chunk_overlap: Optional[int] = Field(default=None, description="Overlapping characters between chunks", ge=0)
+
+
+class IngestJobResponse(BaseModel):
+    """
+    Response schema cho ingestion job.
+
+    Attributes:
+        job_id: Job ID.
+        status: pending / running / completed / failed.
+        running: Job đang chạy trong process này.
+        last_seq: Seq của document cuối cùng đã ghi xong (checkpoint).
+        stats: Thống kê documents/giây theo stage.
+        error: Lỗi gần nhất (nếu có).
+    """
+
+    job_id: str = Field(..., description="Job ID")
+    status: str = Field(..., description="Job status: pending, running, completed or failed")
+    running: bool = Field(default=False, description="Job is running in this process")
+    last_seq: int = Field(default=-1, description="Checkpoint: last fully written document sequence number")
+    stats: Optional[Dict[str, Any]] = Field(default=None, description="Per-stage docs/sec statistics")
+    error: Optional[str] = Field(default=None, description="Last error (if any)")
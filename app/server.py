@@ -0,0 +1,389 @@
+"""
+Production Server - Pre-fork launcher: nhiều uvicorn workers dùng chung một socket.
+
+Master process:
+- Import app một lần (app.main), bind socket, gc.collect() + gc.freeze()
+  rồi mới fork: workers dùng chung (copy-on-write) các pages của code và
+  objects lúc import, GC của workers không chạm vào các objects đã freeze
+  nên không làm bẩn các pages đó.
+- Theo dõi workers, fork worker mới khi một worker thoát (recycle/crash).
+- SIGTERM/SIGINT: dừng nhận request, chờ workers drain (graceful) rồi thoát.
+  SIGHUP: recycle lần lượt toàn bộ workers (vd. sau khi đổi snapshot).
+
+Mặc định một worker (settings.server_workers = 1). Nhiều workers: đề xuất chờ
+duyệt của SimpleGraph phải ở store dùng chung (GRAPH_PENDING_STORE=mongo, mặc
+định); GET /graph/simple/{thread_id}/status (thread_status_registry) chỉ thấy
+các threads do chính worker nhận request đã chạy.
+
+Worker process: uvicorn.Server trên socket đã bind. Worker tự thoát graceful
+(ngừng accept, chờ requests đang chạy xong) khi:
+- Đã phục vụ server_max_requests requests (+ jitter để các workers không
+  recycle cùng lúc), hoặc
+- RSS vượt server_max_rss_mb (kiểm tra mỗi server_rss_check_interval giây).
+
+Keep-alive / concurrency / backlog lấy theo settings.server_profile (xem
+TUNING_PROFILES), từng giá trị có thể override bằng settings riêng.
+
+Cách chạy:
+    python -m app.server --workers 4 --port 8000
+    SERVER_PROFILE=proxy SERVER_MAX_REQUESTS=20000 python -m app.server
+"""
+import argparse
+import asyncio
+import gc
+import logging
+import os
+import random
+import signal
+import socket
+import sys
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from app.core.logging_config import shutdown_logging
+from app.graph.pending_requests import PENDING_MONGO
+
+logger = logging.getLogger(__name__)
+
+# Exit code của uvicorn khi lifespan startup lỗi (vd. không kết nối được MongoDB)
+STARTUP_FAILURE = 3
+
+# Profile tuning keep-alive / concurrency. Settings server_* (khác None) override từng giá trị.
+TUNING_PROFILES: Dict[str, Dict[str, Any]] = {
+    # Mặc định của uvicorn, phù hợp đa số trường hợp
+    "balanced": {"keepalive_timeout": 5, "limit_concurrency": None, "backlog": 2048},
+    # Sau load balancer/reverse proxy: keep-alive dài hơn idle timeout của LB
+    # (thường 60s) để tránh 502 do worker đóng connection trước
+    "proxy": {"keepalive_timeout": 75, "limit_concurrency": 1000, "backlog": 4096},
+    # Client kết nối trực tiếp: keep-alive ngắn giải phóng sockets nhàn rỗi,
+    # giới hạn concurrency để trả 503 sớm thay vì xếp hàng vô hạn
+    "direct": {"keepalive_timeout": 2, "limit_concurrency": 256, "backlog": 1024},
+}
+
+
+def _get_settings():
+    from app.core.config import settings
+    return settings
+
+
+def _exit_worker(signum, frame) -> None:
+    # uvicorn khôi phục handler này sau khi drain xong rồi raise lại signal
+    raise SystemExit(0)
+
+
+def default_workers() -> int:
+    """Số workers mặc định = số CPU cores process được phép dùng."""
+    try:
+        return max(1, len(os.sched_getaffinity(0)))
+    except AttributeError:
+        return max(1, os.cpu_count() or 1)
+
+
+def current_rss_mb() -> Optional[float]:
+    """RSS hiện tại của process (MB), None nếu không đọc được (/proc không có)."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+@dataclass
+class ServerOptions:
+    """Cấu hình của PreforkServer."""
+
+    host: str = "0.0.0.0"
+    port: int = 8000
+    workers: int = 1
+    max_requests: int = 0  # 0 = không recycle theo số requests
+    max_requests_jitter: int = 0
+    max_rss_mb: float = 0  # 0 = không recycle theo RSS
+    rss_check_interval: float = 10.0
+    graceful_timeout: float = 30.0
+    keepalive_timeout: int = 5
+    limit_concurrency: Optional[int] = None
+    backlog: int = 2048
+
+    @classmethod
+    def from_settings(cls, profile: Optional[str] = None, **overrides: Any) -> "ServerOptions":
+        """
+        Tạo options từ settings và tuning profile.
+
+        Args:
+            profile: Tên profile trong TUNING_PROFILES (defaults to settings.server_profile)
+            **overrides: Giá trị override (None = giữ nguyên)
+
+        Returns:
+            ServerOptions instance
+        """
+        settings = _get_settings()
+        profile = profile or settings.server_profile
+        if profile not in TUNING_PROFILES:
+            raise ValueError(f"Server profile không hợp lệ: {profile} (có: {', '.join(TUNING_PROFILES)})")
+        values: Dict[str, Any] = dict(TUNING_PROFILES[profile])
+        for name in ("keepalive_timeout", "limit_concurrency", "backlog"):
+            value = getattr(settings, f"server_{name}")
+            if value is not None:
+                values[name] = value
+        values.update(
+            host=settings.server_host,
+            port=settings.server_port,
+            workers=settings.server_workers or default_workers(),
+            max_requests=settings.server_max_requests,
+            max_requests_jitter=settings.server_max_requests_jitter,
+            max_rss_mb=settings.server_max_rss_mb,
+            rss_check_interval=settings.server_rss_check_interval,
+            graceful_timeout=settings.server_graceful_timeout,
+        )
+        values.update({key: value for key, value in overrides.items() if value is not None})
+        return cls(**values)
+
+
+class PreforkServer:
+    """
+    Master process: fork và giám sát các uvicorn workers.
+    """
+
+    def __init__(self, app: Any, options: ServerOptions):
+        """
+        Initialize server.
+
+        Args:
+            app: ASGI app đã import (được chia sẻ copy-on-write với workers)
+            options: ServerOptions
+        """
+        self.app = app
+        self.options = options
+        self.workers: Dict[int, int] = {}  # pid -> worker index
+        self.socket: Optional[socket.socket] = None
+        self._stopping = False
+        self._reload = False
+        self._exit_code = 0
+
+    def _bind(self) -> socket.socket:
+        family = socket.AF_INET6 if ":" in self.options.host else socket.AF_INET
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.options.host, self.options.port))
+        sock.listen(self.options.backlog)
+        sock.set_inheritable(True)
+        return sock
+
+    def run(self) -> int:
+        """
+        Chạy master đến khi nhận SIGTERM/SIGINT.
+
+        Returns:
+            Exit code (STARTUP_FAILURE nếu worker không start được)
+        """
+        self.socket = self._bind()
+        host, port = self.socket.getsockname()[:2]
+        if self.options.workers > 1:
+            settings = _get_settings()
+            if settings.graph_pending_store.lower() != PENDING_MONGO:
+                logger.warning(
+                    f"{self.options.workers} workers với GRAPH_PENDING_STORE={settings.graph_pending_store}: "
+                    f"/continue chỉ tìm thấy đề xuất khi tới đúng worker đã tạo nó"
+                )
+            logger.warning("Nhiều workers: /graph/simple/{thread_id}/status chỉ thấy threads của worker nhận request")
+        logger.info(
+            f"Master {os.getpid()} listening on {host}:{port} with {self.options.workers} workers "
+            f"(keepalive={self.options.keepalive_timeout}s, limit_concurrency={self.options.limit_concurrency}, "
+            f"max_requests={self.options.max_requests}, max_rss_mb={self.options.max_rss_mb})"
+        )
+
+        # Objects lúc import chuyển sang permanent generation: GC của workers bỏ qua
+        # chúng => không ghi vào các pages dùng chung sau fork
+        gc.collect()
+        gc.freeze()
+
+        signal.signal(signal.SIGTERM, self._on_stop)
+        signal.signal(signal.SIGINT, self._on_stop)
+        signal.signal(signal.SIGHUP, self._on_reload)
+        try:
+            for index in range(self.options.workers):
+                self._spawn(index)
+            while not self._stopping:
+                self._reap()
+                # _reap có thể dừng master (startup failure): không fork lại
+                if self._stopping:
+                    break
+                if self._reload:
+                    self._reload = False
+                    self._recycle_all()
+                for index in set(range(self.options.workers)) - set(self.workers.values()):
+                    self._spawn(index)
+                time.sleep(0.2)
+        finally:
+            self._shutdown()
+            self.socket.close()
+        logger.info(f"Master {os.getpid()} stopped")
+        return self._exit_code
+
+    def _on_stop(self, signum, frame) -> None:
+        self._stopping = True
+
+    def _on_reload(self, signum, frame) -> None:
+        self._reload = True
+
+    def _spawn(self, index: int) -> None:
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                signal.signal(signal.SIGTERM, _exit_worker)
+                signal.signal(signal.SIGINT, _exit_worker)
+                signal.signal(signal.SIGHUP, signal.SIG_IGN)
+                code = self._worker_main(index)
+            except SystemExit as e:
+                code = e.code if isinstance(e.code, int) else 0
+            except BaseException:
+                logger.exception(f"Worker {index} crashed")
+            finally:
+                # os._exit bỏ qua atexit: flush logging queue trước
+                shutdown_logging()
+                os._exit(code)
+        self.workers[pid] = index
+        logger.info(f"Spawned worker {index} (pid {pid})")
+
+    def _reap(self) -> None:
+        while self.workers:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self.workers.clear()
+                return
+            if pid == 0:
+                return
+            index = self.workers.pop(pid, None)
+            if index is None:
+                continue
+            code = os.waitstatus_to_exitcode(status)
+            logger.info(f"Worker {index} (pid {pid}) exited with code {code}")
+            if code == STARTUP_FAILURE and not self._stopping:
+                # Fork lại cũng lỗi y hệt: dừng thay vì crash loop
+                logger.error(f"Worker {index} không start được, dừng master")
+                self._stopping = True
+                self._exit_code = STARTUP_FAILURE
+
+    def _recycle_all(self) -> None:
+        """Recycle từng worker: fork worker mới rồi mới dừng worker cũ."""
+        for pid, index in list(self.workers.items()):
+            if self._stopping:
+                return
+            self.workers.pop(pid)
+            self._spawn(index)
+            self._terminate(pid)
+
+    def _terminate(self, pid: int) -> None:
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+
+    def _shutdown(self) -> None:
+        logger.info(f"Stopping {len(self.workers)} workers (graceful timeout {self.options.graceful_timeout}s)")
+        for pid in list(self.workers):
+            self._terminate(pid)
+        deadline = time.monotonic() + self.options.graceful_timeout + 5
+        while self.workers and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(0.1)
+        for pid in list(self.workers):
+            logger.warning(f"Worker pid {pid} không dừng kịp, kill")
+            try:
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+            except (ProcessLookupError, ChildProcessError):
+                pass
+        self.workers.clear()
+
+    def _worker_main(self, index: int) -> int:
+        import uvicorn
+
+        options = self.options
+        max_requests = None
+        if options.max_requests > 0:
+            max_requests = options.max_requests + random.randint(0, max(options.max_requests_jitter, 0))
+        config = uvicorn.Config(
+            self.app,
+            timeout_keep_alive=options.keepalive_timeout,
+            limit_concurrency=options.limit_concurrency,
+            limit_max_requests=max_requests,
+            backlog=options.backlog,
+            timeout_graceful_shutdown=options.graceful_timeout,
+            # Logs đi qua root logger (queue + thread nền, xem app/core/logging_config.py)
+            log_config=None,
+        )
+        server = uvicorn.Server(config)
+        asyncio.run(self._serve(server, index))
+        return 0
+
+    async def _serve(self, server, index: int) -> None:
+        watchdog = None
+        if self.options.max_rss_mb > 0:
+            watchdog = asyncio.create_task(self._watch_rss(server, index))
+        try:
+            await server.serve(sockets=[self.socket])
+        finally:
+            if watchdog is not None:
+                watchdog.cancel()
+
+    async def _watch_rss(self, server, index: int) -> None:
+        while not server.should_exit:
+            await asyncio.sleep(self.options.rss_check_interval)
+            rss = current_rss_mb()
+            if rss is not None and rss > self.options.max_rss_mb:
+                logger.info(f"Worker {index} RSS {rss:.0f} MB > {self.options.max_rss_mb:g} MB, recycling")
+                server.should_exit = True
+
+
+def run(options: ServerOptions, app_path: str = "app.main:app") -> int:
+    """
+    Import app (một lần, trong master) và chạy PreforkServer.
+
+    Args:
+        options: ServerOptions
+        app_path: "module:attribute" của ASGI app
+
+    Returns:
+        Exit code
+    """
+    import importlib
+
+    module_name, _, attribute = app_path.partition(":")
+    app = getattr(importlib.import_module(module_name), attribute or "app")
+    return PreforkServer(app, options).run()
+
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(description="Chạy app với nhiều uvicorn workers (pre-fork)")
+    parser.add_argument("--app", default="app.main:app", help="ASGI app dạng module:attribute")
+    parser.add_argument("--host", default=None)
+    parser.add_argument("--port", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=None, help="Số workers (mặc định: settings.server_workers, 0 = số CPU cores)")
+    parser.add_argument("--profile", default=None, choices=sorted(TUNING_PROFILES), help="Tuning profile")
+    parser.add_argument("--max-requests", type=int, default=None, help="Recycle worker sau N requests")
+    parser.add_argument("--max-requests-jitter", type=int, default=None)
+    parser.add_argument("--max-rss-mb", type=float, default=None, help="Recycle worker khi RSS vượt ngưỡng")
+    parser.add_argument("--graceful-timeout", type=float, default=None, help="Thời gian drain tối đa (giây)")
+    args = parser.parse_args()
+
+    options = ServerOptions.from_settings(
+        profile=args.profile,
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        max_requests=args.max_requests,
+        max_requests_jitter=args.max_requests_jitter,
+        max_rss_mb=args.max_rss_mb,
+        graceful_timeout=args.graceful_timeout,
+    )
+    sys.exit(run(options, args.app))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,8 +2,12 @@
 Services module - Business logic services cho AI text generation.
 """
 from .base_service import BaseService
+from .ingestion_service import IngestionService
+from .graph_job_service import GraphJobService
 
 __all__ = [
     "BaseService",
+    "IngestionService",
+    "GraphJobService",
 ]
 
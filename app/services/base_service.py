@@ -5,6 +5,8 @@ from abc import ABC
 from typing import Any, Dict, Optional
 import logging
 
+from app.core.tracing import current_span
+
 logger = logging.getLogger(__name__)
 
 
@@ -52,6 +54,9 @@ class BaseService(ABC):
             extra=context,
             exc_info=True,
         )
+        span = current_span()
+        if span is not None:
+            span.record_error(error)
         return {
             "success": False,
             "error": str(error),
@@ -0,0 +1,494 @@
+"""
+Graph Job Service - Chạy graph dưới dạng job nền, trạng thái lưu trong MongoDB.
+
+- submit: ghi job (status pending) rồi trả về ngay; graph chạy trên background
+  task của process, tối đa settings.graph_job_max_concurrency jobs cùng lúc.
+- Trạng thái/kết quả nằm trong collection settings.graph_jobs_collection
+  (lookup theo _id), nên worker nào cũng trả lời được status query.
+- Khi job kết thúc: POST kết quả tới settings.graph_job_callback_url (nếu
+  có), body ký HMAC-SHA256 bằng settings.api_secret_key (header X-Job-Signature).
+- settings.graph_job_executor = "worker": API chỉ ghi job, process riêng
+  (python -m app.worker) claim job bằng lease (find-and-modify), gia hạn lease
+  bằng heartbeat; lease hết hạn (worker chết) => job được chạy lại sau backoff.
+- Executor "local" cũng giữ lease (lease_owner = "local:<host>:<pid>:...") và
+  heartbeat; API process chạy reaper đánh dấu failed các job local có lease
+  hết hạn (process chạy job đã chết), nên client poll status không chờ mãi.
+  Job local không được chạy lại (không có process nào claim hàng đợi).
+"""
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+import httpx
+from pymongo import ReturnDocument
+
+from .base_service import BaseService
+
+logger = logging.getLogger(__name__)
+
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+
+EXECUTOR_LOCAL = "local"
+EXECUTOR_WORKER = "worker"
+
+FINISHED_STATUSES = (JOB_COMPLETED, JOB_FAILED, JOB_CANCELLED)
+
+# Các field của result state được lưu vào job (đủ để dựng lại SimpleGraphResponse)
+RESULT_FIELDS = (
+    "final_response", "messages", "token_usage", "intent",
+    "file_path", "file_content", "waiting_for_human", "__interrupt__",
+)
+
+# Status query không cần input của job
+STATUS_PROJECTION = {"input": 0}
+
+
+def _get_settings():
+    from app.core.config import settings
+    return settings
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+# ==================== Graph registry ====================
+
+_graph_factories: Dict[str, Callable[[], Any]] = {}
+
+
+def register_graph(name: str, factory: Callable[[], Any]) -> None:
+    """
+    Đăng ký graph có thể chạy dưới dạng job.
+
+    Args:
+        name: Tên graph trong job (vd. "simple")
+        factory: Callable trả về instance BaseGraph
+    """
+    _graph_factories[name] = factory
+
+
+def get_graph_factory(name: str) -> Callable[[], Any]:
+    """Factory của graph theo tên (raise ValueError nếu chưa đăng ký)."""
+    if "simple" not in _graph_factories:
+        from app.graph.simple_graph import SimpleGraph
+        _graph_factories.setdefault("simple", SimpleGraph)
+    try:
+        return _graph_factories[name]
+    except KeyError:
+        raise ValueError(f"Graph '{name}' chưa được đăng ký") from None
+
+
+# ==================== Store ====================
+
+class MongoGraphJobStore:
+    """Lưu input, trạng thái và kết quả của graph jobs."""
+
+    def __init__(self, database=None, collection_name: Optional[str] = None):
+        self._database = database
+        self.collection_name = collection_name or _get_settings().graph_jobs_collection
+
+    @property
+    def collection(self):
+        if self._database is not None:
+            return self._database[self.collection_name]
+        from app.core.database import get_database
+        return get_database()[self.collection_name]
+
+    async def setup(self, ttl_seconds: Optional[int] = None) -> None:
+        """Tạo indexes (idempotent); TTL tính từ finished_at."""
+        await self.collection.create_index([("status", 1), ("available_at", 1)])
+        await self.collection.create_index([("status", 1), ("lease_expires_at", 1)])
+        if ttl_seconds:
+            await self.collection.create_index("finished_at", expireAfterSeconds=ttl_seconds)
+
+    async def create(self, job: Dict[str, Any]) -> None:
+        await self.collection.insert_one(job)
+
+    async def load(self, job_id: str, projection: Optional[Dict[str, int]] = None) -> Optional[Dict[str, Any]]:
+        return await self.collection.find_one({"_id": job_id}, projection)
+
+    async def save(self, job_id: str, fields: Dict[str, Any], owner: Optional[str] = None) -> bool:
+        """
+        Cập nhật job; với owner chỉ ghi khi job vẫn thuộc lease của owner.
+
+        Returns:
+            True nếu đã ghi
+        """
+        query = {"_id": job_id}
+        if owner is not None:
+            query["lease_owner"] = owner
+        fields = {**fields, "updated_at": _now()}
+        result = await self.collection.update_one(query, {"$set": fields})
+        return result.matched_count > 0
+
+    async def claim(
+        self,
+        owner: str,
+        lease_seconds: float,
+        graphs: Optional[Iterable[str]] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Claim atomically job pending sớm nhất đã đến hạn (find-and-modify).
+
+        Args:
+            owner: ID của worker
+            lease_seconds: Thời hạn lease
+            graphs: Chỉ claim các graph này (None = mọi graph)
+
+        Returns:
+            Job document sau khi claim (status running, attempts đã tăng) hoặc None
+        """
+        now = _now()
+        query: Dict[str, Any] = {"status": JOB_PENDING, "available_at": {"$lte": now}}
+        if graphs is not None:
+            query["graph"] = {"$in": list(graphs)}
+        return await self.collection.find_one_and_update(
+            query,
+            {
+                "$set": {
+                    "status": JOB_RUNNING,
+                    "lease_owner": owner,
+                    "lease_expires_at": now + timedelta(seconds=lease_seconds),
+                    "started_at": now,
+                    "updated_at": now,
+                },
+                "$inc": {"attempts": 1},
+            },
+            sort=[("available_at", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def extend_lease(self, job_id: str, owner: str, lease_seconds: float) -> bool:
+        """Heartbeat: gia hạn lease; False nếu job không còn thuộc owner."""
+        now = _now()
+        result = await self.collection.update_one(
+            {"_id": job_id, "status": JOB_RUNNING, "lease_owner": owner},
+            {"$set": {"lease_expires_at": now + timedelta(seconds=lease_seconds), "updated_at": now}},
+        )
+        return result.matched_count > 0
+
+    async def requeue_expired(
+        self,
+        max_attempts: int,
+        backoff: Callable[[int], float],
+    ) -> Tuple[int, int]:
+        """
+        Đưa jobs có lease hết hạn (worker chết) về pending sau backoff, hoặc failed khi hết lượt.
+
+        Args:
+            max_attempts: Số lần chạy tối đa
+            backoff: attempts -> số giây chờ trước lần chạy lại
+
+        Returns:
+            (số jobs được requeue, số jobs bị đánh dấu failed)
+        """
+        now = _now()
+        requeued = failed = 0
+        cursor = self.collection.find(
+            {"status": JOB_RUNNING, "lease_expires_at": {"$lt": now}},
+            {"attempts": 1, "lease_owner": 1, "lease_expires_at": 1},
+        )
+        async for job in cursor:
+            attempts = job.get("attempts", 0)
+            if attempts >= max_attempts:
+                fields = {
+                    "status": JOB_FAILED,
+                    "error": f"lease expired after {attempts} attempts",
+                    "finished_at": now,
+                }
+            else:
+                fields = {
+                    "status": JOB_PENDING,
+                    "available_at": now + timedelta(seconds=backoff(attempts)),
+                    "error": f"lease expired (attempt {attempts})",
+                }
+            result = await self.collection.update_one(
+                # Chỉ khi lease chưa được gia hạn / claim lại kể từ lúc đọc
+                {"_id": job["_id"], "lease_owner": job.get("lease_owner"), "lease_expires_at": job["lease_expires_at"]},
+                {"$set": {**fields, "lease_owner": None, "lease_expires_at": None, "updated_at": now}},
+            )
+            if result.modified_count:
+                if fields["status"] == JOB_FAILED:
+                    failed += 1
+                else:
+                    requeued += 1
+        return requeued, failed
+
+
+# ==================== Service ====================
+
+class GraphJobService(BaseService):
+    """
+    Submit và thực thi graph jobs (background tasks trong process hiện tại).
+    """
+
+    def __init__(
+        self,
+        job_store=None,
+        max_concurrency: Optional[int] = None,
+        callback_url: Optional[str] = None,
+        executor: Optional[str] = None,
+        lease_seconds: Optional[float] = None,
+        heartbeat_interval: Optional[float] = None,
+    ):
+        """
+        Initialize graph job service.
+
+        Args:
+            job_store: Nơi lưu jobs (defaults to MongoGraphJobStore)
+            max_concurrency: Số jobs chạy đồng thời (defaults to settings.graph_job_max_concurrency)
+            callback_url: URL nhận kết quả (defaults to settings.graph_job_callback_url)
+            executor: "local" (chạy trong process này) hoặc "worker" (chỉ ghi job cho
+                python -m app.worker) (defaults to settings.graph_job_executor)
+            lease_seconds: Lease của job local (defaults to settings.worker_lease_seconds)
+            heartbeat_interval: Chu kỳ gia hạn lease / reaper của job local
+                (defaults to settings.worker_heartbeat_interval)
+        """
+        super().__init__()
+        settings = _get_settings()
+        self.job_store = job_store if job_store is not None else MongoGraphJobStore()
+        self.max_concurrency = max_concurrency or settings.graph_job_max_concurrency
+        self.callback_url = callback_url if callback_url is not None else settings.graph_job_callback_url
+        self.executor = (executor or settings.graph_job_executor).lower()
+        if self.executor not in (EXECUTOR_LOCAL, EXECUTOR_WORKER):
+            raise ValueError(f"graph_job_executor không hợp lệ: {self.executor}")
+        self.lease_seconds = lease_seconds or settings.worker_lease_seconds
+        self.heartbeat_interval = heartbeat_interval or settings.worker_heartbeat_interval
+        self.owner_id = f"local:{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._reaper: Optional[asyncio.Task] = None
+
+    async def submit(
+        self,
+        graph: str,
+        state: Dict[str, Any],
+        thread_id: Optional[str] = None,
+        resume_value: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Tạo job và lên lịch chạy nền (hoặc để worker claim); trả về ngay.
+
+        Args:
+            graph: Tên graph đã đăng ký (xem register_graph)
+            state: Initial state
+            thread_id: Thread ID (None = tạo mới)
+            resume_value: Human input khi resume sau interrupt
+
+        Returns:
+            Job document vừa tạo
+        """
+        get_graph_factory(graph)
+        now = _now()
+        job = {
+            "_id": str(uuid.uuid4()),
+            "graph": graph,
+            "status": JOB_PENDING,
+            "thread_id": thread_id or str(uuid.uuid4()),
+            "input": {"state": state, "resume_value": resume_value},
+            "attempts": 0,
+            "available_at": now,
+            "created_at": now,
+            "updated_at": now,
+        }
+        await self.job_store.create(job)
+        if self.executor == EXECUTOR_WORKER:
+            return job
+        task = asyncio.create_task(self._run_limited(job))
+        self._tasks[job["_id"]] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job["_id"], None))
+        return job
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Trạng thái + kết quả của job (không kèm input)."""
+        return await self.job_store.load(job_id, STATUS_PROJECTION)
+
+    async def _run_limited(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        async with self._semaphore:
+            return await self.execute(job)
+
+    async def execute(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Chạy job trong process này (executor "local").
+
+        Args:
+            job: Job document vừa submit
+
+        Returns:
+            Fields cuối cùng đã lưu (status, result/error, finished_at)
+        """
+        job = {**job, "attempts": job.get("attempts", 0) + 1}
+        now = _now()
+        await self.job_store.save(job["_id"], {
+            "status": JOB_RUNNING,
+            "started_at": now,
+            "attempts": job["attempts"],
+            "lease_owner": self.owner_id,
+            "lease_expires_at": now + timedelta(seconds=self.lease_seconds),
+        })
+        heartbeat = asyncio.create_task(self._heartbeat(job["_id"], asyncio.current_task()))
+        try:
+            return await self.run_job(job, owner=self.owner_id)
+        finally:
+            heartbeat.cancel()
+
+    async def _heartbeat(self, job_id: str, task: asyncio.Task) -> None:
+        """Gia hạn lease của job local; mất lease (đã bị reaper đánh dấu failed) => hủy job."""
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                owned = await self.job_store.extend_lease(job_id, self.owner_id, self.lease_seconds)
+            except Exception as e:
+                self.logger.warning(f"Heartbeat graph job {job_id} lỗi: {e}")
+                continue
+            if not owned:
+                self.logger.warning(f"Graph job {job_id}: mất lease, hủy job")
+                task.cancel()
+                return
+
+    async def reap_expired(self) -> int:
+        """
+        Đánh dấu failed các job có lease hết hạn (process chạy job local đã chết).
+
+        Returns:
+            Số jobs bị đánh dấu failed
+        """
+        _, failed = await self.job_store.requeue_expired(1, lambda attempts: 0.0)
+        if failed:
+            self.logger.warning(f"Lease hết hạn: {failed} graph jobs local bị đánh dấu failed")
+        return failed
+
+    async def _reap_loop(self) -> None:
+        while True:
+            try:
+                await self.reap_expired()
+            except Exception as e:
+                self.logger.warning(f"Reap graph jobs lỗi: {e}")
+            await asyncio.sleep(self.heartbeat_interval)
+
+    def start_reaper(self) -> None:
+        """Chạy reaper nền cho executor "local" (gọi lúc startup; "worker" dùng reaper của app.worker)."""
+        if self.executor == EXECUTOR_LOCAL and self._reaper is None:
+            self._reaper = asyncio.create_task(self._reap_loop())
+
+    async def run_job(self, job: Dict[str, Any], owner: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Chạy graph của job (đã ở trạng thái running) và lưu kết quả.
+
+        Args:
+            job: Job document (gồm graph, thread_id, input, attempts)
+            owner: Process giữ lease; kết quả chỉ được ghi khi lease vẫn thuộc owner.
+                Với executor "worker", cancel => trả job về pending cho worker khác
+
+        Returns:
+            Fields cuối cùng đã lưu, None nếu lease đã mất
+        """
+        job_id = job["_id"]
+        job_input = job.get("input") or {}
+        try:
+            graph = get_graph_factory(job["graph"])()
+            kwargs = {"thread_id": job.get("thread_id")}
+            if job_input.get("resume_value") is not None:
+                kwargs["resume_value"] = job_input["resume_value"]
+            result_state = await graph.invoke(dict(job_input.get("state") or {}), **kwargs)
+            final = {
+                "status": JOB_COMPLETED,
+                "result": {key: result_state[key] for key in RESULT_FIELDS if key in result_state},
+                "error": None,
+            }
+        except asyncio.CancelledError:
+            if owner is not None and self.executor == EXECUTOR_WORKER:
+                # Worker dừng: trả job về hàng đợi, lần chạy dở không tính vào attempts
+                await self.job_store.save(job_id, {
+                    "status": JOB_PENDING,
+                    "available_at": _now(),
+                    "attempts": max(job.get("attempts", 1) - 1, 0),
+                    "lease_owner": None,
+                    "lease_expires_at": None,
+                }, owner=owner)
+                raise
+            final = {"status": JOB_CANCELLED, "error": "cancelled"}
+            await self._finish(job, final, owner)
+            raise
+        except Exception as e:
+            self._handle_error(e, context={"job_id": job_id})
+            final = {"status": JOB_FAILED, "error": str(e) or type(e).__name__}
+        if not await self._finish(job, final, owner):
+            return None
+        return final
+
+    async def _finish(self, job: Dict[str, Any], final: Dict[str, Any], owner: Optional[str] = None) -> bool:
+        final["finished_at"] = _now()
+        if owner is not None:
+            final["lease_expires_at"] = None
+        if not await self.job_store.save(job["_id"], final, owner=owner):
+            self.logger.warning(f"Graph job {job['_id']}: lease đã mất, bỏ qua kết quả")
+            return False
+        self.logger.info(f"Graph job {job['_id']} {final['status']}")
+        if self.callback_url:
+            callback = await self._notify(job, final)
+            await self.job_store.save(job["_id"], {"callback": callback})
+        return True
+
+    async def _notify(self, job: Dict[str, Any], final: Dict[str, Any]) -> Dict[str, Any]:
+        """POST kết quả tới callback_url; trả về outcome để lưu vào job."""
+        settings = _get_settings()
+        payload = {
+            "job_id": job["_id"],
+            "graph": job["graph"],
+            "thread_id": job.get("thread_id"),
+            "status": final["status"],
+            "result": final.get("result"),
+            "error": final.get("error"),
+        }
+        body = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+        headers = {"Content-Type": "application/json"}
+        if settings.api_secret_key:
+            signature = hmac.new(settings.api_secret_key.encode("utf-8"), body, hashlib.sha256).hexdigest()
+            headers["X-Job-Signature"] = f"sha256={signature}"
+        try:
+            async with httpx.AsyncClient(timeout=settings.graph_job_callback_timeout) as client:
+                response = await client.post(self.callback_url, content=body, headers=headers)
+            return {"status_code": response.status_code, "at": _now()}
+        except httpx.HTTPError as e:
+            self.logger.warning(f"Callback của graph job {job['_id']} lỗi: {e}")
+            return {"error": str(e) or type(e).__name__, "at": _now()}
+
+    async def cancel_all(self) -> None:
+        """Hủy các jobs đang chạy trong process và reaper (gọi khi shutdown)."""
+        if self._reaper is not None:
+            self._reaper.cancel()
+            self._reaper = None
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+_service: Optional[GraphJobService] = None
+
+
+def get_graph_job_service() -> GraphJobService:
+    """GraphJobService dùng chung của process."""
+    global _service
+    if _service is None:
+        _service = GraphJobService()
+    return _service
+
+
+async def cancel_graph_jobs() -> None:
+    """Hủy graph jobs đang chạy nền (shutdown); jobs được đánh dấu cancelled."""
+    if _service is not None:
+        await _service.cancel_all()
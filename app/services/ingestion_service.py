@@ -0,0 +1,579 @@
+"""
+Ingestion Service - Nạp corpus vào hệ thống theo pipeline streaming.
+
+Pipeline (asyncio queues có giới hạn => memory ổn định với corpus lớn):
+    read + chunk (thread) -> embed (N workers đồng thời) -> bulk write
+
+- Source được đọc tuần tự theo batch trong thread, mỗi document có số thứ tự
+  seq. Documents được chia chunk (kích thước/overlap cấu hình được).
+- Chunks được gom thành batch; tối đa `max_concurrency` lời gọi embed cùng lúc.
+- Mỗi batch vectors được ghi bằng một bulk_write (upsert theo chunk _id nên
+  ghi lại khi resume là idempotent).
+- Checkpoint: seq lớn nhất mà mọi document <= seq đã ghi xong được lưu vào
+  collection jobs sau mỗi lần ghi; chạy lại cùng job_id sẽ bỏ qua phần đã xong.
+- Thống kê documents/giây theo từng stage (read / embed / write); một
+  document nhiều chunks được tính theo tỉ lệ chunks đã qua stage.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from pymongo import UpdateOne
+
+from .base_service import BaseService
+
+logger = logging.getLogger(__name__)
+
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+
+STAGES = ("read", "embed", "write")
+
+# Số documents đọc mỗi lần từ source (trong thread)
+_READ_BATCH = 64
+
+
+def _get_settings():
+    from app.core.config import settings
+    return settings
+
+
+# ==================== Chunking ====================
+
+def chunk_text(text: str, chunk_size: int, chunk_overlap: int) -> List[str]:
+    """
+    Chia text thành các chunk có overlap, ưu tiên cắt tại newline/khoảng trắng.
+
+    Args:
+        text: Nội dung
+        chunk_size: Số ký tự tối đa mỗi chunk
+        chunk_overlap: Số ký tự lặp lại giữa hai chunk liên tiếp
+
+    Returns:
+        List chunks (rỗng nếu text chỉ có khoảng trắng)
+    """
+    if chunk_overlap >= chunk_size:
+        raise ValueError("chunk_overlap phải nhỏ hơn chunk_size")
+    text = text.strip()
+    if not text:
+        return []
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(start + chunk_size, len(text))
+        if end < len(text):
+            # Lùi về ranh giới gần nhất trong nửa sau của chunk
+            boundary = max(text.rfind("\n", start + chunk_size // 2, end),
+                           text.rfind(" ", start + chunk_size // 2, end))
+            if boundary > start:
+                end = boundary
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
+        if end >= len(text):
+            break
+        start = max(end - chunk_overlap, start + 1)
+    return chunks
+
+
+# ==================== Sources ====================
+
+def iter_jsonl_documents(path: str) -> Iterator[Document]:
+    """
+    Stream documents từ file JSONL.
+
+    Mỗi dòng: {"text" | "page_content": ..., "id": optional, "metadata": optional}.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            metadata = dict(record.get("metadata") or {})
+            metadata.setdefault("source", path)
+            metadata.setdefault("id", record.get("id", f"{os.path.basename(path)}:{line_number}"))
+            yield Document(
+                page_content=record.get("text") or record.get("page_content") or "",
+                metadata=metadata,
+            )
+
+
+def iter_text_files(directory: str, suffixes: Sequence[str] = (".txt", ".md")) -> Iterator[Document]:
+    """
+    Stream mỗi file text trong thư mục (đệ quy, thứ tự ổn định) thành một document.
+
+    Symlinks trỏ ra ngoài thư mục bị bỏ qua (os.walk liệt kê symlink tới file
+    và open() đi theo nó), nên kiểm tra source ở API vẫn đúng khi source là thư mục.
+    """
+    real_root = os.path.realpath(directory)
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for name in sorted(files):
+            if not name.endswith(tuple(suffixes)):
+                continue
+            path = os.path.join(root, name)
+            if os.path.commonpath([os.path.realpath(path), real_root]) != real_root:
+                logger.warning(f"Bỏ qua {path}: symlink ra ngoài {directory}")
+                continue
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                content = f.read()
+            yield Document(page_content=content, metadata={"source": path, "id": path})
+
+
+def iter_single_file(path: str) -> Iterator[Document]:
+    """Toàn bộ một file text là một document."""
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        yield Document(page_content=f.read(), metadata={"source": path, "id": path})
+
+
+def open_source(path: str) -> Iterator[Document]:
+    """
+    Chọn reader theo path: thư mục -> text files, .jsonl -> JSONL, còn lại -> một document.
+
+    Args:
+        path: Đường dẫn file hoặc thư mục
+
+    Returns:
+        Iterator các Documents theo thứ tự ổn định (cần cho resume)
+    """
+    if os.path.isdir(path):
+        return iter_text_files(path)
+    if path.endswith(".jsonl"):
+        return iter_jsonl_documents(path)
+    return iter_single_file(path)
+
+
+# ==================== Stores ====================
+
+class MongoChunkStore:
+    """Ghi chunks + vectors (bytes float32) vào MongoDB bằng bulk_write."""
+
+    def __init__(self, database=None, collection_name: Optional[str] = None):
+        self._database = database
+        self.collection_name = collection_name or _get_settings().ingest_chunks_collection
+
+    @property
+    def collection(self):
+        if self._database is not None:
+            return self._database[self.collection_name]
+        from app.core.database import get_database
+        return get_database()[self.collection_name]
+
+    async def write(self, chunks: List[Dict[str, Any]], vectors: np.ndarray) -> None:
+        now = datetime.now(timezone.utc)
+        operations = [
+            UpdateOne(
+                {"_id": chunk["_id"]},
+                {"$set": {
+                    "doc_id": chunk["doc_id"],
+                    "chunk_index": chunk["chunk_index"],
+                    "text": chunk["text"],
+                    "metadata": chunk["metadata"],
+                    "vector": vector.astype(np.float32).tobytes(),
+                    "updated_at": now,
+                }},
+                upsert=True,
+            )
+            for chunk, vector in zip(chunks, vectors)
+        ]
+        await self.collection.bulk_write(operations, ordered=False)
+
+
+class RetrieverChunkStore:
+    """Ghi chunks vào retriever in-process (DataRetriever / HybridRetriever)."""
+
+    def __init__(self, retriever):
+        self.retriever = retriever
+
+    async def write(self, chunks: List[Dict[str, Any]], vectors: np.ndarray) -> None:
+        documents = [
+            Document(page_content=chunk["text"], metadata={**chunk["metadata"], "chunk_index": chunk["chunk_index"]})
+            for chunk in chunks
+        ]
+        self.retriever.add_vectors(vectors, documents)
+
+
+class MongoIngestJobStore:
+    """Lưu trạng thái + checkpoint của ingestion jobs."""
+
+    def __init__(self, database=None, collection_name: Optional[str] = None):
+        self._database = database
+        self.collection_name = collection_name or _get_settings().ingest_jobs_collection
+
+    @property
+    def collection(self):
+        if self._database is not None:
+            return self._database[self.collection_name]
+        from app.core.database import get_database
+        return get_database()[self.collection_name]
+
+    async def load(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await self.collection.find_one({"_id": job_id})
+
+    async def save(self, job_id: str, fields: Dict[str, Any]) -> None:
+        fields = {**fields, "updated_at": datetime.now(timezone.utc)}
+        await self.collection.update_one({"_id": job_id}, {"$set": fields}, upsert=True)
+
+
+# ==================== Progress tracking ====================
+
+class IngestionStats:
+    """Counters theo stage; documents tính theo tỉ lệ chunks (1/n mỗi chunk)."""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.docs = {stage: 0.0 for stage in STAGES}
+        self.chunks = {stage: 0 for stage in STAGES}
+        self.skipped_docs = 0
+
+    def add(self, stage: str, chunks: Sequence[Dict[str, Any]]) -> None:
+        self.chunks[stage] += len(chunks)
+        self.docs[stage] += sum(chunk["doc_weight"] for chunk in chunks)
+
+    def add_docs(self, stage: str, docs: float) -> None:
+        self.docs[stage] += docs
+
+    def snapshot(self) -> Dict[str, Any]:
+        elapsed = max(time.perf_counter() - self.started_at, 1e-9)
+        return {
+            "elapsed_seconds": round(elapsed, 3),
+            "skipped_docs": self.skipped_docs,
+            "stages": {
+                stage: {
+                    "docs": round(self.docs[stage], 2),
+                    "chunks": self.chunks[stage],
+                    "docs_per_sec": round(self.docs[stage] / elapsed, 2),
+                }
+                for stage in STAGES
+            },
+        }
+
+    def format(self) -> str:
+        snapshot = self.snapshot()
+        parts = [
+            f"{stage}: {values['docs']:.0f} docs ({values['docs_per_sec']:.1f} docs/s, {values['chunks']} chunks)"
+            for stage, values in snapshot["stages"].items()
+        ]
+        return f"[{snapshot['elapsed_seconds']:.1f}s] " + " | ".join(parts)
+
+
+class _Watermark:
+    """Seq lớn nhất mà mọi document <= seq đã ghi xong (chunks về không theo thứ tự)."""
+
+    def __init__(self, start: int):
+        self.value = start
+        self._remaining: Dict[int, int] = {}
+        self._done: set = set()
+
+    def register(self, seq: int, chunk_count: int) -> None:
+        if chunk_count == 0:
+            self._mark_done(seq)
+        else:
+            self._remaining[seq] = chunk_count
+
+    def complete(self, seqs: Sequence[int]) -> None:
+        for seq in seqs:
+            self._remaining[seq] -= 1
+            if self._remaining[seq] == 0:
+                del self._remaining[seq]
+                self._mark_done(seq)
+
+    def _mark_done(self, seq: int) -> None:
+        self._done.add(seq)
+        while self.value + 1 in self._done:
+            self.value += 1
+            self._done.discard(self.value)
+
+
+# ==================== Service ====================
+
+class IngestionService(BaseService):
+    """
+    Streaming ingestion: read -> chunk -> embed (bounded concurrency) -> bulk write.
+    """
+
+    def __init__(
+        self,
+        embeddings: Optional[Embeddings] = None,
+        chunk_store=None,
+        job_store=None,
+        chunk_size: Optional[int] = None,
+        chunk_overlap: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        max_concurrency: Optional[int] = None,
+        queue_size: Optional[int] = None,
+        progress_interval: Optional[float] = None,
+    ):
+        """
+        Initialize ingestion service.
+
+        Args:
+            embeddings: Embeddings model (defaults to shared CachedEmbeddings)
+            chunk_store: Nơi ghi chunks (defaults to MongoChunkStore)
+            job_store: Nơi lưu checkpoint (defaults to MongoIngestJobStore)
+            chunk_size: Ký tự mỗi chunk (defaults to settings.ingest_chunk_size)
+            chunk_overlap: Overlap giữa chunks (defaults to settings.ingest_chunk_overlap)
+            batch_size: Số chunks mỗi lời gọi embed (defaults to settings.ingest_batch_size)
+            max_concurrency: Số lời gọi embed đồng thời (defaults to settings.ingest_max_concurrency)
+            queue_size: Số batches tối đa chờ giữa các stage (defaults to settings.ingest_queue_size)
+            progress_interval: Chu kỳ log tiến độ, giây (defaults to settings.ingest_progress_interval)
+        """
+        super().__init__()
+        settings = _get_settings()
+        if embeddings is None:
+            from app.utils.embedding_cache import get_cached_embeddings
+            embeddings = get_cached_embeddings()
+        self.embeddings = embeddings
+        self.chunk_store = chunk_store if chunk_store is not None else MongoChunkStore()
+        self.job_store = job_store if job_store is not None else MongoIngestJobStore()
+        self.chunk_size = chunk_size or settings.ingest_chunk_size
+        self.chunk_overlap = chunk_overlap if chunk_overlap is not None else settings.ingest_chunk_overlap
+        self.batch_size = batch_size or settings.ingest_batch_size
+        self.max_concurrency = max_concurrency or settings.ingest_max_concurrency
+        self.queue_size = queue_size or settings.ingest_queue_size
+        self.progress_interval = progress_interval or settings.ingest_progress_interval
+        if self.chunk_overlap >= self.chunk_size:
+            raise ValueError("chunk_overlap phải nhỏ hơn chunk_size")
+
+    async def run(
+        self,
+        source: str,
+        job_id: Optional[str] = None,
+        documents: Optional[Callable[[], Iterator[Document]]] = None,
+        on_progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Chạy (hoặc resume) một ingestion job.
+
+        Args:
+            source: Đường dẫn file/thư mục nguồn (xem open_source)
+            job_id: ID của job; job đã có checkpoint sẽ resume (None = tạo mới)
+            documents: Factory trả về iterator documents thay cho open_source(source)
+            on_progress: Callback nhận snapshot tiến độ sau mỗi lần ghi
+
+        Returns:
+            Job summary: job_id, status, last_seq, stats
+        """
+        job_id = job_id or str(uuid.uuid4())
+        existing = await self.job_store.load(job_id)
+        if existing and existing.get("source") not in (None, source):
+            raise ValueError(f"Job {job_id} đã dùng source khác: {existing.get('source')}")
+        resume_seq = existing.get("last_seq", -1) if existing else -1
+        if existing and existing.get("status") == JOB_COMPLETED:
+            return {"job_id": job_id, "status": JOB_COMPLETED, "last_seq": resume_seq, "stats": existing.get("stats")}
+
+        stats = IngestionStats()
+        watermark = _Watermark(resume_seq)
+        await self.job_store.save(job_id, {
+            "source": source,
+            "status": JOB_RUNNING,
+            "last_seq": resume_seq,
+            "chunk_size": self.chunk_size,
+            "chunk_overlap": self.chunk_overlap,
+        })
+        if resume_seq >= 0:
+            self.logger.info(f"Resume ingestion job {job_id} sau document seq {resume_seq}")
+
+        iterator = documents() if documents is not None else open_source(source)
+        embed_queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        write_queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+
+        embedders = [
+            asyncio.create_task(self._embed_worker(embed_queue, write_queue, stats))
+            for _ in range(self.max_concurrency)
+        ]
+
+        async def close_writer():
+            await asyncio.gather(*embedders)
+            await write_queue.put(None)
+
+        tasks = [
+            asyncio.create_task(self._read(iterator, resume_seq, embed_queue, watermark, stats)),
+            *embedders,
+            asyncio.create_task(close_writer()),
+            asyncio.create_task(self._write(job_id, write_queue, watermark, stats, on_progress)),
+        ]
+        reporter = asyncio.create_task(self._report(job_id, stats))
+        try:
+            # Stage nào lỗi thì dừng cả pipeline (tránh stage khác chờ queue mãi)
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:
+                if not task.cancelled() and task.exception() is not None:
+                    raise task.exception()
+        except BaseException as e:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            status = JOB_FAILED if isinstance(e, Exception) else JOB_PENDING
+            await self.job_store.save(job_id, {
+                "status": status,
+                "last_seq": watermark.value,
+                "error": str(e) or type(e).__name__,
+                "stats": stats.snapshot(),
+            })
+            raise
+        finally:
+            reporter.cancel()
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                try:
+                    close()
+                except Exception as e:
+                    # Không che lỗi/CancelledError gốc của pipeline
+                    self.logger.warning(f"Không đóng được source iterator của job {job_id}: {e}")
+
+        summary = {
+            "job_id": job_id,
+            "status": JOB_COMPLETED,
+            "last_seq": watermark.value,
+            "stats": stats.snapshot(),
+        }
+        await self.job_store.save(job_id, {k: v for k, v in summary.items() if k != "job_id"})
+        self.logger.info(f"Ingestion job {job_id} completed: {stats.format()}")
+        return summary
+
+    # ==================== Stages ====================
+
+    def _read_batch(self, iterator: Iterator[Document], next_seq: int, resume_seq: int):
+        """Đọc + chunk tối đa _READ_BATCH documents (chạy trong thread)."""
+        items: List[Tuple[int, Document, List[str]]] = []
+        skipped = 0
+        for document in iterator:
+            seq = next_seq
+            next_seq += 1
+            if seq <= resume_seq:
+                skipped += 1
+                continue
+            items.append((seq, document, chunk_text(document.page_content, self.chunk_size, self.chunk_overlap)))
+            if len(items) >= _READ_BATCH:
+                break
+        else:
+            return items, next_seq, skipped, True
+        return items, next_seq, skipped, False
+
+    async def _read(self, iterator, resume_seq: int, embed_queue, watermark: _Watermark, stats: IngestionStats):
+        next_seq = 0
+        batch: List[Dict[str, Any]] = []
+        finished = False
+        while not finished:
+            reading = asyncio.ensure_future(asyncio.to_thread(self._read_batch, iterator, next_seq, resume_seq))
+            try:
+                items, next_seq, skipped, finished = await asyncio.shield(reading)
+            except asyncio.CancelledError:
+                # Thread vẫn đang ở trong generator: chờ nó ra để run() close() được iterator
+                await asyncio.gather(reading, return_exceptions=True)
+                raise
+            stats.skipped_docs += skipped
+            for seq, document, chunks in items:
+                watermark.register(seq, len(chunks))
+                stats.add_docs("read", 1.0)
+                if not chunks:
+                    # Document rỗng: coi như đã qua mọi stage
+                    stats.add_docs("embed", 1.0)
+                    stats.add_docs("write", 1.0)
+                doc_id = str(document.metadata.get("id", seq))
+                for index, text in enumerate(chunks):
+                    batch.append({
+                        "_id": f"{doc_id}:{index}",
+                        "doc_id": doc_id,
+                        "seq": seq,
+                        "chunk_index": index,
+                        "text": text,
+                        "metadata": document.metadata,
+                        "doc_weight": 1.0 / len(chunks),
+                    })
+                    if len(batch) >= self.batch_size:
+                        await embed_queue.put(batch)
+                        batch = []
+        if batch:
+            await embed_queue.put(batch)
+        for _ in range(self.max_concurrency):
+            await embed_queue.put(None)
+
+    async def _embed_worker(self, embed_queue, write_queue, stats: IngestionStats):
+        while True:
+            batch = await embed_queue.get()
+            if batch is None:
+                return
+            vectors = await self.embeddings.aembed_documents([chunk["text"] for chunk in batch])
+            stats.add("embed", batch)
+            await write_queue.put((batch, np.asarray(vectors, dtype=np.float32)))
+
+    async def _write(self, job_id: str, write_queue, watermark: _Watermark, stats: IngestionStats, on_progress):
+        while True:
+            item = await write_queue.get()
+            if item is None:
+                return
+            batch, vectors = item
+            await self.chunk_store.write(batch, vectors)
+            stats.add("write", batch)
+            previous = watermark.value
+            watermark.complete([chunk["seq"] for chunk in batch])
+            if watermark.value != previous:
+                await self.job_store.save(job_id, {"last_seq": watermark.value, "stats": stats.snapshot()})
+            if on_progress is not None:
+                on_progress(stats.snapshot())
+
+    async def _report(self, job_id: str, stats: IngestionStats):
+        while True:
+            await asyncio.sleep(self.progress_interval)
+            self.logger.info(f"Ingestion job {job_id}: {stats.format()}")
+
+
+# ==================== Background jobs (API) ====================
+
+_running_jobs: Dict[str, asyncio.Task] = {}
+
+
+def start_ingestion_job(source: str, job_id: Optional[str] = None, **service_kwargs: Any) -> str:
+    """
+    Chạy ingestion job dưới dạng background task trong event loop hiện tại.
+
+    Args:
+        source: Đường dẫn nguồn
+        job_id: ID job (None = tạo mới; job đang chạy với cùng ID sẽ bị từ chối)
+        **service_kwargs: Truyền vào IngestionService
+
+    Returns:
+        job_id
+    """
+    job_id = job_id or str(uuid.uuid4())
+    running = _running_jobs.get(job_id)
+    if running is not None and not running.done():
+        raise ValueError(f"Job {job_id} đang chạy")
+    service = IngestionService(**service_kwargs)
+    task = asyncio.create_task(service.run(source, job_id=job_id))
+    _running_jobs[job_id] = task
+
+    def _done(finished: asyncio.Task) -> None:
+        _running_jobs.pop(job_id, None)
+        if not finished.cancelled() and finished.exception() is not None:
+            logger.error(f"Ingestion job {job_id} failed: {finished.exception()}")
+
+    task.add_done_callback(_done)
+    return job_id
+
+
+def is_job_running(job_id: str) -> bool:
+    """True nếu job đang chạy trong process này."""
+    task = _running_jobs.get(job_id)
+    return task is not None and not task.done()
+
+
+async def cancel_running_jobs() -> None:
+    """Dừng các jobs đang chạy (gọi khi shutdown); checkpoint đã lưu giữ nguyên để resume."""
+    tasks = list(_running_jobs.values())
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
@@ -1,12 +1,13 @@
 """
 Tools module - LangChain tools cho agent.
 """
-from .file_tools import write_file_tool
+from .file_tools import write_file_tool, awrite_file
 from .sql_tools import execute_sql_tool
 from .data_tools import read_data_tool
 
 __all__ = [
     "write_file_tool",
+    "awrite_file",
     "execute_sql_tool",
     "read_data_tool",
 ]
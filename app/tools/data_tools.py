@@ -4,24 +4,72 @@ Data Tools - Tools để đọc dữ liệu.
 from typing import Optional
 from langchain_core.tools import tool
 
+from app.utils.file_reader import read_file_range
+
 
 @tool
-def read_data_tool(file_path: str) -> str:
+def read_data_tool(
+    file_path: str,
+    start_line: Optional[int] = None,
+    end_line: Optional[int] = None,
+    head: Optional[int] = None,
+    tail: Optional[int] = None,
+    byte_start: Optional[int] = None,
+    byte_end: Optional[int] = None,
+    max_bytes: Optional[int] = None,
+) -> str:
     """
-    Đọc nội dung file.
-    
+    Đọc nội dung file (memory-mapped, chỉ đọc phần cần thiết).
+
+    Chỉ dùng một kiểu chọn: line range, head, tail hoặc byte range.
+    Không chỉ định gì thì đọc từ đầu file, giới hạn bởi max_bytes.
+
     Args:
         file_path: Đường dẫn file cần đọc
-        
+        start_line: Dòng bắt đầu (1-based, inclusive)
+        end_line: Dòng kết thúc (1-based, inclusive)
+        head: Đọc N dòng đầu
+        tail: Đọc N dòng cuối
+        byte_start: Byte bắt đầu (0-based, inclusive)
+        byte_end: Byte kết thúc (exclusive)
+        max_bytes: Số bytes tối đa trả về (mặc định theo cấu hình)
+
     Returns:
         Nội dung file hoặc thông báo lỗi
     """
     try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            content = f.read()
-        return f"Nội dung file {file_path}:\n\n{content}"
+        content, info = read_file_range(
+            file_path,
+            byte_start=byte_start,
+            byte_end=byte_end,
+            start_line=start_line,
+            end_line=end_line,
+            head=head,
+            tail=tail,
+            max_bytes=max_bytes,
+        )
     except FileNotFoundError:
         return f"File không tồn tại: {file_path}"
     except Exception as e:
         return f"Lỗi khi đọc file {file_path}: {str(e)}"
 
+    if "total_lines" in info:
+        header = (
+            f"Nội dung file {file_path} (dòng {info['start_line']}-{info['end_line']}"
+            f" / {info['total_lines']} dòng):"
+        )
+    elif info["byte_start"] > 0 or info["byte_end"] < info["file_size"]:
+        header = (
+            f"Nội dung file {file_path} (bytes {info['byte_start']}-{info['byte_end']}"
+            f" / {info['file_size']} bytes):"
+        )
+    else:
+        header = f"Nội dung file {file_path}:"
+
+    result = f"{header}\n\n{content}"
+    if info["truncated"]:
+        result += (
+            f"\n\n[... đã cắt bớt tại byte {info['byte_end']} / {info['file_size']} bytes;"
+            f" dùng start_line/end_line hoặc byte_start/byte_end để đọc tiếp]"
+        )
+    return result
@@ -1,35 +1,146 @@
 """
 File Tools - Tools để thao tác với files.
+
+Ghi file không block event loop:
+- awrite_file / ainvoke chạy trên thread pool riêng cho file I/O.
+- Nội dung được ghi vào file tạm cùng thư mục theo từng chunk, fsync rồi
+  os.replace vào đúng vị trí => reader không bao giờ thấy file ghi dở.
+
+Lưu ý: tool.ainvoke của LangChain gọi str(tool_input) trên event loop để log
+callbacks, với nội dung lớn việc này tự nó đã block loop. Code trong app (ví dụ
+SimpleGraph) nên gọi thẳng awrite_file; write_file_tool giữ cho agent/tool calling.
 """
+import asyncio
+import os
+import secrets
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 from typing import Optional
-from langchain_core.tools import tool
+
+from langchain_core.tools import StructuredTool
+
+from app.core.config import settings
+from app.core.tracing import KIND_TOOL, traced
+
+# Thread pool riêng cho file I/O (tạo lazily, đóng lúc shutdown)
+_file_executor: Optional[ThreadPoolExecutor] = None
+
+
+def get_file_executor() -> ThreadPoolExecutor:
+    """Get thread pool dùng cho file I/O."""
+    global _file_executor
+    if _file_executor is None:
+        _file_executor = ThreadPoolExecutor(
+            max_workers=settings.file_write_max_workers,
+            thread_name_prefix="file-io",
+        )
+    return _file_executor
+
+
+def shutdown_file_executor() -> None:
+    """Đóng thread pool file I/O (gọi khi shutdown app)."""
+    global _file_executor
+    if _file_executor is not None:
+        _file_executor.shutdown(wait=True)
+        _file_executor = None
 
 
-@tool
-def write_file_tool(file_path: str, content: str) -> str:
+def atomic_write_text(
+    file_path: str,
+    content: str,
+    chunk_size: Optional[int] = None,
+) -> None:
+    """
+    Ghi text vào file một cách atomic (temp file + fsync + rename).
+
+    Args:
+        file_path: Đường dẫn file đích
+        content: Nội dung cần ghi
+        chunk_size: Số ký tự mỗi lần write (defaults to settings.file_write_chunk_size)
+    """
+    chunk_size = chunk_size or settings.file_write_chunk_size
+    target = Path(file_path)
+    # Tạo thư mục nếu chưa tồn tại
+    target.parent.mkdir(parents=True, exist_ok=True)
+
+    # File tạm phải cùng filesystem với file đích để os.replace là atomic.
+    # Tạo với 0o666 để kernel áp umask (giống open(..., "w")), không đổi umask của process.
+    while True:
+        tmp_path = str(target.parent / f".{target.name}.{secrets.token_hex(4)}.tmp")
+        try:
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+            break
+        except FileExistsError:
+            continue
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            for start in range(0, len(content), chunk_size):
+                f.write(content[start:start + chunk_size])
+            f.flush()
+            os.fsync(f.fileno())
+        # Giữ quyền của file cũ nếu có (file mới giữ 0o666 & ~umask)
+        try:
+            os.chmod(tmp_path, os.stat(target).st_mode & 0o777)
+        except FileNotFoundError:
+            pass
+        os.replace(tmp_path, target)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+    # fsync thư mục để rename bền vững sau crash (POSIX)
+    try:
+        dir_fd = os.open(str(target.parent), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(dir_fd)
+    except OSError:
+        pass
+    finally:
+        os.close(dir_fd)
+
+
+def _write_file(file_path: str, content: str) -> str:
     """
     Ghi nội dung vào file.
-    
+
     Args:
         file_path: Đường dẫn file cần ghi (ví dụ: output.txt, data.json)
         content: Nội dung cần ghi vào file
-        
+
     Returns:
         Thông báo kết quả ghi file
     """
     try:
-        import os
-        from pathlib import Path
-        
-        # Tạo thư mục nếu chưa tồn tại
-        file_path_obj = Path(file_path)
-        file_path_obj.parent.mkdir(parents=True, exist_ok=True)
-        
-        # Ghi file
-        with open(file_path, "w", encoding="utf-8") as f:
-            f.write(content)
-        
+        atomic_write_text(file_path, content)
         return f"File đã được ghi thành công: {file_path}"
     except Exception as e:
         return f"Lỗi khi ghi file {file_path}: {str(e)}"
 
+
+@traced("tool write_file", KIND_TOOL)
+async def awrite_file(file_path: str, content: str) -> str:
+    """
+    Async version của write_file_tool - chạy trên file I/O thread pool.
+
+    Args:
+        file_path: Đường dẫn file cần ghi
+        content: Nội dung cần ghi vào file
+
+    Returns:
+        Thông báo kết quả ghi file
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_file_executor(), _write_file, file_path, content)
+
+
+write_file_tool = StructuredTool.from_function(
+    func=_write_file,
+    coroutine=awrite_file,
+    name="write_file_tool",
+    description=_write_file.__doc__,
+)
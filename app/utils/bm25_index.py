@@ -0,0 +1,227 @@
+"""
+BM25 Index - Lexical index in-process, bổ sung cho vector search.
+
+Vector search hay bỏ sót mã lỗi, tên file, identifiers mà user paste vào
+query; BM25 bắt được các khớp chính xác này.
+
+- Tokenization: Unicode NFC + lowercase, giữ nguyên identifiers có dấu
+  chấm/gạch (main.py, ERR-404, app/utils) và thêm các phần con của chúng.
+  Tiếng Việt: mỗi âm tiết là một token; thêm biến thể bỏ dấu để query gõ
+  không dấu vẫn khớp.
+- Posting lists: mỗi term có hai array.array int32 (doc positions, tf),
+  append khi add; bản NumPy được cache cho scoring và invalidate khi đổi.
+- Delete: tombstone theo position (position không đổi để khớp với vector
+  index); df và avgdl chỉ tính documents còn sống.
+"""
+import math
+import re
+import threading
+import unicodedata
+from array import array
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Identifier/word: chuỗi \w nối bởi . - / : (ví dụ file.py, ERR-404, v1.2.3)
+_TOKEN_PATTERN = re.compile(r"\w+(?:[.\-/:]\w+)*")
+_SUBTOKEN_PATTERN = re.compile(r"\w+")
+
+
+def _get_settings():
+    from app.core.config import settings
+    return settings
+
+
+@lru_cache(maxsize=65536)
+def fold_accents(text: str) -> str:
+    """Bỏ dấu tiếng Việt (đ -> d) để khớp query gõ không dấu."""
+    decomposed = unicodedata.normalize("NFD", text)
+    stripped = "".join(ch for ch in decomposed if unicodedata.category(ch) != "Mn")
+    return stripped.replace("đ", "d").replace("Đ", "D")
+
+
+def tokenize(text: str, fold: bool = True) -> List[str]:
+    """
+    Tokenize text cho BM25.
+
+    Args:
+        text: Nội dung
+        fold: Thêm biến thể bỏ dấu của các token có dấu
+
+    Returns:
+        List tokens (có lặp, dùng để đếm tf)
+    """
+    tokens = _TOKEN_PATTERN.findall(unicodedata.normalize("NFC", text).lower())
+    # Identifier ghép: thêm từng phần (main.py -> main, py)
+    parts = [part for token in tokens if not token.isalnum() for part in _SUBTOKEN_PATTERN.findall(token)]
+    tokens.extend(parts)
+    if fold:
+        # Token ASCII không có dấu => chỉ fold các token còn lại
+        accented = [token for token in tokens if not token.isascii()]
+        tokens.extend(f for token, f in zip(accented, map(fold_accents, accented)) if f != token)
+    return tokens
+
+
+class BM25Index:
+    """
+    BM25 (Okapi) index với add/delete incremental.
+
+    Position = thứ tự document được add (giống VectorIndex/DataRetriever).
+    """
+
+    def __init__(self, k1: Optional[float] = None, b: Optional[float] = None, fold: bool = True):
+        """
+        Initialize BM25 index.
+
+        Args:
+            k1: Term frequency saturation (defaults to settings.bm25_k1)
+            b: Length normalization (defaults to settings.bm25_b)
+            fold: Index thêm biến thể bỏ dấu
+        """
+        settings = _get_settings()
+        self.k1 = k1 if k1 is not None else settings.bm25_k1
+        self.b = b if b is not None else settings.bm25_b
+        self.fold = fold
+        self._terms: Dict[str, int] = {}
+        self._posting_docs: List[array] = []
+        self._posting_tfs: List[array] = []
+        self._frozen: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}
+        self._doc_lengths = array("i")
+        self._deleted = bytearray()
+        self._live_count = 0
+        self._live_length = 0
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        """Số documents còn sống."""
+        return self._live_count
+
+    @property
+    def size(self) -> int:
+        """Tổng số positions (kể cả đã xóa)."""
+        return len(self._doc_lengths)
+
+    def add(self, texts: Iterable[str]) -> np.ndarray:
+        """
+        Index các documents mới.
+
+        Args:
+            texts: Nội dung documents
+
+        Returns:
+            Positions của các documents vừa thêm
+        """
+        with self._lock:
+            start = len(self._doc_lengths)
+            position = start
+            for text in texts:
+                tokens = tokenize(text, self.fold)
+                for token, tf in Counter(tokens).items():
+                    term_id = self._terms.get(token)
+                    if term_id is None:
+                        term_id = len(self._posting_docs)
+                        self._terms[token] = term_id
+                        self._posting_docs.append(array("i"))
+                        self._posting_tfs.append(array("i"))
+                    self._posting_docs[term_id].append(position)
+                    self._posting_tfs[term_id].append(tf)
+                    self._frozen.pop(term_id, None)
+                self._doc_lengths.append(len(tokens))
+                self._deleted.append(0)
+                self._live_count += 1
+                self._live_length += len(tokens)
+                position += 1
+            return np.arange(start, position, dtype=np.int64)
+
+    def delete(self, positions: Iterable[int]) -> int:
+        """
+        Xóa documents (tombstone).
+
+        Args:
+            positions: Positions cần xóa
+
+        Returns:
+            Số documents thực sự bị xóa
+        """
+        removed = 0
+        with self._lock:
+            for position in positions:
+                position = int(position)
+                if 0 <= position < len(self._deleted) and not self._deleted[position]:
+                    self._deleted[position] = 1
+                    self._live_count -= 1
+                    self._live_length -= self._doc_lengths[position]
+                    removed += 1
+        return removed
+
+    def is_deleted(self, position: int) -> bool:
+        """True nếu position đã bị xóa."""
+        return bool(self._deleted[position])
+
+    def deleted_mask(self) -> np.ndarray:
+        """Boolean mask các positions đã xóa."""
+        return np.frombuffer(bytes(self._deleted), dtype=np.uint8).astype(bool)
+
+    def _posting(self, term_id: int) -> Tuple[np.ndarray, np.ndarray]:
+        cached = self._frozen.get(term_id)
+        if cached is None:
+            cached = (
+                np.array(self._posting_docs[term_id], dtype=np.int64),
+                np.array(self._posting_tfs[term_id], dtype=np.float32),
+            )
+            self._frozen[term_id] = cached
+        return cached
+
+    def search(
+        self,
+        query: str,
+        k: int,
+        positions: Optional[Sequence[int]] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Tìm top-k documents theo BM25.
+
+        Args:
+            query: Query text
+            k: Số kết quả
+            positions: Chỉ xét các positions này (ví dụ kết quả MetadataIndex.filter)
+
+        Returns:
+            Tuple (scores, positions) sắp xếp giảm dần, chỉ gồm documents có score > 0
+        """
+        with self._lock:
+            n = len(self._doc_lengths)
+            if self._live_count == 0 or k <= 0:
+                return np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64)
+            deleted = self.deleted_mask()
+            doc_lengths = np.frombuffer(self._doc_lengths, dtype=np.int32).astype(np.float32)
+            avgdl = self._live_length / self._live_count or 1.0
+            norm = self.k1 * (1.0 - self.b + self.b * doc_lengths / avgdl)
+
+            scores = np.zeros(n, dtype=np.float32)
+            for token in set(tokenize(query, self.fold)):
+                term_id = self._terms.get(token)
+                if term_id is None:
+                    continue
+                docs, tfs = self._posting(term_id)
+                live = ~deleted[docs]
+                df = int(live.sum())
+                if df == 0:
+                    continue
+                idf = math.log(1.0 + (self._live_count - df + 0.5) / (df + 0.5))
+                docs, tfs = docs[live], tfs[live]
+                scores[docs] += idf * tfs * (self.k1 + 1.0) / (tfs + norm[docs])
+
+        if positions is not None:
+            allowed = np.zeros(n, dtype=bool)
+            allowed[np.asarray(positions, dtype=np.int64)] = True
+            scores[~allowed] = 0.0
+        candidates = np.flatnonzero(scores > 0)
+        if candidates.size > k:
+            top = np.argpartition(-scores[candidates], k - 1)[:k]
+            candidates = candidates[top]
+        order = np.argsort(-scores[candidates], kind="stable")
+        candidates = candidates[order]
+        return scores[candidates], candidates
@@ -0,0 +1,320 @@
+"""
+Embedding Cache - Cache embeddings theo content hash + tên model.
+
+Hai tầng:
+- LRU in-process (vectors float32) cho các chunk/query lặp lại trong cùng worker.
+- Tầng persistent trên MongoDB (dùng chung giữa các workers): vector lưu dạng
+  bytes float32, _id = sha256(model + text).
+
+Mỗi batch chỉ tốn một round trip cho toàn bộ cache lookups ($in) và một
+bulk_write cho các embeddings mới; texts trùng trong batch chỉ embed một lần.
+"""
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+CACHE_BACKEND_MEMORY = "memory"
+CACHE_BACKEND_MONGO = "mongo"
+
+
+def _get_settings():
+    from app.core.config import settings
+    return settings
+
+
+def embedding_cache_key(model_name: str, text: str) -> str:
+    """
+    Cache key cho một text: sha256 của tên model và nội dung.
+
+    Args:
+        model_name: Tên embedding model
+        text: Nội dung được embed
+
+    Returns:
+        Hex digest
+    """
+    digest = hashlib.sha256(model_name.encode("utf-8"))
+    digest.update(b"\x1f")
+    digest.update(text.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class _LRUVectorCache:
+    """LRU cache key -> vector float32 (thread-safe)."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, np.ndarray]:
+        found = {}
+        with self._lock:
+            for key in keys:
+                vector = self._entries.get(key)
+                if vector is not None:
+                    self._entries.move_to_end(key)
+                    found[key] = vector
+        return found
+
+    def put_many(self, items: Dict[str, np.ndarray]) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            for key, vector in items.items():
+                self._entries[key] = vector
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class MongoEmbeddingStore:
+    """Tầng persistent: collection {_id: key, model, dim, vector: bytes, created_at}."""
+
+    def __init__(self, database=None, collection_name: Optional[str] = None):
+        """
+        Initialize Mongo embedding store.
+
+        Args:
+            database: Motor database (defaults to get_database())
+            collection_name: Tên collection (defaults to settings.embedding_cache_collection)
+        """
+        self._database = database
+        self.collection_name = collection_name or _get_settings().embedding_cache_collection
+
+    @property
+    def collection(self):
+        if self._database is not None:
+            return self._database[self.collection_name]
+        from app.core.database import get_database
+        return get_database()[self.collection_name]
+
+    async def aget_many(self, keys: Sequence[str]) -> Dict[str, np.ndarray]:
+        """Lấy vectors cho nhiều keys trong một query."""
+        if not keys:
+            return {}
+        cursor = self.collection.find({"_id": {"$in": list(keys)}}, {"vector": 1})
+        found = {}
+        async for doc in cursor:
+            found[doc["_id"]] = np.frombuffer(doc["vector"], dtype=np.float32)
+        return found
+
+    async def aput_many(self, items: Dict[str, np.ndarray], model_name: str) -> None:
+        """Ghi nhiều vectors bằng một bulk_write (upsert, không ghi đè)."""
+        if not items:
+            return
+        now = datetime.now(timezone.utc)
+        operations = [
+            UpdateOne(
+                {"_id": key},
+                {"$setOnInsert": {
+                    "model": model_name,
+                    "dim": int(vector.shape[0]),
+                    "vector": vector.astype(np.float32).tobytes(),
+                    "created_at": now,
+                }},
+                upsert=True,
+            )
+            for key, vector in items.items()
+        ]
+        await self.collection.bulk_write(operations, ordered=False)
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper có cache (LRU + persistent store optional).
+
+    Async API dùng cả hai tầng; sync API chỉ dùng LRU (Motor là async driver).
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        model_name: Optional[str] = None,
+        store: Optional[MongoEmbeddingStore] = None,
+        max_entries: Optional[int] = None,
+    ):
+        """
+        Initialize cached embeddings.
+
+        Args:
+            embeddings: Embeddings model thật
+            model_name: Tên model dùng trong cache key (defaults to embeddings.model)
+            store: Tầng persistent (None = chỉ LRU in-process)
+            max_entries: Số vectors tối đa trong LRU (defaults to settings.embedding_cache_max_entries)
+        """
+        settings = _get_settings()
+        self.embeddings = embeddings
+        self.model_name = model_name or getattr(embeddings, "model", None) or type(embeddings).__name__
+        self.store = store
+        self._lru = _LRUVectorCache(
+            max_entries if max_entries is not None else settings.embedding_cache_max_entries
+        )
+        self._stats = {"requests": 0, "memory_hits": 0, "store_hits": 0, "misses": 0, "store_errors": 0}
+        self._stats_lock = threading.Lock()
+
+    # ==================== Stats ====================
+
+    def _record(self, requests: int, memory_hits: int, store_hits: int, misses: int, store_errors: int = 0) -> None:
+        with self._stats_lock:
+            self._stats["requests"] += requests
+            self._stats["memory_hits"] += memory_hits
+            self._stats["store_hits"] += store_hits
+            self._stats["misses"] += misses
+            self._stats["store_errors"] += store_errors
+
+    def get_stats(self) -> Dict[str, float]:
+        """
+        Thống kê cache.
+
+        Returns:
+            Dict gồm requests, memory_hits, store_hits, misses, store_errors, hit_rate, lru_size
+        """
+        with self._stats_lock:
+            stats = dict(self._stats)
+        hits = stats["memory_hits"] + stats["store_hits"]
+        stats["hit_rate"] = hits / stats["requests"] if stats["requests"] else 0.0
+        stats["lru_size"] = len(self._lru)
+        return stats
+
+    def reset_stats(self) -> None:
+        """Reset các counters thống kê."""
+        with self._stats_lock:
+            for key in self._stats:
+                self._stats[key] = 0
+
+    def clear(self) -> None:
+        """Xóa LRU in-process (không đụng tới tầng persistent)."""
+        self._lru.clear()
+
+    # ==================== Embeddings API ====================
+
+    def _keys(self, texts: Sequence[str]) -> List[str]:
+        return [embedding_cache_key(self.model_name, text) for text in texts]
+
+    @staticmethod
+    def _unique_misses(texts: Sequence[str], keys: Sequence[str], found: Dict[str, np.ndarray]):
+        """Texts chưa có trong cache, mỗi key chỉ một lần."""
+        missing: Dict[str, str] = {}
+        for text, key in zip(texts, keys):
+            if key not in found and key not in missing:
+                missing[key] = text
+        return missing
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed documents qua cache: LRU -> store (1 round trip) -> model (1 batch).
+
+        Store chỉ là cache: lookup lỗi coi như miss, ghi lỗi thì bỏ qua (vectors
+        vẫn được trả về và nằm trong LRU); số lần lỗi đếm trong store_errors.
+        """
+        keys = self._keys(texts)
+        unique_keys = list(dict.fromkeys(keys))
+        found = self._lru.get_many(unique_keys)
+        memory_hits = len(found)
+
+        store_hits = store_errors = 0
+        if self.store is not None and len(found) < len(unique_keys):
+            try:
+                from_store = await self.store.aget_many([k for k in unique_keys if k not in found])
+            except Exception as e:
+                logger.warning(f"Embedding cache store lookup failed, treating as misses: {e}")
+                from_store = {}
+                store_errors += 1
+            store_hits = len(from_store)
+            self._lru.put_many(from_store)
+            found.update(from_store)
+
+        missing = self._unique_misses(texts, keys, found)
+        if missing:
+            vectors = await self.embeddings.aembed_documents(list(missing.values()))
+            computed = {
+                key: np.asarray(vector, dtype=np.float32)
+                for key, vector in zip(missing.keys(), vectors)
+            }
+            self._lru.put_many(computed)
+            found.update(computed)
+            if self.store is not None:
+                try:
+                    await self.store.aput_many(computed, self.model_name)
+                except Exception as e:
+                    logger.warning(f"Embedding cache store write failed, skipping: {e}")
+                    store_errors += 1
+
+        self._record(len(unique_keys), memory_hits, store_hits, len(missing), store_errors)
+        logger.debug(
+            f"Embedding cache: {len(unique_keys)} unique texts, {memory_hits} memory hits, "
+            f"{store_hits} store hits, {len(missing)} misses"
+        )
+        return [found[key].tolist() for key in keys]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """Embed query qua cache."""
+        return (await self.aembed_documents([text]))[0]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Sync embed documents (chỉ dùng LRU)."""
+        keys = self._keys(texts)
+        unique_keys = list(dict.fromkeys(keys))
+        found = self._lru.get_many(unique_keys)
+        memory_hits = len(found)
+        missing = self._unique_misses(texts, keys, found)
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            computed = {
+                key: np.asarray(vector, dtype=np.float32)
+                for key, vector in zip(missing.keys(), vectors)
+            }
+            self._lru.put_many(computed)
+            found.update(computed)
+        self._record(len(unique_keys), memory_hits, 0, len(missing))
+        return [found[key].tolist() for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        """Sync embed query (chỉ dùng LRU)."""
+        return self.embed_documents([text])[0]
+
+
+_cached_embeddings: Optional[CachedEmbeddings] = None
+
+
+def get_cached_embeddings() -> CachedEmbeddings:
+    """
+    Get shared CachedEmbeddings quanh create_embeddings() (tạo lazily).
+
+    Tầng persistent theo settings.embedding_cache_backend ("memory" hoặc "mongo").
+    """
+    global _cached_embeddings
+    if _cached_embeddings is None:
+        from app.utils.llm_utils import create_embeddings
+        settings = _get_settings()
+        store = (
+            MongoEmbeddingStore()
+            if settings.embedding_cache_backend.lower() == CACHE_BACKEND_MONGO
+            else None
+        )
+        _cached_embeddings = CachedEmbeddings(
+            create_embeddings(), model_name=settings.openai_embedding_model, store=store
+        )
+    return _cached_embeddings
+
+
+def get_embedding_cache_stats() -> Optional[Dict[str, float]]:
+    """Stats của shared cache (None nếu chưa được dùng)."""
+    return _cached_embeddings.get_stats() if _cached_embeddings is not None else None
@@ -0,0 +1,257 @@
+"""
+File Reader Utilities - Đọc file lớn bằng memory-map, theo byte/line range.
+
+- Không đọc cả file vào memory: dữ liệu được lấy qua mmap theo range cần thiết.
+- Line offsets (vị trí đầu mỗi dòng) được index một lần bằng NumPy và cache
+  theo (mtime_ns, size) của file; file thay đổi thì index tự build lại.
+- iter_file_chunks stream nội dung theo chunk (cắt tại ranh giới dòng) cho
+  các bước xử lý phía sau như summarization.
+"""
+import mmap
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+import numpy as np
+
+# Kích thước block khi scan newline để build index (giới hạn memory tạm)
+_INDEX_SCAN_BLOCK = 64 * 1024 * 1024
+
+
+def _get_settings():
+    from app.core.config import settings
+    return settings
+
+
+class _LineIndexCache:
+    """LRU cache line offsets theo path, validate bằng (mtime_ns, size)."""
+
+    def __init__(self):
+        self._entries: "OrderedDict[str, Tuple[int, int, np.ndarray]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path: str, stat: os.stat_result) -> Optional[np.ndarray]:
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None or entry[0] != stat.st_mtime_ns or entry[1] != stat.st_size:
+                return None
+            self._entries.move_to_end(path)
+            return entry[2]
+
+    def put(self, path: str, stat: os.stat_result, offsets: np.ndarray) -> None:
+        max_entries = _get_settings().read_data_index_cache_size
+        with self._lock:
+            self._entries[path] = (stat.st_mtime_ns, stat.st_size, offsets)
+            self._entries.move_to_end(path)
+            while len(self._entries) > max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_line_index_cache = _LineIndexCache()
+
+
+def _build_line_offsets(mm: mmap.mmap, size: int) -> np.ndarray:
+    """
+    Build mảng byte offset của đầu mỗi dòng (dòng 1 bắt đầu tại 0).
+
+    Scan theo block để memory tạm không vượt quá _INDEX_SCAN_BLOCK.
+    """
+    parts = [np.zeros(1, dtype=np.int64)]
+    buffer = np.frombuffer(mm, dtype=np.uint8)
+    for start in range(0, size, _INDEX_SCAN_BLOCK):
+        block = buffer[start:start + _INDEX_SCAN_BLOCK]
+        newlines = np.flatnonzero(block == 0x0A)
+        if newlines.size:
+            parts.append(newlines.astype(np.int64) + (start + 1))
+    offsets = np.concatenate(parts)
+    # Newline ở cuối file không mở ra dòng mới
+    if offsets.size > 1 and offsets[-1] >= size:
+        offsets = offsets[:-1]
+    return offsets
+
+
+def get_line_offsets(file_path: str, mm: Optional[mmap.mmap] = None) -> np.ndarray:
+    """
+    Lấy line offsets của file (dùng cache nếu file không đổi).
+
+    Args:
+        file_path: Đường dẫn file
+        mm: mmap đã mở sẵn (optional)
+
+    Returns:
+        np.ndarray int64, phần tử i là byte offset đầu dòng i+1
+    """
+    path = os.path.abspath(file_path)
+    stat = os.stat(path)
+    cached = _line_index_cache.get(path, stat)
+    if cached is not None:
+        return cached
+    if stat.st_size == 0:
+        offsets = np.zeros(0, dtype=np.int64)
+    elif mm is not None:
+        offsets = _build_line_offsets(mm, stat.st_size)
+    else:
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+            offsets = _build_line_offsets(m, stat.st_size)
+    _line_index_cache.put(path, stat, offsets)
+    return offsets
+
+
+def clear_line_index_cache() -> None:
+    """Xóa toàn bộ line index cache."""
+    _line_index_cache.clear()
+
+
+def _utf8_boundary(mm: mmap.mmap, pos: int, lower: int) -> int:
+    """Lùi pos về đầu ký tự UTF-8 gần nhất (không cắt giữa multi-byte sequence)."""
+    while pos > lower and pos < len(mm) and (mm[pos] & 0xC0) == 0x80:
+        pos -= 1
+    return pos
+
+
+def _head_end(mm: mmap.mmap, lines: int, size: int) -> int:
+    """Byte offset kết thúc của `lines` dòng đầu (không cần full index)."""
+    pos = 0
+    for _ in range(lines):
+        found = mm.find(b"\n", pos)
+        if found < 0:
+            return size
+        pos = found + 1
+    return pos
+
+
+def _tail_start(mm: mmap.mmap, lines: int, size: int) -> int:
+    """Byte offset bắt đầu của `lines` dòng cuối (scan ngược, không cần full index)."""
+    if lines <= 0:
+        return size
+    # Bỏ qua newline kết thúc file
+    pos = size - 1 if mm[size - 1:size] == b"\n" else size
+    for _ in range(lines):
+        found = mm.rfind(b"\n", 0, pos)
+        if found < 0:
+            return 0
+        pos = found
+    return pos + 1
+
+
+def read_file_range(
+    file_path: str,
+    byte_start: Optional[int] = None,
+    byte_end: Optional[int] = None,
+    start_line: Optional[int] = None,
+    end_line: Optional[int] = None,
+    head: Optional[int] = None,
+    tail: Optional[int] = None,
+    max_bytes: Optional[int] = None,
+) -> Tuple[str, Dict[str, Any]]:
+    """
+    Đọc một phần file qua mmap.
+
+    Chỉ dùng một kiểu selection: byte range, line range, head hoặc tail.
+    Không truyền gì thì đọc từ đầu file (vẫn bị giới hạn bởi max_bytes).
+
+    Args:
+        file_path: Đường dẫn file
+        byte_start: Byte bắt đầu (inclusive, 0-based)
+        byte_end: Byte kết thúc (exclusive)
+        start_line: Dòng bắt đầu (1-based, inclusive)
+        end_line: Dòng kết thúc (1-based, inclusive)
+        head: Số dòng đầu
+        tail: Số dòng cuối
+        max_bytes: Giới hạn số bytes trả về (defaults to settings.read_data_max_bytes)
+
+    Returns:
+        Tuple (text, info) với info gồm file_size, byte_start, byte_end, truncated
+        và total_lines/start_line/end_line khi đọc theo line range (dùng line index)
+
+    Raises:
+        ValueError: Nếu kết hợp nhiều kiểu selection
+    """
+    selections = [
+        byte_start is not None or byte_end is not None,
+        start_line is not None or end_line is not None,
+        head is not None,
+        tail is not None,
+    ]
+    if sum(selections) > 1:
+        raise ValueError("Chỉ được dùng một kiểu selection: byte range, line range, head hoặc tail")
+    if max_bytes is None:
+        max_bytes = _get_settings().read_data_max_bytes
+
+    info: Dict[str, Any] = {}
+    with open(file_path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        info["file_size"] = size
+        if size == 0:
+            info.update({"byte_start": 0, "byte_end": 0, "truncated": False})
+            return "", info
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if start_line is not None or end_line is not None:
+                offsets = get_line_offsets(file_path, mm)
+                total_lines = int(offsets.size)
+                first = max(1, start_line or 1)
+                last = min(total_lines, end_line or total_lines)
+                info.update({"total_lines": total_lines, "start_line": first, "end_line": last})
+                if first > last:
+                    start, end = 0, 0
+                else:
+                    start = int(offsets[first - 1])
+                    end = int(offsets[last]) if last < total_lines else size
+            elif head is not None:
+                start, end = 0, _head_end(mm, max(0, head), size)
+            elif tail is not None:
+                start, end = _tail_start(mm, tail, size), size
+            else:
+                start = min(max(0, byte_start or 0), size)
+                end = size if byte_end is None else min(max(start, byte_end), size)
+
+            truncated = max_bytes is not None and max_bytes > 0 and end - start > max_bytes
+            if truncated:
+                end = _utf8_boundary(mm, start + max_bytes, start)
+            info.update({"byte_start": start, "byte_end": end, "truncated": truncated})
+            text = mm[start:end].decode("utf-8", errors="replace")
+    return text, info
+
+
+def iter_file_chunks(
+    file_path: str,
+    chunk_bytes: Optional[int] = None,
+    byte_start: int = 0,
+    byte_end: Optional[int] = None,
+) -> Iterator[str]:
+    """
+    Stream nội dung file theo chunk, cắt tại newline gần nhất khi có thể.
+
+    Args:
+        file_path: Đường dẫn file
+        chunk_bytes: Kích thước chunk mục tiêu (defaults to settings.read_data_chunk_bytes)
+        byte_start: Byte bắt đầu
+        byte_end: Byte kết thúc (exclusive, None = hết file)
+
+    Yields:
+        Các đoạn text liên tiếp
+    """
+    chunk_bytes = chunk_bytes or _get_settings().read_data_chunk_bytes
+    with open(file_path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return
+        end = size if byte_end is None else min(byte_end, size)
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            pos = max(0, byte_start)
+            while pos < end:
+                stop = min(pos + chunk_bytes, end)
+                if stop < end:
+                    newline = mm.rfind(b"\n", pos, stop)
+                    if newline >= pos:
+                        stop = newline + 1
+                    else:
+                        stop = _utf8_boundary(mm, stop, pos + 1)
+                yield mm[pos:stop].decode("utf-8", errors="replace")
+                pos = stop
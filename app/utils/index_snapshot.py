@@ -0,0 +1,381 @@
+"""
+Index Snapshot - Lưu DataRetriever xuống disk, các workers memory-map read-only.
+
+Mỗi snapshot là một thư mục version bất biến trong root:
+
+    <root>/CURRENT                  # tên version đang dùng (đổi bằng os.replace)
+    <root>/<version>/manifest.json  # format_version, params index, metadata values
+    <root>/<version>/index_*.npy    # VectorIndex.export_arrays (vectors, positions, ...)
+    <root>/<version>/texts.bin      # page_content UTF-8 nối liền + text_offsets.npy
+    <root>/<version>/meta_<i>_*.npy # MappedColumn: codes, order, offsets theo key
+
+Arrays được load bằng np.load(mmap_mode="r") nên mở snapshot gần như tức thì
+và các workers dùng chung page cache của OS thay vì mỗi process một bản copy.
+Version được ghi vào thư mục tạm rồi rename, sau đó CURRENT được thay atomic;
+SnapshotRetrieverHolder phát hiện version mới và swap retriever không cần
+restart. Version cũ bị xóa vẫn đọc được bởi process đang map (POSIX).
+
+Metadata values ngoài JSON (datetime, date, ObjectId) được ghi kèm type tag để
+load lại đúng kiểu (filter theo value vẫn khớp); kiểu khác thì save lỗi.
+
+BM25Index (hybrid retrieval) chưa nằm trong snapshot.
+"""
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from datetime import date, datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+from bson import ObjectId
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from app.utils.metadata_index import MappedColumn, MetadataIndex
+from app.utils.vector_index import VectorIndex
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+_CURRENT = "CURRENT"
+_MANIFEST = "manifest.json"
+_TEXTS = "texts.bin"
+# Key đánh dấu metadata value ngoài JSON trong manifest
+_TYPE_TAG = "__snapshot_type__"
+
+
+def _get_settings():
+    from app.core.config import settings
+    return settings
+
+
+class MappedDocuments:
+    """
+    Documents của snapshot: page_content đọc từ texts.bin (memmap), metadata
+    dựng lại từ MetadataIndex. Documents add sau khi load nằm trong list riêng.
+    """
+
+    def __init__(self, texts: np.ndarray, offsets: np.ndarray, metadata_index: MetadataIndex):
+        self._texts = texts
+        self._offsets = offsets
+        self._base_size = offsets.shape[0] - 1
+        self._metadata_index = metadata_index
+        self._extra: List[Document] = []
+
+    def __len__(self) -> int:
+        return self._base_size + len(self._extra)
+
+    def __getitem__(self, position: int) -> Document:
+        if position < 0:
+            position += len(self)
+        if position >= self._base_size:
+            return self._extra[position - self._base_size]
+        start, end = int(self._offsets[position]), int(self._offsets[position + 1])
+        return Document(
+            page_content=bytes(self._texts[start:end]).decode("utf-8"),
+            metadata=self._metadata_index.metadata_at(position),
+        )
+
+    def __iter__(self) -> Iterator[Document]:
+        for position in range(len(self)):
+            yield self[position]
+
+    def extend(self, documents: Iterable[Document]) -> None:
+        self._extra.extend(documents)
+
+
+def _encode_value(value: Any) -> Dict[str, str]:
+    """json default: giữ kiểu của metadata value ngoài JSON (raise nếu không hỗ trợ)."""
+    if isinstance(value, datetime):
+        return {_TYPE_TAG: "datetime", "value": value.isoformat()}
+    if isinstance(value, date):
+        return {_TYPE_TAG: "date", "value": value.isoformat()}
+    if isinstance(value, ObjectId):
+        return {_TYPE_TAG: "objectid", "value": str(value)}
+    raise TypeError(f"Metadata value kiểu {type(value).__name__} không lưu được vào snapshot")
+
+
+def _decode_value(obj: Dict[str, Any]) -> Any:
+    """json object_hook: ngược lại của _encode_value."""
+    kind = obj.get(_TYPE_TAG)
+    if kind == "datetime":
+        return datetime.fromisoformat(obj["value"])
+    if kind == "date":
+        return date.fromisoformat(obj["value"])
+    if kind == "objectid":
+        return ObjectId(obj["value"])
+    return obj
+
+
+def _new_version() -> str:
+    return datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+
+
+def _save_array(directory: str, name: str, array: np.ndarray) -> str:
+    filename = f"{name}.npy"
+    np.save(os.path.join(directory, filename), np.ascontiguousarray(array))
+    return filename
+
+
+def _load_array(directory: str, filename: str) -> np.ndarray:
+    return np.load(os.path.join(directory, filename), mmap_mode="r")
+
+
+def save_snapshot(retriever, root: str, version: Optional[str] = None, keep: Optional[int] = None) -> str:
+    """
+    Ghi snapshot của DataRetriever và trỏ CURRENT sang version mới.
+
+    Index được compact (build) trước khi ghi. Nên gọi từ process ghi duy nhất
+    (ví dụ sau ingestion), các workers chỉ đọc. Metadata value không phải JSON
+    / datetime / date / ObjectId => TypeError, không có version nào được ghi.
+
+    Args:
+        retriever: DataRetriever (cần có ít nhất một document)
+        root: Thư mục chứa các versions
+        version: Tên version (None = timestamp UTC)
+        keep: Số versions giữ lại (defaults to settings.index_snapshot_keep)
+
+    Returns:
+        Đường dẫn thư mục version
+    """
+    if retriever.index is None:
+        raise ValueError("Retriever chưa có documents để snapshot")
+    version = version or _new_version()
+    os.makedirs(root, exist_ok=True)
+    final_path = os.path.join(root, version)
+    if os.path.exists(final_path):
+        raise ValueError(f"Snapshot version đã tồn tại: {version}")
+    tmp_path = os.path.join(root, f".{version}.tmp-{uuid.uuid4().hex[:8]}")
+    os.makedirs(tmp_path)
+    try:
+        retriever.index.build()
+        params, arrays = retriever.index.export_arrays()
+        manifest: Dict[str, Any] = {
+            "format_version": FORMAT_VERSION,
+            "version": version,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "index": params,
+            "index_arrays": {name: _save_array(tmp_path, f"index_{name}", array) for name, array in arrays.items()},
+            "documents": len(retriever.documents),
+        }
+
+        offsets = np.zeros(len(retriever.documents) + 1, dtype=np.int64)
+        metadatas = []
+        with open(os.path.join(tmp_path, _TEXTS), "wb") as f:
+            for position, doc in enumerate(retriever.documents):
+                encoded = doc.page_content.encode("utf-8")
+                f.write(encoded)
+                offsets[position + 1] = offsets[position] + len(encoded)
+                metadatas.append(doc.metadata or {})
+        manifest["text_offsets"] = _save_array(tmp_path, "text_offsets", offsets)
+
+        keys = list(dict.fromkeys(key for metadata in metadatas for key in metadata))
+        manifest["metadata"] = []
+        for i, key in enumerate(keys):
+            column = MappedColumn.from_metadatas(metadatas, key)
+            manifest["metadata"].append({
+                "key": key,
+                "values": column.values,
+                "codes": _save_array(tmp_path, f"meta_{i}_codes", column.codes),
+                "order": _save_array(tmp_path, f"meta_{i}_order", column.order),
+                "offsets": _save_array(tmp_path, f"meta_{i}_offsets", column.offsets),
+            })
+        non_empty = np.asarray([i for i, metadata in enumerate(metadatas) if metadata], dtype=np.int64)
+        manifest["metadata_non_empty"] = _save_array(tmp_path, "metadata_non_empty", non_empty)
+
+        # Manifest ghi cuối: thư mục thiếu manifest là snapshot dở dang
+        with open(os.path.join(tmp_path, _MANIFEST), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, default=_encode_value)
+        os.rename(tmp_path, final_path)
+    except BaseException:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+
+    _write_current(root, version)
+    prune_snapshots(root, keep)
+    logger.info(f"Saved index snapshot {version}: {len(retriever.documents)} documents")
+    return final_path
+
+
+def _write_current(root: str, version: str) -> None:
+    tmp = os.path.join(root, f".{_CURRENT}.tmp-{uuid.uuid4().hex[:8]}")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(tmp, os.path.join(root, _CURRENT))
+
+
+def current_version(root: str) -> Optional[str]:
+    """Version mà CURRENT đang trỏ tới (None nếu chưa có snapshot)."""
+    try:
+        with open(os.path.join(root, _CURRENT), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def _created_at(path: str) -> float:
+    """Thời điểm tạo snapshot theo manifest (fallback mtime thư mục)."""
+    try:
+        with open(os.path.join(path, _MANIFEST), "r", encoding="utf-8") as f:
+            return datetime.fromisoformat(json.load(f)["created_at"]).timestamp()
+    except (OSError, ValueError, KeyError, TypeError):
+        return os.path.getmtime(path)
+
+
+def prune_snapshots(root: str, keep: Optional[int] = None) -> List[str]:
+    """
+    Xóa các versions cũ, giữ lại `keep` versions mới nhất (luôn giữ CURRENT).
+
+    Versions được xếp theo created_at trong manifest (tên version do caller
+    đặt, ví dụ "v9" < "v10" không đúng theo thứ tự chuỗi).
+
+    Returns:
+        Các versions đã xóa
+    """
+    if keep is None:
+        keep = _get_settings().index_snapshot_keep
+    current = current_version(root)
+    versions = sorted(
+        (
+            name for name in os.listdir(root)
+            if not name.startswith(".") and os.path.isfile(os.path.join(root, name, _MANIFEST))
+        ),
+        key=lambda name: (_created_at(os.path.join(root, name)), name),
+    )
+    removed = []
+    for name in versions[:-keep] if keep > 0 else versions:
+        if name != current:
+            shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+            removed.append(name)
+    return removed
+
+
+def load_snapshot(path: str, embeddings: Optional[Embeddings] = None, **kwargs: Any):
+    """
+    Mở snapshot (memory-mapped, read-only) thành DataRetriever.
+
+    Args:
+        path: Thư mục version
+        embeddings: Embeddings cho query (None = default_embeddings())
+        **kwargs: Truyền vào DataRetriever (top_k, score_threshold)
+
+    Returns:
+        DataRetriever dùng chung vectors/metadata/texts qua page cache
+    """
+    from app.graph.data_retriever import DataRetriever, default_embeddings
+
+    with open(os.path.join(path, _MANIFEST), "r", encoding="utf-8") as f:
+        manifest = json.load(f, object_hook=_decode_value)
+    if manifest.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"Không hỗ trợ snapshot format {manifest.get('format_version')}")
+
+    index = VectorIndex.from_arrays(
+        manifest["index"],
+        {name: _load_array(path, filename) for name, filename in manifest["index_arrays"].items()},
+    )
+    columns = {
+        column["key"]: MappedColumn(
+            column["values"],
+            _load_array(path, column["codes"]),
+            _load_array(path, column["order"]),
+            _load_array(path, column["offsets"]),
+        )
+        for column in manifest["metadata"]
+    }
+    size = manifest["documents"]
+    metadata_index = MetadataIndex.from_columns(size, columns, _load_array(path, manifest["metadata_non_empty"]))
+
+    offsets = _load_array(path, manifest["text_offsets"])
+    texts_path = os.path.join(path, _TEXTS)
+    texts = (
+        np.memmap(texts_path, dtype=np.uint8, mode="r")
+        if os.path.getsize(texts_path) else np.empty(0, dtype=np.uint8)
+    )
+
+    retriever = DataRetriever(embeddings=embeddings or default_embeddings(), index=index, **kwargs)
+    retriever.metadata_index = metadata_index
+    retriever.documents = MappedDocuments(texts, offsets, metadata_index)
+    return retriever
+
+
+class SnapshotRetrieverHolder:
+    """
+    Giữ DataRetriever của snapshot CURRENT, tự swap khi CURRENT đổi.
+
+    Swap là một phép gán reference: request đang chạy tiếp tục dùng retriever
+    cũ (mmap vẫn hợp lệ), request mới nhận retriever mới.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        embeddings: Optional[Embeddings] = None,
+        refresh_interval: Optional[float] = None,
+    ):
+        """
+        Initialize holder.
+
+        Args:
+            root: Thư mục snapshots
+            embeddings: Embeddings cho query (None = default_embeddings())
+            refresh_interval: Chu kỳ kiểm tra CURRENT, giây
+                (defaults to settings.index_snapshot_refresh_interval)
+        """
+        self.root = root
+        self.embeddings = embeddings
+        self.refresh_interval = (
+            refresh_interval if refresh_interval is not None
+            else _get_settings().index_snapshot_refresh_interval
+        )
+        self.version: Optional[str] = None
+        self.retriever = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def refresh(self) -> bool:
+        """
+        Load snapshot CURRENT nếu khác version đang giữ.
+
+        Returns:
+            True nếu đã swap sang version mới
+        """
+        with self._lock:
+            self._checked_at = time.monotonic()
+            version = current_version(self.root)
+            if version is None or version == self.version:
+                return False
+            started = time.perf_counter()
+            retriever = load_snapshot(os.path.join(self.root, version), embeddings=self.embeddings)
+            self.retriever, self.version = retriever, version
+            logger.info(
+                f"Loaded index snapshot {version}: {len(retriever.documents)} documents "
+                f"in {(time.perf_counter() - started) * 1000:.1f} ms"
+            )
+            return True
+
+    def get(self):
+        """Retriever hiện tại (kiểm tra CURRENT tối đa mỗi refresh_interval giây)."""
+        if time.monotonic() - self._checked_at >= self.refresh_interval:
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Không load được index snapshot mới, giữ version {self.version}: {e}")
+        return self.retriever
+
+
+_snapshot_holder: Optional[SnapshotRetrieverHolder] = None
+
+
+def get_snapshot_holder() -> Optional[SnapshotRetrieverHolder]:
+    """Holder dùng chung cho settings.index_snapshot_dir (None nếu chưa cấu hình)."""
+    global _snapshot_holder
+    root = _get_settings().index_snapshot_dir
+    if not root:
+        return None
+    if _snapshot_holder is None:
+        _snapshot_holder = SnapshotRetrieverHolder(root)
+    return _snapshot_holder
@@ -2,9 +2,11 @@
 LLM Utilities - Helper functions cho LLM operations.
 """
 from typing import Optional, Dict, Any, List, TYPE_CHECKING
-from langchain_openai import ChatOpenAI
+from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 from langchain.schema import HumanMessage, AIMessage, SystemMessage, BaseMessage
 
+from app.core.http_client import get_llm_http_client
+
 if TYPE_CHECKING:
     from app.core.config import Settings
 
@@ -36,10 +38,41 @@ def create_llm(
         ChatOpenAI instance
     """
     settings = _get_settings()
+    http_client = get_llm_http_client()
     return ChatOpenAI(
         model_name=model_name or settings.openai_model,
         temperature=temperature or settings.openai_temperature,
         openai_api_key=api_key or settings.get_openai_api_key(),
+        base_url=settings.openai_base_url,
+        http_async_client=http_client,
+        request_timeout=http_client.timeout,
+    )
+
+
+def create_embeddings(
+    model_name: Optional[str] = None,
+    api_key: Optional[str] = None,
+) -> OpenAIEmbeddings:
+    """
+    Create embeddings instance với default settings.
+    
+    Args:
+        model_name: Embedding model name (defaults to settings.openai_embedding_model)
+        api_key: OpenAI API key (defaults to settings.openai_api_key)
+        
+    Returns:
+        OpenAIEmbeddings instance
+    """
+    settings = _get_settings()
+    http_client = get_llm_http_client()
+    return OpenAIEmbeddings(
+        model=model_name or settings.openai_embedding_model,
+        openai_api_key=api_key or settings.get_openai_api_key(),
+        base_url=settings.openai_base_url,
+        http_async_client=http_client,
+        request_timeout=http_client.timeout,
+        # Endpoint tương thích OpenAI: không tokenize input bằng tiktoken (cần tải BPE qua mạng)
+        check_embedding_ctx_length=settings.openai_base_url is None,
     )
 
 
@@ -0,0 +1,315 @@
+"""
+Metadata Index - Column store + inverted index cho metadata của documents.
+
+- Columns: mỗi metadata key là một list giá trị theo position của document,
+  extract_metadata đọc thẳng từ column thay vì duyệt doc.metadata.
+- Posting lists: (key, value) -> mảng int64 positions đã sắp xếp. Filter là
+  phép giao các posting lists (nhỏ nhất trước), trả về positions để vector
+  search chỉ scoring trên tập ứng viên.
+- Base từ snapshot (xem app/utils/index_snapshot.py): mỗi column là mảng codes
+  int32 + positions sắp theo code (memmap read-only, chia sẻ page cache giữa
+  workers); posting list là một slice, giá trị unhashable được tra theo JSON.
+  Documents add sau đó nằm trong phần delta (columns/postings như trên).
+
+Semantics giống filter_docs_by_metadata: so sánh bằng ==, key thiếu tương
+đương value None. Giá trị unhashable (list, dict) không có posting list và
+được filter bằng cách scan column.
+"""
+import json
+import threading
+from typing import Any, Dict, Hashable, Iterable, List, Mapping, Optional, Sequence
+
+import numpy as np
+
+# Marker cho key không có trong metadata của document
+_MISSING = object()
+
+
+def _is_hashable(value: Any) -> bool:
+    try:
+        hash(value)
+    except TypeError:
+        return False
+    return True
+
+
+def value_key(value: Any) -> Hashable:
+    """Key dùng để tra cứu value trong MappedColumn (unhashable -> JSON)."""
+    if _is_hashable(value):
+        return value
+    return ("__json__", json.dumps(value, sort_keys=True, default=str))
+
+
+class MappedColumn:
+    """
+    Column đã factorize: codes[position] là index trong values (-1 = thiếu key).
+
+    order là positions sắp theo code (ổn định => tăng dần trong mỗi code),
+    offsets[c]:offsets[c + 1] là posting list của values[c]; slot cuối
+    (len(values)) chứa các positions thiếu key.
+    """
+
+    def __init__(self, values: Sequence[Any], codes: np.ndarray, order: np.ndarray, offsets: np.ndarray):
+        self.values = list(values)
+        self.codes = codes
+        self.order = order
+        self.offsets = offsets
+        # Build lần đầu filter (column nhiều giá trị khác nhau => tốn thời gian load)
+        self._lookup: Optional[Dict[Hashable, int]] = None
+
+    @classmethod
+    def from_metadatas(cls, metadatas: Sequence[Mapping[str, Any]], key: str) -> "MappedColumn":
+        """
+        Factorize column của key từ metadata dicts (theo thứ tự position).
+
+        Args:
+            metadatas: Metadata của từng document
+            key: Metadata key
+
+        Returns:
+            MappedColumn instance
+        """
+        lookup: Dict[Hashable, int] = {}
+        values: List[Any] = []
+        codes = np.empty(len(metadatas), dtype=np.int32)
+        for position, metadata in enumerate(metadatas):
+            value = metadata.get(key, _MISSING)
+            if value is _MISSING:
+                codes[position] = -1
+                continue
+            lookup_key = value_key(value)
+            code = lookup.get(lookup_key)
+            if code is None:
+                code = lookup[lookup_key] = len(values)
+                values.append(value)
+            codes[position] = code
+        slots = np.where(codes < 0, len(values), codes)
+        order = np.argsort(slots, kind="stable").astype(np.int64)
+        counts = np.bincount(slots, minlength=len(values) + 1)
+        offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        return cls(values, codes, order, offsets)
+
+    def _slot(self, slot: int) -> np.ndarray:
+        return np.asarray(self.order[self.offsets[slot]:self.offsets[slot + 1]])
+
+    def positions(self, value: Any) -> np.ndarray:
+        """Positions có value (None cũng khớp positions thiếu key)."""
+        if self._lookup is None:
+            self._lookup = {value_key(item): code for code, item in enumerate(self.values)}
+        code = self._lookup.get(value_key(value))
+        matched = self._slot(code) if code is not None else np.empty(0, dtype=np.int64)
+        if value is None:
+            matched = np.union1d(matched, self._slot(len(self.values)))
+        return matched
+
+    def value_at(self, position: int, default: Any = _MISSING) -> Any:
+        code = int(self.codes[position])
+        return default if code < 0 else self.values[code]
+
+
+class MetadataIndex:
+    """
+    Inverted index trên metadata, position = thứ tự document được add.
+    """
+
+    def __init__(self):
+        self._size = 0
+        # Base (snapshot): positions [0, _base_size)
+        self._base_size = 0
+        self._base_columns: Dict[str, MappedColumn] = {}
+        self._base_non_empty = np.empty(0, dtype=np.int64)
+        # Delta: column lists được đánh index theo (position - _base_size)
+        self._columns: Dict[str, List[Any]] = {}
+        self._postings: Dict[str, Dict[Hashable, List[int]]] = {}
+        # Cache posting lists dạng np.ndarray, invalidate khi posting thay đổi
+        self._frozen: Dict[tuple, np.ndarray] = {}
+        # Positions của documents có metadata khác rỗng (extract_metadata bỏ qua doc rỗng)
+        self._non_empty: List[int] = []
+        self._lock = threading.RLock()
+
+    @classmethod
+    def from_documents(cls, docs: Iterable[Any]) -> "MetadataIndex":
+        """
+        Build index từ list Documents.
+
+        Args:
+            docs: Documents (có thuộc tính metadata)
+
+        Returns:
+            MetadataIndex instance
+        """
+        index = cls()
+        index.add([doc.metadata for doc in docs])
+        return index
+
+    @classmethod
+    def from_columns(
+        cls, size: int, columns: Mapping[str, MappedColumn], non_empty: np.ndarray
+    ) -> "MetadataIndex":
+        """
+        Tạo index với base là các MappedColumn (từ snapshot).
+
+        Args:
+            size: Số documents của base
+            columns: MappedColumn theo key
+            non_empty: Positions có metadata khác rỗng
+
+        Returns:
+            MetadataIndex instance
+        """
+        index = cls()
+        index._size = index._base_size = size
+        index._base_columns = dict(columns)
+        index._base_non_empty = non_empty
+        return index
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def keys(self) -> List[str]:
+        """Các metadata keys đã thấy."""
+        return list(dict.fromkeys([*self._base_columns, *self._columns]))
+
+    def add(self, metadatas: Iterable[Optional[Mapping[str, Any]]]) -> None:
+        """
+        Thêm metadata của các documents mới (theo thứ tự position).
+
+        Args:
+            metadatas: Metadata dict của từng document
+        """
+        with self._lock:
+            for metadata in metadatas:
+                metadata = metadata or {}
+                position = self._size
+                delta_position = position - self._base_size
+                if metadata:
+                    self._non_empty.append(position)
+                for key in metadata:
+                    if key not in self._columns:
+                        # Key mới: các documents trước đó (trong delta) coi như thiếu key
+                        self._columns[key] = [_MISSING] * delta_position
+                        self._postings[key] = (
+                            {None: list(range(self._base_size, position))} if delta_position else {}
+                        )
+                        self._frozen.pop((key, None), None)
+                for key, column in self._columns.items():
+                    value = metadata.get(key, _MISSING)
+                    column.append(value)
+                    posting_value = None if value is _MISSING else value
+                    if _is_hashable(posting_value):
+                        self._postings[key].setdefault(posting_value, []).append(position)
+                        self._frozen.pop((key, posting_value), None)
+                self._size += 1
+
+    def _posting(self, key: str, value: Any) -> np.ndarray:
+        cache_key = (key, value)
+        cached = self._frozen.get(cache_key)
+        if cached is None:
+            cached = np.asarray(self._postings[key].get(value, ()), dtype=np.int64)
+            self._frozen[cache_key] = cached
+        return cached
+
+    def _scan(self, key: str, value: Any) -> np.ndarray:
+        column = self._columns[key]
+        return np.asarray(
+            [self._base_size + i for i, item in enumerate(column) if (None if item is _MISSING else item) == value],
+            dtype=np.int64,
+        )
+
+    def _key_positions(self, key: str, value: Any) -> Optional[np.ndarray]:
+        """Positions khớp key == value (None = khớp tất cả, key chưa từng xuất hiện)."""
+        if key not in self._base_columns and key not in self._columns:
+            return None if value is None else np.empty(0, dtype=np.int64)
+        parts = []
+        base_column = self._base_columns.get(key)
+        if base_column is not None:
+            parts.append(base_column.positions(value))
+        elif value is None:
+            parts.append(np.arange(self._base_size, dtype=np.int64))
+        if key in self._columns:
+            parts.append(self._posting(key, value) if _is_hashable(value) else self._scan(key, value))
+        elif value is None:
+            parts.append(np.arange(self._base_size, self._size, dtype=np.int64))
+        # Base luôn đứng trước delta => nối lại vẫn tăng dần
+        return np.concatenate(parts) if len(parts) > 1 else parts[0]
+
+    def filter(self, metadata_filter: Mapping[str, Any]) -> np.ndarray:
+        """
+        Positions của documents thỏa mãn tất cả điều kiện (key == value).
+
+        Args:
+            metadata_filter: Dictionary metadata key-value
+
+        Returns:
+            np.ndarray int64 positions, sắp xếp tăng dần
+        """
+        with self._lock:
+            if not metadata_filter:
+                return np.arange(self._size, dtype=np.int64)
+            candidates = []
+            for key, value in metadata_filter.items():
+                matched = self._key_positions(key, value)
+                if matched is None:
+                    continue
+                if matched.size == 0:
+                    return matched
+                candidates.append(matched)
+            if not candidates:
+                return np.arange(self._size, dtype=np.int64)
+            candidates.sort(key=len)
+            result = candidates[0]
+            for posting in candidates[1:]:
+                if result.size == 0:
+                    break
+                result = np.intersect1d(result, posting, assume_unique=True)
+            return result
+
+    def mask(self, metadata_filter: Mapping[str, Any]) -> np.ndarray:
+        """Boolean mask độ dài len(index) cho filter."""
+        mask = np.zeros(self._size, dtype=bool)
+        mask[self.filter(metadata_filter)] = True
+        return mask
+
+    def _value_at(self, key: str, position: int, default: Any) -> Any:
+        if position < self._base_size:
+            base_column = self._base_columns.get(key)
+            return default if base_column is None else base_column.value_at(position, default)
+        column = self._columns.get(key)
+        if column is None:
+            return default
+        value = column[position - self._base_size]
+        return default if value is _MISSING else value
+
+    def extract(
+        self,
+        key: str,
+        default: Any = None,
+        positions: Optional[Iterable[int]] = None,
+    ) -> List[Any]:
+        """
+        Đọc giá trị metadata từ column.
+
+        Args:
+            key: Metadata key
+            default: Giá trị khi document không có key
+            positions: Positions cần đọc (None = các documents có metadata,
+                giống extract_metadata)
+
+        Returns:
+            List giá trị
+        """
+        with self._lock:
+            if positions is None:
+                positions = [*self._base_non_empty.tolist(), *self._non_empty]
+            return [self._value_at(key, int(position), default) for position in positions]
+
+    def metadata_at(self, position: int) -> Dict[str, Any]:
+        """Metadata dict của document tại position (dựng lại từ columns)."""
+        with self._lock:
+            metadata = {}
+            for key in self.keys:
+                value = self._value_at(key, position, _MISSING)
+                if value is not _MISSING:
+                    metadata[key] = value
+            return metadata
@@ -2,13 +2,135 @@
 Retriever Utilities - Helper functions cho retrieval operations.
 """
 from typing import List, Optional, Dict, Any
+
+import numpy as np
 from langchain_core.documents import Document
 from langchain_core.vectorstores import VectorStore
 
+from app.utils.metadata_index import MetadataIndex
+from app.utils.token_utils import get_token_counter
+
+# Separator giữa các documents trong context
+DOC_SEPARATOR = "\n\n---\n\n"
+
+# Số chiều của vector shingle dùng để phát hiện near-duplicate khi không có embeddings
+_SHINGLE_DIM = 2048
+_SHINGLE_SIZE = 5
+
+
+def _get_settings():
+    from app.core.config import settings
+    return settings
+
+
+def shingle_vectors(texts: List[str]) -> np.ndarray:
+    """
+    Vector hóa texts bằng hashed shingles trên UTF-8 bytes (đã normalize).
+
+    Rẻ hơn embeddings và đủ để phát hiện chunks gần trùng nhau.
+
+    Args:
+        texts: Danh sách texts
+
+    Returns:
+        np.ndarray float32 shape (len(texts), _SHINGLE_DIM)
+    """
+    vectors = np.zeros((len(texts), _SHINGLE_DIM), dtype=np.float32)
+    for row, text in enumerate(texts):
+        normalized = " ".join(text.lower().split()).encode("utf-8").ljust(_SHINGLE_SIZE)
+        codes = np.frombuffer(normalized, dtype=np.uint8).astype(np.uint64)
+        # Polynomial hash của mọi shingle _SHINGLE_SIZE bytes, tính vectorized
+        width = codes.size - _SHINGLE_SIZE + 1
+        hashes = np.zeros(width, dtype=np.uint64)
+        for offset in range(_SHINGLE_SIZE):
+            hashes = hashes * np.uint64(1000003) + codes[offset:offset + width]
+        vectors[row] = np.bincount(hashes % np.uint64(_SHINGLE_DIM), minlength=_SHINGLE_DIM)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def pack_documents(
+    docs: List[Document],
+    max_tokens: int,
+    vectors: Optional[np.ndarray] = None,
+    duplicate_threshold: Optional[float] = None,
+    mmr_lambda: Optional[float] = None,
+    model_name: Optional[str] = None,
+) -> List[Document]:
+    """
+    Chọn documents vừa token budget: bỏ near-duplicates, ưu tiên relevance/token.
+
+    Greedy MMR: mỗi bước tính điểm lambda * relevance - (1 - lambda) * max_sim
+    (max_sim là similarity lớn nhất với các docs đã chọn), chia cho số tokens
+    và chọn doc có điểm cao nhất còn vừa budget. Doc có similarity >=
+    duplicate_threshold với doc đã chọn bị loại.
+
+    Args:
+        docs: Documents theo thứ tự relevance (metadata["score"] nếu có)
+        max_tokens: Token budget cho toàn bộ context (tính cả separators)
+        vectors: Vectors của docs (None = dùng shingle_vectors)
+        duplicate_threshold: Ngưỡng near-duplicate (defaults to settings.retriever_duplicate_threshold)
+        mmr_lambda: Trọng số relevance vs diversity (defaults to settings.retriever_mmr_lambda)
+        model_name: Model dùng để đếm tokens (defaults to settings.openai_model)
+
+    Returns:
+        Documents được chọn, giữ thứ tự ban đầu
+    """
+    if not docs or max_tokens <= 0:
+        return []
+    settings = _get_settings()
+    if duplicate_threshold is None:
+        duplicate_threshold = settings.retriever_duplicate_threshold
+    if mmr_lambda is None:
+        mmr_lambda = settings.retriever_mmr_lambda
+
+    count = get_token_counter(model_name)
+    tokens = np.array([max(1, count(doc.page_content)) for doc in docs], dtype=np.float64)
+    separator_tokens = count(DOC_SEPARATOR)
+
+    # Relevance: score trong metadata nếu có, ngược lại theo thứ hạng; scale về [0, 1]
+    scores = [doc.metadata.get("score") if doc.metadata else None for doc in docs]
+    if all(score is not None for score in scores):
+        relevance = np.asarray(scores, dtype=np.float64)
+    else:
+        relevance = 1.0 / (1.0 + np.arange(len(docs), dtype=np.float64))
+    span = relevance.max() - relevance.min()
+    relevance = (relevance - relevance.min()) / span if span > 0 else np.ones(len(docs))
+
+    if vectors is None:
+        vectors = shingle_vectors([doc.page_content for doc in docs])
+    vectors = np.asarray(vectors, dtype=np.float32)
+    vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    similarity = vectors @ vectors.T
+
+    max_sim = np.zeros(len(docs))
+    available = np.ones(len(docs), dtype=bool)
+    selected: List[int] = []
+    budget = float(max_tokens)
+    while True:
+        cost = tokens + (separator_tokens if selected else 0)
+        available &= cost <= budget
+        if not available.any():
+            break
+        mmr = mmr_lambda * relevance - (1.0 - mmr_lambda) * max_sim
+        # +1 để doc relevance thấp vẫn có điểm dương, chia tokens => ưu tiên relevance/token
+        density = np.where(available, (mmr + 1.0) / cost, -np.inf)
+        best = int(np.argmax(density))
+        selected.append(best)
+        budget -= cost[best]
+        available[best] = False
+        max_sim = np.maximum(max_sim, similarity[best])
+        available &= max_sim < duplicate_threshold
+
+    return [docs[i] for i in sorted(selected)]
+
 
 def format_retrieved_docs(
     docs: List[Document],
     max_length: Optional[int] = None,
+    max_tokens: Optional[int] = None,
+    model_name: Optional[str] = None,
 ) -> str:
     """
     Format retrieved documents thành context string.
@@ -16,6 +138,9 @@ def format_retrieved_docs(
     Args:
         docs: List of retrieved documents
         max_length: Maximum length of formatted string (None for no limit)
+        max_tokens: Token budget - bật packing mode (pack_documents): bỏ near-duplicates
+            và chọn docs theo relevance/token thay vì cắt theo ký tự
+        model_name: Model dùng để đếm tokens (defaults to settings.openai_model)
         
     Returns:
         Formatted context string
@@ -23,6 +148,9 @@ def format_retrieved_docs(
     if not docs:
         return ""
     
+    if max_tokens:
+        docs = pack_documents(docs, max_tokens, model_name=model_name)
+    
     context_parts = []
     total_length = 0
     
@@ -38,13 +166,14 @@ def format_retrieved_docs(
         context_parts.append(content)
         total_length += len(content)
     
-    return "\n\n---\n\n".join(context_parts)
+    return DOC_SEPARATOR.join(context_parts)
 
 
 def extract_metadata(
     docs: List[Document],
     key: str,
     default: Any = None,
+    index: Optional[MetadataIndex] = None,
 ) -> List[Any]:
     """
     Extract metadata values từ documents.
@@ -53,16 +182,20 @@ def extract_metadata(
         docs: List of documents
         key: Metadata key to extract
         default: Default value if key not found
+        index: MetadataIndex đã build trên đúng docs (đọc thẳng từ column)
         
     Returns:
         List of metadata values
     """
+    if index is not None:
+        return index.extract(key, default)
     return [doc.metadata.get(key, default) for doc in docs if doc.metadata]
 
 
 def filter_docs_by_metadata(
     docs: List[Document],
     metadata_filter: Dict[str, Any],
+    index: Optional[MetadataIndex] = None,
 ) -> List[Document]:
     """
     Filter documents by metadata.
@@ -70,10 +203,14 @@ def filter_docs_by_metadata(
     Args:
         docs: List of documents
         metadata_filter: Dictionary of metadata key-value pairs to filter by
+        index: MetadataIndex đã build trên đúng docs (giao posting lists thay vì scan)
         
     Returns:
         Filtered list of documents
     """
+    if index is not None:
+        return [docs[position] for position in index.filter(metadata_filter)]
+    
     filtered = []
     for doc in docs:
         match = True
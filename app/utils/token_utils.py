@@ -0,0 +1,68 @@
+"""
+Token Utilities - Đếm tokens với tokenizer được cache theo model.
+
+Tokenizer tiktoken được load một lần cho mỗi model (lru_cache). Nếu không
+load được (ví dụ môi trường không có mạng để tải BPE file), dùng ước lượng
+~4 ký tự / token để các tính năng phụ thuộc token budget vẫn chạy.
+"""
+import logging
+import math
+from functools import lru_cache
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Encoding mặc định cho các model mới khi tiktoken chưa biết tên model
+_DEFAULT_ENCODING = "o200k_base"
+_CHARS_PER_TOKEN = 4
+
+
+def _get_settings():
+    from app.core.config import settings
+    return settings
+
+
+def _approximate_tokens(text: str) -> int:
+    return math.ceil(len(text) / _CHARS_PER_TOKEN) if text else 0
+
+
+@lru_cache(maxsize=16)
+def get_token_counter(model_name: Optional[str] = None) -> Callable[[str], int]:
+    """
+    Lấy hàm đếm tokens cho model (cached).
+
+    Args:
+        model_name: Tên model (defaults to settings.openai_model)
+
+    Returns:
+        Callable nhận text và trả về số tokens
+    """
+    model_name = model_name or _get_settings().openai_model
+    try:
+        import tiktoken
+        try:
+            encoding = tiktoken.encoding_for_model(model_name)
+        except KeyError:
+            encoding = tiktoken.get_encoding(_DEFAULT_ENCODING)
+    except Exception as e:
+        logger.warning(f"Không load được tokenizer cho {model_name}, dùng ước lượng: {e}")
+        return _approximate_tokens
+
+    def count(text: str) -> int:
+        return len(encoding.encode_ordinary(text)) if text else 0
+
+    return count
+
+
+def count_tokens(text: str, model_name: Optional[str] = None) -> int:
+    """
+    Đếm số tokens của text.
+
+    Args:
+        text: Nội dung cần đếm
+        model_name: Tên model (defaults to settings.openai_model)
+
+    Returns:
+        Số tokens
+    """
+    return get_token_counter(model_name)(text)
@@ -0,0 +1,857 @@
+"""
+Vector Index - In-process vector index trên các ma trận NumPy float32 liên tục.
+
+Hai chế độ search (cosine similarity, vectors được normalize khi add):
+- "flat": exact search, batched matmul theo block + argpartition lấy top-k.
+  Phù hợp corpus nhỏ/vừa.
+- "ivf": coarse clustering (spherical k-means). Vectors được sắp xếp liên tục
+  theo cluster (CSR layout), query chỉ scan n_probe clusters gần nhất.
+  Phù hợp corpus lớn, đổi một ít recall lấy latency.
+
+"auto" chọn ivf khi số vectors >= settings.vector_index_ivf_threshold.
+
+Cập nhật incremental (chi phí tỉ lệ với số vectors thay đổi, không phải corpus):
+- Storage = base (kết quả compaction, có thể là IVF) + các segments growable
+  ở tail. add chỉ ghi vào segment cuối, segment đầy thì mở segment mới.
+- delete là tombstone bitmap theo position, bị bỏ qua khi search.
+- build() là compaction: gộp base + segments, loại bỏ rows đã xóa và train
+  lại IVF centroids. Phần nặng chạy ngoài lock trên snapshot nên queries,
+  add và delete không bị chặn; needs_compaction() cho biết khi nào tail/rác
+  đủ lớn để đáng compact (DataRetriever chạy compaction ở background).
+
+Position của vector không đổi qua các lần compaction.
+
+Quantization (settings.vector_index_dtype) để giảm RAM mỗi worker:
+- "float16": 2 bytes/chiều.
+- "int8": scalar quantization đối xứng với scale theo từng chiều
+  (x ~= code * scale), 1 byte/chiều. Tail segments giữ float32; compaction
+  fit lại scales trên mọi vectors còn sống (scales chỉ tăng) rồi encode tail
+  và re-encode base khi scales đổi, nên add theo batch nhỏ không bị clip.
+  needs_compaction() coi tail float32 là cần compact như tail IVF.
+Search vẫn vectorized: mỗi block codes được cast sang float32 rồi matmul với
+query (int8: base dùng query đã nhân scale, tail dùng query gốc). Khi có rerank_source (hàm trả về vectors
+float32 gốc theo positions, ví dụ memmap/MongoDB), top k * rerank_factor ứng
+viên được chấm lại bằng float32.
+"""
+import logging
+import math
+import threading
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+INDEX_FLAT = "flat"
+INDEX_IVF = "ivf"
+INDEX_AUTO = "auto"
+
+DTYPE_FLOAT32 = "float32"
+DTYPE_FLOAT16 = "float16"
+DTYPE_INT8 = "int8"
+_STORAGE_DTYPES = {
+    DTYPE_FLOAT32: np.float32,
+    DTYPE_FLOAT16: np.float16,
+    DTYPE_INT8: np.int8,
+}
+# Block nhỏ khi scan dữ liệu quantized: bản cast float32 nằm gọn trong cache
+_DECODE_BLOCK_ROWS = 4096
+
+
+def _get_settings():
+    from app.core.config import settings
+    return settings
+
+
+def normalize_vectors(vectors) -> np.ndarray:
+    """
+    Convert sang float32 C-contiguous và L2-normalize từng hàng.
+
+    Args:
+        vectors: Array-like shape (n, dim) hoặc (dim,)
+
+    Returns:
+        np.ndarray float32 shape (n, dim)
+    """
+    matrix = np.array(vectors, dtype=np.float32, copy=True, ndmin=2, order="C")
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+    return matrix
+
+
+def int8_scales(vectors: np.ndarray) -> np.ndarray:
+    """
+    Scale theo từng chiều cho int8 quantization đối xứng.
+
+    Args:
+        vectors: Normalized float32 matrix (n, dim)
+
+    Returns:
+        float32 array (dim,), code = round(x / scale) nằm trong [-127, 127]
+    """
+    max_abs = np.abs(vectors).max(axis=0)
+    # Chiều toàn 0 vẫn cần scale > 0; vectors đã normalize nên |x| <= 1
+    max_abs[max_abs == 0] = 1.0
+    return (max_abs / 127.0).astype(np.float32)
+
+
+def quantize_vectors(
+    vectors: np.ndarray, dtype: str, scales: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """
+    Encode normalized float32 vectors sang storage dtype.
+
+    Args:
+        vectors: Normalized float32 matrix (n, dim)
+        dtype: "float32", "float16" hoặc "int8"
+        scales: Scale theo chiều (bắt buộc với int8)
+
+    Returns:
+        Codes theo storage dtype
+    """
+    if dtype == DTYPE_INT8:
+        codes = np.rint(vectors / scales)
+        np.clip(codes, -127, 127, out=codes)
+        return codes.astype(np.int8)
+    return vectors.astype(_STORAGE_DTYPES[dtype], copy=False)
+
+
+def dequantize_vectors(
+    codes: np.ndarray, dtype: str, scales: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """Decode codes về float32 (xấp xỉ vectors đã normalize)."""
+    matrix = codes.astype(np.float32)
+    if dtype == DTYPE_INT8:
+        matrix *= scales
+    return matrix
+
+
+def _merge_topk(
+    scores: np.ndarray,
+    indices: np.ndarray,
+    new_scores: np.ndarray,
+    new_indices: np.ndarray,
+    k: int,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Gộp top-k hiện tại với candidates mới (theo từng hàng query)."""
+    all_scores = np.concatenate([scores, new_scores], axis=1)
+    all_indices = np.concatenate([indices, new_indices], axis=1)
+    if all_scores.shape[1] > k:
+        part = np.argpartition(-all_scores, k - 1, axis=1)[:, :k]
+        all_scores = np.take_along_axis(all_scores, part, axis=1)
+        all_indices = np.take_along_axis(all_indices, part, axis=1)
+    return all_scores, all_indices
+
+
+def _sort_topk(scores: np.ndarray, indices: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    order = np.argsort(-scores, axis=1, kind="stable")
+    return np.take_along_axis(scores, order, axis=1), np.take_along_axis(indices, order, axis=1)
+
+
+def spherical_kmeans(
+    vectors: np.ndarray,
+    n_clusters: int,
+    n_iter: int = 10,
+    sample_size: Optional[int] = None,
+    block_rows: int = 65536,
+    seed: int = 0,
+) -> np.ndarray:
+    """
+    Spherical k-means (cosine) trên sample của vectors đã normalize.
+
+    Args:
+        vectors: Normalized float32 matrix (n, dim)
+        n_clusters: Số clusters
+        n_iter: Số vòng lặp
+        sample_size: Số vectors dùng để train (None = 64 * n_clusters)
+        block_rows: Số hàng mỗi block khi assign
+        seed: Random seed
+
+    Returns:
+        Normalized centroids (n_clusters, dim)
+    """
+    rng = np.random.default_rng(seed)
+    n = vectors.shape[0]
+    sample_size = min(n, sample_size or 64 * n_clusters)
+    sample = vectors[rng.choice(n, sample_size, replace=False)] if sample_size < n else vectors
+    centroids = sample[rng.choice(sample.shape[0], n_clusters, replace=False)].copy()
+
+    for _ in range(n_iter):
+        assignments = assign_to_centroids(sample, centroids, block_rows)
+        counts = np.bincount(assignments, minlength=n_clusters)
+        # Tổng vectors theo cluster: sort theo assignment rồi reduceat từng đoạn
+        order = np.argsort(assignments, kind="stable")
+        non_empty = np.flatnonzero(counts)
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])[non_empty]
+        sums = np.zeros_like(centroids)
+        sums[non_empty] = np.add.reduceat(sample[order], starts, axis=0)
+        empty = counts == 0
+        if empty.any():
+            # Cluster rỗng: reseed bằng vectors ngẫu nhiên
+            sums[empty] = sample[rng.choice(sample.shape[0], int(empty.sum()), replace=False)]
+        centroids = normalize_vectors(sums)
+    return centroids
+
+
+def assign_to_centroids(
+    vectors: np.ndarray, centroids: np.ndarray, block_rows: int = 65536
+) -> np.ndarray:
+    """Assign mỗi vector vào centroid gần nhất (cosine), xử lý theo block."""
+    assignments = np.empty(vectors.shape[0], dtype=np.int32)
+    for start in range(0, vectors.shape[0], block_rows):
+        block = vectors[start:start + block_rows]
+        assignments[start:start + block.shape[0]] = np.argmax(block @ centroids.T, axis=1)
+    return assignments
+
+
+class _Segment:
+    """Segment growable ở tail: positions liên tục bắt đầu từ start."""
+
+    __slots__ = ("start", "vectors", "size", "sealed")
+
+    def __init__(self, start: int, dim: int, dtype=np.float32):
+        self.start = start
+        self.vectors = np.empty((0, dim), dtype=dtype)
+        self.size = 0
+        self.sealed = False
+
+    def append(self, matrix: np.ndarray, max_rows: int) -> int:
+        """Ghi tối đa (max_rows - size) hàng, trả về số hàng đã ghi."""
+        take = min(matrix.shape[0], max_rows - self.size)
+        needed = self.size + take
+        if needed > self.vectors.shape[0]:
+            # Capacity doubling trong giới hạn max_rows => copy bị chặn bởi kích thước segment
+            capacity = min(max_rows, max(needed, 2 * self.vectors.shape[0], 256))
+            grown = np.empty((capacity, self.vectors.shape[1]), dtype=self.vectors.dtype)
+            grown[:self.size] = self.vectors[:self.size]
+            self.vectors = grown
+        self.vectors[self.size:needed] = matrix[:take]
+        self.size = needed
+        return take
+
+
+class _IndexState(NamedTuple):
+    """Snapshot bất biến dùng cho search/compaction ngoài lock."""
+
+    size: int
+    live: int
+    tail_start: int
+    base_vectors: np.ndarray
+    base_positions: np.ndarray
+    base_rows: np.ndarray
+    centroids: Optional[np.ndarray]
+    list_offsets: Optional[np.ndarray]
+    tail: List[Tuple[int, np.ndarray]]
+    deleted: np.ndarray
+    scales: Optional[np.ndarray]
+
+
+class VectorIndex:
+    """
+    In-process cosine vector index.
+
+    Rows được định danh bằng position (0..n-1) theo thứ tự add; caller tự
+    map position sang document (xem DataRetriever).
+    """
+
+    def __init__(
+        self,
+        dim: int,
+        index_type: Optional[str] = None,
+        n_lists: Optional[int] = None,
+        n_probe: Optional[int] = None,
+        dtype: Optional[str] = None,
+        rerank_source: Optional[Callable[[np.ndarray], np.ndarray]] = None,
+        rerank_factor: Optional[int] = None,
+    ):
+        """
+        Initialize vector index.
+
+        Args:
+            dim: Số chiều vector
+            index_type: "flat", "ivf" hoặc "auto" (defaults to settings.vector_index_type)
+            n_lists: Số IVF clusters (defaults to settings.vector_index_n_lists, None = sqrt(n))
+            n_probe: Số clusters scan mỗi query (defaults to settings.vector_index_n_probe)
+            dtype: Storage dtype "float32", "float16" hoặc "int8"
+                (defaults to settings.vector_index_dtype)
+            rerank_source: Hàm positions -> vectors float32 gốc, dùng để chấm lại
+                top candidates khi dtype không phải float32 (None = không rerank)
+            rerank_factor: Số candidates = k * rerank_factor
+                (defaults to settings.vector_index_rerank_factor)
+        """
+        settings = _get_settings()
+        self.dim = dim
+        self.index_type = (index_type or settings.vector_index_type).lower()
+        if self.index_type not in (INDEX_FLAT, INDEX_IVF, INDEX_AUTO):
+            raise ValueError(f"Unsupported index_type: {self.index_type}")
+        self.n_lists = n_lists or settings.vector_index_n_lists
+        self.n_probe = n_probe or settings.vector_index_n_probe
+        self.dtype = (dtype or settings.vector_index_dtype).lower()
+        if self.dtype not in _STORAGE_DTYPES:
+            raise ValueError(f"Unsupported dtype: {self.dtype}")
+        self._storage_dtype = _STORAGE_DTYPES[self.dtype]
+        self.rerank_source = rerank_source
+        self.rerank_factor = rerank_factor or settings.vector_index_rerank_factor
+        # int8: scale theo chiều của base (fit lại mỗi lần compaction);
+        # tail chưa quantize nên giữ float32
+        self._scales: Optional[np.ndarray] = None
+        self._tail_dtype = np.float32 if self.dtype == DTYPE_INT8 else self._storage_dtype
+        self.block_rows = settings.vector_index_search_block_rows
+        self.segment_rows = settings.vector_index_segment_rows
+        self.compaction_ratio = settings.vector_index_compaction_ratio
+
+        self._size = 0
+        self._live = 0
+        # Base (kết quả compaction gần nhất): rows sắp theo cluster nếu IVF,
+        # theo position nếu flat. _base_rows map position -> row (-1 = đã loại bỏ)
+        self._base_vectors = np.empty((0, dim), dtype=self._storage_dtype)
+        self._base_positions = np.empty(0, dtype=np.int64)
+        self._base_rows = np.empty(0, dtype=np.int64)
+        self._centroids: Optional[np.ndarray] = None
+        self._list_offsets: Optional[np.ndarray] = None
+        # Positions >= _tail_start nằm trong các segments (thứ tự add)
+        self._tail_start = 0
+        self._segments: List[_Segment] = []
+        self._deleted = np.zeros(0, dtype=bool)
+        self._lock = threading.RLock()
+        # Chỉ một compaction tại một thời điểm
+        self._build_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """Số vectors còn sống."""
+        return self._live
+
+    @property
+    def size(self) -> int:
+        """Tổng số positions đã cấp (kể cả đã xóa)."""
+        return self._size
+
+    @property
+    def is_ivf(self) -> bool:
+        """True nếu base đã được build dạng IVF."""
+        return self._centroids is not None
+
+    @property
+    def memory_bytes(self) -> int:
+        """Bộ nhớ của vectors + các mảng position (không tính rerank_source)."""
+        with self._lock:
+            total = self._base_vectors.nbytes + self._base_positions.nbytes + self._base_rows.nbytes
+            total += sum(segment.vectors.nbytes for segment in self._segments)
+            total += self._deleted.nbytes
+            if self._centroids is not None:
+                total += self._centroids.nbytes + self._list_offsets.nbytes
+        return total
+
+    def export_arrays(self) -> Tuple[Dict[str, Any], Dict[str, np.ndarray]]:
+        """
+        Params + arrays của base để ghi snapshot (gọi sau build(), tail phải rỗng).
+
+        Returns:
+            Tuple (params JSON-serializable, arrays theo tên)
+        """
+        with self._lock:
+            if self.tail_size:
+                raise ValueError("Cần build() trước khi export (tail chưa được compact)")
+            params = {
+                "dim": self.dim,
+                "index_type": self.index_type,
+                "n_lists": self.n_lists,
+                "n_probe": self.n_probe,
+                "dtype": self.dtype,
+                "size": self._size,
+                "live": self._live,
+            }
+            arrays = {
+                "vectors": self._base_vectors,
+                "positions": self._base_positions,
+                "rows": self._base_rows,
+                "deleted": self._deleted[:self._size],
+            }
+            if self._centroids is not None:
+                arrays["centroids"] = self._centroids
+                arrays["list_offsets"] = self._list_offsets
+            if self._scales is not None:
+                arrays["scales"] = self._scales
+        return params, arrays
+
+    @classmethod
+    def from_arrays(cls, params: Dict[str, Any], arrays: Dict[str, np.ndarray]) -> "VectorIndex":
+        """
+        Khôi phục index từ export_arrays (arrays có thể là memmap read-only).
+
+        Base không bao giờ bị ghi tại chỗ (add ghi vào segments, compaction tạo
+        arrays mới) nên memmap được chia sẻ page cache giữa các processes.
+        Chỉ tombstone bitmap được copy vào memory riêng.
+
+        Args:
+            params: Params từ export_arrays
+            arrays: Arrays theo tên
+
+        Returns:
+            VectorIndex instance
+        """
+        index = cls(
+            dim=params["dim"],
+            index_type=params["index_type"],
+            n_lists=params.get("n_lists"),
+            n_probe=params.get("n_probe"),
+            dtype=params["dtype"],
+        )
+        index._size = index._tail_start = params["size"]
+        index._live = params["live"]
+        index._base_vectors = arrays["vectors"]
+        index._base_positions = arrays["positions"]
+        index._base_rows = arrays["rows"]
+        index._deleted = np.array(arrays["deleted"], dtype=bool)
+        index._centroids = arrays.get("centroids")
+        index._list_offsets = arrays.get("list_offsets")
+        index._scales = arrays.get("scales")
+        return index
+
+    def _encode(self, matrix: np.ndarray, scales: Optional[np.ndarray]) -> np.ndarray:
+        return quantize_vectors(matrix, self.dtype, scales)
+
+    def _decode(self, codes: np.ndarray, scales: Optional[np.ndarray]) -> np.ndarray:
+        return dequantize_vectors(codes, self.dtype, scales)
+
+    def _prepare_queries(self, queries: np.ndarray, scales: Optional[np.ndarray]) -> np.ndarray:
+        """int8: nhân scale vào query để score = query_scaled . codes (chỉ dùng cho base)."""
+        if self.dtype == DTYPE_INT8 and scales is not None:
+            return queries * scales
+        return queries
+
+    @property
+    def tail_size(self) -> int:
+        """Số vectors trong segments chưa được compact vào base."""
+        return self._size - self._tail_start
+
+    def add(self, vectors) -> np.ndarray:
+        """
+        Thêm vectors vào segment cuối (mở segment mới khi đầy).
+
+        Args:
+            vectors: Array-like shape (n, dim)
+
+        Returns:
+            Positions của các vectors vừa thêm
+        """
+        matrix = normalize_vectors(vectors)
+        if matrix.shape[1] != self.dim:
+            raise ValueError(f"Expected dim {self.dim}, got {matrix.shape[1]}")
+        # int8 được quantize ở compaction (scales fit trên toàn bộ dữ liệu)
+        codes = matrix if self.dtype == DTYPE_INT8 else self._encode(matrix, None)
+        with self._lock:
+            start = self._size
+            offset = 0
+            while offset < codes.shape[0]:
+                segment = self._segments[-1] if self._segments else None
+                if segment is None or segment.sealed or segment.size >= self.segment_rows:
+                    segment = _Segment(self._size, self.dim, self._tail_dtype)
+                    self._segments.append(segment)
+                taken = segment.append(codes[offset:], self.segment_rows)
+                offset += taken
+                self._size += taken
+            if self._size > self._deleted.shape[0]:
+                grown = np.zeros(max(self._size, 2 * self._deleted.shape[0], 1024), dtype=bool)
+                grown[:self._deleted.shape[0]] = self._deleted
+                self._deleted = grown
+            self._live += matrix.shape[0]
+        return np.arange(start, self._size, dtype=np.int64)
+
+    def delete(self, positions: Sequence[int]) -> int:
+        """
+        Xóa vectors (tombstone); storage được thu hồi ở lần compaction sau.
+
+        Args:
+            positions: Positions cần xóa
+
+        Returns:
+            Số vectors thực sự bị xóa
+        """
+        positions = np.unique(np.asarray(positions, dtype=np.int64).ravel())
+        with self._lock:
+            positions = positions[(positions >= 0) & (positions < self._size)]
+            positions = positions[~self._deleted[positions]]
+            self._deleted[positions] = True
+            self._live -= positions.size
+        return int(positions.size)
+
+    def is_deleted(self, position: int) -> bool:
+        """True nếu position đã bị xóa."""
+        return bool(self._deleted[position])
+
+    def _wants_ivf(self, n: int) -> bool:
+        return self.index_type == INDEX_IVF or (
+            self.index_type == INDEX_AUTO and n >= _get_settings().vector_index_ivf_threshold
+        )
+
+    def needs_compaction(self) -> bool:
+        """
+        True khi rows đã xóa chiếm >= compaction_ratio storage, hoặc (khi dùng
+        IVF hoặc int8) tail chưa được index/quantize >= compaction_ratio kích
+        thước base.
+        """
+        with self._lock:
+            base_rows = self._base_vectors.shape[0]
+            stored = base_rows + self.tail_size
+            garbage = stored - self._live
+            if garbage > 0 and garbage >= self.compaction_ratio * stored:
+                return True
+            return (
+                self.tail_size > 0
+                and (self.dtype == DTYPE_INT8 or self._wants_ivf(self._live))
+                and self.tail_size >= self.compaction_ratio * base_rows
+            )
+
+    def _state(self) -> _IndexState:
+        """Snapshot state hiện tại (gọi khi giữ lock)."""
+        return _IndexState(
+            size=self._size,
+            live=self._live,
+            tail_start=self._tail_start,
+            base_vectors=self._base_vectors,
+            base_positions=self._base_positions,
+            base_rows=self._base_rows,
+            centroids=self._centroids,
+            list_offsets=self._list_offsets,
+            tail=[(segment.start, segment.vectors[:segment.size]) for segment in self._segments],
+            deleted=self._deleted,
+            scales=self._scales,
+        )
+
+    def _blocks(
+        self, state: _IndexState, include_base: bool = True, include_tail: bool = True
+    ) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """(vectors, positions) theo block để scan base + tail segments."""
+        block_rows = self.block_rows
+        if self.dtype != DTYPE_FLOAT32:
+            block_rows = min(block_rows, _DECODE_BLOCK_ROWS)
+        if include_base:
+            for start in range(0, state.base_vectors.shape[0], block_rows):
+                yield (
+                    state.base_vectors[start:start + block_rows],
+                    state.base_positions[start:start + block_rows],
+                )
+        if not include_tail:
+            return
+        for segment_start, segment_vectors in state.tail:
+            for start in range(0, segment_vectors.shape[0], block_rows):
+                block = segment_vectors[start:start + block_rows]
+                first = segment_start + start
+                yield block, np.arange(first, first + block.shape[0], dtype=np.int64)
+
+    def build(self, force: bool = False) -> None:
+        """
+        Compaction: gộp base + segments, loại bỏ rows đã xóa và build lại
+        IVF (nếu index_type là ivf, hoặc auto và đủ lớn).
+
+        Phần nặng (k-means, sắp xếp lại) chạy trên snapshot ngoài lock; vectors
+        add trong lúc compact nằm ở segments mới và được giữ nguyên làm tail.
+        Peak memory ~ base cũ + base mới.
+
+        Args:
+            force: Build IVF bất kể index_type/threshold
+        """
+        with self._build_lock:
+            with self._lock:
+                state = self._state()
+                # Seal segment cuối để add mới không ghi vào phần đang compact
+                if self._segments:
+                    self._segments[-1].sealed = True
+                n_sealed = len(self._segments)
+                deleted = state.deleted[:state.size].copy()
+
+            pieces = []
+            for vectors, positions in self._blocks(state):
+                keep = ~deleted[positions]
+                if not keep.all():
+                    vectors, positions = vectors[keep], positions[keep]
+                if positions.size:
+                    pieces.append((vectors, positions))
+            scales = state.scales
+            if self.dtype == DTYPE_INT8:
+                scales, pieces = self._requantize(pieces, state)
+            n_live = sum(positions.size for _, positions in pieces)
+            all_positions = (
+                np.concatenate([positions for _, positions in pieces])
+                if pieces else np.empty(0, dtype=np.int64)
+            )
+
+            centroids = list_offsets = None
+            if n_live and (force or self._wants_ivf(n_live)):
+                n_lists = min(self.n_lists or max(1, int(math.sqrt(n_live))), n_live)
+                sample_size = min(n_live, 64 * n_lists)
+                sample_ids = np.sort(np.random.default_rng(0).choice(n_live, sample_size, replace=False))
+                centroids = spherical_kmeans(
+                    self._decode(_take_rows(pieces, sample_ids), scales), n_lists, block_rows=self.block_rows
+                )
+                assignments = np.concatenate([
+                    assign_to_centroids(self._decode(vectors, scales), centroids, self.block_rows)
+                    for vectors, _ in pieces
+                ])
+                order = np.argsort(assignments, kind="stable")
+                counts = np.bincount(assignments, minlength=n_lists)
+                list_offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+            else:
+                order = np.argsort(all_positions, kind="stable")
+
+            # Scatter từng piece thẳng vào vị trí đích (không tạo bản copy trung gian)
+            destination = np.empty(n_live, dtype=np.int64)
+            destination[order] = np.arange(n_live, dtype=np.int64)
+            base_vectors = np.empty((n_live, self.dim), dtype=self._storage_dtype)
+            offset = 0
+            for vectors, positions in pieces:
+                base_vectors[destination[offset:offset + positions.size]] = vectors
+                offset += positions.size
+            base_positions = all_positions[order]
+            base_rows = np.full(state.size, -1, dtype=np.int64)
+            base_rows[base_positions] = np.arange(n_live, dtype=np.int64)
+
+            with self._lock:
+                self._base_vectors = base_vectors
+                self._base_positions = base_positions
+                self._base_rows = base_rows
+                self._centroids = centroids
+                self._list_offsets = list_offsets
+                self._scales = scales
+                self._tail_start = state.size
+                self._segments = self._segments[n_sealed:]
+            if centroids is not None:
+                logger.info(f"Built IVF index: {n_live} vectors, {centroids.shape[0]} lists")
+
+    def _requantize(
+        self, pieces: List[Tuple[np.ndarray, np.ndarray]], state: _IndexState
+    ) -> Tuple[np.ndarray, List[Tuple[np.ndarray, np.ndarray]]]:
+        """
+        int8: fit lại scales trên các pieces còn sống (base codes + tail float32).
+
+        Scales chỉ tăng (không bao giờ clip vectors đã có); base chỉ bị
+        re-encode khi scales thực sự đổi, tail luôn được encode.
+
+        Returns:
+            Tuple (scales mới, pieces dạng int8 codes)
+        """
+        max_abs = np.zeros(self.dim, dtype=np.float32)
+        for vectors, positions in pieces:
+            peak = np.abs(vectors).max(axis=0)
+            if positions[0] < state.tail_start:
+                peak = peak.astype(np.float32) * state.scales
+            np.maximum(max_abs, peak, out=max_abs)
+        scales = int8_scales(max_abs[np.newaxis, :])
+        if state.scales is not None:
+            # Giữ scale cũ nếu đủ rộng: tránh re-encode base vì sai số làm tròn
+            scales = np.where(scales > state.scales * (1 + 1e-6), scales, state.scales).astype(np.float32)
+        rescale = state.scales is not None and not np.array_equal(scales, state.scales)
+        encoded = []
+        for vectors, positions in pieces:
+            if positions[0] >= state.tail_start:
+                vectors = self._encode(vectors, scales)
+            elif rescale:
+                vectors = self._encode(self._decode(vectors, state.scales), scales)
+            encoded.append((vectors, positions))
+        return scales, encoded
+
+    def search(
+        self,
+        queries,
+        k: int,
+        n_probe: Optional[int] = None,
+        positions: Optional[Sequence[int]] = None,
+        rerank: Optional[bool] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Tìm top-k vectors gần nhất (cosine) cho một batch queries.
+
+        Args:
+            queries: Array-like shape (m, dim) hoặc (dim,)
+            k: Số kết quả mỗi query
+            n_probe: Override số IVF lists scan mỗi query
+            positions: Chỉ scoring trên các positions này (ví dụ kết quả
+                MetadataIndex.filter); luôn là exact search trên tập con
+            rerank: Chấm lại top candidates bằng float32 từ rerank_source
+                (None = rerank khi dtype quantized và có rerank_source)
+
+        Returns:
+            Tuple (scores, positions), mỗi array shape (m, k'), k' = min(k, số
+            vectors còn sống). Sắp xếp giảm dần theo score; IVF có thể trả về
+            position -1 khi các lists được scan có ít hơn k' vectors.
+        """
+        query_matrix = normalize_vectors(queries)
+        with self._lock:
+            state = self._state()
+        if positions is not None:
+            positions = np.asarray(positions, dtype=np.int64)
+            positions = positions[(positions >= 0) & (positions < state.size)]
+            positions = positions[~state.deleted[positions]]
+        k = min(k, state.live if positions is None else positions.size)
+        if k <= 0:
+            empty = np.empty((query_matrix.shape[0], 0))
+            return empty.astype(np.float32), empty.astype(np.int64)
+        if rerank is None:
+            rerank = self.dtype != DTYPE_FLOAT32
+        rerank = rerank and self.rerank_source is not None
+        candidate_k = min(k * self.rerank_factor, state.live) if rerank else k
+        if positions is not None:
+            blocks = (
+                (self._gather(state, positions[start:start + self.block_rows]),
+                 positions[start:start + self.block_rows])
+                for start in range(0, positions.size, self.block_rows)
+            )
+            scores, found = self._scan(query_matrix, min(candidate_k, positions.size), blocks, state.deleted)
+        elif state.centroids is not None:
+            scores, found = self._search_ivf(query_matrix, candidate_k, n_probe or self.n_probe, state)
+        else:
+            scores, found = self._scan(
+                self._prepare_queries(query_matrix, state.scales), candidate_k,
+                self._blocks(state, include_tail=False), state.deleted,
+            )
+            if state.tail:
+                scores, found = self._scan_tail(query_matrix, candidate_k, state, scores, found)
+        if rerank:
+            return self._rerank(query_matrix, found, k)
+        scores, found = _sort_topk(scores, found)
+        return scores[:, :k], found[:, :k]
+
+    def _rerank(
+        self, queries: np.ndarray, candidates: np.ndarray, k: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Chấm lại candidates (m, c) bằng vectors float32 gốc, giữ top-k."""
+        valid = candidates >= 0
+        unique, inverse = np.unique(np.where(valid, candidates, 0), return_inverse=True)
+        originals = normalize_vectors(self.rerank_source(unique))
+        vectors = originals[inverse.reshape(candidates.shape)]
+        scores = np.einsum("mcd,md->mc", vectors, queries)
+        scores[~valid] = -np.inf
+        scores, candidates = _sort_topk(scores, candidates)
+        return scores[:, :k], candidates[:, :k]
+
+    @staticmethod
+    def _scan(
+        queries: np.ndarray,
+        k: int,
+        blocks,
+        deleted: np.ndarray,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Exact top-k trên các blocks (vectors, positions), bỏ qua tombstones."""
+        m = queries.shape[0]
+        scores = np.empty((m, 0), dtype=np.float32)
+        positions = np.empty((m, 0), dtype=np.int64)
+        for vectors, block_positions in blocks:
+            block_scores = queries @ vectors.astype(np.float32, copy=False).T
+            dead = deleted[block_positions]
+            if dead.any():
+                block_scores[:, dead] = -np.inf
+            block_k = min(k, block_scores.shape[1])
+            if block_scores.shape[1] > block_k:
+                part = np.argpartition(-block_scores, block_k - 1, axis=1)[:, :block_k]
+            else:
+                part = np.broadcast_to(np.arange(block_scores.shape[1]), block_scores.shape)
+            block_top = np.take_along_axis(block_scores, part, axis=1)
+            scores, positions = _merge_topk(scores, positions, block_top, block_positions[part], k)
+        return scores, positions
+
+    def _search_ivf(
+        self, queries: np.ndarray, k: int, n_probe: int, state: _IndexState
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        m = queries.shape[0]
+        n_probe = min(n_probe, state.centroids.shape[0])
+        # Centroids ở không gian float (đã decode); base codes dùng query đã nhân scale
+        centroid_scores = queries @ state.centroids.T
+        scaled = self._prepare_queries(queries, state.scales)
+        probes = np.argpartition(-centroid_scores, n_probe - 1, axis=1)[:, :n_probe]
+
+        out_scores = np.full((m, k), -np.inf, dtype=np.float32)
+        out_positions = np.full((m, k), -1, dtype=np.int64)
+        offsets = state.list_offsets
+        for i in range(m):
+            rows = np.concatenate([
+                np.arange(offsets[c], offsets[c + 1], dtype=np.int64) for c in probes[i]
+            ])
+            if rows.size == 0:
+                continue
+            row_scores = state.base_vectors[rows].astype(np.float32, copy=False) @ scaled[i]
+            row_positions = state.base_positions[rows]
+            row_scores[state.deleted[row_positions]] = -np.inf
+            top = min(k, rows.size)
+            part = np.argpartition(-row_scores, top - 1)[:top]
+            out_scores[i, :top] = row_scores[part]
+            out_positions[i, :top] = row_positions[part]
+        if state.tail:
+            # Vectors add sau lần compact cuối chưa thuộc list nào => luôn scan
+            out_scores, out_positions = self._scan_tail(queries, k, state, out_scores, out_positions)
+        out_scores, out_positions = _sort_topk(out_scores, out_positions)
+        out_positions[~np.isfinite(out_scores)] = -1
+        return out_scores, out_positions
+
+    def _scan_tail(
+        self,
+        queries: np.ndarray,
+        k: int,
+        state: _IndexState,
+        scores: np.ndarray,
+        positions: np.ndarray,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Scan tail segments (query gốc, chưa nhân scale) và gộp vào top-k hiện có."""
+        tail_scores, tail_positions = self._scan(
+            queries, k, self._blocks(state, include_base=False), state.deleted
+        )
+        return _merge_topk(scores, positions, tail_scores, tail_positions, k)
+
+    def _gather(self, state: _IndexState, positions: np.ndarray) -> np.ndarray:
+        """Đọc vectors float32 (đã dequantize) theo positions từ base/segments (rows đã loại bỏ = 0)."""
+        out = np.zeros((positions.size, self.dim), dtype=np.float32)
+        in_base = positions < state.tail_start
+        base_ids = np.flatnonzero(in_base)
+        if base_ids.size:
+            rows = state.base_rows[positions[base_ids]]
+            stored = rows >= 0
+            out[base_ids[stored]] = self._decode(state.base_vectors[rows[stored]], state.scales)
+        tail_ids = np.flatnonzero(~in_base)
+        if tail_ids.size:
+            starts = np.array([start for start, _ in state.tail], dtype=np.int64)
+            segment_ids = np.searchsorted(starts, positions[tail_ids], side="right") - 1
+            for segment_id in np.unique(segment_ids):
+                selected = tail_ids[segment_ids == segment_id]
+                start, segment_vectors = state.tail[segment_id]
+                out[selected] = segment_vectors[positions[selected] - start]
+        return out
+
+    def get_vectors(self, positions: Sequence[int]) -> np.ndarray:
+        """Lấy normalized vectors (float32, đã dequantize) theo positions."""
+        with self._lock:
+            state = self._state()
+        positions = np.asarray(positions, dtype=np.int64)
+        if positions.size and (positions.min() < 0 or positions.max() >= state.size):
+            raise IndexError("Position nằm ngoài index")
+        return self._gather(state, positions)
+
+
+def _take_rows(pieces: List[Tuple[np.ndarray, np.ndarray]], ids: np.ndarray) -> np.ndarray:
+    """Lấy các hàng (id toàn cục, đã sắp xếp) từ danh sách pieces nối tiếp nhau."""
+    bounds = np.cumsum([0] + [positions.size for _, positions in pieces])
+    piece_ids = np.searchsorted(bounds, ids, side="right") - 1
+    return np.concatenate([
+        pieces[piece_id][0][ids[piece_ids == piece_id] - bounds[piece_id]]
+        for piece_id in np.unique(piece_ids)
+    ])
+
+
+def exact_topk(
+    queries, vectors, k: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Exact cosine top-k (không cần build index) - tiện cho test/benchmark recall.
+
+    Args:
+        queries: Array-like (m, dim)
+        vectors: Array-like (n, dim)
+        k: Số kết quả
+
+    Returns:
+        Tuple (scores, indices) shape (m, k)
+    """
+    index = VectorIndex(dim=np.asarray(vectors).shape[1], index_type=INDEX_FLAT)
+    index.add(vectors)
+    return index.search(queries, k)
+
@@ -0,0 +1,270 @@
+"""
+Graph Worker - Process riêng chạy graph jobs từ hàng đợi trong MongoDB.
+
+API (settings.graph_job_executor = "worker") chỉ ghi job vào collection
+settings.graph_jobs_collection; worker claim và chạy job, nên tier API và
+tier worker scale độc lập.
+
+- Claim: find-and-modify atomically (pending + available_at <= now ->
+  running, lease_owner, lease_expires_at, attempts + 1); nhiều workers không
+  bao giờ chạy trùng một job.
+- Tối đa settings.worker_concurrency jobs đồng thời; hàng đợi rỗng thì chờ
+  với backoff tới settings.worker_poll_interval.
+- Heartbeat gia hạn lease mỗi settings.worker_heartbeat_interval giây; mất
+  lease (job đã bị requeue cho worker khác) => hủy job đang chạy, kết quả
+  không được ghi (fencing theo lease_owner).
+- Reaper: job có lease hết hạn (worker chết) được trả về pending sau backoff
+  base * 2^(attempts-1), hoặc failed sau settings.worker_max_attempts lần.
+- SIGTERM/SIGINT: ngừng claim, chờ jobs đang chạy tối đa
+  settings.worker_graceful_timeout giây, sau đó hủy và trả job về hàng đợi.
+
+Graph được chạy theo tên đã đăng ký (register_graph trong
+app/services/graph_job_service.py); "simple" có sẵn, các graph khác đăng ký
+trong module được import bằng --import.
+
+Đề xuất ghi file chờ human duyệt của SimpleGraph nằm trong pending store
+dùng chung (settings.graph_pending_store, mặc định MongoDB), nên job resume
+(thread_id + human_input) chạy được trên worker bất kỳ, kể cả sau restart.
+Worker từ chối chạy khi graph_pending_store = "memory" (đề xuất sẽ bị mất).
+
+Cách chạy:
+    GRAPH_JOB_EXECUTOR=worker python -m app.server
+    python -m app.worker --concurrency 8
+"""
+import argparse
+import asyncio
+import importlib
+import logging
+import os
+import signal
+import socket
+import sys
+import uuid
+from typing import Dict, Iterable, Optional
+
+from app.core.exceptions import ConfigurationError
+from app.core.tracing import KIND_INTERNAL, start_span
+from app.graph.pending_requests import PENDING_MONGO, MongoPendingStore
+from app.services.graph_job_service import GraphJobService, MongoGraphJobStore
+
+logger = logging.getLogger(__name__)
+
+
+def _get_settings():
+    from app.core.config import settings
+    return settings
+
+
+class GraphWorker:
+    """
+    Vòng lặp claim -> chạy -> heartbeat cho graph jobs.
+    """
+
+    def __init__(
+        self,
+        service: Optional[GraphJobService] = None,
+        concurrency: Optional[int] = None,
+        lease_seconds: Optional[float] = None,
+        heartbeat_interval: Optional[float] = None,
+        poll_interval: Optional[float] = None,
+        max_attempts: Optional[int] = None,
+        retry_backoff: Optional[float] = None,
+        retry_backoff_max: Optional[float] = None,
+        graceful_timeout: Optional[float] = None,
+        graphs: Optional[Iterable[str]] = None,
+        worker_id: Optional[str] = None,
+    ):
+        """
+        Initialize worker.
+
+        Args:
+            service: GraphJobService (defaults to service với executor "worker")
+            concurrency: Số jobs đồng thời (defaults to settings.worker_concurrency)
+            lease_seconds: Thời hạn lease (defaults to settings.worker_lease_seconds)
+            heartbeat_interval: Chu kỳ gia hạn lease và reaper (defaults to settings.worker_heartbeat_interval)
+            poll_interval: Chờ tối đa khi hàng đợi rỗng (defaults to settings.worker_poll_interval)
+            max_attempts: Số lần chạy tối đa mỗi job (defaults to settings.worker_max_attempts)
+            retry_backoff: Backoff cơ sở, giây (defaults to settings.worker_retry_backoff)
+            retry_backoff_max: Backoff tối đa, giây (defaults to settings.worker_retry_backoff_max)
+            graceful_timeout: Chờ jobs khi dừng (defaults to settings.worker_graceful_timeout)
+            graphs: Chỉ claim các graph này (None = mọi graph)
+            worker_id: ID ghi vào lease_owner (defaults to host:pid:random)
+        """
+        settings = _get_settings()
+        self.service = service if service is not None else GraphJobService(executor="worker")
+        self.job_store = self.service.job_store
+        self.concurrency = concurrency or settings.worker_concurrency
+        self.lease_seconds = lease_seconds or settings.worker_lease_seconds
+        self.heartbeat_interval = heartbeat_interval or settings.worker_heartbeat_interval
+        self.poll_interval = poll_interval or settings.worker_poll_interval
+        self.max_attempts = max_attempts or settings.worker_max_attempts
+        self.retry_backoff = retry_backoff if retry_backoff is not None else settings.worker_retry_backoff
+        self.retry_backoff_max = retry_backoff_max or settings.worker_retry_backoff_max
+        self.graceful_timeout = graceful_timeout if graceful_timeout is not None else settings.worker_graceful_timeout
+        self.graphs = list(graphs) if graphs else None
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._running: Dict[str, asyncio.Task] = {}
+        self._stopping = asyncio.Event()
+        self._wake = asyncio.Event()
+
+    def backoff(self, attempts: int) -> float:
+        """Số giây chờ trước lần chạy lại sau `attempts` lần đã chạy."""
+        return min(self.retry_backoff * 2 ** max(attempts - 1, 0), self.retry_backoff_max)
+
+    def stop(self) -> None:
+        """Ngừng claim jobs mới (run() trả về sau khi jobs đang chạy xong)."""
+        self._stopping.set()
+        self._wake.set()
+
+    @property
+    def running_jobs(self) -> int:
+        return len(self._running)
+
+    async def run(self) -> None:
+        """Claim và chạy jobs đến khi stop() được gọi."""
+        logger.info(f"Graph worker {self.worker_id} started (concurrency={self.concurrency})")
+        reaper = asyncio.create_task(self._reap_loop())
+        delay = 0.0
+        try:
+            while not self._stopping.is_set():
+                if len(self._running) >= self.concurrency:
+                    await self._idle(self.poll_interval)
+                    continue
+                try:
+                    job = await self.job_store.claim(self.worker_id, self.lease_seconds, self.graphs)
+                except Exception as e:
+                    logger.warning(f"Claim graph job lỗi: {e}")
+                    job = None
+                if job is None:
+                    # Hàng đợi rỗng: chờ tăng dần tới poll_interval
+                    delay = min(max(delay * 2, 0.05), self.poll_interval)
+                    await self._idle(delay)
+                    continue
+                delay = 0.0
+                self._running[job["_id"]] = asyncio.create_task(self._execute(job))
+        finally:
+            reaper.cancel()
+            await self._drain()
+        logger.info(f"Graph worker {self.worker_id} stopped")
+
+    async def _idle(self, timeout: float) -> None:
+        self._wake.clear()
+        try:
+            await asyncio.wait_for(self._wake.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _execute(self, job: Dict) -> None:
+        job_id = job["_id"]
+        heartbeat = asyncio.create_task(self._heartbeat(job_id, asyncio.current_task()))
+        try:
+            with start_span(f"job {job['graph']}", KIND_INTERNAL, job_id=job_id, attempt=job.get("attempts")):
+                await self.service.run_job(job, owner=self.worker_id)
+        except asyncio.CancelledError:
+            logger.info(f"Graph job {job_id} bị hủy trên worker {self.worker_id}")
+        except Exception as e:
+            logger.error(f"Graph job {job_id} lỗi ngoài graph: {e}", exc_info=True)
+        finally:
+            heartbeat.cancel()
+            self._running.pop(job_id, None)
+            self._wake.set()
+
+    async def _heartbeat(self, job_id: str, task: asyncio.Task) -> None:
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                owned = await self.job_store.extend_lease(job_id, self.worker_id, self.lease_seconds)
+            except Exception as e:
+                logger.warning(f"Heartbeat graph job {job_id} lỗi: {e}")
+                continue
+            if not owned:
+                logger.warning(f"Graph job {job_id}: mất lease, hủy job")
+                task.cancel()
+                return
+
+    async def _reap_loop(self) -> None:
+        while True:
+            try:
+                requeued, failed = await self.job_store.requeue_expired(self.max_attempts, self.backoff)
+                if requeued or failed:
+                    logger.info(f"Lease hết hạn: requeue {requeued} jobs, failed {failed} jobs")
+            except Exception as e:
+                logger.warning(f"Requeue graph jobs lỗi: {e}")
+            await asyncio.sleep(self.heartbeat_interval)
+
+    async def _drain(self) -> None:
+        """Chờ jobs đang chạy tối đa graceful_timeout, sau đó hủy (job được trả về hàng đợi)."""
+        tasks = list(self._running.values())
+        if not tasks:
+            return
+        logger.info(f"Chờ {len(tasks)} graph jobs đang chạy (tối đa {self.graceful_timeout:g}s)")
+        _, pending = await asyncio.wait(tasks, timeout=self.graceful_timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+
+async def serve(worker: GraphWorker) -> None:
+    """Kết nối MongoDB, chạy worker đến khi nhận SIGTERM/SIGINT rồi đóng kết nối."""
+    from app.core.database import close_mongo_connection, connect_to_mongo
+    from app.core.http_client import close_llm_http_client
+    from app.core.tracing import shutdown_tracing
+
+    settings = _get_settings()
+    if settings.graph_pending_store.lower() != PENDING_MONGO:
+        # Đề xuất chờ duyệt trong memory của worker không tới được lượt resume
+        raise ConfigurationError("Graph worker cần GRAPH_PENDING_STORE=mongo")
+    await connect_to_mongo()
+    try:
+        await MongoGraphJobStore().setup(settings.graph_job_ttl_seconds)
+        await MongoPendingStore().setup(settings.graph_pending_ttl_seconds)
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, worker.stop)
+        await worker.run()
+    finally:
+        await close_llm_http_client()
+        await close_mongo_connection()
+        shutdown_tracing()
+
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(description="Worker chạy graph jobs từ hàng đợi MongoDB")
+    parser.add_argument("--concurrency", type=int, default=None, help="Số jobs đồng thời")
+    parser.add_argument("--lease-seconds", type=float, default=None, help="Thời hạn lease của job")
+    parser.add_argument("--heartbeat-interval", type=float, default=None, help="Chu kỳ gia hạn lease (giây)")
+    parser.add_argument("--max-attempts", type=int, default=None, help="Số lần chạy tối đa mỗi job")
+    parser.add_argument("--graceful-timeout", type=float, default=None, help="Chờ jobs đang chạy khi dừng (giây)")
+    parser.add_argument("--graphs", default=None, help="Chỉ chạy các graph này (phân cách bằng dấu phẩy)")
+    parser.add_argument(
+        "--import", dest="imports", action="append", default=[],
+        help="Module đăng ký thêm graph (register_graph) khi import, có thể lặp lại",
+    )
+    args = parser.parse_args()
+
+    from app.core.logging_config import setup_logging
+    from app.core.tracing import setup_tracing
+
+    setup_logging()
+    setup_tracing()
+    for module in args.imports:
+        importlib.import_module(module)
+
+    worker = GraphWorker(
+        concurrency=args.concurrency,
+        lease_seconds=args.lease_seconds,
+        heartbeat_interval=args.heartbeat_interval,
+        max_attempts=args.max_attempts,
+        graceful_timeout=args.graceful_timeout,
+        graphs=[name.strip() for name in args.graphs.split(",")] if args.graphs else None,
+    )
+    try:
+        asyncio.run(serve(worker))
+    except Exception as e:
+        logger.error(f"Graph worker dừng do lỗi: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
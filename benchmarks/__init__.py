@@ -0,0 +1,6 @@
+"""
+Benchmarks module - Các script đo hiệu năng cho base structure.
+
+Mỗi benchmark là một module chạy độc lập từ thư mục gốc repo:
+    python -m benchmarks.<tên_benchmark>
+"""
@@ -0,0 +1,82 @@
+"""
+Benchmark - Context packing: cắt theo ký tự vs pack_documents (token budget + dedup).
+
+Mô phỏng kết quả retrieval có nhiều chunk gần trùng (cùng đoạn văn bị cắt
+chồng lấn / lặp giữa các nguồn). Đo số prompt tokens, số "facts" khác nhau
+còn giữ được (recall) và thời gian pack.
+
+Cách chạy:
+    python -m benchmarks.bench_context_packing --docs 40 --duplicate-ratio 0.4 --budget 1500
+"""
+import argparse
+import random
+import time
+from typing import List, Set
+
+from langchain_core.documents import Document
+
+from app.utils.retriever_utils import format_retrieved_docs
+from app.utils.token_utils import count_tokens
+
+WORDS = (
+    "hợp đồng lao động quy định thời gian làm việc nghỉ phép tiền lương bảo hiểm "
+    "xã hội người sử dụng lao động chấm dứt trợ cấp thôi việc thử việc điều khoản"
+).split()
+
+
+def _make_docs(n: int, duplicate_ratio: float, rng: random.Random) -> List[Document]:
+    docs = []
+    for rank in range(n):
+        if docs and rng.random() < duplicate_ratio:
+            # Near-duplicate: copy một chunk trước đó, sửa vài từ
+            source = rng.choice(docs)
+            words = source.page_content.split()
+            for _ in range(3):
+                words[rng.randrange(len(words))] = rng.choice(WORDS)
+            fact = source.metadata["fact"]
+            content = " ".join(words)
+        else:
+            fact = rank
+            body = " ".join(rng.choice(WORDS) for _ in range(rng.randint(40, 160)))
+            content = f"[fact {fact}] {body}"
+        docs.append(Document(
+            page_content=content,
+            metadata={"fact": fact, "score": 1.0 - rank / (2 * n)},
+        ))
+    return docs
+
+
+def _facts(context: str, docs: List[Document]) -> Set[int]:
+    return {doc.metadata["fact"] for doc in docs if f"[fact {doc.metadata['fact']}]" in context}
+
+
+def main(n: int, duplicate_ratio: float, budget: int) -> None:
+    rng = random.Random(0)
+    docs = _make_docs(n, duplicate_ratio, rng)
+    all_facts = {doc.metadata["fact"] for doc in docs}
+
+    # Warm-up: load tokenizer (cached) trước khi đo
+    count_tokens("warmup")
+    full = format_retrieved_docs(docs)
+    # Cách cũ: giới hạn ký tự tương ứng budget (~4 ký tự / token)
+    truncated = format_retrieved_docs(docs, max_length=budget * 4)
+    started = time.perf_counter()
+    packed = format_retrieved_docs(docs, max_tokens=budget)
+    pack_ms = (time.perf_counter() - started) * 1000
+
+    print(f"{n} docs, {len(all_facts)} distinct facts, budget {budget} tokens")
+    print(f"{'mode':<22}{'tokens':>8}{'facts':>8}{'facts/1k tok':>14}")
+    for name, context in (("all docs", full), ("max_length (chars)", truncated), ("max_tokens (packed)", packed)):
+        tokens = count_tokens(context)
+        facts = len(_facts(context, docs))
+        print(f"{name:<22}{tokens:>8}{facts:>8}{facts * 1000 / max(tokens, 1):>14.1f}")
+    print(f"pack time: {pack_ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Context packing benchmark")
+    parser.add_argument("--docs", type=int, default=40, help="Số retrieved documents")
+    parser.add_argument("--duplicate-ratio", type=float, default=0.4, help="Tỉ lệ near-duplicates")
+    parser.add_argument("--budget", type=int, default=1500, help="Token budget")
+    args = parser.parse_args()
+    main(args.docs, args.duplicate_ratio, args.budget)
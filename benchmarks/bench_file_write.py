@@ -0,0 +1,93 @@
+"""
+Benchmark - Event-loop lag khi ghi nhiều file lớn đồng thời.
+
+So sánh:
+- blocking: open(...).write ngay trên event loop (cách cũ của write_file_tool)
+- async: awrite_file (thread pool riêng + atomic rename), cách SimpleGraph ghi file
+
+Event-loop lag được đo bằng một ticker sleep 1ms và ghi lại độ trễ thực tế.
+
+Cách chạy:
+    python -m benchmarks.bench_file_write --files 8 --size-mb 32
+"""
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+from app.tools.file_tools import awrite_file, shutdown_file_executor
+
+TICK_INTERVAL = 0.001
+
+
+async def _ticker(lags: List[float], stop: asyncio.Event) -> None:
+    """Đo độ trễ của event loop so với lịch sleep."""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + TICK_INTERVAL
+        await asyncio.sleep(TICK_INTERVAL)
+        lags.append(max(0.0, loop.time() - expected))
+
+
+async def _blocking_write(file_path: str, content: str) -> None:
+    with open(file_path, "w", encoding="utf-8") as f:
+        f.write(content)
+
+
+async def _async_write(file_path: str, content: str) -> None:
+    await awrite_file(file_path, content)
+
+
+async def _run(mode: str, directory: Path, files: int, content: str) -> dict:
+    writer = _blocking_write if mode == "blocking" else _async_write
+    lags: List[float] = []
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(_ticker(lags, stop))
+    await asyncio.sleep(0.05)
+
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(writer(str(directory / f"{mode}_{i}.txt"), content) for i in range(files))
+    )
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await ticker
+    lags_ms = sorted(lag * 1000 for lag in lags) or [0.0]
+    return {
+        "mode": mode,
+        "elapsed_s": elapsed,
+        "lag_p50_ms": statistics.median(lags_ms),
+        "lag_p99_ms": lags_ms[min(len(lags_ms) - 1, int(len(lags_ms) * 0.99))],
+        "lag_max_ms": lags_ms[-1],
+        "ticks": len(lags_ms),
+    }
+
+
+async def main(files: int, size_mb: int) -> None:
+    content = ("Dòng dữ liệu mẫu cho benchmark ghi file. " * 32 + "\n") * (
+        size_mb * 1024 * 1024 // 1400
+    )
+    print(f"Writing {files} files x {len(content.encode('utf-8')) / 1e6:.1f} MB concurrently")
+    print(f"{'mode':<10}{'elapsed(s)':>12}{'lag p50(ms)':>14}{'lag p99(ms)':>14}{'lag max(ms)':>14}{'ticks':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        # Warm-up: khởi tạo thread pool trước khi đo
+        await _async_write(str(Path(tmp) / "warmup.txt"), "warmup")
+        for mode in ("blocking", "async"):
+            r = await _run(mode, Path(tmp), files, content)
+            print(
+                f"{r['mode']:<10}{r['elapsed_s']:>12.2f}{r['lag_p50_ms']:>14.2f}"
+                f"{r['lag_p99_ms']:>14.2f}{r['lag_max_ms']:>14.2f}{r['ticks']:>8}"
+            )
+    shutdown_file_executor()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Event-loop lag benchmark cho ghi file")
+    parser.add_argument("--files", type=int, default=8, help="Số file ghi đồng thời")
+    parser.add_argument("--size-mb", type=int, default=32, help="Kích thước mỗi file (MB)")
+    args = parser.parse_args()
+    asyncio.run(main(args.files, args.size_mb))
@@ -0,0 +1,97 @@
+"""
+Benchmark - Chi phí build + serialize SimpleGraphResponse theo độ dài lịch sử.
+
+So sánh:
+- validated: SimpleGraphResult(...) / SimpleGraphResponse(...) (validate đầy đủ,
+  cách các routes dựng response trước đây).
+- trusted: app.api.responses.graph_response (model_construct).
+- serialize: TypeAdapter(SimpleGraphResponse) validate (instance => không
+  validate lại) + dump_json, giống đường response_model của FastAPI.
+
+Cách chạy:
+    python -m benchmarks.bench_graph_response --lengths 10 100 1000 5000
+"""
+import argparse
+import statistics
+import time
+from typing import Any, Callable, Dict, List
+
+from pydantic import TypeAdapter
+
+from app.api.responses import graph_response
+from app.schemas.api import SimpleGraphResponse, SimpleGraphResult
+
+
+def _state(length: int) -> Dict[str, Any]:
+    messages = [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": f"message {i} " + "lorem ipsum " * 20}
+        for i in range(length)
+    ]
+    return {
+        "messages": messages,
+        "query": "q",
+        "final_response": "done",
+        "token_usage": {"prompt_tokens": 100, "completion_tokens": 20, "total_tokens": 120},
+        "intent": "question",
+        "file_path": None,
+    }
+
+
+def _validated(state: Dict[str, Any]) -> SimpleGraphResponse:
+    result = SimpleGraphResult(
+        final_response=state.get("final_response", ""),
+        messages=state.get("messages", []),
+        token_usage=state.get("token_usage", {}) or {},
+        intent=state.get("intent"),
+        file_path=state.get("file_path"),
+        file_content=None,
+    )
+    return SimpleGraphResponse(
+        success=True,
+        message="SimpleGraph executed successfully",
+        data=result,
+        thread_id="thread",
+        waiting_for_human=False,
+    )
+
+
+def _trusted(state: Dict[str, Any]) -> SimpleGraphResponse:
+    return graph_response(state, "thread", "SimpleGraph executed successfully", "paused")
+
+
+def _median_us(fn: Callable[[], Any], repeat: int) -> float:
+    timings: List[float] = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1e6)
+    return statistics.median(timings)
+
+
+def main(lengths: List[int], repeat: int) -> None:
+    adapter = TypeAdapter(SimpleGraphResponse)
+
+    def _serialize(response: SimpleGraphResponse) -> bytes:
+        return adapter.dump_json(adapter.validate_python(response))
+
+    print(f"{'messages':>9} {'validated':>12} {'trusted':>12} {'serialize':>12} {'speedup':>8}")
+    for length in lengths:
+        state = _state(length)
+        # Kết quả hai cách phải giống hệt nhau
+        assert _serialize(_validated(state)) == _serialize(_trusted(state))
+        validated_us = _median_us(lambda: _validated(state), repeat)
+        trusted_us = _median_us(lambda: _trusted(state), repeat)
+        response = _trusted(state)
+        serialize_us = _median_us(lambda: _serialize(response), repeat)
+        print(
+            f"{length:>9} {validated_us:>10.1f}us {trusted_us:>10.1f}us {serialize_us:>10.1f}us "
+            f"{(validated_us + serialize_us) / (trusted_us + serialize_us):>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lengths", type=int, nargs="+", default=[0, 10, 100, 1000, 5000])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+    main(args.lengths, args.repeat)
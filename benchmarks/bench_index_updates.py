@@ -0,0 +1,68 @@
+"""
+Benchmark - Chi phí cập nhật VectorIndex: incremental (segments + tombstones)
+so với build lại toàn bộ, và latency query trong lúc compaction chạy nền.
+
+Cách chạy:
+    python -m benchmarks.bench_index_updates --size 500000 --dim 128 --changes 1000
+"""
+import argparse
+import statistics
+import threading
+import time
+
+import numpy as np
+
+from app.utils.vector_index import INDEX_IVF, VectorIndex
+
+
+def _ms(started: float) -> float:
+    return (time.perf_counter() - started) * 1000
+
+
+def main(size: int, dim: int, changes: int) -> None:
+    rng = np.random.default_rng(0)
+    corpus = rng.standard_normal((size + changes, dim), dtype=np.float32)
+    queries = rng.standard_normal((200, dim), dtype=np.float32)
+
+    index = VectorIndex(dim=dim, index_type=INDEX_IVF)
+    index.add(corpus[:size])
+    started = time.perf_counter()
+    index.build()
+    rebuild_ms = _ms(started)
+
+    started = time.perf_counter()
+    index.add(corpus[size:])
+    add_ms = _ms(started)
+    started = time.perf_counter()
+    index.delete(rng.choice(size, changes, replace=False))
+    delete_ms = _ms(started)
+
+    print(f"n={size} dim={dim} changes={changes}")
+    print(f"{'full rebuild':<28}{rebuild_ms:>10.1f} ms")
+    print(f"{'incremental add':<28}{add_ms:>10.1f} ms")
+    print(f"{'incremental delete':<28}{delete_ms:>10.1f} ms")
+
+    latencies = [0.0]
+    compaction = threading.Thread(target=index.build)
+    started = time.perf_counter()
+    compaction.start()
+    while compaction.is_alive():
+        query = queries[len(latencies) % len(queries)]
+        query_started = time.perf_counter()
+        index.search(query, 10)
+        latencies.append(_ms(query_started))
+    compaction.join()
+    print(f"{'background compaction':<28}{_ms(started):>10.1f} ms")
+    print(
+        f"{'queries during compaction':<28}{len(latencies) - 1:>10} "
+        f"(p50 {statistics.median(latencies):.2f} ms, max {max(latencies):.2f} ms)"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark incremental updates cho VectorIndex")
+    parser.add_argument("--size", type=int, default=500_000, help="Số vectors ban đầu")
+    parser.add_argument("--dim", type=int, default=128, help="Số chiều vector")
+    parser.add_argument("--changes", type=int, default=1000, help="Số vectors add và delete")
+    args = parser.parse_args()
+    main(args.size, args.dim, args.changes)
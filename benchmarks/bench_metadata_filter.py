@@ -0,0 +1,78 @@
+"""
+Benchmark - filter_docs_by_metadata / extract_metadata: linear scan vs MetadataIndex.
+
+Cách chạy:
+    python -m benchmarks.bench_metadata_filter --docs 100000
+"""
+import argparse
+import random
+import statistics
+import time
+from typing import Callable, List
+
+from langchain_core.documents import Document
+
+from app.utils.metadata_index import MetadataIndex
+from app.utils.retriever_utils import extract_metadata, filter_docs_by_metadata
+
+FILTERS = [
+    {"source": "source_7"},
+    {"category": "law", "lang": "vi"},
+    {"source": "source_3", "category": "news", "year": 2021},
+    {"lang": "en", "year": 2019},
+]
+
+
+def _make_docs(n: int) -> List[Document]:
+    rng = random.Random(0)
+    return [
+        Document(
+            page_content=f"doc {i}",
+            metadata={
+                "id": i,
+                "source": f"source_{rng.randrange(50)}",
+                "category": rng.choice(["news", "law", "blog", "faq", "wiki"]),
+                "year": rng.randrange(2015, 2025),
+                "lang": rng.choice(["vi", "en"]),
+            },
+        )
+        for i in range(n)
+    ]
+
+
+def _time_ms(fn: Callable[[], object], repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main(n: int, repeat: int) -> None:
+    docs = _make_docs(n)
+    started = time.perf_counter()
+    index = MetadataIndex.from_documents(docs)
+    print(f"{n} documents, index build {time.perf_counter() - started:.2f}s")
+    print(f"{'filter':<58}{'matches':>9}{'scan(ms)':>10}{'index(ms)':>11}{'speedup':>9}")
+    for metadata_filter in FILTERS:
+        expected = filter_docs_by_metadata(docs, metadata_filter)
+        assert filter_docs_by_metadata(docs, metadata_filter, index=index) == expected
+        scan = _time_ms(lambda: filter_docs_by_metadata(docs, metadata_filter), repeat)
+        indexed = _time_ms(lambda: index.filter(metadata_filter), repeat)
+        print(
+            f"{str(metadata_filter):<58}{len(expected):>9}{scan:>10.2f}{indexed:>11.3f}"
+            f"{scan / indexed:>8.0f}x"
+        )
+
+    scan = _time_ms(lambda: extract_metadata(docs, "source"), repeat)
+    indexed = _time_ms(lambda: extract_metadata(docs, "source", index=index), repeat)
+    print(f"{'extract_metadata(source)':<58}{n:>9}{scan:>10.2f}{indexed:>11.3f}{scan / indexed:>8.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Metadata filter benchmark")
+    parser.add_argument("--docs", type=int, default=100_000, help="Số documents")
+    parser.add_argument("--repeat", type=int, default=10, help="Số lần lặp mỗi phép đo")
+    args = parser.parse_args()
+    main(args.docs, args.repeat)
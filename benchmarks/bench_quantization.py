@@ -0,0 +1,94 @@
+"""
+Benchmark - Memory, latency và recall@k của VectorIndex theo storage dtype.
+
+So sánh float32 / float16 / int8 (và int8 + rerank float32 từ memmap trên
+disk) với exact float32. Dữ liệu có cấu trúc cluster giống bench_vector_index.
+--add-batch > 0 add theo batch nhỏ và compact khi needs_compaction() (giống
+ingestion), thay vì một lần add toàn bộ corpus.
+
+Cách chạy:
+    python -m benchmarks.bench_quantization --size 200000 --dim 256 --index flat
+    python -m benchmarks.bench_quantization --size 20000 --add-batch 64
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from typing import List
+
+import numpy as np
+
+from app.utils.vector_index import INDEX_FLAT, VectorIndex, exact_topk
+from benchmarks.bench_vector_index import _make_corpus
+
+MODES = [
+    ("float32", False),
+    ("float16", False),
+    ("int8", False),
+    ("int8", True),
+]
+
+
+def _latencies_ms(index: VectorIndex, queries: np.ndarray, k: int) -> List[float]:
+    latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        index.search(query, k)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return sorted(latencies)
+
+
+def main(size: int, dim: int, queries: int, k: int, index_type: str, add_batch: int = 0) -> None:
+    rng = np.random.default_rng(0)
+    corpus = _make_corpus(size, dim, rng)
+    picks = rng.integers(0, size, queries)
+    query_matrix = corpus[picks] + 0.2 * rng.standard_normal((queries, dim), dtype=np.float32)
+    _, exact = exact_topk(query_matrix, corpus, k)
+
+    # Vectors float32 gốc cho rerank nằm trên disk (memmap), không tính vào RAM của index
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "vectors.f32")
+        originals = np.memmap(path, dtype=np.float32, mode="w+", shape=corpus.shape)
+        originals[:] = corpus
+        originals.flush()
+
+        print(f"n={size} dim={dim} queries={queries} k={k} index={index_type} add_batch={add_batch or size}")
+        print(f"{'mode':>14}{'memory(MB)':>12}{'p50(ms)':>10}{'p99(ms)':>10}{'recall@k':>10}")
+        for dtype, rerank in MODES:
+            index = VectorIndex(
+                dim=dim,
+                index_type=index_type,
+                dtype=dtype,
+                rerank_source=(lambda positions: originals[positions]) if rerank else None,
+            )
+            batch = add_batch or size
+            for start in range(0, size, batch):
+                index.add(corpus[start:start + batch])
+                if index.needs_compaction():
+                    index.build()
+            index.build()
+            latencies = _latencies_ms(index, query_matrix, k)
+            _, positions = index.search(query_matrix, k)
+            recall = np.mean([
+                len(set(a.tolist()) & set(b.tolist())) / k for a, b in zip(exact, positions)
+            ])
+            label = f"{dtype}+rerank" if rerank else dtype
+            print(
+                f"{label:>14}{index.memory_bytes / 2**20:>12.1f}{statistics.median(latencies):>10.2f}"
+                f"{latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]:>10.2f}{recall:>10.3f}"
+            )
+            del index
+        del originals
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark quantized storage cho VectorIndex")
+    parser.add_argument("--size", type=int, default=200_000, help="Số vectors")
+    parser.add_argument("--dim", type=int, default=256, help="Số chiều vector")
+    parser.add_argument("--queries", type=int, default=100, help="Số queries đo")
+    parser.add_argument("--k", type=int, default=10, help="Top-k")
+    parser.add_argument("--index", default=INDEX_FLAT, help="flat hoặc ivf")
+    parser.add_argument("--add-batch", type=int, default=0, help="Số vectors mỗi lần add (0 = add một lần)")
+    args = parser.parse_args()
+    main(args.size, args.dim, args.queries, args.k, args.index, args.add_batch)
@@ -0,0 +1,93 @@
+"""
+Benchmark - Query latency của VectorIndex (flat vs IVF) theo kích thước corpus.
+
+Dữ liệu: vectors ngẫu nhiên có cấu trúc cluster (gần với embeddings thật hơn
+nhiễu Gaussian thuần). Recall@k của IVF được đo so với flat (exact).
+
+Memory ~ n * dim * 4 bytes (1M x 256 ~ 1 GB), giảm --dim nếu máy ít RAM.
+
+Cách chạy:
+    python -m benchmarks.bench_vector_index --sizes 10000 100000 1000000 --dim 256
+"""
+import argparse
+import statistics
+import time
+from typing import List
+
+import numpy as np
+
+from app.utils.vector_index import INDEX_FLAT, INDEX_IVF, VectorIndex
+
+
+def _make_corpus(n: int, dim: int, rng: np.random.Generator) -> np.ndarray:
+    n_topics = max(16, int(np.sqrt(n)))
+    topics = rng.standard_normal((n_topics, dim)).astype(np.float32)
+    corpus = np.empty((n, dim), dtype=np.float32)
+    step = 100_000
+    for start in range(0, n, step):
+        rows = min(step, n - start)
+        corpus[start:start + rows] = topics[rng.integers(0, n_topics, rows)]
+        corpus[start:start + rows] += 0.5 * rng.standard_normal((rows, dim), dtype=np.float32)
+    return corpus
+
+
+def _latencies_ms(index: VectorIndex, queries: np.ndarray, k: int) -> List[float]:
+    latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        index.search(query, k)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return sorted(latencies)
+
+
+def main(sizes: List[int], dim: int, queries: int, k: int, n_probe: int) -> None:
+    rng = np.random.default_rng(0)
+    print(f"dim={dim} queries={queries} k={k} n_probe={n_probe}")
+    print(
+        f"{'n':>10}{'mode':>6}{'build(s)':>10}{'p50(ms)':>10}{'p99(ms)':>10}"
+        f"{'batch qps':>11}{'recall@k':>10}"
+    )
+    for n in sizes:
+        corpus = _make_corpus(n, dim, rng)
+        picks = rng.integers(0, n, queries)
+        query_matrix = corpus[picks] + 0.2 * rng.standard_normal((queries, dim), dtype=np.float32)
+
+        exact = None
+        for mode in (INDEX_FLAT, INDEX_IVF):
+            index = VectorIndex(dim=dim, index_type=mode, n_probe=n_probe)
+            index.add(corpus)
+            started = time.perf_counter()
+            index.build()
+            build_s = time.perf_counter() - started
+
+            latencies = _latencies_ms(index, query_matrix, k)
+            started = time.perf_counter()
+            _, positions = index.search(query_matrix, k)
+            batch_qps = queries / (time.perf_counter() - started)
+
+            if exact is None:
+                exact = positions
+            recall = np.mean([
+                len(set(a.tolist()) & set(b.tolist())) / k for a, b in zip(exact, positions)
+            ])
+            print(
+                f"{n:>10}{mode:>6}{build_s:>10.2f}{statistics.median(latencies):>10.2f}"
+                f"{latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]:>10.2f}"
+                f"{batch_qps:>11.0f}{recall:>10.3f}"
+            )
+            del index
+        del corpus
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query latency benchmark cho VectorIndex")
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000],
+        help="Số vectors trong corpus",
+    )
+    parser.add_argument("--dim", type=int, default=256, help="Số chiều vector")
+    parser.add_argument("--queries", type=int, default=100, help="Số queries đo")
+    parser.add_argument("--k", type=int, default=10, help="Top-k")
+    parser.add_argument("--n-probe", type=int, default=16, help="Số IVF lists scan mỗi query")
+    args = parser.parse_args()
+    main(args.sizes, args.dim, args.queries, args.k, args.n_probe)
@@ -0,0 +1,394 @@
+"""
+Load Test - Sinh tải end-to-end cho /graph/simple/start và /continue.
+
+Mỗi "turn" là một kịch bản của user:
+- question: POST /start với một câu hỏi (trả lời trực tiếp).
+- request: POST /start với yêu cầu ghi file; nếu server trả về
+  waiting_for_human thì POST /continue với quyết định approve/reject
+  (human-in-the-loop).
+
+Turns đến theo quá trình Poisson (open loop, --rate turns/giây; 0 = closed
+loop, luôn giữ đủ --concurrency turns đang chạy) và bị chặn bởi
+--concurrency. Latency được đo theo từng endpoint; request lỗi là HTTP
+status >= 400, lỗi kết nối/timeout hoặc body có success = false.
+
+Report (JSON) gồm p50/p95/p99/mean latency, throughput và error rate.
+--save-baseline ghi report làm baseline; --baseline so sánh và trả về exit
+code 1 nếu latency/throughput kém hơn baseline quá --tolerance (tương đối)
+hoặc error rate tăng quá --error-tolerance (tuyệt đối).
+
+Cách chạy (offline với stub):
+    python -m benchmarks.openai_stub --port 8100 --ttft-ms 200 --random-enums
+    OPENAI_BASE_URL=http://127.0.0.1:8100/v1 OPENAI_API_KEY=stub uvicorn app.main:app --port 8000
+    python -m benchmarks.loadtest --url http://127.0.0.1:8000 --turns 500 --rate 20 \\
+        --concurrency 32 --save-baseline benchmarks/baselines/simple_graph.json
+    python -m benchmarks.loadtest --url http://127.0.0.1:8000 --turns 500 --rate 20 \\
+        --concurrency 32 --baseline benchmarks/baselines/simple_graph.json --tolerance 0.15
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import sys
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence
+
+import httpx
+
+ENDPOINT_START = "start"
+ENDPOINT_CONTINUE = "continue"
+PERCENTILES = (50, 95, 99)
+
+QUESTIONS = [
+    "LangGraph là gì?",
+    "Giải thích human-in-the-loop trong một đoạn ngắn.",
+    "So sánh asyncio và threading trong Python.",
+    "Vector index IVF hoạt động như thế nào?",
+]
+FILE_REQUESTS = [
+    "Tạo file notes.txt ghi lại các bước deploy.",
+    "Ghi file todo.md với danh sách việc cần làm tuần này.",
+    "Tạo file config.yaml mẫu cho service.",
+]
+
+
+@dataclass
+class Sample:
+    """Kết quả của một HTTP request."""
+
+    endpoint: str
+    latency_ms: float
+    ok: bool
+    status: int  # 0 = lỗi kết nối / timeout
+    error: Optional[str] = None
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """
+    Percentile nội suy tuyến tính (giống numpy.percentile mặc định).
+
+    Args:
+        values: Các giá trị (không cần sắp xếp)
+        q: Percentile trong [0, 100]
+
+    Returns:
+        Giá trị percentile (nan nếu values rỗng)
+    """
+    if not values:
+        return math.nan
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * q / 100
+    low = math.floor(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def _latency_stats(samples: Sequence[Sample], duration_s: float) -> Dict[str, Any]:
+    latencies = [sample.latency_ms for sample in samples]
+    errors = sum(1 for sample in samples if not sample.ok)
+    stats: Dict[str, Any] = {
+        "count": len(samples),
+        "errors": errors,
+        "error_rate": errors / len(samples) if samples else 0.0,
+        "throughput_rps": len(samples) / duration_s if duration_s > 0 else 0.0,
+        "mean_ms": sum(latencies) / len(latencies) if latencies else math.nan,
+    }
+    for q in PERCENTILES:
+        stats[f"p{q}_ms"] = percentile(latencies, q)
+    return stats
+
+
+def summarize(samples: Sequence[Sample], turns: Dict[str, int], duration_s: float) -> Dict[str, Any]:
+    """
+    Tổng hợp samples thành report.
+
+    Args:
+        samples: Tất cả requests đã gửi
+        turns: Số turns đã chạy theo loại (question, request, hitl)
+        duration_s: Thời gian chạy (giây)
+
+    Returns:
+        Report dict: overall + theo endpoint, cùng error breakdown
+    """
+    error_counts: Dict[str, int] = {}
+    for sample in samples:
+        if not sample.ok:
+            key = sample.error or f"HTTP {sample.status}"
+            error_counts[key] = error_counts.get(key, 0) + 1
+    return {
+        "duration_s": duration_s,
+        "turns": dict(turns),
+        "turns_per_sec": sum(turns.get(kind, 0) for kind in ("question", "request")) / duration_s
+        if duration_s > 0 else 0.0,
+        "overall": _latency_stats(samples, duration_s),
+        "endpoints": {
+            endpoint: _latency_stats([s for s in samples if s.endpoint == endpoint], duration_s)
+            for endpoint in (ENDPOINT_START, ENDPOINT_CONTINUE)
+        },
+        "error_breakdown": error_counts,
+    }
+
+
+def compare_reports(
+    report: Dict[str, Any],
+    baseline: Dict[str, Any],
+    tolerance: float = 0.1,
+    error_tolerance: float = 0.01,
+) -> List[str]:
+    """
+    So sánh report với baseline.
+
+    Args:
+        report: Report của lần chạy hiện tại
+        baseline: Report baseline
+        tolerance: Mức kém hơn tương đối cho phép của latency và throughput
+        error_tolerance: Mức tăng tuyệt đối cho phép của error rate
+
+    Returns:
+        Danh sách regressions (rỗng = đạt)
+    """
+    regressions = []
+    sections = [("overall", report.get("overall", {}), baseline.get("overall", {}))]
+    for endpoint, base_stats in baseline.get("endpoints", {}).items():
+        sections.append((endpoint, report.get("endpoints", {}).get(endpoint, {}), base_stats))
+
+    for name, current, base in sections:
+        # Endpoint không có request trong baseline (vd. không có lượt HITL) => bỏ qua
+        if not base.get("count"):
+            continue
+        for q in PERCENTILES:
+            key = f"p{q}_ms"
+            limit = base[key] * (1 + tolerance)
+            if current.get(key, math.inf) > limit:
+                regressions.append(
+                    f"{name}.{key}: {current.get(key, math.nan):.1f} > {limit:.1f} (baseline {base[key]:.1f})"
+                )
+        limit = base["error_rate"] + error_tolerance
+        if current.get("error_rate", 1.0) > limit:
+            regressions.append(
+                f"{name}.error_rate: {current.get('error_rate', math.nan):.4f} > {limit:.4f}"
+            )
+
+    limit = baseline["overall"]["throughput_rps"] * (1 - tolerance)
+    if report["overall"]["throughput_rps"] < limit:
+        regressions.append(
+            f"overall.throughput_rps: {report['overall']['throughput_rps']:.2f} < {limit:.2f}"
+        )
+    return regressions
+
+
+class LoadGenerator:
+    """
+    Chạy các turns question/request lên API graph và thu samples.
+    """
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        api_prefix: str = "/api/v1",
+        request_ratio: float = 0.3,
+        approve_ratio: float = 0.5,
+        seed: Optional[int] = None,
+    ):
+        """
+        Initialize generator.
+
+        Args:
+            client: httpx.AsyncClient (base_url trỏ tới app)
+            api_prefix: Prefix của API (settings.api_prefix)
+            request_ratio: Tỉ lệ turns là yêu cầu ghi file (HITL)
+            approve_ratio: Tỉ lệ /continue là approve (còn lại reject, không ghi file)
+            seed: Seed cho việc chọn kịch bản
+        """
+        self.client = client
+        self.base_path = f"{api_prefix.rstrip('/')}/graph/simple"
+        self.request_ratio = request_ratio
+        self.approve_ratio = approve_ratio
+        self.rng = random.Random(seed)
+        self.samples: List[Sample] = []
+        self.turns = {"question": 0, "request": 0, "hitl": 0}
+
+    async def _post(self, endpoint: str, path: str, payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        started = time.perf_counter()
+        try:
+            response = await self.client.post(f"{self.base_path}{path}", json=payload)
+        except httpx.HTTPError as e:
+            self.samples.append(Sample(endpoint, (time.perf_counter() - started) * 1000, False, 0, type(e).__name__))
+            return None
+        latency_ms = (time.perf_counter() - started) * 1000
+
+        body = None
+        try:
+            body = response.json()
+        except ValueError:
+            pass
+        ok = response.status_code < 400 and isinstance(body, dict) and body.get("success", False)
+        error = None
+        if not ok and response.status_code < 400:
+            error = "success=false"
+        self.samples.append(Sample(endpoint, latency_ms, ok, response.status_code, error))
+        return body if ok else None
+
+    async def run_turn(self) -> None:
+        """Chạy một turn (question hoặc request + continue nếu bị interrupt)."""
+        if self.rng.random() >= self.request_ratio:
+            self.turns["question"] += 1
+            await self._post(ENDPOINT_START, "/start", {"query": self.rng.choice(QUESTIONS)})
+            return
+
+        self.turns["request"] += 1
+        body = await self._post(ENDPOINT_START, "/start", {"query": self.rng.choice(FILE_REQUESTS)})
+        if not body or not body.get("waiting_for_human") or not body.get("thread_id"):
+            return
+        self.turns["hitl"] += 1
+        decision = "approve" if self.rng.random() < self.approve_ratio else "reject"
+        await self._post(ENDPOINT_CONTINUE, f"/{body['thread_id']}/continue", {"human_input": decision})
+
+    async def run(self, turns: int, concurrency: int, rate: float = 0.0) -> float:
+        """
+        Chạy `turns` turns.
+
+        Args:
+            turns: Tổng số turns
+            concurrency: Số turns chạy đồng thời tối đa
+            rate: Arrival rate (turns/giây, Poisson); 0 = closed loop
+
+        Returns:
+            Thời gian chạy (giây)
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def _bounded() -> None:
+            async with semaphore:
+                await self.run_turn()
+
+        started = time.perf_counter()
+        tasks = []
+        for _ in range(turns):
+            # Closed loop (rate = 0): mọi turns xếp hàng ngay, semaphore giữ đúng concurrency
+            if rate > 0:
+                await asyncio.sleep(self.rng.expovariate(rate))
+            tasks.append(asyncio.create_task(_bounded()))
+        await asyncio.gather(*tasks)
+        return time.perf_counter() - started
+
+    def report(self, duration_s: float) -> Dict[str, Any]:
+        return summarize(self.samples, self.turns, duration_s)
+
+
+async def run_load(
+    url: str,
+    turns: int,
+    concurrency: int,
+    rate: float = 0.0,
+    api_prefix: str = "/api/v1",
+    request_ratio: float = 0.3,
+    approve_ratio: float = 0.5,
+    timeout: float = 120.0,
+    seed: Optional[int] = None,
+    transport: Optional[httpx.AsyncBaseTransport] = None,
+) -> Dict[str, Any]:
+    """
+    Chạy load test và trả về report.
+
+    Args:
+        url: Base URL của app
+        turns: Tổng số turns
+        concurrency: Số turns chạy đồng thời tối đa
+        rate: Arrival rate (turns/giây); 0 = closed loop
+        api_prefix: Prefix của API
+        request_ratio: Tỉ lệ turns yêu cầu ghi file
+        approve_ratio: Tỉ lệ approve trong /continue
+        timeout: Timeout mỗi request (giây)
+        seed: Seed chọn kịch bản / arrivals
+        transport: Transport tùy chọn (vd. httpx.ASGITransport để test in-process)
+
+    Returns:
+        Report dict (xem summarize) kèm config của lần chạy
+    """
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, timeout=timeout, limits=limits, transport=transport) as client:
+        generator = LoadGenerator(client, api_prefix, request_ratio, approve_ratio, seed)
+        duration_s = await generator.run(turns, concurrency, rate)
+    report = generator.report(duration_s)
+    report["config"] = {
+        "turns": turns,
+        "concurrency": concurrency,
+        "rate": rate,
+        "request_ratio": request_ratio,
+        "approve_ratio": approve_ratio,
+    }
+    return report
+
+
+def _print_report(report: Dict[str, Any]) -> None:
+    print(
+        f"duration {report['duration_s']:.1f}s | turns {report['turns']} | "
+        f"{report['turns_per_sec']:.2f} turns/s"
+    )
+    print(f"{'endpoint':<10} {'count':>7} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>8}")
+    rows = [("overall", report["overall"]), *report["endpoints"].items()]
+    for name, stats in rows:
+        print(
+            f"{name:<10} {stats['count']:>7} {stats['throughput_rps']:>8.2f} "
+            f"{stats['p50_ms']:>9.1f} {stats['p95_ms']:>9.1f} {stats['p99_ms']:>9.1f} "
+            f"{stats['error_rate']:>7.1%}"
+        )
+    for error, count in report["error_breakdown"].items():
+        print(f"  {error}: {count}")
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """Main function (exit code 1 nếu regression so với baseline)."""
+    parser = argparse.ArgumentParser(description="Load test /graph/simple/start và /continue")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--api-prefix", default="/api/v1")
+    parser.add_argument("--turns", type=int, default=200, help="Tổng số turns")
+    parser.add_argument("--concurrency", type=int, default=16, help="Số turns đồng thời tối đa")
+    parser.add_argument("--rate", type=float, default=0.0, help="Arrival rate (turns/giây), 0 = closed loop")
+    parser.add_argument("--request-ratio", type=float, default=0.3, help="Tỉ lệ turns yêu cầu ghi file (HITL)")
+    parser.add_argument("--approve-ratio", type=float, default=0.5, help="Tỉ lệ approve trong /continue")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Timeout mỗi request (giây)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Ghi report JSON ra file")
+    parser.add_argument("--save-baseline", help="Ghi report làm baseline")
+    parser.add_argument("--baseline", help="So sánh với baseline JSON")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Regression tương đối cho phép")
+    parser.add_argument("--error-tolerance", type=float, default=0.01, help="Error rate tăng thêm cho phép")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run_load(
+        args.url,
+        turns=args.turns,
+        concurrency=args.concurrency,
+        rate=args.rate,
+        api_prefix=args.api_prefix,
+        request_ratio=args.request_ratio,
+        approve_ratio=args.approve_ratio,
+        timeout=args.timeout,
+        seed=args.seed,
+    ))
+    _print_report(report)
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2, ensure_ascii=False)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_reports(report, baseline, args.tolerance, args.error_tolerance)
+        if regressions:
+            print("REGRESSION so với baseline:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print("OK: không có regression so với baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,419 @@
+"""
+OpenAI Stub - Server local nói chat-completions API để load test offline.
+
+Hỗ trợ:
+- POST /v1/chat/completions: text, streaming (SSE, kể cả usage chunk),
+  structured output (response_format json_schema/json_object và function
+  calling qua tools) - JSON được sinh từ schema nên parse được thành model.
+- POST /v1/embeddings: vectors deterministic theo hash của input.
+- GET /v1/models, GET /stub/stats, PUT /stub/config (đổi cấu hình khi đang chạy).
+
+Latency: time-to-first-token lấy mẫu lognormal (median ttft_ms, độ lệch
+ttft_sigma), sau đó sinh tokens với tốc độ tokens_per_sec. Tỉ lệ lỗi 500 và
+429 (kèm retry-after) cấu hình được.
+
+Prefix caching giả lập như OpenAI: các system messages đầu prompt đã gặp và
+dài từ prefix_cache_min_tokens được báo trong
+usage.prompt_tokens_details.cached_tokens (làm tròn xuống bội số 128), TTFT
+giảm theo tỉ lệ cached_ttft_saving.
+
+Cách chạy:
+    python -m benchmarks.openai_stub --port 8100 --ttft-ms 400 --tokens-per-sec 60
+    OPENAI_BASE_URL=http://127.0.0.1:8100/v1 OPENAI_API_KEY=stub uvicorn app.main:app
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import random
+import time
+import uuid
+from dataclasses import asdict, dataclass, fields
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import numpy as np
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from app.utils.token_utils import count_tokens
+
+_WORDS = (
+    "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor "
+    "incididunt ut labore et dolore magna aliqua"
+).split()
+# Structured output được stream theo từng đoạn ~ 1 token
+_CHARS_PER_TOKEN = 4
+
+
+@dataclass
+class StubConfig:
+    """Cấu hình latency/lỗi của stub."""
+
+    ttft_ms: float = 300.0  # Median time-to-first-token
+    ttft_sigma: float = 0.3  # Sigma của lognormal (0 = cố định)
+    tokens_per_sec: float = 50.0  # Tốc độ sinh tokens sau token đầu
+    completion_tokens: int = 64  # Số tokens mặc định của câu trả lời text
+    error_rate: float = 0.0  # Tỉ lệ request trả về 500
+    rate_limit_rate: float = 0.0  # Tỉ lệ request trả về 429
+    retry_after_ms: int = 200  # Header retry-after-ms của 429
+    embedding_dim: int = 1536
+    embedding_latency_ms: float = 20.0
+    random_enums: bool = False  # Chọn enum ngẫu nhiên (vd. intent question/request) thay vì giá trị đầu
+    prefix_cache_min_tokens: int = 1024  # Độ dài prefix tối thiểu để được cache (0 = tắt)
+    cached_ttft_saving: float = 0.5  # TTFT giảm theo tỉ lệ cached tokens * saving
+    seed: Optional[int] = None
+
+    def update(self, values: Dict[str, Any]) -> None:
+        names = {field.name for field in fields(self)}
+        for key, value in values.items():
+            if key not in names:
+                raise ValueError(f"Unknown stub config: {key}")
+            setattr(self, key, value)
+
+
+def sample_from_schema(
+    schema: Dict[str, Any],
+    defs: Optional[Dict[str, Any]] = None,
+    rng: Optional[random.Random] = None,
+) -> Any:
+    """
+    Sinh một instance hợp lệ (tối thiểu) từ JSON schema.
+
+    Args:
+        schema: JSON schema (hỗ trợ $ref/$defs, anyOf/oneOf/allOf, enum, const, default)
+        defs: Definitions để resolve $ref (mặc định lấy từ schema gốc)
+        rng: Nếu có, enum được chọn ngẫu nhiên thay vì giá trị đầu tiên
+
+    Returns:
+        Giá trị Python tương ứng
+    """
+    if defs is None:
+        defs = {**schema.get("definitions", {}), **schema.get("$defs", {})}
+    if "$ref" in schema:
+        return sample_from_schema(defs[schema["$ref"].split("/")[-1]], defs, rng)
+    for key in ("const", "default"):
+        if key in schema:
+            return schema[key]
+    if schema.get("enum"):
+        return rng.choice(schema["enum"]) if rng is not None else schema["enum"][0]
+    for key in ("anyOf", "oneOf", "allOf"):
+        options = [option for option in schema.get(key, []) if option.get("type") != "null"]
+        if options:
+            return sample_from_schema(options[0], defs, rng)
+
+    schema_type = schema.get("type", "object" if "properties" in schema else "string")
+    if isinstance(schema_type, list):
+        schema_type = next((t for t in schema_type if t != "null"), "null")
+    if schema_type == "object":
+        return {
+            name: sample_from_schema(prop, defs, rng)
+            for name, prop in schema.get("properties", {}).items()
+        }
+    if schema_type == "array":
+        count = max(schema.get("minItems", 1), 1)
+        return [sample_from_schema(schema.get("items", {}), defs, rng) for _ in range(count)]
+    if schema_type == "integer":
+        return int(schema.get("minimum", 0))
+    if schema_type == "number":
+        return float(schema.get("minimum", 0.0))
+    if schema_type == "boolean":
+        return False
+    if schema_type == "null":
+        return None
+    return "stub"
+
+
+def _prompt_tokens(messages: List[Dict[str, Any]]) -> int:
+    total = 0
+    for message in messages:
+        content = message.get("content") or ""
+        if isinstance(content, list):
+            content = " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+        # ~4 tokens overhead mỗi message như chat format của OpenAI
+        total += count_tokens(str(content)) + 4
+    return total
+
+
+def _cached_prefix_tokens(messages: List[Dict[str, Any]], seen: Dict[str, None], min_tokens: int) -> int:
+    """Số prompt tokens được "cache hit" (prefix system messages đã gặp trước đó)."""
+    prefix = []
+    for message in messages:
+        if message.get("role") not in ("system", "developer"):
+            break
+        prefix.append(message)
+    tokens = _prompt_tokens(prefix)
+    if not min_tokens or tokens < min_tokens:
+        return 0
+    key = hashlib.sha256(json.dumps(prefix, sort_keys=True).encode("utf-8")).hexdigest()
+    if key not in seen:
+        if len(seen) >= 1024:
+            seen.pop(next(iter(seen)))
+        seen[key] = None
+        return 0
+    return tokens // 128 * 128
+
+
+def _text_pieces(n_tokens: int) -> List[str]:
+    return [(" " if i else "") + _WORDS[i % len(_WORDS)] for i in range(n_tokens)]
+
+
+def _json_pieces(payload: str) -> List[str]:
+    return [payload[i:i + _CHARS_PER_TOKEN] for i in range(0, len(payload), _CHARS_PER_TOKEN)] or [""]
+
+
+def _selected_tool(body: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Tool mà model giả lập sẽ gọi (None = trả lời text)."""
+    tools = [tool for tool in body.get("tools") or [] if tool.get("type") == "function"]
+    choice = body.get("tool_choice")
+    if not tools or choice == "none":
+        return None
+    if isinstance(choice, dict):
+        name = choice.get("function", {}).get("name")
+        return next((tool for tool in tools if tool["function"]["name"] == name), tools[0])
+    return tools[0]
+
+
+def _embedding(text: str, dim: int) -> List[float]:
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+def create_stub_app(config: Optional[StubConfig] = None) -> FastAPI:
+    """
+    Tạo FastAPI app của stub.
+
+    Args:
+        config: Cấu hình latency/lỗi (None = mặc định)
+
+    Returns:
+        FastAPI app
+    """
+    config = config or StubConfig()
+    rng = random.Random(config.seed)
+    stats = {
+        "requests": 0, "rate_limited": 0, "errors": 0,
+        "completion_tokens": 0, "prompt_tokens": 0, "cached_tokens": 0,
+    }
+    seen_prefixes: Dict[str, None] = {}
+    app = FastAPI(title="OpenAI stub")
+
+    def _ttft() -> float:
+        return config.ttft_ms / 1000 * math.exp(config.ttft_sigma * rng.gauss(0.0, 1.0))
+
+    def _injected_error() -> Optional[JSONResponse]:
+        roll = rng.random()
+        if roll < config.rate_limit_rate:
+            stats["rate_limited"] += 1
+            return JSONResponse(
+                status_code=429,
+                content={"error": {
+                    "message": "Rate limit reached (stub)",
+                    "type": "rate_limit_error",
+                    "code": "rate_limit_exceeded",
+                }},
+                headers={
+                    "retry-after-ms": str(config.retry_after_ms),
+                    "retry-after": str(max(1, math.ceil(config.retry_after_ms / 1000))),
+                },
+            )
+        if roll < config.rate_limit_rate + config.error_rate:
+            stats["errors"] += 1
+            return JSONResponse(
+                status_code=500,
+                content={"error": {"message": "Internal error (stub)", "type": "server_error", "code": None}},
+            )
+        return None
+
+    @app.get("/v1/models")
+    async def list_models():
+        return {"object": "list", "data": [{"id": "stub", "object": "model", "owned_by": "stub"}]}
+
+    @app.get("/stub/stats")
+    async def get_stats():
+        return {**stats, "config": asdict(config)}
+
+    @app.put("/stub/config")
+    async def put_config(request: Request):
+        try:
+            config.update(await request.json())
+        except ValueError as e:
+            return JSONResponse(status_code=400, content={"error": {"message": str(e)}})
+        return asdict(config)
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        stats["requests"] += 1
+        error = _injected_error()
+        if error is not None:
+            return error
+        inputs = body.get("input")
+        inputs = [inputs] if isinstance(inputs, str) else list(inputs or [])
+        inputs = [text if isinstance(text, str) else " ".join(map(str, text)) for text in inputs]
+        await asyncio.sleep(config.embedding_latency_ms / 1000)
+        dim = body.get("dimensions") or config.embedding_dim
+        tokens = sum(count_tokens(text) for text in inputs)
+        stats["prompt_tokens"] += tokens
+        return {
+            "object": "list",
+            "model": body.get("model", "stub"),
+            "data": [
+                {"object": "embedding", "index": i, "embedding": _embedding(text, dim)}
+                for i, text in enumerate(inputs)
+            ],
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        }
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        stats["requests"] += 1
+        error = _injected_error()
+        if error is not None:
+            return error
+
+        model = body.get("model", "stub")
+        prompt_tokens = _prompt_tokens(body.get("messages", []))
+        cached_tokens = _cached_prefix_tokens(body.get("messages", []), seen_prefixes, config.prefix_cache_min_tokens)
+        max_tokens = body.get("max_completion_tokens") or body.get("max_tokens")
+        tool = _selected_tool(body)
+        enum_rng = rng if config.random_enums else None
+        response_format = body.get("response_format") or {}
+        if tool is not None:
+            payload = json.dumps(sample_from_schema(tool["function"].get("parameters", {}), rng=enum_rng))
+            pieces = _json_pieces(payload)
+        elif response_format.get("type") == "json_schema":
+            payload = json.dumps(sample_from_schema(response_format["json_schema"].get("schema", {}), rng=enum_rng))
+            pieces = _json_pieces(payload)
+        elif response_format.get("type") == "json_object":
+            pieces = ["{}"]
+        else:
+            pieces = _text_pieces(min(config.completion_tokens, max_tokens or config.completion_tokens))
+        completion_tokens = len(pieces)
+        stats["prompt_tokens"] += prompt_tokens
+        stats["completion_tokens"] += completion_tokens
+        stats["cached_tokens"] += cached_tokens
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": cached_tokens},
+        }
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+        finish_reason = "tool_calls" if tool is not None else "stop"
+        ttft = _ttft() * (1 - config.cached_ttft_saving * cached_tokens / max(prompt_tokens, 1))
+        generation = max(completion_tokens - 1, 0) / config.tokens_per_sec
+
+        if not body.get("stream"):
+            await asyncio.sleep(ttft + generation)
+            message: Dict[str, Any] = {"role": "assistant", "content": None, "refusal": None}
+            if tool is not None:
+                message["tool_calls"] = [{
+                    "id": f"call_{uuid.uuid4().hex[:24]}",
+                    "type": "function",
+                    "function": {"name": tool["function"]["name"], "arguments": "".join(pieces)},
+                }]
+            else:
+                message["content"] = "".join(pieces)
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "system_fingerprint": "stub",
+                "choices": [{"index": 0, "message": message, "finish_reason": finish_reason, "logprobs": None}],
+                "usage": usage,
+            }
+
+        include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+
+        def chunk(delta: Dict[str, Any], finish: Optional[str] = None, **extra: Any) -> str:
+            data = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "system_fingerprint": "stub",
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish, "logprobs": None}],
+                **extra,
+            }
+            return f"data: {json.dumps(data)}\n\n"
+
+        async def events() -> AsyncIterator[str]:
+            started = time.perf_counter()
+            await asyncio.sleep(ttft)
+            if tool is not None:
+                yield chunk({"role": "assistant", "content": None, "tool_calls": [{
+                    "index": 0,
+                    "id": f"call_{uuid.uuid4().hex[:24]}",
+                    "type": "function",
+                    "function": {"name": tool["function"]["name"], "arguments": ""},
+                }]})
+            else:
+                yield chunk({"role": "assistant", "content": ""})
+            for i, piece in enumerate(pieces):
+                # Token i phát ra tại ttft + i / tokens_per_sec (không tích lũy sai số sleep)
+                delay = started + ttft + i / config.tokens_per_sec - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                if tool is not None:
+                    yield chunk({"tool_calls": [{"index": 0, "function": {"arguments": piece}}]})
+                else:
+                    yield chunk({"content": piece})
+            yield chunk({}, finish_reason)
+            if include_usage:
+                data = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [],
+                    "usage": usage,
+                }
+                yield f"data: {json.dumps(data)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(description="Stub server tương thích OpenAI cho load test offline")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--ttft-ms", type=float, default=300.0, help="Median time-to-first-token (ms)")
+    parser.add_argument("--ttft-sigma", type=float, default=0.3, help="Sigma lognormal của TTFT (0 = cố định)")
+    parser.add_argument("--tokens-per-sec", type=float, default=50.0, help="Tốc độ sinh tokens")
+    parser.add_argument("--completion-tokens", type=int, default=64, help="Độ dài câu trả lời text (tokens)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Tỉ lệ lỗi 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Tỉ lệ lỗi 429")
+    parser.add_argument("--retry-after-ms", type=int, default=200, help="retry-after-ms của 429")
+    parser.add_argument("--embedding-dim", type=int, default=1536)
+    parser.add_argument("--embedding-latency-ms", type=float, default=20.0)
+    parser.add_argument(
+        "--random-enums", action="store_true",
+        help="Chọn enum ngẫu nhiên (intent question/request => có cả lượt human-in-the-loop)",
+    )
+    parser.add_argument(
+        "--prefix-cache-min-tokens", type=int, default=1024,
+        help="Độ dài system prefix tối thiểu để giả lập cache hit (0 = tắt)",
+    )
+    parser.add_argument("--cached-ttft-saving", type=float, default=0.5, help="TTFT giảm theo tỉ lệ cached tokens")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    config = StubConfig(**{
+        field.name: getattr(args, field.name) for field in fields(StubConfig)
+    })
+    uvicorn.run(create_stub_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Tests cho hủy work khi client ngắt kết nối (app/core/cancellation.py).
+"""
+import asyncio
+import json
+
+import httpx
+from fastapi import FastAPI, Request
+from langchain_openai import ChatOpenAI
+
+from app.core.cancellation import complete_despite_cancel, run_until_disconnected
+from app.core.exceptions import ClientDisconnectedError
+from app.graph.pending_requests import MemoryPendingStore
+from app.graph.simple_graph import SimpleGraph
+from app.graph.thread_status import thread_status_registry, STATUS_CANCELLED, STATUS_COMPLETED
+from benchmarks.openai_stub import StubConfig, create_stub_app
+
+
+def test_work_is_cancelled_when_client_disconnects():
+    """Test client disconnect => work bị cancel, endpoint nhận ClientDisconnectedError."""
+    events = []
+    app = FastAPI()
+
+    async def slow_work():
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            events.append("work cancelled")
+            raise
+
+    @app.post("/work")
+    async def work(payload: dict, request: Request):
+        try:
+            return await run_until_disconnected(request, slow_work(), name="slow work")
+        except ClientDisconnectedError as e:
+            events.append(e.status_code)
+            return {"cancelled": True}
+
+    async def scenario():
+        body = json.dumps({"x": 1}).encode()
+        messages = [{"type": "http.request", "body": body, "more_body": False}]
+
+        async def receive():
+            if messages:
+                return messages.pop(0)
+            await asyncio.sleep(0.05)
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            pass
+
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+            "scheme": "http", "path": "/work", "raw_path": b"/work", "query_string": b"",
+            "headers": [(b"content-type", b"application/json")], "server": ("test", 80), "client": ("test", 1),
+        }
+        await asyncio.wait_for(app(scope, receive, send), timeout=2)
+
+    asyncio.run(scenario())
+    assert events == ["work cancelled", 499]
+
+
+def test_commit_completes_when_cancelled_midway():
+    """Test cancel giữa đoạn commit bị hoãn: commit chạy xong, code sau commit vẫn chạy."""
+    state = []
+
+    async def commit():
+        await asyncio.sleep(0.05)
+        state.append("written")
+        return "ok"
+
+    async def work():
+        result = await complete_despite_cancel(commit())
+        state.append("pending cleared")
+        return result
+
+    async def scenario():
+        task = asyncio.ensure_future(work())
+        await asyncio.sleep(0.01)
+        task.cancel()
+        return await task
+
+    assert asyncio.run(scenario()) == "ok"
+    assert state == ["written", "pending cleared"]
+
+
+def test_cancelled_graph_keeps_no_half_written_pending_state(tmp_path):
+    """Test hủy SimpleGraph khi đang chờ LLM: status cancelled, không có pending request dở dang."""
+    stub = create_stub_app(StubConfig(ttft_ms=5000.0, ttft_sigma=0.0, seed=0))
+    thread_id = "cancel-thread"
+    pending = MemoryPendingStore()
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=stub)) as http_client:
+            llm = ChatOpenAI(model="stub", api_key="stub", base_url="http://stub/v1", http_async_client=http_client)
+            graph = SimpleGraph(llm=llm, pending_store=pending)
+            task = asyncio.ensure_future(graph.invoke({"query": "ghi file"}, thread_id=thread_id))
+            await asyncio.sleep(0.2)
+            task.cancel()
+            await asyncio.wait({task})
+            assert task.cancelled()
+            cancelled = thread_status_registry.get(thread_id)
+
+            # Resume bị hủy trong lúc ghi file: ghi file + xóa pending vẫn hoàn tất
+            file_path = str(tmp_path / "out.txt")
+            pending.requests[thread_id] = {
+                "file_path": file_path, "file_content": "nội dung", "query": "ghi file",
+            }
+            task = asyncio.ensure_future(graph.invoke({}, thread_id=thread_id, resume_value="approve"))
+            await asyncio.sleep(0)
+            task.cancel()
+            result = await task
+            return cancelled, result, file_path
+
+    cancelled, result, file_path = asyncio.run(scenario())
+    assert cancelled["status"] == STATUS_CANCELLED
+    assert cancelled["state"] == {"pending_review": False}
+    assert result["file_path"] == file_path
+    assert open(file_path, encoding="utf-8").read() == "nội dung"
+    assert thread_id not in pending.requests
+    assert thread_status_registry.get(thread_id)["status"] == STATUS_COMPLETED
@@ -0,0 +1,202 @@
+"""
+Tests cho MongoCheckpointSaver (app/core/checkpointer.py) trên Motor database giả trong memory.
+"""
+import asyncio
+import operator
+from typing import Annotated, Any, Dict, List, TypedDict
+
+import pytest
+from langgraph.graph import END, StateGraph
+from pymongo import UpdateMany
+
+from app.core.checkpointer import MongoCheckpointSaver
+
+
+def _matches(doc: Dict[str, Any], query: Dict[str, Any]) -> bool:
+    for key, condition in query.items():
+        value = doc.get(key)
+        if isinstance(condition, dict):
+            for op, arg in condition.items():
+                if op == "$in" and value not in arg:
+                    return False
+                if op == "$nin" and value in arg:
+                    return False
+                if op == "$eq" and value != arg:
+                    return False
+                if op == "$lt" and not (value is not None and value < arg):
+                    return False
+        elif value != condition:
+            return False
+    return True
+
+
+class _Cursor:
+    def __init__(self, docs):
+        self._docs = iter(docs)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._docs)
+        except StopIteration:
+            raise StopAsyncIteration from None
+
+
+class FakeCollection:
+    """Tập con Motor API mà MongoCheckpointSaver dùng."""
+
+    def __init__(self, database):
+        self.database = database
+        self.docs: Dict[str, Dict[str, Any]] = {}
+        self.indexes: List[Any] = []
+
+    async def create_index(self, keys, **kwargs):
+        self.indexes.append((keys, kwargs))
+
+    def _update(self, query, update, upsert, many):
+        matched = [doc for doc in self.docs.values() if _matches(doc, query)]
+        for doc in matched if many else matched[:1]:
+            doc.update(update.get("$set", {}))
+        if not matched and upsert:
+            doc = {key: value for key, value in query.items() if not isinstance(value, dict)}
+            doc.update(update.get("$setOnInsert", {}))
+            doc.update(update.get("$set", {}))
+            self.docs[doc["_id"]] = doc
+
+    async def bulk_write(self, operations, ordered=True):
+        for op in operations:
+            self._update(op._filter, op._doc, op._upsert, isinstance(op, UpdateMany))
+
+    async def replace_one(self, query, document, upsert=False):
+        self.docs[document["_id"]] = dict(document)
+
+    async def delete_many(self, query):
+        for key in [key for key, doc in self.docs.items() if _matches(doc, query)]:
+            del self.docs[key]
+
+    def aggregate(self, pipeline):
+        docs = [dict(doc) for doc in self.docs.values()]
+        for stage in pipeline:
+            (name, arg), = stage.items()
+            if name == "$match":
+                docs = [doc for doc in docs if _matches(doc, arg)]
+            elif name == "$sort":
+                (field, direction), = arg.items()
+                docs.sort(key=operator.itemgetter(field), reverse=direction < 0)
+            elif name == "$limit":
+                docs = docs[:arg]
+            elif name == "$lookup":
+                foreign = self.database[arg["from"]].docs.values()
+                for doc in docs:
+                    local = doc.get(arg["localField"])
+                    keys = local if isinstance(local, list) else [local]
+                    doc[arg["as"]] = [other for other in foreign if other.get(arg["foreignField"]) in keys]
+            elif name == "$group":
+                groups: Dict[Any, Dict[str, Any]] = {}
+                for doc in docs:
+                    group = doc[arg["_id"].lstrip("$")]
+                    if group not in groups:
+                        groups[group] = {"_id": group, **{
+                            field: doc[spec["$first"].lstrip("$")] for field, spec in arg.items() if field != "_id"
+                        }}
+                docs = list(groups.values())
+        return _Cursor(docs)
+
+
+class FakeDatabase:
+    def __init__(self):
+        self.collections: Dict[str, FakeCollection] = {}
+
+    def __getitem__(self, name):
+        return self.collections.setdefault(name, FakeCollection(self))
+
+
+class CounterState(TypedDict):
+    total: Annotated[int, operator.add]
+    steps: Annotated[list, operator.add]
+
+
+def _counter_graph(saver):
+    workflow = StateGraph(CounterState)
+    workflow.add_node("first", lambda state: {"total": 1, "steps": ["first"]})
+    workflow.add_node("second", lambda state: {"total": 10, "steps": ["second"]})
+    workflow.set_entry_point("first")
+    workflow.add_edge("first", "second")
+    workflow.add_edge("second", END)
+    return workflow.compile(checkpointer=saver)
+
+
+def test_graph_round_trip_ttl_indexes_and_pruning():
+    """Test state được lưu/đọc lại qua nhiều lần chạy, TTL indexes được tạo, aprune chỉ giữ checkpoint mới nhất."""
+    db = FakeDatabase()
+    saver = MongoCheckpointSaver(database=db, ttl_seconds=60)
+    graph = _counter_graph(saver)
+    config = {"configurable": {"thread_id": "t1"}}
+
+    async def scenario():
+        await graph.ainvoke({"total": 0, "steps": []}, config)
+        second = await graph.ainvoke({"total": 100, "steps": []}, config)
+        history = [item async for item in saver.alist(config)]
+        latest = await saver.aget_tuple(config)
+        await saver.aprune(["t1"])
+        remaining = [item async for item in saver.alist(config)]
+        return second, history, latest, remaining
+
+    second, history, latest, remaining = asyncio.run(scenario())
+    assert second == {"total": 122, "steps": ["first", "second", "first", "second"]}
+    assert latest.checkpoint["channel_values"]["total"] == 122
+    assert latest.parent_config["configurable"]["checkpoint_id"] == history[1].config["configurable"]["checkpoint_id"]
+    assert [item.config for item in history][0] == latest.config and len(history) == 8
+
+    ttl = {keys: kwargs["expireAfterSeconds"] for keys, kwargs in
+           (item for collection in db.collections.values() for item in collection.indexes) if kwargs}
+    assert ttl == {"created_at": 60, "last_used_at": 60}
+
+    assert [item.config for item in remaining] == [latest.config]
+    assert remaining[0].checkpoint["channel_values"]["steps"] == second["steps"]
+    assert set(db["checkpoint_blobs"].docs) == set(db["checkpoints"].docs[next(iter(db["checkpoints"].docs))]["blob_ids"])
+
+
+def test_writes_are_buffered_until_checkpoint_or_special_write():
+    """Test writes thường nằm trong buffer (gộp trùng), interrupt write và aget_tuple flush ngay."""
+    db = FakeDatabase()
+    saver = MongoCheckpointSaver(database=db, flush_max_writes=100)
+    config = {"configurable": {"thread_id": "t2", "checkpoint_ns": "", "checkpoint_id": "c1"}}
+
+    async def scenario():
+        await saver.aput_writes(config, [("a", 1), ("b", 2)], task_id="task")
+        await saver.aput_writes(config, [("a", 99)], task_id="task")
+        buffered = (len(saver._pending_writes), len(db["checkpoint_writes"].docs))
+        await saver.aput_writes(config, [("__interrupt__", "review")], task_id="task")
+        flushed = len(db["checkpoint_writes"].docs)
+        return buffered, flushed
+
+    buffered, flushed = asyncio.run(scenario())
+    assert buffered == (2, 0)
+    assert flushed == 3 and saver._pending_writes == {}
+    values = {doc["channel"]: saver._load(doc["value"]) for doc in db["checkpoint_writes"].docs.values()}
+    assert values == {"a": 1, "b": 2, "__interrupt__": "review"}
+
+
+def test_sync_api_bridges_to_motor_event_loop():
+    """Test graph.invoke (sync) chạy được từ thread khác loop; gọi sync trên chính loop thì raise."""
+    saver = MongoCheckpointSaver(database=FakeDatabase())
+    graph = _counter_graph(saver)
+    config = {"configurable": {"thread_id": "t3"}}
+
+    with pytest.raises(RuntimeError):
+        saver.get_tuple(config)
+
+    async def scenario():
+        await saver.setup()
+        result = await asyncio.to_thread(graph.invoke, {"total": 0, "steps": []}, config)
+        listed = await asyncio.to_thread(lambda: list(saver.list(config, limit=2)))
+        with pytest.raises(RuntimeError):
+            saver.get_tuple(config)
+        return result, listed, await saver.aget_tuple(config)
+
+    result, listed, latest = asyncio.run(scenario())
+    assert result["total"] == 11
+    assert len(listed) == 2 and listed[0].config == latest.config
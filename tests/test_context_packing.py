@@ -0,0 +1,40 @@
+"""
+Tests cho token-aware context packing trong format_retrieved_docs.
+"""
+from langchain_core.documents import Document
+
+from app.utils.retriever_utils import DOC_SEPARATOR, format_retrieved_docs, pack_documents
+from app.utils.token_utils import count_tokens
+
+BASE = "Người lao động được nghỉ phép năm 12 ngày làm việc nếu làm đủ 12 tháng. "
+
+
+def test_pack_drops_near_duplicates():
+    """Test chunk gần trùng bị loại, chunk khác nội dung được giữ."""
+    docs = [
+        Document(page_content=BASE * 3, metadata={"score": 0.9}),
+        Document(page_content=(BASE * 3).replace("đủ 12 tháng", "đủ mười hai tháng", 1), metadata={"score": 0.85}),
+        Document(page_content="Thời gian thử việc tối đa 180 ngày với chức danh quản lý.", metadata={"score": 0.5}),
+    ]
+    packed = pack_documents(docs, max_tokens=10_000)
+    assert packed == [docs[0], docs[2]]
+
+
+def test_pack_respects_token_budget_and_order():
+    """Test tổng tokens không vượt budget và giữ thứ tự relevance ban đầu."""
+    docs = [
+        Document(page_content=f"Chunk {i}: " + " ".join(f"từ{i}_{j}" for j in range(30)))
+        for i in range(10)
+    ]
+    budget = count_tokens(docs[0].page_content) * 3 + count_tokens(DOC_SEPARATOR) * 2
+    context = format_retrieved_docs(docs, max_tokens=budget)
+    assert count_tokens(context) <= budget
+    assert context.startswith("Chunk 0:")
+    assert context.count(DOC_SEPARATOR) >= 1
+
+
+def test_format_without_budget_unchanged():
+    """Test không truyền max_tokens thì giữ hành vi cũ."""
+    docs = [Document(page_content="a"), Document(page_content="a")]
+    assert format_retrieved_docs(docs) == "a\n\n---\n\na"
+    assert format_retrieved_docs(docs, max_length=1) == "a"
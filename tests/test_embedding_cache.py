@@ -0,0 +1,99 @@
+"""
+Tests cho CachedEmbeddings (LRU + persistent tier, batched lookups).
+"""
+import asyncio
+from typing import Dict, List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from app.utils.embedding_cache import CachedEmbeddings
+
+
+class _CountingEmbeddings(Embeddings):
+    """Embeddings giả, ghi lại các batch được gọi."""
+
+    def __init__(self):
+        self.batches: List[List[str]] = []
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.batches.append(list(texts))
+        return [[float(len(text)), 1.0] for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+class _DictStore:
+    """Persistent tier giả, đếm số round trip."""
+
+    def __init__(self):
+        self.data: Dict[str, np.ndarray] = {}
+        self.get_calls = 0
+        self.put_calls = 0
+
+    async def aget_many(self, keys):
+        self.get_calls += 1
+        return {key: self.data[key] for key in keys if key in self.data}
+
+    async def aput_many(self, items, model_name):
+        self.put_calls += 1
+        self.data.update(items)
+
+
+def test_batch_dedup_and_single_round_trip():
+    """Test texts trùng chỉ embed một lần, mỗi batch một lookup + một insert."""
+    model = _CountingEmbeddings()
+    store = _DictStore()
+    cached = CachedEmbeddings(model, model_name="fake", store=store)
+
+    vectors = asyncio.run(cached.aembed_documents(["a", "bb", "a"]))
+    assert vectors[0] == vectors[2] == [1.0, 1.0]
+    assert model.batches == [["a", "bb"]]
+    assert (store.get_calls, store.put_calls) == (1, 1)
+
+    # LRU hit: không chạm tới store lẫn model
+    asyncio.run(cached.aembed_documents(["a", "bb"]))
+    assert (store.get_calls, len(model.batches)) == (1, 1)
+
+    # Worker khác (LRU rỗng) dùng chung store
+    other = CachedEmbeddings(_CountingEmbeddings(), model_name="fake", store=store)
+    assert asyncio.run(other.aembed_query("bb")) == [2.0, 1.0]
+    assert other.embeddings.batches == []
+    assert other.get_stats()["store_hits"] == 1
+
+    stats = cached.get_stats()
+    assert stats["requests"] == 4 and stats["misses"] == 2
+    assert stats["hit_rate"] == 0.5
+
+
+def test_model_name_is_part_of_key():
+    """Test cùng text nhưng khác model không dùng chung cache."""
+    store = _DictStore()
+    asyncio.run(CachedEmbeddings(_CountingEmbeddings(), "m1", store).aembed_query("x"))
+    second = CachedEmbeddings(_CountingEmbeddings(), "m2", store)
+    asyncio.run(second.aembed_query("x"))
+    assert second.embeddings.batches == [["x"]]
+
+
+class _BrokenStore:
+    """Persistent tier luôn lỗi (Mongo down)."""
+
+    async def aget_many(self, keys):
+        raise ConnectionError("mongo down")
+
+    async def aput_many(self, items, model_name):
+        raise ConnectionError("mongo down")
+
+
+def test_store_errors_do_not_fail_embedding():
+    """Test store lỗi: lookup coi như miss, ghi bỏ qua, vectors vẫn trả về và vào LRU."""
+    inner = _CountingEmbeddings()
+    cached = CachedEmbeddings(inner, model_name="m", store=_BrokenStore())
+
+    vectors = asyncio.run(cached.aembed_documents(["a", "bb"]))
+    assert vectors == [[1.0, 1.0], [2.0, 1.0]]
+    assert asyncio.run(cached.aembed_query("bb")) == [2.0, 1.0]
+    assert inner.batches == [["a", "bb"]]
+    stats = cached.get_stats()
+    assert stats["store_errors"] == 2 and stats["misses"] == 2 and stats["memory_hits"] == 1
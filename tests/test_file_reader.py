@@ -0,0 +1,71 @@
+"""
+Tests cho memory-mapped file reader và read_data_tool.
+"""
+import os
+
+import pytest
+
+from app.tools import read_data_tool
+from app.utils.file_reader import (
+    clear_line_index_cache,
+    get_line_offsets,
+    iter_file_chunks,
+    read_file_range,
+)
+
+
+@pytest.fixture
+def sample_file(tmp_path):
+    """File 100 dòng: 'dòng 1' ... 'dòng 100'."""
+    path = tmp_path / "sample.txt"
+    path.write_text("".join(f"dòng {i}\n" for i in range(1, 101)), encoding="utf-8")
+    clear_line_index_cache()
+    return str(path)
+
+
+def test_line_range(sample_file):
+    """Test đọc theo line range."""
+    text, info = read_file_range(sample_file, start_line=10, end_line=12)
+    assert text == "dòng 10\ndòng 11\ndòng 12\n"
+    assert info["total_lines"] == 100
+
+
+def test_head_and_tail(sample_file):
+    """Test head / tail."""
+    assert read_file_range(sample_file, head=2)[0] == "dòng 1\ndòng 2\n"
+    assert read_file_range(sample_file, tail=2)[0] == "dòng 99\ndòng 100\n"
+
+
+def test_max_bytes_does_not_split_utf8(sample_file):
+    """Test cắt theo max_bytes không cắt giữa ký tự UTF-8."""
+    # "dòng" = d + ò (2 bytes) + n + g => cắt tại byte 2 phải lùi về byte 1
+    text, info = read_file_range(sample_file, max_bytes=2)
+    assert info["truncated"] is True
+    assert text == "d"
+
+
+def test_line_index_invalidated_on_change(sample_file):
+    """Test line index được build lại khi file thay đổi."""
+    assert get_line_offsets(sample_file).size == 100
+    with open(sample_file, "a", encoding="utf-8") as f:
+        f.write("dòng 101\n")
+    stat = os.stat(sample_file)
+    os.utime(sample_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert get_line_offsets(sample_file).size == 101
+
+
+def test_iter_file_chunks_roundtrip(sample_file):
+    """Test stream chunks ghép lại đúng nội dung gốc."""
+    chunks = list(iter_file_chunks(sample_file, chunk_bytes=64))
+    assert len(chunks) > 1
+    assert all(chunk.endswith("\n") for chunk in chunks)
+    with open(sample_file, encoding="utf-8") as f:
+        assert "".join(chunks) == f.read()
+
+
+def test_read_data_tool(sample_file):
+    """Test read_data_tool với line range và file không tồn tại."""
+    result = read_data_tool.invoke({"file_path": sample_file, "start_line": 5, "end_line": 5})
+    assert "dòng 5\n" in result
+    assert "/ 100 dòng" in result
+    assert "File không tồn tại" in read_data_tool.invoke({"file_path": sample_file + ".missing"})
@@ -0,0 +1,53 @@
+"""
+Tests cho ghi file atomic (app/tools/file_tools.py).
+"""
+import asyncio
+import os
+
+import pytest
+
+from app.tools import file_tools
+from app.tools.file_tools import atomic_write_text, awrite_file
+
+
+def _umask() -> int:
+    mask = os.umask(0o022)
+    os.umask(mask)
+    return mask
+
+
+def test_atomic_write_replaces_file_and_keeps_mode(tmp_path):
+    """Test ghi đè thay nội dung, giữ quyền file cũ; file mới theo umask; không để lại file tạm."""
+    umask_before = _umask()
+    target = tmp_path / "sub" / "out.txt"
+    atomic_write_text(str(target), "xin chào " * 100, chunk_size=7)
+    assert target.read_text(encoding="utf-8") == "xin chào " * 100
+    assert target.stat().st_mode & 0o777 == 0o666 & ~umask_before
+
+    target.chmod(0o640)
+    atomic_write_text(str(target), "mới")
+    assert target.read_text(encoding="utf-8") == "mới"
+    assert target.stat().st_mode & 0o777 == 0o640
+    assert os.listdir(target.parent) == ["out.txt"]
+    assert _umask() == umask_before
+
+
+def test_atomic_write_failure_leaves_original_and_no_temp_file(tmp_path, monkeypatch):
+    """Test lỗi giữa chừng (encode hoặc rename) => file cũ nguyên vẹn, file tạm bị xóa."""
+    target = tmp_path / "out.txt"
+    target.write_text("cũ", encoding="utf-8")
+
+    # Lone surrogate không encode được utf-8 => lỗi khi đang ghi chunk thứ hai
+    with pytest.raises(UnicodeEncodeError):
+        atomic_write_text(str(target), "ok" + "\ud800", chunk_size=2)
+    assert target.read_text(encoding="utf-8") == "cũ"
+    assert os.listdir(tmp_path) == ["out.txt"]
+
+    def broken_replace(src, dst):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(file_tools.os, "replace", broken_replace)
+    message = asyncio.run(awrite_file(str(target), "mới"))
+    assert message.startswith("Lỗi khi ghi file") and "disk full" in message
+    assert target.read_text(encoding="utf-8") == "cũ"
+    assert os.listdir(tmp_path) == ["out.txt"]
@@ -0,0 +1,107 @@
+"""
+Tests cho GraphJobService (graph chạy nền, trạng thái trong job store, callback).
+"""
+import asyncio
+import hashlib
+import hmac
+import json
+from typing import Any, Dict
+
+from app.api.responses import graph_job_response
+from app.core.config import settings
+from app.services.graph_job_service import (
+    JOB_COMPLETED,
+    JOB_FAILED,
+    JOB_PENDING,
+    GraphJobService,
+    register_graph,
+)
+
+
+class DictJobStore:
+    def __init__(self):
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+
+    async def create(self, job):
+        self.jobs[job["_id"]] = dict(job)
+
+    async def load(self, job_id, projection=None):
+        job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        return {key: value for key, value in job.items() if not projection or key not in projection}
+
+    async def save(self, job_id, fields, owner=None):
+        job = self.jobs[job_id]
+        if owner is not None and job.get("lease_owner") != owner:
+            return False
+        job.update(fields)
+        return True
+
+
+class EchoGraph:
+    async def invoke(self, state, thread_id=None, resume_value=None):
+        await asyncio.sleep(0.01)
+        if state.get("query") == "boom":
+            raise RuntimeError("graph failed")
+        answer = f"echo: {state['query']}"
+        return {
+            "messages": [{"role": "assistant", "content": answer}],
+            "query": state["query"],
+            "final_response": answer,
+            "token_usage": {},
+            "intent": "question",
+            "waiting_for_human": False,
+        }
+
+
+async def _callback_server(received):
+    async def handle(reader, writer):
+        head = await reader.readuntil(b"\r\n\r\n")
+        lines = head.decode().split("\r\n")[1:]
+        headers = {key.lower(): value for key, value in (line.split(": ", 1) for line in lines if ": " in line)}
+        body = await reader.readexactly(int(headers["content-length"]))
+        received.append((headers, body))
+        writer.write(b"HTTP/1.1 204 No Content\r\nContent-Length: 0\r\n\r\n")
+        await writer.drain()
+        writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    return server, f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}/hook"
+
+
+def test_job_returns_immediately_and_stores_result(monkeypatch):
+    """Test submit trả về job pending ngay; job chạy nền, kết quả lưu vào store và gửi callback có chữ ký."""
+    register_graph("echo", EchoGraph)
+    monkeypatch.setattr(settings, "api_secret_key", "secret")
+    store = DictJobStore()
+    received = []
+
+    async def scenario():
+        server, url = await _callback_server(received)
+        try:
+            service = GraphJobService(job_store=store, max_concurrency=1, callback_url=url, executor="local")
+            ok = await service.submit("echo", {"query": "xin chào"})
+            failed = await service.submit("echo", {"query": "boom"})
+            assert ok["status"] == JOB_PENDING and ok["thread_id"]
+            await asyncio.gather(*service._tasks.values())
+            return ok["_id"], failed["_id"], await service.get(ok["_id"]), await service.get(failed["_id"])
+        finally:
+            server.close()
+            await server.wait_closed()
+
+    ok_id, failed_id, ok, failed = asyncio.run(scenario())
+    assert ok["status"] == JOB_COMPLETED and ok["attempts"] == 1 and "input" not in ok
+    assert ok["callback"]["status_code"] == 204
+    assert failed["status"] == JOB_FAILED and failed["error"] == "graph failed"
+
+    response = graph_job_response(ok)
+    assert response.result.data.final_response == "echo: xin chào"
+    assert response.result.thread_id == ok["thread_id"] and not response.result.waiting_for_human
+
+    headers, body = received[0]
+    payload = json.loads(body)
+    assert (payload["job_id"], payload["status"]) == (ok_id, JOB_COMPLETED)
+    expected = hmac.new(b"secret", body, hashlib.sha256).hexdigest()
+    assert headers["x-job-signature"] == f"sha256={expected}"
+    assert json.loads(received[1][1])["job_id"] == failed_id
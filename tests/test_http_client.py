@@ -0,0 +1,59 @@
+"""
+Tests cho HTTP client dùng chung của LLM clients (app/core/http_client.py).
+"""
+import asyncio
+
+from app.core.config import settings
+from app.core.http_client import create_http_client, get_llm_http_client
+from app.graph.simple_graph import SimpleGraph
+
+
+async def _serve(delay: float):
+    """HTTP/1.1 server tối giản, keep-alive, trả lời sau `delay` giây."""
+    async def handle(reader, writer):
+        try:
+            while True:
+                await reader.readuntil(b"\r\n\r\n")
+                await asyncio.sleep(delay)
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\nContent-Type: text/plain\r\n\r\nok")
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    return server, f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}/"
+
+
+def test_connections_are_reused_and_pool_wait_is_measured():
+    """Test requests tuần tự dùng lại 1 connection; requests đồng thời chờ pool khi max_connections=1."""
+    async def scenario():
+        server, url = await _serve(delay=0.05)
+        client = create_http_client(max_connections=1, http2=False)
+        try:
+            for _ in range(3):
+                assert (await client.get(url)).text == "ok"
+            sequential = client.pool_stats.snapshot()
+            await asyncio.gather(*(client.get(url) for _ in range(3)))
+            return sequential, client.pool_stats.snapshot()
+        finally:
+            await client.aclose()
+            server.close()
+            await server.wait_closed()
+
+    sequential, concurrent = asyncio.run(scenario())
+    assert sequential["requests"] == 3
+    assert sequential["connections_opened"] == 1 and sequential["connections_reused"] == 2
+    assert concurrent["connections_opened"] == 1 and concurrent["in_flight"] == 0
+    # Request thứ 3 chờ 2 requests trước (~0.1s) mới có connection
+    assert concurrent["pool_wait_max_ms"] >= 80
+    assert concurrent["http_versions"] == {"HTTP/1.1": 6}
+
+
+def test_graphs_share_one_llm_http_client(monkeypatch):
+    """Test mọi graph dùng cùng AsyncClient thay vì tạo pool riêng."""
+    monkeypatch.setattr(settings, "openai_api_key", "test-key")
+    first, second = SimpleGraph(), SimpleGraph()
+    assert first.llm.http_async_client is get_llm_http_client()
+    assert second.llm.http_async_client is first.llm.http_async_client
@@ -0,0 +1,101 @@
+"""
+Tests cho BM25Index và HybridRetriever.
+"""
+import asyncio
+import random
+import time
+from typing import List
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from app.graph.data_retriever import DataRetriever
+from app.graph.hybrid_retriever import HybridRetriever, reciprocal_rank_fusion
+from app.utils.bm25_index import BM25Index, tokenize
+
+
+def test_tokenize_identifiers_and_vietnamese():
+    """Test giữ identifiers, tách phần con và thêm biến thể bỏ dấu."""
+    tokens = tokenize("Lỗi ERR-404 trong app/main.py")
+    assert {"err-404", "err", "404", "app/main.py", "main", "lỗi", "loi"} <= set(tokens)
+
+
+def test_bm25_exact_identifier_and_delete():
+    """Test BM25 tìm đúng mã lỗi, document đã xóa không còn xuất hiện."""
+    index = BM25Index()
+    index.add([
+        "Kết nối database bị timeout",
+        "Lỗi ERR-404 khi gọi API",
+        "Hướng dẫn cấu hình ERR-404 page",
+    ])
+    _, positions = index.search("ERR-404", k=5)
+    assert set(positions.tolist()) == {1, 2}
+    _, positions = index.search("ket noi database", k=5)
+    assert positions.tolist() == [0]
+
+    index.delete([1])
+    _, positions = index.search("ERR-404", k=5)
+    assert positions.tolist() == [2]
+    assert len(index) == 2
+
+
+def test_rrf_prefers_items_in_both_lists():
+    """Test RRF xếp item có mặt ở cả hai danh sách lên đầu."""
+    fused = reciprocal_rank_fusion([[1, 2, 3], [3, 4]], rrf_k=60)
+    assert list(fused)[0] == 3
+
+
+class _ConstantEmbeddings(Embeddings):
+    """Mọi text cùng một vector => nhánh vector không phân biệt được."""
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [[1.0, 0.0] for _ in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return [1.0, 0.0]
+
+
+def test_hybrid_retriever_fuses_both_legs():
+    """Test nhánh BM25 kéo document chứa identifier lên top."""
+    docs = [Document(page_content=f"Tài liệu chung số {i}") for i in range(5)]
+    docs.append(Document(page_content="Stacktrace của file worker_pool.py", metadata={"id": "target"}))
+
+    async def scenario():
+        retriever = await HybridRetriever.create_with_embeddings(
+            docs, embeddings=_ConstantEmbeddings(), top_k=3
+        )
+        return await retriever.aretrieve("worker_pool.py")
+
+    results = asyncio.run(scenario())
+    assert results[0].metadata["id"] == "target"
+    assert results[0].metadata["bm25_score"] > 0
+    assert results[0].metadata["vector_score"] is not None
+
+
+
+class _JitterBM25Index(BM25Index):
+    """BM25 add chậm ngẫu nhiên (index lớn / GIL) => add chạy trong threads sẽ hoàn thành lệch thứ tự."""
+
+    def add(self, texts):
+        time.sleep(random.uniform(0, 0.003))
+        return super().add(texts)
+
+
+def test_concurrent_adds_keep_bm25_and_vector_positions_aligned():
+    """Test nhiều aadd_documents đồng thời: BM25 hit trỏ đúng document."""
+    random.seed(0)
+
+    async def scenario():
+        data_retriever = await DataRetriever.create_with_embeddings(embeddings=_ConstantEmbeddings())
+        retriever = HybridRetriever(data_retriever=data_retriever, bm25_index=_JitterBM25Index())
+        await asyncio.gather(*(
+            retriever.aadd_documents([Document(page_content=f"token{i}", metadata={"id": i})])
+            for i in range(50)
+        ))
+        return retriever
+
+    retriever = asyncio.run(scenario())
+    assert len(retriever) == len(retriever.data_retriever) == 50
+    for i in range(50):
+        _, positions = retriever.bm25_index.search(f"token{i}", 1)
+        assert retriever.data_retriever.document_at(int(positions[0])).metadata["id"] == i
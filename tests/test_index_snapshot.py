@@ -0,0 +1,116 @@
+"""
+Tests cho index snapshots (save, mmap load, atomic swap).
+"""
+import os
+from datetime import date, datetime, timezone
+
+import numpy as np
+import pytest
+from bson import ObjectId
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from app.graph.data_retriever import DataRetriever
+from app.utils.index_snapshot import SnapshotRetrieverHolder, current_version, prune_snapshots, save_snapshot
+
+DOCS = [
+    Document(page_content="mèo con", metadata={"lang": "vi", "tags": ["pet"]}),
+    Document(page_content="dog", metadata={"lang": "en"}),
+    Document(page_content="", metadata={}),
+    Document(page_content="cá vàng", metadata={"lang": "vi", "year": 2021}),
+]
+
+
+class _NoEmbeddings(Embeddings):
+    def embed_documents(self, texts):
+        raise NotImplementedError
+
+    def embed_query(self, text):
+        raise NotImplementedError
+
+
+VECTORS = np.array([[1, 0, 0], [0, 1, 0], [0, 0, 1], [0.9, 0.1, 0]], dtype=np.float32)
+
+
+def _retriever() -> DataRetriever:
+    retriever = DataRetriever(top_k=3)
+    retriever.add_vectors(VECTORS, DOCS)
+    return retriever
+
+
+def test_snapshot_roundtrip_is_memory_mapped(tmp_path):
+    """Test snapshot load bằng memmap cho kết quả search/filter/documents giống bản gốc."""
+    original = _retriever()
+    original.delete([1])
+    path = save_snapshot(original, str(tmp_path))
+    loaded = SnapshotRetrieverHolder(str(tmp_path), embeddings=_NoEmbeddings())
+    assert loaded.refresh()
+    retriever = loaded.retriever
+
+    assert isinstance(retriever.index._base_vectors, np.memmap)
+    assert [retriever.documents[i] for i in range(4)] == [original.documents[i] for i in range(4)]
+    for metadata_filter in ({"lang": "vi"}, {"year": None}, {"tags": ["pet"]}, None):
+        expected = [doc.page_content for doc in original.search_by_vector([1, 0, 0], metadata_filter=metadata_filter)]
+        actual = [doc.page_content for doc in retriever.search_by_vector([1, 0, 0], metadata_filter=metadata_filter)]
+        assert actual == expected
+    assert retriever.search_by_vector([0, 1, 0], top_k=1)[0].page_content != "dog"
+
+    retriever.add_vectors([[0, 1, 0]], [Document(page_content="new", metadata={"lang": "en"})])
+    results = retriever.search_by_vector([0, 1, 0], top_k=1, metadata_filter={"lang": "en"})
+    assert results[0].page_content == "new"
+    assert os.path.basename(path) == current_version(str(tmp_path))
+
+
+def test_holder_swaps_to_new_version(tmp_path):
+    """Test holder chuyển sang version mới khi CURRENT đổi, version cũ bị prune."""
+    root = str(tmp_path)
+    save_snapshot(_retriever(), root, version="v1")
+    holder = SnapshotRetrieverHolder(root, embeddings=_NoEmbeddings(), refresh_interval=0)
+    first = holder.get()
+    assert holder.version == "v1" and not holder.refresh()
+
+    updated = _retriever()
+    updated.add_vectors([[0, 0, 1]], [Document(page_content="extra")])
+    save_snapshot(updated, root, version="v2", keep=1)
+    assert holder.get() is not first
+    assert holder.version == "v2" and len(holder.retriever) == 5
+    assert sorted(os.listdir(root)) == ["CURRENT", "v2"]
+    # Retriever cũ vẫn đọc được sau khi version của nó bị xóa
+    assert first.documents[0].page_content == "mèo con"
+
+
+def test_prune_keeps_newest_by_created_at(tmp_path):
+    """Test prune xếp theo thời điểm tạo (không theo tên "v10" < "v9"), keep=0 chỉ giữ CURRENT."""
+    root = str(tmp_path)
+    for version in ("v8", "v9", "v10"):
+        save_snapshot(_retriever(), root, version=version, keep=2)
+    assert sorted(os.listdir(root)) == ["CURRENT", "v10", "v9"]
+
+    save_snapshot(_retriever(), root, version="v11", keep=5)
+    assert prune_snapshots(root, keep=0) == ["v9", "v10"]
+    assert sorted(os.listdir(root)) == ["CURRENT", "v11"]
+
+
+def test_non_json_metadata_keeps_type_after_load(tmp_path):
+    """Test metadata datetime/date/ObjectId load lại đúng kiểu nên filter vẫn khớp; kiểu lạ => lỗi khi save."""
+    created = datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc)
+    owner = ObjectId()
+    retriever = DataRetriever(top_k=4)
+    retriever.add_vectors(VECTORS[:2], [
+        Document(page_content="a", metadata={"created": created, "day": date(2024, 5, 1), "owner": owner}),
+        Document(page_content="b", metadata={"created": datetime(2023, 1, 1, tzinfo=timezone.utc)}),
+    ])
+    save_snapshot(retriever, str(tmp_path))
+    holder = SnapshotRetrieverHolder(str(tmp_path), embeddings=_NoEmbeddings())
+    loaded = holder.get()
+
+    for metadata_filter in ({"created": created}, {"day": date(2024, 5, 1)}, {"owner": owner}):
+        results = loaded.search_by_vector([1, 0, 0], metadata_filter=metadata_filter)
+        assert [doc.page_content for doc in results] == ["a"], metadata_filter
+    assert loaded.documents[0].metadata["created"] == created
+
+    broken = DataRetriever(top_k=1)
+    broken.add_vectors(VECTORS[:1], [Document(page_content="x", metadata={"tags": {"a", "b"}})])
+    with pytest.raises(TypeError):
+        save_snapshot(broken, str(tmp_path / "broken"))
+    assert os.listdir(tmp_path / "broken") == []
@@ -0,0 +1,52 @@
+"""
+Tests cho Ingestion API: yêu cầu API key, source phải nằm trong INGEST_ALLOWED_DIR.
+"""
+from app.api.routes import ingest
+from app.core.config import settings
+from app.services.ingestion_service import open_source
+
+
+def test_ingest_requires_api_key_and_allowed_dir(client, monkeypatch, tmp_path):
+    """Test thiếu/sai API key => 401; source ngoài thư mục được phép (kể cả qua symlink) => 400."""
+    allowed = tmp_path / "corpus"
+    allowed.mkdir()
+    (tmp_path / "secret.env").write_text("OPENAI_API_KEY=sk-test", encoding="utf-8")
+    (allowed / "escape.txt").symlink_to(tmp_path / "secret.env")
+    monkeypatch.setattr(settings, "ingest_allowed_dir", str(allowed))
+
+    monkeypatch.setattr(settings, "api_secret_key", None)
+    response = client.post("/api/v1/ingest/jobs", json={"source": str(allowed)}, headers={"X-API-Key": "x"})
+    assert response.status_code == 401
+
+    monkeypatch.setattr(settings, "api_secret_key", "secret")
+    assert client.post("/api/v1/ingest/jobs", json={"source": str(allowed)}).status_code == 401
+    assert client.get("/api/v1/ingest/jobs/any", headers={"X-API-Key": "wrong"}).status_code == 401
+
+    headers = {"X-API-Key": "secret"}
+    for source in ("/etc/passwd", str(tmp_path / "secret.env"), str(allowed / "escape.txt"), f"{allowed}/../secret.env"):
+        response = client.post("/api/v1/ingest/jobs", json={"source": source}, headers=headers)
+        assert response.status_code == 400, source
+        assert "ngoài thư mục" in response.json()["error"]
+
+    monkeypatch.setattr(settings, "ingest_allowed_dir", "")
+    response = client.post("/api/v1/ingest/jobs", json={"source": str(allowed)}, headers=headers)
+    assert response.status_code == 400
+
+
+def test_ingest_directory_skips_symlinks_outside_allowed_dir(client, monkeypatch, tmp_path):
+    """Test POST chính thư mục được phép: file symlink ra ngoài không bị ingest."""
+    allowed = tmp_path / "corpus"
+    (allowed / "sub").mkdir(parents=True)
+    (tmp_path / "secret.txt").write_text("TOP SECRET", encoding="utf-8")
+    (allowed / "escape.txt").symlink_to(tmp_path / "secret.txt")
+    (allowed / "sub" / "note.txt").write_text("ghi chú", encoding="utf-8")
+    (allowed / "alias.txt").symlink_to(allowed / "sub" / "note.txt")
+    monkeypatch.setattr(settings, "ingest_allowed_dir", str(allowed))
+    monkeypatch.setattr(settings, "api_secret_key", "secret")
+    started = []
+    monkeypatch.setattr(ingest, "start_ingestion_job", lambda source, **kwargs: started.append(source) or "job")
+
+    response = client.post("/api/v1/ingest/jobs", json={"source": str(allowed)}, headers={"X-API-Key": "secret"})
+    assert response.status_code == 200
+    contents = [doc.page_content for doc in open_source(started[0])]
+    assert contents == ["ghi chú", "ghi chú"]
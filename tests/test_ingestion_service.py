@@ -0,0 +1,127 @@
+"""
+Tests cho IngestionService (pipeline streaming + resume).
+"""
+import asyncio
+import threading
+from typing import Any, Dict, List
+
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from app.services.ingestion_service import JOB_COMPLETED, JOB_FAILED, JOB_PENDING, IngestionService, chunk_text
+
+
+class FakeEmbeddings(Embeddings):
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [[float(len(text)), 1.0] for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return [float(len(text)), 1.0]
+
+
+class DictJobStore:
+    def __init__(self):
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+
+    async def load(self, job_id):
+        return self.jobs.get(job_id)
+
+    async def save(self, job_id, fields):
+        self.jobs.setdefault(job_id, {}).update(fields)
+
+
+class ListChunkStore:
+    def __init__(self, fail_after=None):
+        self.chunks: Dict[str, Dict[str, Any]] = {}
+        self.fail_after = fail_after
+        self.writes = 0
+
+    async def write(self, chunks, vectors):
+        if self.fail_after is not None and self.writes >= self.fail_after:
+            raise RuntimeError("write failed")
+        self.writes += 1
+        for chunk, vector in zip(chunks, vectors):
+            self.chunks[chunk["_id"]] = {"doc_id": chunk["doc_id"], "vector": vector}
+
+
+def _documents(count: int):
+    return lambda: iter(
+        Document(page_content=f"document {i} " + "nội dung " * 20, metadata={"id": f"doc-{i}"})
+        for i in range(count)
+    )
+
+
+def _service(chunk_store, job_store):
+    return IngestionService(
+        embeddings=FakeEmbeddings(),
+        chunk_store=chunk_store,
+        job_store=job_store,
+        chunk_size=100,
+        chunk_overlap=20,
+        batch_size=4,
+        max_concurrency=2,
+        queue_size=2,
+        progress_interval=60,
+    )
+
+
+def test_chunk_text_overlap_and_boundaries():
+    """Test chunks không vượt chunk_size và phủ toàn bộ text."""
+    text = " ".join(f"word{i}" for i in range(200))
+    chunks = chunk_text(text, chunk_size=100, chunk_overlap=20)
+    assert len(chunks) > 1
+    assert all(len(chunk) <= 100 for chunk in chunks)
+    assert chunks[0].startswith("word0") and chunks[-1].endswith("word199")
+    assert chunk_text("   ", 100, 20) == []
+
+
+def test_ingestion_runs_and_resumes_after_failure():
+    """Test job lỗi giữa chừng lưu checkpoint, chạy lại cùng job_id chỉ xử lý phần còn lại."""
+    job_store = DictJobStore()
+    failing_store = ListChunkStore(fail_after=3)
+    with pytest.raises(RuntimeError):
+        asyncio.run(_service(failing_store, job_store).run("corpus", job_id="job", documents=_documents(30)))
+    assert job_store.jobs["job"]["status"] == JOB_FAILED
+    last_seq = job_store.jobs["job"]["last_seq"]
+    assert last_seq >= 0
+
+    chunk_store = ListChunkStore()
+    summary = asyncio.run(_service(chunk_store, job_store).run("corpus", job_id="job", documents=_documents(30)))
+    assert summary["status"] == JOB_COMPLETED
+    assert summary["last_seq"] == 29
+    assert summary["stats"]["skipped_docs"] == last_seq + 1
+    written_docs = {chunk["doc_id"] for chunk in chunk_store.chunks.values()}
+    assert written_docs == {f"doc-{i}" for i in range(last_seq + 1, 30)}
+    assert summary["stats"]["stages"]["write"]["docs"] == pytest.approx(30 - last_seq - 1)
+    assert all(isinstance(chunk["vector"], np.ndarray) for chunk in chunk_store.chunks.values())
+
+
+def test_cancel_while_reader_thread_is_inside_source():
+    """Test cancel khi thread đọc đang nằm trong generator: raise CancelledError, source vẫn được đóng."""
+    entered, release = threading.Event(), threading.Event()
+    closed = []
+
+    def documents():
+        try:
+            yield Document(page_content="đầu tiên", metadata={"id": "doc-0"})
+            entered.set()
+            release.wait(5)
+            yield Document(page_content="thứ hai", metadata={"id": "doc-1"})
+        finally:
+            closed.append(True)
+
+    job_store = DictJobStore()
+
+    async def scenario():
+        task = asyncio.create_task(_service(ListChunkStore(), job_store).run("src", job_id="job", documents=documents))
+        await asyncio.to_thread(entered.wait, 5)
+        asyncio.get_running_loop().call_later(0.05, release.set)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(scenario())
+    assert closed == [True]
+    assert job_store.jobs["job"]["status"] == JOB_PENDING
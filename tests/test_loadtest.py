@@ -0,0 +1,60 @@
+"""
+Tests cho load test harness (benchmarks/loadtest.py).
+"""
+import asyncio
+
+import httpx
+from fastapi import FastAPI
+
+from benchmarks.loadtest import compare_reports, percentile, run_load
+
+
+def _fake_graph_app() -> FastAPI:
+    """App giả lập /graph/simple: yêu cầu ghi file => chờ human, /continue lỗi cho thread 'bad'."""
+    app = FastAPI()
+
+    @app.post("/api/v1/graph/simple/start")
+    async def start(body: dict):
+        waiting = body["query"].startswith(("Tạo file", "Ghi file"))
+        return {"success": True, "message": "ok", "thread_id": "t1", "waiting_for_human": waiting}
+
+    @app.post("/api/v1/graph/simple/{thread_id}/continue")
+    async def resume(thread_id: str, body: dict):
+        return {"success": body["human_input"] == "approve", "message": "done", "waiting_for_human": False}
+
+    return app
+
+
+def test_percentile_matches_linear_interpolation():
+    """Test percentile nội suy tuyến tính giống numpy."""
+    values = [10.0, 1.0, 4.0, 7.0]
+    assert percentile(values, 50) == 5.5
+    assert percentile(values, 100) == 10.0
+    assert abs(percentile(values, 95) - 9.55) < 1e-9
+
+
+def test_run_load_reports_and_detects_regression():
+    """Test report theo endpoint (HITL có /continue) và gate regression so với baseline."""
+    transport = httpx.ASGITransport(app=_fake_graph_app())
+    report = asyncio.run(run_load(
+        "http://test", turns=40, concurrency=4, request_ratio=0.5, approve_ratio=1.0,
+        seed=1, transport=transport,
+    ))
+    assert report["turns"]["question"] + report["turns"]["request"] == 40
+    assert report["endpoints"]["start"]["count"] == 40
+    assert report["endpoints"]["continue"]["count"] == report["turns"]["hitl"] == report["turns"]["request"] > 0
+    assert report["overall"]["error_rate"] == 0.0
+    assert compare_reports(report, report) == []
+
+    slower = {**report, "overall": {**report["overall"], "p99_ms": report["overall"]["p99_ms"] * 2}}
+    failing = {**report, "endpoints": {
+        **report["endpoints"], "continue": {**report["endpoints"]["continue"], "error_rate": 0.5},
+    }}
+    assert [r.split(":")[0] for r in compare_reports(slower, report)] == ["overall.p99_ms"]
+    assert [r.split(":")[0] for r in compare_reports(failing, report)] == ["continue.error_rate"]
+
+    rejected = asyncio.run(run_load(
+        "http://test", turns=10, concurrency=2, request_ratio=1.0, approve_ratio=0.0,
+        seed=1, transport=httpx.ASGITransport(app=_fake_graph_app()),
+    ))
+    assert rejected["error_breakdown"] == {"success=false": 10}
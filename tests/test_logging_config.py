@@ -0,0 +1,85 @@
+"""
+Tests cho queued logging + sampling tracebacks (app/core/logging_config.py).
+"""
+import json
+import logging
+import time
+
+from app.core.logging_config import setup_logging, shutdown_logging
+
+
+def _fail(logger: logging.Logger, message: str) -> None:
+    try:
+        raise ValueError(message)
+    except ValueError:
+        logger.error("request failed: %s", message, exc_info=True)
+
+
+def test_repeated_tracebacks_are_sampled_to_json_file(tmp_path):
+    """Test traceback giống nhau chỉ ghi một lần, phần bị chặn được tóm tắt khi shutdown."""
+    log_file = tmp_path / "app.log"
+    root = logging.getLogger()
+    previous = (list(root.handlers), root.level)
+    try:
+        setup_logging(level="INFO", log_file=str(log_file), json_file=True, sample_window=60)
+        logger = logging.getLogger("storm")
+        for i in range(50):
+            _fail(logger, f"boom {i}")
+        logger.info("still logging")
+        try:
+            {}["missing"]
+        except KeyError:
+            logger.error("other failure", exc_info=True)
+        shutdown_logging()
+    finally:
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        for handler in previous[0]:
+            root.addHandler(handler)
+        root.setLevel(previous[1])
+
+    with open(log_file, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+    messages = [record["message"] for record in records]
+    assert messages == [
+        "request failed: boom 0",
+        "still logging",
+        "other failure",
+        "suppressed 49 similar ValueError tracebacks",
+    ]
+    assert "ValueError: boom 0" in records[0]["exc_info"]
+    assert "KeyError" in records[2]["exc_info"]
+
+
+def test_suppressed_summary_is_flushed_after_burst_stops(tmp_path):
+    """Test burst dừng hẳn (không shutdown): summary vẫn được ghi khi cửa sổ hết hạn, lần sau log đầy đủ."""
+    log_file = tmp_path / "app.log"
+    root = logging.getLogger()
+    previous = (list(root.handlers), root.level)
+
+    def messages():
+        with open(log_file, encoding="utf-8") as f:
+            return [json.loads(line)["message"] for line in f]
+
+    try:
+        setup_logging(level="INFO", log_file=str(log_file), json_file=True, sample_window=0.1)
+        logger = logging.getLogger("burst")
+        for i in range(5):
+            _fail(logger, f"boom {i}")
+        deadline = time.monotonic() + 5
+        while "suppressed 4 similar ValueError tracebacks" not in messages() and time.monotonic() < deadline:
+            time.sleep(0.02)
+        _fail(logger, "again")
+        shutdown_logging()
+    finally:
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        for handler in previous[0]:
+            root.addHandler(handler)
+        root.setLevel(previous[1])
+
+    assert messages() == [
+        "request failed: boom 0",
+        "suppressed 4 similar ValueError tracebacks",
+        "request failed: again",
+    ]
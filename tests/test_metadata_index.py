@@ -0,0 +1,49 @@
+"""
+Tests cho MetadataIndex và các helper trong retriever_utils dùng index.
+"""
+import numpy as np
+from langchain_core.documents import Document
+
+from app.graph.data_retriever import DataRetriever
+from app.utils.metadata_index import MetadataIndex
+from app.utils.retriever_utils import extract_metadata, filter_docs_by_metadata
+
+DOCS = [
+    Document(page_content="a", metadata={"lang": "vi", "year": 2020}),
+    Document(page_content="b", metadata={"lang": "en", "tags": ["x"]}),
+    Document(page_content="c", metadata={}),
+    Document(page_content="d", metadata={"lang": "vi", "year": 2021, "tags": ["x"]}),
+]
+
+
+def test_filter_matches_linear_scan():
+    """Test kết quả filter qua index giống hệt linear scan (kể cả key thiếu / unhashable)."""
+    index = MetadataIndex.from_documents(DOCS)
+    filters = [
+        {"lang": "vi"},
+        {"lang": "vi", "year": 2021},
+        {"year": None},
+        {"tags": ["x"]},
+        {"unknown": None},
+        {"unknown": 1},
+        {},
+    ]
+    for metadata_filter in filters:
+        assert filter_docs_by_metadata(DOCS, metadata_filter, index=index) == \
+            filter_docs_by_metadata(DOCS, metadata_filter)
+
+
+def test_extract_reads_columns():
+    """Test extract_metadata qua index bỏ qua doc không có metadata như bản gốc."""
+    index = MetadataIndex.from_documents(DOCS)
+    assert extract_metadata(DOCS, "year", default=0, index=index) == \
+        extract_metadata(DOCS, "year", default=0) == [2020, 0, 2021]
+
+
+def test_retriever_prefilters_before_scoring():
+    """Test metadata_filter loại documents trước khi vector scoring."""
+    retriever = DataRetriever(top_k=2)
+    retriever.add_vectors(np.array([[1, 0], [1, 0.1], [0, 1], [0.9, 0]]), DOCS)
+    results = retriever.search_by_vector([1, 0], metadata_filter={"lang": "vi"})
+    assert [doc.page_content for doc in results] == ["a", "d"]
+    assert retriever.search_by_vector([1, 0], metadata_filter={"lang": "fr"}) == []
@@ -0,0 +1,60 @@
+"""
+Tests cho OpenAI stub server (benchmarks/openai_stub.py).
+"""
+import json
+import random
+
+from fastapi.testclient import TestClient
+
+from benchmarks.openai_stub import StubConfig, create_stub_app, sample_from_schema
+
+FAST = dict(ttft_ms=0.0, ttft_sigma=0.0, tokens_per_sec=1e6, embedding_latency_ms=0.0, seed=0)
+
+
+def test_sample_from_schema_resolves_refs_and_enums():
+    """Test instance sinh từ schema pydantic (có $ref, enum, Optional) hợp lệ."""
+    schema = {
+        "type": "object",
+        "properties": {
+            "intent": {"enum": ["question", "request"], "type": "string"},
+            "file": {"$ref": "#/$defs/File"},
+            "note": {"anyOf": [{"type": "null"}, {"type": "integer"}]},
+        },
+        "$defs": {"File": {"type": "object", "properties": {"name": {"type": "string"}}}},
+    }
+    assert sample_from_schema(schema) == {"intent": "question", "file": {"name": "stub"}, "note": 0}
+    rng = random.Random(0)
+    assert {sample_from_schema(schema, rng=rng)["intent"] for _ in range(20)} == {"question", "request"}
+
+
+def test_chat_completion_structured_stream_and_rate_limit():
+    """Test response thường, json_schema, streaming SSE và 429 khi rate_limit_rate = 1."""
+    config = StubConfig(completion_tokens=5, **FAST)
+    client = TestClient(create_stub_app(config))
+
+    response = client.post("/v1/chat/completions", json={"messages": [{"role": "user", "content": "hi"}]})
+    body = response.json()
+    assert body["choices"][0]["message"]["content"] == "lorem ipsum dolor sit amet"
+    assert body["usage"]["completion_tokens"] == 5
+
+    schema = {"type": "object", "properties": {"intent": {"enum": ["question", "request"]}}}
+    response = client.post("/v1/chat/completions", json={
+        "messages": [],
+        "response_format": {"type": "json_schema", "json_schema": {"name": "Intent", "schema": schema}},
+    })
+    assert json.loads(response.json()["choices"][0]["message"]["content"]) == {"intent": "question"}
+
+    response = client.post("/v1/chat/completions", json={
+        "messages": [], "stream": True, "stream_options": {"include_usage": True},
+    })
+    events = [line[len("data: "):] for line in response.text.splitlines() if line.startswith("data: ")]
+    assert events[-1] == "[DONE]"
+    chunks = [json.loads(event) for event in events[:-1]]
+    content = "".join(chunk["choices"][0]["delta"].get("content") or "" for chunk in chunks if chunk["choices"])
+    assert content == "lorem ipsum dolor sit amet"
+    assert chunks[-1]["usage"]["completion_tokens"] == 5
+
+    client.put("/stub/config", json={"rate_limit_rate": 1.0})
+    response = client.post("/v1/chat/completions", json={"messages": []})
+    assert response.status_code == 429 and response.headers["retry-after-ms"] == "200"
+    assert client.get("/stub/stats").json()["rate_limited"] == 1
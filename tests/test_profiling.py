@@ -0,0 +1,63 @@
+"""
+Tests cho ProfilingMiddleware (app/core/profiling.py).
+"""
+import json
+import os
+import pstats
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.profiling import ProfilingMiddleware
+
+
+def _busy_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/work")
+    async def work():
+        deadline = time.perf_counter() + 0.05
+        total = 0
+        while time.perf_counter() < deadline:
+            total += sum(range(1000))
+        return {"total": total}
+
+    return app
+
+
+def test_header_triggers_cprofile_dump(tmp_path):
+    """Test chỉ request có header X-Profile đúng secret mới được profile (pstats)."""
+    app = _busy_app()
+    app.add_middleware(ProfilingMiddleware, directory=str(tmp_path), mode="cprofile", sample_every=0, secret="s3cret")
+    client = TestClient(app)
+
+    assert "x-profile-id" not in client.get("/work").headers
+    assert "x-profile-id" not in client.get("/work", headers={"X-Profile": "wrong"}).headers
+    assert os.listdir(tmp_path) == []
+
+    response = client.get("/work", headers={"X-Profile": "s3cret"})
+    assert response.status_code == 200
+    profile_id = response.headers["x-profile-id"]
+    assert os.listdir(tmp_path) == [f"{profile_id}.prof"]
+    stats = pstats.Stats(str(tmp_path / f"{profile_id}.prof"))
+    assert any(func[2] == "work" for func in stats.stats)
+
+
+def test_sampling_one_in_n_writes_speedscope(tmp_path):
+    """Test sampling 1/N requests và output speedscope hợp lệ (stack chứa endpoint)."""
+    app = _busy_app()
+    app.add_middleware(ProfilingMiddleware, directory=str(tmp_path), mode="sampling", sample_every=2, secret="")
+    client = TestClient(app)
+
+    headers = [client.get("/work").headers for _ in range(4)]
+    assert ["x-profile-id" in h for h in headers] == [False, True, False, True]
+
+    files = sorted(os.listdir(tmp_path))
+    assert len(files) == 2 and all(name.endswith(".speedscope.json") for name in files)
+    with open(tmp_path / files[0], encoding="utf-8") as f:
+        profile = json.load(f)
+    frames = profile["shared"]["frames"]
+    samples = profile["profiles"][0]["samples"]
+    assert samples and len(samples) == len(profile["profiles"][0]["weights"])
+    assert any(frames[i]["name"].endswith("work") for stack in samples for i in stack)
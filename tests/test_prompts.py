@@ -0,0 +1,51 @@
+"""
+Tests cho prompt builder và cached prompt tokens (app/prompts/builder.py).
+"""
+import asyncio
+
+import httpx
+from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_openai import ChatOpenAI
+
+from app.core.config import settings
+from app.graph.simple_graph import SimpleGraph
+from app.prompts.builder import build_messages, get_prompt_cache_stats, prompt_cache_stats
+from benchmarks.openai_stub import StubConfig, create_stub_app
+
+
+def test_build_messages_puts_static_prefix_before_user_content():
+    """Test shared prefix + system prompt đứng trước, query nằm trong message cuối."""
+    messages = build_messages("Hướng dẫn node.", 'Câu: "xin chào"', shared_prefix="Hướng dẫn chung.")
+    assert messages == [
+        SystemMessage(content="Hướng dẫn chung.\n\nHướng dẫn node."),
+        HumanMessage(content='Câu: "xin chào"'),
+    ]
+    assert build_messages(None, "xin chào", shared_prefix="") == [HumanMessage(content="xin chào")]
+
+
+def test_cached_prompt_tokens_recorded_per_node(tmp_path, monkeypatch):
+    """Test prefix dùng chung đủ dài => lần gọi sau được báo cached tokens, stats ghi theo node."""
+    prefix_file = tmp_path / "shared_prefix.txt"
+    prefix_file.write_text("Quy tắc chung của hệ thống. " * 300, encoding="utf-8")
+    monkeypatch.setattr(settings, "prompt_shared_prefix_path", str(prefix_file))
+    prompt_cache_stats.reset()
+
+    stub = create_stub_app(StubConfig(ttft_ms=0.0, ttft_sigma=0.0, tokens_per_sec=1e6, seed=0))
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=stub)) as http_client:
+            llm = ChatOpenAI(
+                model="stub", api_key="stub", base_url="http://stub/v1", http_async_client=http_client
+            )
+            graph = SimpleGraph(llm=llm)
+            return [await graph._classify_intent(query) for query in ("câu một", "câu hai", "câu ba")]
+
+    assert asyncio.run(scenario()) == ["question"] * 3
+    stats = get_prompt_cache_stats()["classify_intent"]
+    assert stats["calls"] == 3
+    # Lần đầu miss, hai lần sau hit phần prefix (làm tròn 128 tokens)
+    assert stats["cached_tokens"] > 0 and stats["cached_tokens"] % 128 == 0
+    assert 0.5 < stats["cached_ratio"] < 1
+    assert stats["hit_latency_avg_ms"] is not None and stats["miss_latency_avg_ms"] is not None
+    assert stats["input_cost_saving"] == round(stats["cached_ratio"] * settings.prompt_cache_discount, 4)
+    prompt_cache_stats.reset()
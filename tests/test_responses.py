@@ -0,0 +1,39 @@
+"""
+Tests cho response builders của graph routes (app/api/responses.py).
+"""
+from app.api.responses import MESSAGE_WAITING_FOR_INPUT, graph_error_response, graph_response
+from app.schemas.api import SimpleGraphResponse
+
+MESSAGES = [{"role": "user", "content": "ghi file a.txt"}, {"role": "assistant", "content": "ok"}]
+
+
+def _dump(response: SimpleGraphResponse) -> dict:
+    # Serialize rồi validate lại: response trusted phải là payload hợp lệ
+    return SimpleGraphResponse.model_validate_json(response.model_dump_json()).model_dump()
+
+
+def test_graph_response_paused_and_completed():
+    """Test response khi chờ approve ghi file, chờ thông tin và khi chạy xong."""
+    review = _dump(graph_response(
+        {"__interrupt__": True, "messages": MESSAGES, "intent": "request",
+         "file_path": "a.txt", "file_content": "hello", "token_usage": None},
+        "t1", message="done", paused_message="paused",
+    ))
+    assert review["waiting_for_human"] and review["message"] == "paused"
+    assert review["data"]["final_response"] == "Yêu cầu ghi file:\n\nFile: a.txt\n\nNội dung:\nhello"
+    assert review["data"]["file_content"] == "hello" and review["data"]["token_usage"] == {}
+    assert review["data"]["messages"] == MESSAGES
+
+    asking = _dump(graph_response({"__interrupt__": True, "file_path": "a.txt"}, "t1", "done", "paused"))
+    assert asking["data"]["final_response"] == MESSAGE_WAITING_FOR_INPUT
+    assert asking["data"]["file_path"] is None and asking["data"]["messages"] == []
+
+    completed = _dump(graph_response(
+        {"final_response": "xong", "messages": MESSAGES, "file_path": "a.txt", "file_content": "hello"},
+        "t1", "done", "paused",
+    ))
+    assert not completed["waiting_for_human"] and completed["message"] == "done"
+    assert completed["data"]["file_path"] == "a.txt" and completed["data"]["file_content"] is None
+
+    error = _dump(graph_error_response("boom", "t1"))
+    assert error == {"success": False, "message": "boom", "data": None, "thread_id": "t1", "waiting_for_human": False}
@@ -0,0 +1,105 @@
+"""
+Tests cho pre-fork server launcher (app/server.py).
+"""
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+import pytest
+
+from app.server import STARTUP_FAILURE, ServerOptions
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SERVER_SCRIPT = """
+import os, sys
+from fastapi import FastAPI
+from app.server import PreforkServer, ServerOptions
+
+app = FastAPI()
+
+@app.get("/pid")
+async def pid():
+    return {"pid": os.getpid()}
+
+options = ServerOptions(host="127.0.0.1", port=int(sys.argv[1]), workers=2, max_requests=3, graceful_timeout=2)
+sys.exit(PreforkServer(app, options).run())
+"""
+
+FAILING_SERVER_SCRIPT = """
+import logging, sys
+from fastapi import FastAPI
+from app.server import PreforkServer, ServerOptions
+
+logging.basicConfig(level=logging.INFO, stream=sys.stdout, format="%(message)s")
+app = FastAPI()
+
+@app.on_event("startup")
+async def startup():
+    raise RuntimeError("MongoDB không kết nối được")
+
+options = ServerOptions(host="127.0.0.1", port=int(sys.argv[1]), workers=2, graceful_timeout=2)
+sys.exit(PreforkServer(app, options).run())
+"""
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_options_from_profile_and_overrides():
+    """Test tuning profile được áp dụng, override khác None được ưu tiên."""
+    options = ServerOptions.from_settings(profile="proxy", workers=3, port=None)
+    assert (options.keepalive_timeout, options.limit_concurrency, options.backlog) == (75, 1000, 4096)
+    assert options.workers == 3 and options.port == 8000
+    assert ServerOptions.from_settings(profile="balanced").workers >= 1
+    with pytest.raises(ValueError):
+        ServerOptions.from_settings(profile="turbo")
+
+
+def test_workers_are_recycled_and_master_stops_gracefully():
+    """Test workers recycle sau max_requests (pid mới) và SIGTERM dừng master với exit code 0."""
+    port = _free_port()
+    env = {**os.environ, "PYTHONPATH": ROOT}
+    process = subprocess.Popen(
+        [sys.executable, "-c", SERVER_SCRIPT, str(port)],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        url = f"http://127.0.0.1:{port}/pid"
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                httpx.get(url, timeout=1)
+                break
+            except httpx.HTTPError:
+                assert time.monotonic() < deadline, "server không start"
+                time.sleep(0.2)
+
+        pids = {httpx.get(url, timeout=10).json()["pid"] for _ in range(15)}
+        assert process.pid not in pids
+        assert len(pids) > 2
+
+        process.send_signal(signal.SIGTERM)
+        assert process.wait(timeout=30) == 0
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+
+
+def test_startup_failure_stops_master_without_respawning():
+    """Test worker lỗi lúc startup => master dừng với STARTUP_FAILURE, không fork lại workers."""
+    env = {**os.environ, "PYTHONPATH": ROOT}
+    result = subprocess.run(
+        [sys.executable, "-c", FAILING_SERVER_SCRIPT, str(_free_port())],
+        cwd=ROOT, env=env, capture_output=True, text=True, timeout=60,
+    )
+    assert result.returncode == STARTUP_FAILURE
+    assert result.stdout.count("Spawned worker") == 2
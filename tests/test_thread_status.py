@@ -0,0 +1,100 @@
+"""
+Tests cho ThreadStatusRegistry và status endpoint.
+"""
+import asyncio
+
+from fastapi import status
+
+from app.graph.thread_status import (
+    ThreadStatusRegistry,
+    thread_status_registry,
+    STATUS_RUNNING,
+    STATUS_WAITING_FOR_HUMAN,
+)
+
+
+def test_update_increments_version():
+    """Test version tăng sau mỗi lần update."""
+    registry = ThreadStatusRegistry(max_threads=10)
+    registry.update("t1", STATUS_RUNNING)
+    entry = registry.update("t1", STATUS_WAITING_FOR_HUMAN, {"intent": "request"})
+    assert entry["version"] == 2
+    assert entry["waiting_for_human"] is True
+    assert registry.get("t1")["state"] == {"intent": "request"}
+
+
+def test_registry_evicts_oldest_thread():
+    """Test LRU eviction khi vượt max_threads."""
+    registry = ThreadStatusRegistry(max_threads=2)
+    for thread_id in ("t1", "t2", "t3"):
+        registry.update(thread_id, STATUS_RUNNING)
+    assert registry.get("t1") is None
+    assert registry.get("t3") is not None
+
+
+def test_get_marks_thread_as_recently_used():
+    """Test get() cập nhật thứ tự LRU: thread vừa đọc không bị evict."""
+    registry = ThreadStatusRegistry(max_threads=2)
+    registry.update("t1", STATUS_RUNNING)
+    registry.update("t2", STATUS_RUNNING)
+    assert registry.get("t1") is not None
+    registry.update("t3", STATUS_RUNNING)
+    assert registry.get("t2") is None
+    assert registry.get("t1") is not None
+
+
+def test_wait_for_change_wakes_on_update():
+    """Test long-poll được đánh thức khi trạng thái thay đổi."""
+    registry = ThreadStatusRegistry(max_threads=10)
+    registry.update("t1", STATUS_RUNNING)
+
+    async def scenario():
+        waiter = asyncio.create_task(registry.wait_for_change("t1", None, timeout=5))
+        await asyncio.sleep(0)
+        registry.update("t1", STATUS_WAITING_FOR_HUMAN)
+        return await asyncio.wait_for(waiter, timeout=1)
+
+    entry = asyncio.run(scenario())
+    assert entry["status"] == STATUS_WAITING_FOR_HUMAN
+
+
+def test_wait_for_change_times_out():
+    """Test long-poll trả về trạng thái cũ khi hết timeout."""
+    registry = ThreadStatusRegistry(max_threads=10)
+    registry.update("t1", STATUS_RUNNING)
+    entry = asyncio.run(registry.wait_for_change("t1", None, timeout=0.01))
+    assert entry["version"] == 1
+    assert registry._events == {}
+
+
+def test_cancelled_waiters_release_event():
+    """Test waiter bị cancel không làm mất event của waiter khác; waiter cuối cùng dọn event."""
+    registry = ThreadStatusRegistry(max_threads=10)
+    registry.update("t1", STATUS_RUNNING)
+
+    async def scenario():
+        first = asyncio.create_task(registry.wait_for_change("t1", None, timeout=5))
+        second = asyncio.create_task(registry.wait_for_change("t1", None, timeout=5))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.gather(first, return_exceptions=True)
+        assert registry._events["t1"].count == 1
+        second.cancel()
+        await asyncio.gather(second, return_exceptions=True)
+
+    asyncio.run(scenario())
+    assert registry._events == {}
+
+
+def test_status_endpoint(client):
+    """Test status endpoint đọc từ registry."""
+    thread_status_registry.update("status-test", STATUS_WAITING_FOR_HUMAN, {"intent": "request"})
+    response = client.get("/api/v1/graph/simple/status-test/status")
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["waiting_for_human"] is True
+    assert data["status"] == STATUS_WAITING_FOR_HUMAN
+    assert data["current_state"] == {"intent": "request"}
+
+    response = client.get("/api/v1/graph/simple/missing-thread/status", params={"wait": 1})
+    assert response.json()["status"] == "unknown"
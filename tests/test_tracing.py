@@ -0,0 +1,85 @@
+"""
+Tests cho tracing (app/core/tracing.py).
+"""
+import json
+from types import SimpleNamespace
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from app.core.tracing import (
+    JsonLinesExporter,
+    MongoCommandTracer,
+    TracingMiddleware,
+    configure_tracing,
+    shutdown_tracing,
+    start_span,
+    traced,
+)
+
+
+def _read_spans(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_request_spans_link_route_node_and_llm(tmp_path):
+    """Test span server -> node (@traced) -> llm (callbacks) cùng trace, header được echo."""
+    path = tmp_path / "spans.jsonl"
+    configure_tracing(JsonLinesExporter(str(path)))
+    try:
+        llm = FakeListChatModel(responses=["xin chào"])
+
+        @traced("node answer", "node")
+        async def answer():
+            return (await llm.ainvoke("hi")).content
+
+        app = FastAPI()
+        app.add_middleware(TracingMiddleware)
+
+        @app.get("/items/{item_id}")
+        async def get_item(item_id: str):
+            return {"answer": await answer()}
+
+        client = TestClient(app)
+        response = client.get("/items/1", headers={"X-Request-ID": "req-123"})
+        assert response.json() == {"answer": "xin chào"}
+        assert response.headers["x-request-id"] == "req-123"
+        trace_id = response.headers["x-trace-id"]
+    finally:
+        shutdown_tracing()
+
+    spans = {span["kind"]: span for span in _read_spans(path)}
+    assert set(spans) == {"server", "node", "llm"}
+    assert {span["trace_id"] for span in spans.values()} == {trace_id}
+    assert {span["request_id"] for span in spans.values()} == {"req-123"}
+    assert spans["server"]["name"] == "GET /items/{item_id}"
+    assert spans["server"]["attributes"]["http.status_code"] == 200
+    assert spans["node"]["parent_id"] == spans["server"]["span_id"]
+    assert spans["llm"]["parent_id"] == spans["node"]["span_id"]
+
+
+def test_mongo_commands_and_errors_become_child_spans(tmp_path):
+    """Test CommandListener tạo span db con của span hiện tại, lỗi được ghi nhận."""
+    path = tmp_path / "spans.jsonl"
+    configure_tracing(JsonLinesExporter(str(path)))
+    listener = MongoCommandTracer()
+    event = SimpleNamespace(connection_id=("localhost", 27017), request_id=7, command_name="find", database_name="db")
+    try:
+        # Command ngoài request (không có span cha) bị bỏ qua
+        listener.started(event)
+        listener.succeeded(event)
+        try:
+            with start_span("work") as span:
+                listener.started(event)
+                listener.failed(SimpleNamespace(**vars(event), failure={"errmsg": "boom"}))
+                raise ValueError("bad")
+        except ValueError:
+            pass
+    finally:
+        shutdown_tracing()
+
+    db, work = _read_spans(path)
+    assert db["name"] == "mongo find" and db["parent_id"] == span.span_id and db["error"] == "boom"
+    assert work["status"] == "error" and work["error"] == "ValueError: bad"
@@ -0,0 +1,154 @@
+"""
+Tests cho VectorIndex (flat/IVF) và DataRetriever.
+"""
+import asyncio
+from typing import List
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from app.graph.data_retriever import DataRetriever
+from app.utils.retriever_utils import format_retrieved_docs
+from app.utils.vector_index import VectorIndex, exact_topk
+
+
+def _corpus(n: int = 2000, dim: int = 16) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    topics = rng.standard_normal((20, dim))
+    return (topics[rng.integers(0, 20, n)] + 0.3 * rng.standard_normal((n, dim))).astype(np.float32)
+
+
+def test_flat_search_matches_bruteforce():
+    """Test flat search (nhiều block) khớp với cosine brute force."""
+    corpus = _corpus()
+    index = VectorIndex(dim=16, index_type="flat")
+    index.block_rows = 300
+    index.add(corpus)
+    scores, positions = index.search(corpus[:5], k=3)
+
+    normalized = corpus / np.linalg.norm(corpus, axis=1, keepdims=True)
+    expected = np.argsort(-(normalized[:5] @ normalized.T), axis=1)[:, :3]
+    assert positions[:, 0].tolist() == [0, 1, 2, 3, 4]
+    assert np.allclose(scores[:, 0], 1.0, atol=1e-5)
+    assert positions.tolist() == expected.tolist()
+
+
+def test_ivf_recall_and_unbuilt_tail():
+    """Test IVF recall cao và vectors add sau build vẫn tìm thấy."""
+    corpus = _corpus()
+    index = VectorIndex(dim=16, index_type="ivf", n_lists=20, n_probe=4)
+    index.add(corpus)
+    index.build()
+    _, exact = exact_topk(corpus[:50], corpus, 5)
+    _, approx = index.search(corpus[:50], k=5)
+    recall = np.mean([len(set(a) & set(b)) / 5 for a, b in zip(exact.tolist(), approx.tolist())])
+    assert recall >= 0.9
+
+    new_vector = np.ones((1, 16), dtype=np.float32)
+    (position,) = index.add(new_vector)
+    _, positions = index.search(new_vector, k=1)
+    assert positions[0, 0] == position
+
+
+def test_incremental_segments_tombstones_and_compaction():
+    """Test add vào nhiều segments, delete bị bỏ qua khi search, compaction giữ nguyên positions."""
+    corpus = _corpus(n=1000)
+    index = VectorIndex(dim=16, index_type="ivf", n_lists=10, n_probe=10)
+    index.segment_rows = 300
+    index.add(corpus[:600])
+    index.build()
+    index.add(corpus[600:])
+    assert index.tail_size == 400 and index.needs_compaction()
+
+    removed = index.delete([0, 1, 700, 700])
+    assert removed == 3 and len(index) == 997
+    _, positions = index.search(corpus[[0, 1, 700, 5]], k=1)
+    assert 0 not in positions[:3, 0] and 700 not in positions[:3, 0]
+    assert positions[3, 0] == 5
+    _, subset = index.search(corpus[0], k=5, positions=[0, 1, 2, 3])
+    assert sorted(subset[0].tolist()) == [2, 3]
+
+    index.build()
+    assert index.tail_size == 0 and index.is_ivf
+    _, positions = index.search(corpus[[800, 0]], k=1)
+    assert positions[0, 0] == 800 and positions[1, 0] != 0
+    normalized = corpus[[5, 900]] / np.linalg.norm(corpus[[5, 900]], axis=1, keepdims=True)
+    assert np.allclose(index.get_vectors([5, 900]), normalized, atol=1e-6)
+
+
+def test_quantized_storage_recall_and_rerank():
+    """Test float16/int8 giảm memory, recall cao và rerank float32 cho score exact."""
+    corpus = _corpus()
+    _, exact = exact_topk(corpus[:50], corpus, 5)
+    memory = {}
+    for dtype in ("float32", "float16", "int8"):
+        index = VectorIndex(dim=16, index_type="flat", dtype=dtype)
+        index.add(corpus)
+        index.build()
+        memory[dtype] = index.memory_bytes
+        _, approx = index.search(corpus[:50], k=5)
+        recall = np.mean([len(set(a) & set(b)) / 5 for a, b in zip(exact.tolist(), approx.tolist())])
+        assert recall >= 0.9
+    assert memory["int8"] < memory["float16"] < memory["float32"]
+
+    index = VectorIndex(dim=16, index_type="flat", dtype="int8", rerank_source=lambda p: corpus[p])
+    index.add(corpus)
+    scores, positions = index.search(corpus[:5], k=3)
+    assert positions[:, 0].tolist() == [0, 1, 2, 3, 4]
+    assert np.allclose(scores[:, 0], 1.0, atol=1e-6)
+
+
+def test_int8_scales_refit_after_small_first_add():
+    """Test int8: batch add đầu nhỏ không làm clip các batch sau (scales fit lại khi compaction)."""
+    corpus = _corpus()
+    _, exact = exact_topk(corpus[:50], corpus, 5)
+    for index_type in ("flat", "ivf"):
+        index = VectorIndex(dim=16, index_type=index_type, dtype="int8", n_lists=20, n_probe=20)
+        index.add(corpus[:1])
+        index.build()
+        index.add(corpus[1:100])
+        assert index.needs_compaction()
+        index.build()
+        index.add(corpus[100:])
+        _, tail_approx = index.search(corpus[:50], k=5)
+        index.build()
+        assert index.tail_size == 0 and index.memory_bytes < corpus.nbytes
+        _, approx = index.search(corpus[:50], k=5)
+        for found in (tail_approx, approx):
+            recall = np.mean([len(set(a) & set(b)) / 5 for a, b in zip(exact.tolist(), found.tolist())])
+            assert recall >= 0.9, index_type
+    assert np.allclose(index.get_vectors([1500]), corpus[1500] / np.linalg.norm(corpus[1500]), atol=0.05)
+
+
+class _KeywordEmbeddings(Embeddings):
+    """Embeddings giả: mỗi chiều đếm một keyword."""
+
+    keywords = ["mèo", "chó", "cá"]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return [text.count(word) + 0.01 for word in self.keywords]
+
+
+def test_data_retriever_returns_scored_documents():
+    """Test DataRetriever trả về Documents có score, dùng được với format_retrieved_docs."""
+    docs = [
+        Document(page_content="con mèo", metadata={"id": 1}),
+        Document(page_content="con chó", metadata={"id": 2}),
+        Document(page_content="con cá", metadata={"id": 3}),
+    ]
+
+    async def scenario():
+        retriever = await DataRetriever.create_with_embeddings(
+            docs, embeddings=_KeywordEmbeddings(), top_k=2, score_threshold=0.5
+        )
+        return await retriever.aretrieve("mèo")
+
+    results = asyncio.run(scenario())
+    assert [doc.metadata["id"] for doc in results] == [1]
+    assert results[0].metadata["score"] > 0.9
+    assert "score" not in docs[0].metadata
+    assert format_retrieved_docs(results) == "con mèo"
@@ -0,0 +1,241 @@
+"""
+Tests cho graph worker (app/worker.py): claim bằng lease, heartbeat, retry khi worker chết.
+"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict
+
+from langchain_openai import ChatOpenAI
+
+from app.graph.pending_requests import MemoryPendingStore
+from app.graph.simple_graph import SimpleGraph
+from app.schemas.graph.base import FileInfo
+from app.services.graph_job_service import (
+    JOB_COMPLETED,
+    JOB_FAILED,
+    JOB_PENDING,
+    JOB_RUNNING,
+    GraphJobService,
+    register_graph,
+)
+from app.worker import GraphWorker
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+class MemoryJobStore:
+    """Cùng ngữ nghĩa với MongoGraphJobStore (claim/extend/requeue atomically trong event loop)."""
+
+    def __init__(self):
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        self.revoked = set()
+
+    async def create(self, job):
+        self.jobs[job["_id"]] = dict(job)
+
+    async def load(self, job_id, projection=None):
+        job = self.jobs.get(job_id)
+        return dict(job) if job is not None else None
+
+    async def save(self, job_id, fields, owner=None):
+        job = self.jobs[job_id]
+        if owner is not None and job.get("lease_owner") != owner:
+            return False
+        job.update(fields)
+        return True
+
+    async def claim(self, owner, lease_seconds, graphs=None):
+        now = _now()
+        ready = [
+            job for job in self.jobs.values()
+            if job["status"] == JOB_PENDING and job["available_at"] <= now
+            and (graphs is None or job["graph"] in graphs)
+        ]
+        if not ready:
+            return None
+        job = min(ready, key=lambda item: item["available_at"])
+        job.update(
+            status=JOB_RUNNING, lease_owner=owner, started_at=now,
+            lease_expires_at=now + timedelta(seconds=lease_seconds), attempts=job["attempts"] + 1,
+        )
+        return dict(job)
+
+    async def extend_lease(self, job_id, owner, lease_seconds):
+        job = self.jobs[job_id]
+        if job_id in self.revoked or job["status"] != JOB_RUNNING or job.get("lease_owner") != owner:
+            return False
+        job["lease_expires_at"] = _now() + timedelta(seconds=lease_seconds)
+        return True
+
+    async def requeue_expired(self, max_attempts, backoff):
+        now = _now()
+        requeued = failed = 0
+        for job in self.jobs.values():
+            if job["status"] != JOB_RUNNING or not job.get("lease_expires_at") or job["lease_expires_at"] >= now:
+                continue
+            if job["attempts"] >= max_attempts:
+                job.update(status=JOB_FAILED, error="lease expired", finished_at=now)
+                failed += 1
+            else:
+                job.update(status=JOB_PENDING, available_at=now + timedelta(seconds=backoff(job["attempts"])))
+                requeued += 1
+            job.update(lease_owner=None, lease_expires_at=None)
+        return requeued, failed
+
+
+class SleepGraph:
+    active = 0
+    peak = 0
+    calls = []
+
+    async def invoke(self, state, thread_id=None):
+        SleepGraph.active += 1
+        SleepGraph.peak = max(SleepGraph.peak, SleepGraph.active)
+        SleepGraph.calls.append(state["n"])
+        try:
+            await asyncio.sleep(state.get("seconds", 0.05))
+        finally:
+            SleepGraph.active -= 1
+        return {"final_response": f"done {state['n']}", "messages": [], "token_usage": {}}
+
+
+class ProposingGraph(SimpleGraph):
+    """SimpleGraph không gọi LLM: mọi query là yêu cầu ghi file vào `target`."""
+
+    target = None
+
+    async def _classify_intent(self, query):
+        return "request"
+
+    async def _propose_file(self, query):
+        return FileInfo(file_name=ProposingGraph.target, file_content=f"nội dung: {query}")
+
+
+def _worker(store, **kwargs):
+    options = dict(concurrency=2, lease_seconds=1.0, heartbeat_interval=0.05, poll_interval=0.05,
+                   max_attempts=2, retry_backoff=0.05, graceful_timeout=2.0)
+    options.update(kwargs)
+    return GraphWorker(service=GraphJobService(job_store=store, executor="worker", callback_url=""), **options)
+
+
+async def _run_until(workers, condition, timeout=5.0):
+    tasks = [asyncio.create_task(worker.run()) for worker in workers]
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition() and asyncio.get_running_loop().time() < deadline:
+        await asyncio.sleep(0.02)
+    for worker in workers:
+        worker.stop()
+    await asyncio.gather(*tasks)
+
+
+def test_workers_claim_each_job_once_with_bounded_concurrency():
+    """Test hai workers cùng hàng đợi: mỗi job chạy đúng một lần, mỗi worker tối đa `concurrency` jobs."""
+    register_graph("sleep", SleepGraph)
+    SleepGraph.calls, SleepGraph.peak = [], 0
+    store = MemoryJobStore()
+
+    async def scenario():
+        service = GraphJobService(job_store=store, executor="worker", callback_url="")
+        for n in range(8):
+            job = await service.submit("sleep", {"n": n})
+            assert job["status"] == JOB_PENDING
+        assert all(job["status"] == JOB_PENDING for job in store.jobs.values())
+        workers = [_worker(store, worker_id="w1"), _worker(store, worker_id="w2")]
+        await _run_until(workers, lambda: all(job["status"] == JOB_COMPLETED for job in store.jobs.values()))
+
+    asyncio.run(scenario())
+    assert sorted(SleepGraph.calls) == list(range(8))
+    assert SleepGraph.peak <= 4
+    assert {job["lease_owner"] for job in store.jobs.values()} == {"w1", "w2"}
+    assert all(job["attempts"] == 1 and job["result"]["final_response"] for job in store.jobs.values())
+
+
+def test_crashed_job_is_retried_with_backoff_then_failed():
+    """Test lease hết hạn (worker chết) => job chạy lại trên worker khác; hết lượt => failed."""
+    register_graph("sleep", SleepGraph)
+    store = MemoryJobStore()
+    expired = _now() - timedelta(seconds=1)
+    base = {"graph": "sleep", "status": JOB_RUNNING, "lease_owner": "dead", "lease_expires_at": expired,
+            "available_at": expired, "thread_id": "t"}
+    store.jobs["retry"] = {**base, "_id": "retry", "attempts": 1, "input": {"state": {"n": 100}}}
+    store.jobs["exhausted"] = {**base, "_id": "exhausted", "attempts": 2, "input": {"state": {"n": 101}}}
+
+    async def scenario():
+        await _run_until([_worker(store, worker_id="w1")], lambda: store.jobs["retry"]["status"] == JOB_COMPLETED)
+
+    asyncio.run(scenario())
+    assert store.jobs["retry"]["attempts"] == 2 and store.jobs["retry"]["lease_owner"] == "w1"
+    assert store.jobs["exhausted"]["status"] == JOB_FAILED
+
+
+def test_lost_lease_cancels_job_and_stop_releases_running_jobs():
+    """Test mất lease => job bị hủy, kết quả không ghi; stop() hết graceful_timeout => job trả về pending."""
+    register_graph("sleep", SleepGraph)
+    store = MemoryJobStore()
+
+    async def scenario():
+        service = GraphJobService(job_store=store, executor="worker", callback_url="")
+        lost = await service.submit("sleep", {"n": 200, "seconds": 5})
+        store.revoked.add(lost["_id"])
+        await _run_until([_worker(store, worker_id="w1")], lambda: False, timeout=0.3)
+
+        store.revoked.clear()
+        store.jobs[lost["_id"]].update(status=JOB_PENDING, lease_owner=None, attempts=0)
+        worker = _worker(store, worker_id="w2", graceful_timeout=0.0)
+        await _run_until([worker], lambda: store.jobs[lost["_id"]]["status"] == JOB_RUNNING)
+        return lost["_id"]
+
+    job_id = asyncio.run(scenario())
+    job = store.jobs[job_id]
+    assert job["status"] == JOB_PENDING and job["attempts"] == 0
+    assert job["lease_owner"] is None and "result" not in job
+
+
+def test_resume_job_runs_on_another_worker(tmp_path):
+    """Test HITL: worker 1 chạy lượt đầu rồi dừng, worker 2 chạy job resume => file vẫn được ghi."""
+    ProposingGraph.target = str(tmp_path / "note.txt")
+    # Thay cho collection MongoDB: dùng chung giữa các workers, không nằm trong graph/worker nào
+    pending = MemoryPendingStore()
+    register_graph("hitl", lambda: ProposingGraph(llm=ChatOpenAI(model="stub", api_key="stub"), pending_store=pending))
+    store = MemoryJobStore()
+
+    async def scenario():
+        service = GraphJobService(job_store=store, executor="worker", callback_url="")
+        start = await service.submit("hitl", {"query": "ghi ghi chú"})
+        await _run_until([_worker(store, worker_id="w1")], lambda: store.jobs[start["_id"]]["status"] == JOB_COMPLETED)
+        resume = await service.submit("hitl", {}, thread_id=start["thread_id"], resume_value="đồng ý")
+        await _run_until([_worker(store, worker_id="w2")], lambda: store.jobs[resume["_id"]]["status"] == JOB_COMPLETED)
+        return store.jobs[start["_id"]], store.jobs[resume["_id"]]
+
+    start, resume = asyncio.run(scenario())
+    assert start["lease_owner"] == "w1" and start["result"]["waiting_for_human"]
+    assert resume["lease_owner"] == "w2" and not resume["result"]["waiting_for_human"]
+    assert "Đã ghi file" in resume["result"]["final_response"]
+    assert open(ProposingGraph.target, encoding="utf-8").read() == "nội dung: ghi ghi chú"
+    assert pending.requests == {}
+
+
+def test_local_jobs_hold_lease_and_orphans_are_failed():
+    """Test executor local: job giữ lease qua heartbeat; job của process đã chết bị reaper đánh dấu failed."""
+    register_graph("sleep", SleepGraph)
+    store = MemoryJobStore()
+    expired = _now() - timedelta(seconds=1)
+    store.jobs["orphan"] = {"_id": "orphan", "graph": "sleep", "status": JOB_RUNNING, "attempts": 1,
+                            "lease_owner": "local:dead", "lease_expires_at": expired, "available_at": expired}
+
+    async def scenario():
+        service = GraphJobService(job_store=store, executor="local", callback_url="",
+                                  lease_seconds=0.1, heartbeat_interval=0.02)
+        service.start_reaper()
+        job = await service.submit("sleep", {"n": 300, "seconds": 0.3})
+        while store.jobs[job["_id"]]["status"] != JOB_COMPLETED:
+            await asyncio.sleep(0.02)
+        await service.cancel_all()
+        return store.jobs[job["_id"]], service.owner_id
+
+    job, owner = asyncio.run(scenario())
+    assert job["lease_owner"] == owner and job["attempts"] == 1
+    assert job["result"]["final_response"] == "done 300"
+    assert store.jobs["orphan"]["status"] == JOB_FAILED and "lease expired" in store.jobs["orphan"]["error"]